@@ -0,0 +1,51 @@
+"""
+Shared FastAPI dependencies for the v1 API
+"""
+
+from fastapi import Depends
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import AuthenticationException, AuthorizationException, verify_token
+from app.db import LoaderRegistry, get_session
+from app.models import User, UserRole
+from app.services import UserService
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    session: AsyncSession = Depends(get_session),
+) -> User:
+    """Resolve the active user from the bearer access token"""
+    if credentials is None:
+        raise AuthenticationException("Not authenticated")
+
+    try:
+        payload = verify_token(credentials.credentials)
+    except ValueError as e:
+        raise AuthenticationException(str(e))
+
+    if payload.get("type") != "access" or not str(payload.get("sub", "")).isdigit():
+        raise AuthenticationException("Invalid access token")
+
+    user = await UserService(session).get_user_by_id(int(payload["sub"]))
+    if not user or not user.is_active:
+        raise AuthenticationException("User not found or inactive")
+
+    return user
+
+
+async def require_admin(user: User = Depends(get_current_user)) -> User:
+    """Allow only administrators"""
+    # The role is read from the database rather than the token claim, so a
+    # demoted user loses access without waiting for the token to expire
+    if user.role != UserRole.ADMIN:
+        raise AuthorizationException("Administrator role required")
+    return user
+
+
+async def get_loaders(session: AsyncSession = Depends(get_session)) -> LoaderRegistry:
+    """Batch loaders shared by everything that handles the current request"""
+    return LoaderRegistry(session)
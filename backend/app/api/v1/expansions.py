@@ -0,0 +1,47 @@
+"""
+Optional related objects on order responses, selected with ?expand=
+"""
+
+from typing import Callable, Iterable, Optional, Set
+
+from fastapi import Query
+
+from app.core import BadRequestException
+from app.db import LoaderRegistry
+from app.models import User
+
+# expand name -> (related model, foreign key attribute on the order, relationship to fill)
+ORDER_EXPANSIONS = {
+    "created_by": (User, "created_by", "created_by_user"),
+}
+
+
+def expand_query(expansions: dict = ORDER_EXPANSIONS) -> Callable[..., Set[str]]:
+    """Build a dependency that parses a comma-separated ?expand= parameter"""
+
+    def parse(
+        expand: Optional[str] = Query(
+            None,
+            description=f"Comma-separated related objects to include: {', '.join(expansions)}",
+        ),
+    ) -> Set[str]:
+        requested = {name.strip() for name in (expand or "").split(",") if name.strip()}
+        unknown = requested - expansions.keys()
+        if unknown:
+            raise BadRequestException(f"Cannot expand: {', '.join(sorted(unknown))}")
+        return requested
+
+    return parse
+
+
+async def apply_expansions(
+    objects: Iterable,
+    expand: Set[str],
+    loaders: LoaderRegistry,
+    expansions: dict = ORDER_EXPANSIONS,
+) -> None:
+    """Load each requested expansion for all objects with one query per expansion"""
+    objects = list(objects)
+    for name in expand:
+        model, key_attribute, relationship = expansions[name]
+        await loaders.get(model).attach(objects, key_attribute, relationship)
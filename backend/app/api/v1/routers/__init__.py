@@ -2,8 +2,14 @@
 
 from fastapi import APIRouter
 
+from app.api.v1.routers.admin import router as admin_router
 from app.api.v1.routers.auth import router as auth_router
+from app.api.v1.routers.inventory import router as inventory_router
+from app.api.v1.routers.jobs import router as jobs_router
+from app.api.v1.routers.ml import router as ml_router
+from app.api.v1.routers.planning import router as planning_router
 from app.api.v1.routers.purchase_order import router as po_router
+from app.api.v1.routers.reports import router as reports_router
 from app.api.v1.routers.sales_order import router as so_router
 from app.api.v1.routers.work_order import router as wo_router
 
@@ -15,5 +21,11 @@ router.include_router(auth_router)
 router.include_router(po_router)
 router.include_router(so_router)
 router.include_router(wo_router)
+router.include_router(inventory_router)
+router.include_router(planning_router)
+router.include_router(ml_router)
+router.include_router(jobs_router)
+router.include_router(reports_router)
+router.include_router(admin_router)
 
 __all__ = ["router"]
@@ -0,0 +1,87 @@
+"""
+Administrative endpoints for profiling the running worker
+"""
+
+from enum import Enum
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.api.v1.dependencies import require_admin
+from app.core import get_logger, get_settings
+from app.core.profiling import capture_allocations, profile_event_loop
+from app.core.tracing import TracedRoute
+from app.models import User
+from app.schemas import AllocationReport
+
+logger = get_logger(__name__)
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    route_class=TracedRoute,
+    dependencies=[Depends(require_admin)],
+)
+
+
+class ProfileFormat(str, Enum):
+    """Output formats for CPU profiles"""
+
+    COLLAPSED = "collapsed"
+    SPEEDSCOPE = "speedscope"
+
+
+class AllocationGrouping(str, Enum):
+    """How tracemalloc statistics are grouped"""
+
+    LINENO = "lineno"
+    FILENAME = "filename"
+    TRACEBACK = "traceback"
+
+
+@router.post("/profile/cpu")
+async def profile_cpu(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    format: ProfileFormat = Query(ProfileFormat.COLLAPSED),
+    user: User = Depends(require_admin),
+):
+    """Sample the event loop thread of this worker for a number of seconds
+
+    The response is returned when the capture ends. Collapsed stacks can be
+    fed to flamegraph.pl; speedscope files open at https://www.speedscope.app.
+    """
+    seconds = min(seconds, get_settings().PROFILER_MAX_SECONDS)
+    logger.info("CPU profile started by %s for %ss", user.username, seconds)
+
+    profiler = await profile_event_loop(seconds, interval_ms / 1000)
+
+    logger.info("CPU profile finished with %s samples", profiler.sample_count)
+    if format == ProfileFormat.SPEEDSCOPE:
+        return JSONResponse(
+            profiler.speedscope(f"event loop, {seconds}s"),
+            headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'},
+        )
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed.txt"'},
+    )
+
+
+@router.post("/profile/memory", response_model=AllocationReport, response_model_exclude_none=True)
+async def profile_memory(
+    seconds: float = Query(10, gt=0),
+    top: int = Query(25, ge=1, le=500),
+    group_by: AllocationGrouping = Query(AllocationGrouping.LINENO),
+    user: User = Depends(require_admin),
+):
+    """Trace allocations made by this worker for a window of requests
+
+    Reports the biggest allocation sites still live at the end of the window
+    and the growth between the start and end snapshots.
+    """
+    settings = get_settings()
+    seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+    logger.info("Allocation capture started by %s for %ss", user.username, seconds)
+
+    return await capture_allocations(seconds, top, group_by.value, settings.TRACEMALLOC_FRAMES)
@@ -14,6 +14,7 @@ from app.core import (
     get_logger,
     verify_token,
 )
+from app.core.tracing import TracedRoute
 from app.db import get_session
 from app.schemas import (
     LoginRequest,
@@ -26,7 +27,7 @@ from app.services import UserService
 
 logger = get_logger(__name__)
 
-router = APIRouter(prefix="/auth", tags=["authentication"])
+router = APIRouter(prefix="/auth", tags=["authentication"], route_class=TracedRoute)
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -43,10 +44,10 @@ async def register(
             password=request.password,
             full_name=request.full_name,
         )
-        logger.info(f"User registered: {user.username}")
+        logger.info("User registered: %s", user.username)
         return user
     except Exception as e:
-        logger.error(f"Registration error: {str(e)}")
+        logger.error("Registration error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -73,7 +74,7 @@ async def login(
         )
         refresh_token = create_refresh_token(subject=str(user.id))
 
-        logger.info(f"User logged in: {user.username}")
+        logger.info("User logged in: %s", user.username)
 
         return TokenResponse(
             access_token=access_token,
@@ -82,7 +83,7 @@ async def login(
             expires_in=30 * 60,  # 30 minutes in seconds
         )
     except AuthenticationException as e:
-        logger.warning(f"Login failed: {str(e)}")
+        logger.warning("Login failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e),
@@ -103,7 +104,7 @@ async def refresh_token(request: RefreshTokenRequest):
         user_id = payload.get("sub")
         access_token = create_access_token(subject=user_id)
 
-        logger.info(f"Token refreshed for user: {user_id}")
+        logger.info("Token refreshed for user: %s", user_id)
 
         return TokenResponse(
             access_token=access_token,
@@ -112,7 +113,7 @@ async def refresh_token(request: RefreshTokenRequest):
             expires_in=30 * 60,
         )
     except Exception as e:
-        logger.error(f"Token refresh error: {str(e)}")
+        logger.error("Token refresh error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
@@ -0,0 +1,334 @@
+"""
+Inventory routes: materials, on-hand balances, the stock ledger, snapshots and fabric rolls
+"""
+
+from datetime import date
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.dependencies import require_admin
+from app.core import ConflictException, NotFoundException, ValidationException, get_logger
+from app.core.tracing import TracedRoute
+from app.db import get_session
+from app.models import User
+from app.schemas import (
+    AsOfBalanceResponse,
+    ConsistencyReport,
+    CreateMaterialRequest,
+    FabricRollResponse,
+    MaterialResponse,
+    PaginatedResponse,
+    RebuildReport,
+    RegisterRollsRequest,
+    StockBalanceResponse,
+    StockMovementRequest,
+    StockMovementResponse,
+    StockSnapshotResponse,
+    UpdateMaterialRequest,
+    ValuationReport,
+)
+from app.services import CuttingService, InventoryService, StockSnapshotService
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/inventory", tags=["inventory"], route_class=TracedRoute)
+
+
+def _page(items, total: int, skip: int, limit: int, schema) -> dict:
+    return {
+        "total": total,
+        "page": (skip // limit) + 1,
+        "limit": limit,
+        "pages": (total + limit - 1) // limit,
+        "data": [schema.model_validate(item) for item in items],
+    }
+
+
+@router.post("/materials", response_model=MaterialResponse, status_code=status.HTTP_201_CREATED)
+async def create_material(
+    request: CreateMaterialRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Create a new material"""
+    try:
+        service = InventoryService(session)
+        material = await service.create_material(request)
+        logger.info("Material created: %s", material.material_code)
+        return material
+    except ConflictException as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error("Error creating material: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.get("/materials", response_model=PaginatedResponse)
+async def get_materials(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    search: str = Query(None),
+    category: str = Query(None),
+    below_reorder: bool = Query(False),
+    session: AsyncSession = Depends(get_session),
+):
+    """Get materials with their on-hand quantities"""
+    try:
+        service = InventoryService(session)
+        materials, total = await service.get_all_materials(
+            skip=skip,
+            limit=limit,
+            search=search,
+            category=category,
+            below_reorder=below_reorder,
+        )
+        return _page(materials, total, skip, limit, MaterialResponse)
+    except Exception as e:
+        logger.error("Error fetching materials: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.get("/materials/{material_id}", response_model=MaterialResponse)
+async def get_material(
+    material_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """Get material by ID"""
+    try:
+        service = InventoryService(session)
+        return await service.get_material(material_id)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.put("/materials/{material_id}", response_model=MaterialResponse)
+async def update_material(
+    material_id: int,
+    request: UpdateMaterialRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Update a material"""
+    try:
+        service = InventoryService(session)
+        material = await service.update_material(material_id, request)
+        logger.info("Material updated: %s", material.material_code)
+        return material
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error("Error updating material: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.get("/balances", response_model=PaginatedResponse)
+async def get_balances(
+    material_id: int = Query(None),
+    warehouse_code: str = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    """Get on-hand balances per material and warehouse"""
+    service = InventoryService(session)
+    balances, total = await service.get_balances(
+        material_id=material_id,
+        warehouse_code=warehouse_code,
+        skip=skip,
+        limit=limit,
+    )
+    return _page(balances, total, skip, limit, StockBalanceResponse)
+
+
+@router.get("/movements", response_model=PaginatedResponse)
+async def get_movements(
+    material_id: int = Query(None),
+    warehouse_code: str = Query(None),
+    reference_type: str = Query(None),
+    reference_id: int = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    """Get stock ledger entries, newest first"""
+    service = InventoryService(session)
+    movements, total = await service.get_movements(
+        material_id=material_id,
+        warehouse_code=warehouse_code,
+        reference_type=reference_type,
+        reference_id=reference_id,
+        skip=skip,
+        limit=limit,
+    )
+    return _page(movements, total, skip, limit, StockMovementResponse)
+
+
+@router.post("/movements", response_model=StockMovementResponse, status_code=status.HTTP_201_CREATED)
+async def create_movement(
+    request: StockMovementRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Post a manual receipt, issue or adjustment"""
+    try:
+        service = InventoryService(session)
+        movement = await service.create_movement(request)
+        logger.info("Stock movement posted: %s", movement.id)
+        return movement
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error("Error posting stock movement: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.get("/balances/check", response_model=ConsistencyReport)
+async def check_balances(
+    chunk_size: int = Query(None, ge=1),
+    user: User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+):
+    """Compare every balance with its ledger and report the mismatches"""
+    logger.info("Stock balance check started by %s", user.username)
+    return await InventoryService(session).check_consistency(chunk_size)
+
+
+@router.post("/balances/rebuild", response_model=RebuildReport)
+async def rebuild_balances(
+    chunk_size: int = Query(None, ge=1),
+    user: User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+):
+    """Recompute every balance from the ledger; postings wait until it finishes"""
+    logger.info("Stock balance rebuild started by %s", user.username)
+    return await InventoryService(session).rebuild_balances(chunk_size)
+
+
+@router.get("/balances/as-of", response_model=AsOfBalanceResponse)
+async def get_balance_as_of(
+    as_of: date = Query(..., description="Day whose closing balance is returned"),
+    material_id: int = Query(None),
+    material_code: str = Query(None),
+    session: AsyncSession = Depends(get_session),
+):
+    """On-hand quantity of a material at the end of a day, per warehouse"""
+    try:
+        if material_id is None:
+            if not material_code:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="material_id or material_code is required",
+                )
+            materials = await InventoryService(session).get_materials_by_code([material_code])
+            material_id = materials[material_code].id
+        return await StockSnapshotService(session).material_as_of(as_of, material_id)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.get("/valuation", response_model=ValuationReport)
+async def get_valuation(
+    as_of: date = Query(..., description="Day whose closing stock is valued"),
+    warehouse_code: str = Query(None),
+    top: int = Query(50, ge=0, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    """Stock value at standard cost at the end of a day, by category and top materials"""
+    service = StockSnapshotService(session)
+    return await service.valuation(as_of, warehouse_code=warehouse_code, top=top)
+
+
+@router.get("/snapshots", response_model=PaginatedResponse)
+async def get_snapshots(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    """Get daily stock snapshots, newest first"""
+    service = StockSnapshotService(session)
+    snapshots, total = await service.get_snapshots(skip=skip, limit=limit)
+    return _page(snapshots, total, skip, limit, StockSnapshotResponse)
+
+
+@router.post("/snapshots", response_model=List[StockSnapshotResponse])
+async def take_snapshots(
+    through: date = Query(None, description="Last day to snapshot; defaults to yesterday"),
+    user: User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+):
+    """Take the pending daily snapshots now instead of waiting for the scheduled job"""
+    logger.info("Stock snapshots requested by %s", user.username)
+    return await StockSnapshotService(session).take_snapshots(through)
+
+
+@router.post("/rolls", response_model=List[FabricRollResponse], status_code=status.HTTP_201_CREATED)
+async def register_rolls(
+    request: RegisterRollsRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Put received rolls of a fabric in stock"""
+    try:
+        service = CuttingService(session)
+        rolls = await service.register_rolls(request)
+        logger.info("Fabric rolls registered: %s of %s", len(rolls), request.material_code)
+        return rolls
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except ConflictException as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        )
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.get("/rolls", response_model=PaginatedResponse)
+async def get_rolls(
+    material_id: int = Query(None),
+    available_only: bool = Query(True, description="Only rolls with fabric left"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    """Get fabric rolls"""
+    service = CuttingService(session)
+    rolls, total = await service.get_rolls(
+        material_id=material_id,
+        available_only=available_only,
+        skip=skip,
+        limit=limit,
+    )
+    return _page(rolls, total, skip, limit, FabricRollResponse)
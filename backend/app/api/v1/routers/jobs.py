@@ -0,0 +1,87 @@
+"""
+Background job routes
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.dependencies import require_admin
+from app.core import NotFoundException, get_logger
+from app.core.tracing import TracedRoute
+from app.db import get_session
+from app.models import JobStatus, User
+from app.schemas import CreateJobRequest, JobResponse, PaginatedResponse
+from app.services import JobService
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"], route_class=TracedRoute)
+
+
+@router.post("", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    request: CreateJobRequest,
+    response: Response,
+    user: User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+):
+    """Queue a job; with a dedup_key already queued or running, that job is returned with 200"""
+    job, created = await JobService(session).enqueue(
+        request.job_type,
+        params=request.params,
+        priority=request.priority,
+        dedup_key=request.dedup_key,
+        max_attempts=request.max_attempts,
+        created_by=user.id,
+    )
+    if created:
+        logger.info("Job %s (%s) queued by %s", job.id, job.job_type, user.username)
+    else:
+        response.status_code = status.HTTP_200_OK
+    return job
+
+
+@router.get("", response_model=PaginatedResponse)
+async def get_jobs(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    job_status: JobStatus = Query(None, alias="status"),
+    job_type: str = Query(None),
+    session: AsyncSession = Depends(get_session),
+):
+    """Get jobs, newest first"""
+    jobs, total = await JobService(session).get_jobs(skip=skip, limit=limit, status=job_status, job_type=job_type)
+    return {
+        "total": total,
+        "page": (skip // limit) + 1,
+        "limit": limit,
+        "pages": (total + limit - 1) // limit,
+        "data": [JobResponse.model_validate(job) for job in jobs],
+    }
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """A job's status and progress, and its result or error once finished"""
+    try:
+        return await JobService(session).get_job(job_id)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: int,
+    user: User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+):
+    """Cancel a queued job, or stop a running one at its next progress report"""
+    job = await JobService(session).cancel(job_id)
+    logger.info("Job %s cancellation requested by %s", job_id, user.username)
+    return job
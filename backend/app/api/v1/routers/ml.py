@@ -0,0 +1,284 @@
+"""
+Machine learning routes: demand forecasting, inventory optimization, supplier risk and quality inspection
+"""
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, status, Query, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.dependencies import require_admin
+from app.core import NotFoundException, get_logger
+from app.core.inference import inference_metrics
+from app.core.model_registry import get_model_registry
+from app.core.tracing import TracedRoute
+from app.db import get_session
+from app.models import User
+from app.schemas import (
+    ABCAnalysisResponse,
+    CostSavingsResponse,
+    DefectDetectionResponse,
+    DemandForecastResponse,
+    ForecastMetricsResponse,
+    ForecastMetricsSummary,
+    ForecastRunReport,
+    InventoryPolicyResponse,
+    InventoryPolicyRunReport,
+    ModelRegistryStatus,
+    PaginatedResponse,
+    QualityPredictionRequest,
+    QualityPredictionResponse,
+    SupplierRiskHistoryResponse,
+    SupplierRiskProfileResponse,
+    SupplierRiskRunReport,
+)
+from app.services import ForecastingService, InspectionService, InventoryOptimizationService, SupplierRiskService
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/ml", tags=["ml"], route_class=TracedRoute)
+
+
+@router.get("/demand-forecasting/skus", response_model=PaginatedResponse)
+async def get_forecast_skus(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    search: str = Query(None),
+    model: str = Query(None, description="ses or croston"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Get the products with a demand forecast"""
+    service = ForecastingService(session)
+    forecasts, total = await service.get_forecasts(skip=skip, limit=limit, search=search, model=model)
+    return {
+        "total": total,
+        "page": (skip // limit) + 1,
+        "limit": limit,
+        "pages": (total + limit - 1) // limit,
+        "data": [ForecastMetricsResponse.model_validate(forecast) for forecast in forecasts],
+    }
+
+
+@router.get("/demand-forecasting/forecast", response_model=DemandForecastResponse)
+async def get_demand_forecast(
+    sku_id: str = Query(..., description="Product code"),
+    history_weeks: int = Query(26, ge=0, le=520),
+    horizon_weeks: int = Query(None, ge=1, le=104),
+    session: AsyncSession = Depends(get_session),
+):
+    """Weekly actual and forecast demand of a product, with a 95% prediction interval"""
+    try:
+        service = ForecastingService(session)
+        return await service.forecast_chart(sku_id, history_weeks, horizon_weeks)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.get("/demand-forecasting/metrics", response_model=ForecastMetricsSummary)
+async def get_forecast_metrics_summary(
+    session: AsyncSession = Depends(get_session),
+):
+    """Forecast accuracy averaged over all products"""
+    return await ForecastingService(session).get_metrics_summary()
+
+
+@router.get("/demand-forecasting/metrics/{sku_id}", response_model=ForecastMetricsResponse)
+async def get_forecast_metrics(
+    sku_id: str,
+    session: AsyncSession = Depends(get_session),
+):
+    """Accuracy of a product's forecasts over its history"""
+    try:
+        return await ForecastingService(session).get_forecast(sku_id)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.post("/demand-forecasting/retrain", response_model=ForecastRunReport)
+async def retrain_demand_forecasts(
+    full: bool = Query(False, description="Refit every product, not only those whose orders changed"),
+    user: User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+):
+    """Refresh the demand forecasts: refit the products whose orders changed and roll the rest forward"""
+    logger.info("Demand forecast retrain (full=%s) started by %s", full, user.username)
+    return await ForecastingService(session).retrain(full=full)
+
+
+@router.get("/inventory-optimization/recommendations", response_model=PaginatedResponse)
+async def get_inventory_recommendations(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    search: str = Query(None),
+    abc_class: str = Query(None, pattern="^[ABCabc]$"),
+    xyz_class: str = Query(None, pattern="^[XYZxyz]$"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Stock policies of the materials, largest potential savings first"""
+    service = InventoryOptimizationService(session)
+    policies, total = await service.get_policies(
+        skip=skip, limit=limit, search=search, abc_class=abc_class, xyz_class=xyz_class
+    )
+    return {
+        "total": total,
+        "page": (skip // limit) + 1,
+        "limit": limit,
+        "pages": (total + limit - 1) // limit,
+        "data": [InventoryPolicyResponse.model_validate(policy) for policy in policies],
+    }
+
+
+@router.get("/inventory-optimization/reorder-points", response_model=PaginatedResponse)
+async def get_reorder_points(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    search: str = Query(None),
+    below_reorder_point: bool = Query(False, description="Only materials to reorder now"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Reorder points of the materials, the least stock over the reorder point first"""
+    service = InventoryOptimizationService(session)
+    policies, total = await service.get_policies(
+        skip=skip, limit=limit, search=search, below_reorder_point=below_reorder_point, order_by="reorder"
+    )
+    return {
+        "total": total,
+        "page": (skip // limit) + 1,
+        "limit": limit,
+        "pages": (total + limit - 1) // limit,
+        "data": [InventoryPolicyResponse.model_validate(policy) for policy in policies],
+    }
+
+
+@router.get("/inventory-optimization/abc-analysis", response_model=ABCAnalysisResponse)
+async def get_abc_analysis(
+    session: AsyncSession = Depends(get_session),
+):
+    """Materials and consumption value per ABC class, and the ABC/XYZ matrix"""
+    return await InventoryOptimizationService(session).get_abc_analysis()
+
+
+@router.get("/inventory-optimization/cost-savings", response_model=CostSavingsResponse)
+async def get_cost_savings(
+    session: AsyncSession = Depends(get_session),
+):
+    """Yearly inventory cost now and at the computed policies"""
+    return await InventoryOptimizationService(session).get_cost_savings()
+
+
+@router.post("/inventory-optimization/recompute", response_model=InventoryPolicyRunReport)
+async def recompute_inventory_policies(
+    full: bool = Query(False, description="Aggregate the ledger for every material, not only changed ones"),
+    user: User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+):
+    """Recompute the stock policies from consumption and purchase order receipts"""
+    logger.info("Inventory policy refresh (full=%s) started by %s", full, user.username)
+    return await InventoryOptimizationService(session).refresh(full=full)
+
+
+@router.get("/supplier-risk/scores", response_model=PaginatedResponse)
+async def get_supplier_risk_scores(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    search: str = Query(None),
+    status: str = Query(None, pattern="^(high_risk|watch|low_risk)$"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Risk scores of the suppliers, highest risk first"""
+    service = SupplierRiskService(session)
+    profiles, total = await service.get_scores(skip=skip, limit=limit, search=search, status=status)
+    return {
+        "total": total,
+        "page": (skip // limit) + 1,
+        "limit": limit,
+        "pages": (total + limit - 1) // limit,
+        "data": [SupplierRiskProfileResponse.model_validate(service.describe(profile)) for profile in profiles],
+    }
+
+
+@router.get("/supplier-risk/profile/{supplier_id}", response_model=SupplierRiskProfileResponse)
+async def get_supplier_risk_profile(
+    supplier_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """Purchase order features and risk scores of a supplier"""
+    service = SupplierRiskService(session)
+    try:
+        return service.describe(await service.get_profile(supplier_id))
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.get("/supplier-risk/history/{supplier_id}", response_model=SupplierRiskHistoryResponse)
+async def get_supplier_risk_history(
+    supplier_id: int,
+    timeframe: str = Query("12m", pattern=r"^\d+[dwmy]$", description="e.g. 30d, 8w, 12m or 2y"),
+    session: AsyncSession = Depends(get_session),
+):
+    """A supplier's daily risk scores over the timeframe"""
+    scores = await SupplierRiskService(session).get_history(supplier_id, timeframe)
+    return {"supplier_id": supplier_id, "timeframe": timeframe, "scores": scores}
+
+
+@router.post("/supplier-risk/refresh", response_model=SupplierRiskRunReport)
+async def refresh_supplier_risk(
+    user: User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+):
+    """Rescore every supplier from its purchase orders"""
+    logger.info("Supplier risk scoring started by %s", user.username)
+    return await SupplierRiskService(session).refresh()
+
+
+@router.post("/defect-detection/detect", response_model=DefectDetectionResponse)
+async def detect_defects(
+    image: UploadFile = File(..., description="Binary PGM (P5) or NumPy .npy image"),
+    line_id: str = Form(None),
+):
+    """Detect a defect in an inspection image, batched with other stations' images"""
+    return await InspectionService().detect(image.file, line_id)
+
+
+@router.post("/quality-prediction/batch", response_model=QualityPredictionResponse)
+async def predict_batch_quality(request: QualityPredictionRequest):
+    """Predict the inspection outcome of dyeing batches from their process parameters"""
+    records = [record.model_dump() for record in request.records]
+    return {"predictions": await InspectionService().predict(records)}
+
+
+@router.get("/inference/metrics")
+async def get_inference_metrics():
+    """Queue time, batch size and run time of each model's micro-batches"""
+    return inference_metrics()
+
+
+@router.get("/models", response_model=ModelRegistryStatus)
+async def get_models():
+    """Versions of every model in the registry, and which are loaded"""
+    return get_model_registry().status()
+
+
+@router.post("/models/{name}/activate", response_model=ModelRegistryStatus)
+async def activate_model_version(
+    name: str,
+    version: int = Query(..., ge=1),
+    user: User = Depends(require_admin),
+):
+    """Switch a model to another published version; the next batch loads it"""
+    try:
+        get_model_registry().activate(name, version)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    logger.info("Model %s version %s activated by %s", name, version, user.username)
+    return get_model_registry().status()
@@ -0,0 +1,297 @@
+"""
+Planning routes: bills of materials, material requirements planning, production scheduling,
+dye-lot sequencing, fabric cutting and available to promise
+"""
+
+from datetime import date, datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.dependencies import require_admin
+from app.core import ConflictException, NotFoundException, ValidationException, get_logger
+from app.core.tracing import TracedRoute
+from app.db import get_session
+from app.models import User
+from app.schemas import (
+    ATPResponse,
+    BOMResponse,
+    CreateDyeRecipeRequest,
+    CreateWorkCenterRequest,
+    CuttingPlanResponse,
+    DyeRecipeResponse,
+    DyeSequenceResponse,
+    MRPResponse,
+    PaginatedResponse,
+    ScheduledOrderResponse,
+    ScheduleReport,
+    UpdateBOMRequest,
+    UpdateWorkCenterRequest,
+    WorkCenterResponse,
+)
+from app.services import (
+    ATPService,
+    BOMService,
+    CuttingService,
+    DyeSequencingService,
+    MRPService,
+    SchedulingService,
+    WorkOrderService,
+)
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/planning", tags=["planning"], route_class=TracedRoute)
+
+
+@router.get("/boms/{material_id}", response_model=BOMResponse)
+async def get_bom(
+    material_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """Get the single-level bill of materials of a material"""
+    try:
+        service = BOMService(session)
+        return await service.get_bom(material_id)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.put("/boms/{material_id}", response_model=BOMResponse)
+async def replace_bom(
+    material_id: int,
+    request: UpdateBOMRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Replace the bill of materials of a material; an empty list makes it a bought material"""
+    try:
+        service = BOMService(session)
+        bom = await service.replace_bom(material_id, request)
+        logger.info("Bill of materials replaced: %s", bom["material_code"])
+        return bom
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.get("/mrp", response_model=MRPResponse)
+async def run_mrp(
+    bucket_days: int = Query(None, ge=1, le=366, description="Length of a planning period"),
+    material_id: int = Query(None),
+    action: str = Query(None, pattern="^(make|buy)$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    """Run MRP over all open work orders and page through the time-phased net requirements"""
+    try:
+        service = MRPService(session)
+        return await service.run(
+            bucket_days=bucket_days,
+            material_id=material_id,
+            action=action,
+            skip=skip,
+            limit=limit,
+        )
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.post("/work-centers", response_model=WorkCenterResponse, status_code=status.HTTP_201_CREATED)
+async def create_work_center(
+    request: CreateWorkCenterRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Create a new work center"""
+    try:
+        service = SchedulingService(session)
+        center = await service.create_work_center(request)
+        logger.info("Work center created: %s", center.code)
+        return center
+    except ConflictException as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        )
+
+
+@router.get("/work-centers", response_model=List[WorkCenterResponse])
+async def get_work_centers(
+    category: str = Query(None),
+    session: AsyncSession = Depends(get_session),
+):
+    """Get work centers"""
+    service = SchedulingService(session)
+    return await service.get_all_work_centers(category=category)
+
+
+@router.put("/work-centers/{center_id}", response_model=WorkCenterResponse)
+async def update_work_center(
+    center_id: int,
+    request: UpdateWorkCenterRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Update a work center"""
+    try:
+        service = SchedulingService(session)
+        center = await service.update_work_center(center_id, request)
+        logger.info("Work center updated: %s", center.code)
+        return center
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.get("/schedule", response_model=PaginatedResponse)
+async def get_schedule(
+    work_center_id: int = Query(None),
+    start: datetime = Query(None, description="Only orders still running at or after this time"),
+    end: datetime = Query(None, description="Only orders starting before this time"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+):
+    """Get scheduled work orders by start time"""
+    service = SchedulingService(session)
+    orders, total = await service.get_schedule(
+        work_center_id=work_center_id,
+        start=start,
+        end=end,
+        skip=skip,
+        limit=limit,
+    )
+    return {
+        "total": total,
+        "page": (skip // limit) + 1,
+        "limit": limit,
+        "pages": (total + limit - 1) // limit,
+        "data": [ScheduledOrderResponse.model_validate(order) for order in orders],
+    }
+
+
+@router.post("/schedule", response_model=ScheduleReport)
+async def run_schedule(
+    user: User = Depends(require_admin),
+    session: AsyncSession = Depends(get_session),
+):
+    """Reschedule every open work order from now, closing the gaps left by incremental moves"""
+    logger.info("Schedule run requested by %s", user.username)
+    return await SchedulingService(session).run_schedule()
+
+
+@router.post("/schedule/work-orders/{wo_id}", response_model=ScheduledOrderResponse)
+async def schedule_work_order(
+    wo_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """Put one work order in the earliest free slot without moving any other"""
+    try:
+        wo = await WorkOrderService(session).get_work_order(wo_id)
+        await SchedulingService(session).reschedule_order(wo)
+        await session.commit()
+        logger.info("Work order scheduled: %s", wo.wo_number)
+        return wo
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.post("/dye-recipes", response_model=DyeRecipeResponse, status_code=status.HTTP_201_CREATED)
+async def create_dye_recipe(
+    request: CreateDyeRecipeRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Create a new dye recipe"""
+    try:
+        service = DyeSequencingService(session)
+        recipe = await service.create_dye_recipe(request)
+        logger.info("Dye recipe created: %s", recipe.code)
+        return recipe
+    except ConflictException as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        )
+
+
+@router.get("/dye-recipes", response_model=List[DyeRecipeResponse])
+async def get_dye_recipes(
+    session: AsyncSession = Depends(get_session),
+):
+    """Get dye recipes, lightest shade first"""
+    service = DyeSequencingService(session)
+    return await service.get_all_dye_recipes()
+
+
+@router.get("/dye-sequence", response_model=DyeSequenceResponse)
+async def get_dye_sequence(
+    work_center_id: int = Query(None, description="Dyeing machine whose batch capacity sizes the lots"),
+    batch_capacity: float = Query(None, gt=0, description="Lot size; overrides the work center's"),
+    time_budget_ms: int = Query(None, ge=1, le=60000, description="Time allowed for improving the sequence"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Batch open dyeing work orders into lots and sequence them for the least changeover"""
+    try:
+        service = DyeSequencingService(session)
+        return await service.plan_lots(
+            work_center_id=work_center_id,
+            batch_capacity=batch_capacity,
+            time_budget_ms=time_budget_ms,
+        )
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.get("/cutting-plan", response_model=CuttingPlanResponse)
+async def get_cutting_plan(
+    material_code: str = Query(None),
+    work_order_id: Optional[List[int]] = Query(None, description="Only these work orders; all open ones by default"),
+    time_limit_ms: int = Query(None, ge=1, le=60000, description="Time allowed per fabric"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Plan cutting the fabric pieces of open work orders from the rolls in stock"""
+    service = CuttingService(session)
+    return await service.plan_cuts(
+        material_code=material_code,
+        work_order_ids=work_order_id,
+        time_limit_ms=time_limit_ms,
+    )
+
+
+@router.get("/atp", response_model=ATPResponse)
+async def check_available_to_promise(
+    product_code: str = Query(...),
+    quantity: float = Query(..., gt=0),
+    ship_by: date = Query(..., alias="date", description="Date the quantity is to ship by"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Check whether a quantity of a product can ship by a date, from stock and scheduled output or by ordering more"""
+    try:
+        service = ATPService(session)
+        return await service.check(product_code, quantity, ship_by)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
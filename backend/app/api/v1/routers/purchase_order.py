@@ -2,14 +2,21 @@
 Purchase Order routes
 """
 
+from typing import Set
+
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core import NotFoundException, get_logger
-from app.db import get_session
+from app.api.v1.dependencies import get_loaders
+from app.api.v1.expansions import apply_expansions, expand_query
+from app.core import NotFoundException, ValidationException, get_logger
+from app.core.tracing import TracedRoute
+from app.db import LoaderRegistry, get_session
 from app.schemas import (
     CreatePurchaseOrderRequest,
+    POLineItemRequest,
     PurchaseOrderResponse,
+    UpdatePOLineItemRequest,
     UpdatePurchaseOrderRequest,
     PaginatedResponse,
 )
@@ -18,7 +25,7 @@ from app.utils import PaginationUtil
 
 logger = get_logger(__name__)
 
-router = APIRouter(prefix="/purchase-orders", tags=["purchase-orders"])
+router = APIRouter(prefix="/purchase-orders", tags=["purchase-orders"], route_class=TracedRoute)
 
 
 @router.post("", response_model=PurchaseOrderResponse, status_code=status.HTTP_201_CREATED)
@@ -30,10 +37,10 @@ async def create_purchase_order(
     try:
         service = PurchaseOrderService(session)
         po = await service.create_purchase_order(request)
-        logger.info(f"Purchase order created: {po.po_number}")
+        logger.info("Purchase order created: %s", po.po_number)
         return po
     except Exception as e:
-        logger.error(f"Error creating purchase order: {str(e)}")
+        logger.error("Error creating purchase order: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -43,12 +50,16 @@ async def create_purchase_order(
 @router.get("/{po_id}", response_model=PurchaseOrderResponse)
 async def get_purchase_order(
     po_id: int,
+    include_archived: bool = Query(False),
+    expand: Set[str] = Depends(expand_query()),
+    loaders: LoaderRegistry = Depends(get_loaders),
     session: AsyncSession = Depends(get_session),
 ):
     """Get purchase order by ID"""
     try:
         service = PurchaseOrderService(session)
-        po = await service.get_purchase_order(po_id)
+        po = await service.get_purchase_order(po_id, include_archived=include_archived)
+        await apply_expansions([po], expand, loaders)
         return po
     except NotFoundException as e:
         raise HTTPException(
@@ -62,6 +73,9 @@ async def get_purchase_orders(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     status: str = Query(None),
+    include_archived: bool = Query(False),
+    expand: Set[str] = Depends(expand_query()),
+    loaders: LoaderRegistry = Depends(get_loaders),
     session: AsyncSession = Depends(get_session),
 ):
     """Get all purchase orders with pagination"""
@@ -71,17 +85,19 @@ async def get_purchase_orders(
             skip=skip,
             limit=limit,
             status=status,
+            include_archived=include_archived,
         )
+        await apply_expansions(pos, expand, loaders)
 
         return {
             "total": total,
             "page": (skip // limit) + 1,
             "limit": limit,
             "pages": (total + limit - 1) // limit,
-            "data": pos,
+            "data": [PurchaseOrderResponse.model_validate(item) for item in pos],
         }
     except Exception as e:
-        logger.error(f"Error fetching purchase orders: {str(e)}")
+        logger.error("Error fetching purchase orders: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -98,7 +114,7 @@ async def update_purchase_order(
     try:
         service = PurchaseOrderService(session)
         po = await service.update_purchase_order(po_id, request)
-        logger.info(f"Purchase order updated: {po.po_number}")
+        logger.info("Purchase order updated: %s", po.po_number)
         return po
     except NotFoundException as e:
         raise HTTPException(
@@ -106,7 +122,7 @@ async def update_purchase_order(
             detail=str(e),
         )
     except Exception as e:
-        logger.error(f"Error updating purchase order: {str(e)}")
+        logger.error("Error updating purchase order: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -122,9 +138,81 @@ async def delete_purchase_order(
     try:
         service = PurchaseOrderService(session)
         await service.delete_purchase_order(po_id)
-        logger.info(f"Purchase order deleted: {po_id}")
+        logger.info("Purchase order deleted: %s", po_id)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.post("/{po_id}/line-items", response_model=PurchaseOrderResponse, status_code=status.HTTP_201_CREATED)
+async def add_line_item(
+    po_id: int,
+    request: POLineItemRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Add a line item to a purchase order"""
+    try:
+        service = PurchaseOrderService(session)
+        po = await service.add_line_item(po_id, request)
+        logger.info("Line item added to purchase order: %s", po.po_number)
+        return po
     except NotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e),
         )
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.patch("/{po_id}/line-items/{item_id}", response_model=PurchaseOrderResponse)
+async def update_line_item(
+    po_id: int,
+    item_id: int,
+    request: UpdatePOLineItemRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Update a line item of a purchase order"""
+    try:
+        service = PurchaseOrderService(session)
+        po = await service.update_line_item(po_id, item_id, request)
+        logger.info("Line item %s updated on purchase order: %s", item_id, po.po_number)
+        return po
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.delete("/{po_id}/line-items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_line_item(
+    po_id: int,
+    item_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """Remove a line item from a purchase order"""
+    try:
+        service = PurchaseOrderService(session)
+        await service.delete_line_item(po_id, item_id)
+        logger.info("Line item %s deleted from purchase order: %s", item_id, po_id)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
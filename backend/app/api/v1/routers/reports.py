@@ -0,0 +1,66 @@
+"""
+Report routes
+"""
+
+from datetime import date
+from enum import Enum
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import NotFoundException, get_logger, get_settings
+from app.core.tracing import TracedRoute
+from app.db import get_session
+from app.schemas import ReportDefinition
+from app.services import ReportService
+from app.services.report_service import FORMATS
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/reports", tags=["reports"], route_class=TracedRoute)
+
+
+class ReportFormat(str, Enum):
+    """Output formats for reports"""
+
+    CSV = "csv"
+    JSON = "json"
+    PARQUET = "parquet"
+
+
+@router.get("", response_model=List[ReportDefinition])
+async def get_reports(session: AsyncSession = Depends(get_session)):
+    """The reports and what their rows can be grouped by"""
+    return ReportService(session).describe()
+
+
+@router.get("/{name}")
+async def get_report(
+    name: str,
+    group_by: List[str] = Query(None, description="Dimensions, e.g. supplier, material, month; default per report"),
+    start: date = Query(None),
+    end: date = Query(None),
+    order_status: List[str] = Query(None, alias="status", description="Statuses of the orders counted"),
+    format: ReportFormat = Query(ReportFormat.JSON),
+    session: AsyncSession = Depends(get_session),
+):
+    """A report's rows, streamed; served from the cache unless the orders it reads changed"""
+    try:
+        result, cached = await ReportService(session).run(
+            name, group_by=group_by, start=start, end=end, statuses=order_status
+        )
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+    media_type, extension, encode = FORMATS[format.value]
+    headers = {"X-Report-Cache": "hit" if cached else "miss", "X-Report-Rows": str(result.rows)}
+    if format != ReportFormat.JSON:
+        headers["Content-Disposition"] = f'attachment; filename="{name}.{extension}"'
+    return StreamingResponse(
+        encode(result, get_settings().REPORT_CHUNK_ROWS), media_type=media_type, headers=headers
+    )
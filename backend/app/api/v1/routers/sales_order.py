@@ -2,14 +2,21 @@
 Sales Order routes
 """
 
+from typing import Set
+
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core import NotFoundException, get_logger
-from app.db import get_session
+from app.api.v1.dependencies import get_loaders
+from app.api.v1.expansions import apply_expansions, expand_query
+from app.core import NotFoundException, ValidationException, get_logger
+from app.core.tracing import TracedRoute
+from app.db import LoaderRegistry, get_session
 from app.schemas import (
     CreateSalesOrderRequest,
+    SOLineItemRequest,
     SalesOrderResponse,
+    UpdateSOLineItemRequest,
     UpdateSalesOrderRequest,
     PaginatedResponse,
 )
@@ -17,7 +24,7 @@ from app.services import SalesOrderService
 
 logger = get_logger(__name__)
 
-router = APIRouter(prefix="/sales-orders", tags=["sales-orders"])
+router = APIRouter(prefix="/sales-orders", tags=["sales-orders"], route_class=TracedRoute)
 
 
 @router.post("", response_model=SalesOrderResponse, status_code=status.HTTP_201_CREATED)
@@ -29,10 +36,10 @@ async def create_sales_order(
     try:
         service = SalesOrderService(session)
         so = await service.create_sales_order(request)
-        logger.info(f"Sales order created: {so.so_number}")
+        logger.info("Sales order created: %s", so.so_number)
         return so
     except Exception as e:
-        logger.error(f"Error creating sales order: {str(e)}")
+        logger.error("Error creating sales order: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -42,12 +49,16 @@ async def create_sales_order(
 @router.get("/{so_id}", response_model=SalesOrderResponse)
 async def get_sales_order(
     so_id: int,
+    include_archived: bool = Query(False),
+    expand: Set[str] = Depends(expand_query()),
+    loaders: LoaderRegistry = Depends(get_loaders),
     session: AsyncSession = Depends(get_session),
 ):
     """Get sales order by ID"""
     try:
         service = SalesOrderService(session)
-        so = await service.get_sales_order(so_id)
+        so = await service.get_sales_order(so_id, include_archived=include_archived)
+        await apply_expansions([so], expand, loaders)
         return so
     except NotFoundException as e:
         raise HTTPException(
@@ -61,6 +72,9 @@ async def get_sales_orders(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     status: str = Query(None),
+    include_archived: bool = Query(False),
+    expand: Set[str] = Depends(expand_query()),
+    loaders: LoaderRegistry = Depends(get_loaders),
     session: AsyncSession = Depends(get_session),
 ):
     """Get all sales orders with pagination"""
@@ -70,17 +84,19 @@ async def get_sales_orders(
             skip=skip,
             limit=limit,
             status=status,
+            include_archived=include_archived,
         )
+        await apply_expansions(sos, expand, loaders)
 
         return {
             "total": total,
             "page": (skip // limit) + 1,
             "limit": limit,
             "pages": (total + limit - 1) // limit,
-            "data": sos,
+            "data": [SalesOrderResponse.model_validate(item) for item in sos],
         }
     except Exception as e:
-        logger.error(f"Error fetching sales orders: {str(e)}")
+        logger.error("Error fetching sales orders: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -97,7 +113,7 @@ async def update_sales_order(
     try:
         service = SalesOrderService(session)
         so = await service.update_sales_order(so_id, request)
-        logger.info(f"Sales order updated: {so.so_number}")
+        logger.info("Sales order updated: %s", so.so_number)
         return so
     except NotFoundException as e:
         raise HTTPException(
@@ -105,7 +121,7 @@ async def update_sales_order(
             detail=str(e),
         )
     except Exception as e:
-        logger.error(f"Error updating sales order: {str(e)}")
+        logger.error("Error updating sales order: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -121,9 +137,81 @@ async def delete_sales_order(
     try:
         service = SalesOrderService(session)
         await service.delete_sales_order(so_id)
-        logger.info(f"Sales order deleted: {so_id}")
+        logger.info("Sales order deleted: %s", so_id)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+
+
+@router.post("/{so_id}/line-items", response_model=SalesOrderResponse, status_code=status.HTTP_201_CREATED)
+async def add_line_item(
+    so_id: int,
+    request: SOLineItemRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Add a line item to a sales order"""
+    try:
+        service = SalesOrderService(session)
+        so = await service.add_line_item(so_id, request)
+        logger.info("Line item added to sales order: %s", so.so_number)
+        return so
     except NotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e),
         )
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.patch("/{so_id}/line-items/{item_id}", response_model=SalesOrderResponse)
+async def update_line_item(
+    so_id: int,
+    item_id: int,
+    request: UpdateSOLineItemRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Update a line item of a sales order"""
+    try:
+        service = SalesOrderService(session)
+        so = await service.update_line_item(so_id, item_id, request)
+        logger.info("Line item %s updated on sales order: %s", item_id, so.so_number)
+        return so
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.delete("/{so_id}/line-items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_line_item(
+    so_id: int,
+    item_id: int,
+    session: AsyncSession = Depends(get_session),
+):
+    """Remove a line item from a sales order"""
+    try:
+        service = SalesOrderService(session)
+        await service.delete_line_item(so_id, item_id)
+        logger.info("Line item %s deleted from sales order: %s", item_id, so_id)
+    except NotFoundException as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except ValidationException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
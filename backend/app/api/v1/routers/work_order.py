@@ -2,11 +2,16 @@
 Work Order routes
 """
 
+from typing import Set
+
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.v1.dependencies import get_loaders
+from app.api.v1.expansions import apply_expansions, expand_query
 from app.core import NotFoundException, get_logger
-from app.db import get_session
+from app.core.tracing import TracedRoute
+from app.db import LoaderRegistry, get_session
 from app.schemas import (
     CreateWorkOrderRequest,
     WorkOrderResponse,
@@ -17,7 +22,7 @@ from app.services import WorkOrderService
 
 logger = get_logger(__name__)
 
-router = APIRouter(prefix="/work-orders", tags=["work-orders"])
+router = APIRouter(prefix="/work-orders", tags=["work-orders"], route_class=TracedRoute)
 
 
 @router.post("", response_model=WorkOrderResponse, status_code=status.HTTP_201_CREATED)
@@ -29,10 +34,10 @@ async def create_work_order(
     try:
         service = WorkOrderService(session)
         wo = await service.create_work_order(request)
-        logger.info(f"Work order created: {wo.wo_number}")
+        logger.info("Work order created: %s", wo.wo_number)
         return wo
     except Exception as e:
-        logger.error(f"Error creating work order: {str(e)}")
+        logger.error("Error creating work order: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -42,12 +47,16 @@ async def create_work_order(
 @router.get("/{wo_id}", response_model=WorkOrderResponse)
 async def get_work_order(
     wo_id: int,
+    include_archived: bool = Query(False),
+    expand: Set[str] = Depends(expand_query()),
+    loaders: LoaderRegistry = Depends(get_loaders),
     session: AsyncSession = Depends(get_session),
 ):
     """Get work order by ID"""
     try:
         service = WorkOrderService(session)
-        wo = await service.get_work_order(wo_id)
+        wo = await service.get_work_order(wo_id, include_archived=include_archived)
+        await apply_expansions([wo], expand, loaders)
         return wo
     except NotFoundException as e:
         raise HTTPException(
@@ -61,6 +70,9 @@ async def get_work_orders(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     status: str = Query(None),
+    include_archived: bool = Query(False),
+    expand: Set[str] = Depends(expand_query()),
+    loaders: LoaderRegistry = Depends(get_loaders),
     session: AsyncSession = Depends(get_session),
 ):
     """Get all work orders with pagination"""
@@ -70,17 +82,19 @@ async def get_work_orders(
             skip=skip,
             limit=limit,
             status=status,
+            include_archived=include_archived,
         )
+        await apply_expansions(wos, expand, loaders)
 
         return {
             "total": total,
             "page": (skip // limit) + 1,
             "limit": limit,
             "pages": (total + limit - 1) // limit,
-            "data": wos,
+            "data": [WorkOrderResponse.model_validate(item) for item in wos],
         }
     except Exception as e:
-        logger.error(f"Error fetching work orders: {str(e)}")
+        logger.error("Error fetching work orders: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -97,7 +111,7 @@ async def update_work_order(
     try:
         service = WorkOrderService(session)
         wo = await service.update_work_order(wo_id, request)
-        logger.info(f"Work order updated: {wo.wo_number}")
+        logger.info("Work order updated: %s", wo.wo_number)
         return wo
     except NotFoundException as e:
         raise HTTPException(
@@ -105,7 +119,7 @@ async def update_work_order(
             detail=str(e),
         )
     except Exception as e:
-        logger.error(f"Error updating work order: {str(e)}")
+        logger.error("Error updating work order: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
@@ -121,7 +135,7 @@ async def delete_work_order(
     try:
         service = WorkOrderService(session)
         await service.delete_work_order(wo_id)
-        logger.info(f"Work order deleted: {wo_id}")
+        logger.info("Work order deleted: %s", wo_id)
     except NotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
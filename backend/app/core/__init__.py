@@ -10,6 +10,7 @@ from app.core.exceptions import (
     BadRequestException,
     ConflictException,
     NotFoundException,
+    ServiceUnavailableException,
     ValidationException,
 )
 from app.core.logging import get_logger
@@ -36,4 +37,5 @@ __all__ = [
     "NotFoundException",
     "ConflictException",
     "BadRequestException",
+    "ServiceUnavailableException",
 ]
@@ -84,3 +84,14 @@ class BadRequestException(AppException):
             status_code=status.HTTP_400_BAD_REQUEST,
             error_code="BAD_REQUEST",
         )
+
+
+class ServiceUnavailableException(AppException):
+    """Raised when the server is too busy to take the request"""
+
+    def __init__(self, message: str = "Service unavailable"):
+        super().__init__(
+            message=message,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            error_code="SERVICE_UNAVAILABLE",
+        )
@@ -0,0 +1,234 @@
+"""
+Micro-batching of model inference
+
+Routes call a model through an InferenceScheduler instead of running it
+themselves. Requests queue per model; a collector task takes the first
+request waiting and every other that arrives within INFERENCE_MAX_WAIT_MS,
+up to INFERENCE_MAX_BATCH_SIZE, and hands the batch to a thread pool shared
+by all models. Each caller awaits a future resolved with its own result, so
+the event loop is never blocked by a model and one model call serves many
+requests.
+
+- backpressure: a model's queue holds INFERENCE_MAX_QUEUE requests; past that
+  submit() raises ServiceUnavailableException (503) at once
+- concurrency: at most INFERENCE_CONCURRENCY[model] batches of a model run
+  at once; while they do, its queue keeps filling the next batch
+- metrics: queue time, batch size and batch run time per model, from
+  metrics()
+
+Schedulers belong to the event loop they were created on, and are created
+again on first use from another.
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.exceptions import ServiceUnavailableException
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Recent batches and requests the metrics percentiles are taken over
+METRICS_WINDOW = 1000
+
+_executor: Optional[ThreadPoolExecutor] = None
+_schedulers: Dict[str, "InferenceScheduler"] = {}
+
+
+@dataclass
+class _Request:
+    item: Any
+    future: asyncio.Future
+    enqueued: float
+
+
+@dataclass
+class InferenceStats:
+    """Counters and recent timings of one model"""
+
+    requests: int = 0
+    rejected: int = 0
+    failed: int = 0
+    batches: int = 0
+    queue_ms: deque = field(default_factory=lambda: deque(maxlen=METRICS_WINDOW))
+    batch_sizes: deque = field(default_factory=lambda: deque(maxlen=METRICS_WINDOW))
+    run_ms: deque = field(default_factory=lambda: deque(maxlen=METRICS_WINDOW))
+
+    def snapshot(self) -> dict:
+        """Counters, with the mean and percentiles of the recent timings"""
+
+        def summary(values: deque) -> dict:
+            if not values:
+                return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+            array = np.fromiter(values, dtype=float)
+            p50, p95 = np.percentile(array, [50, 95])
+            return {
+                "mean": round(float(array.mean()), 3),
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+                "max": round(float(array.max()), 3),
+            }
+
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "batches": self.batches,
+            "queue_ms": summary(self.queue_ms),
+            "batch_size": summary(self.batch_sizes),
+            "run_ms": summary(self.run_ms),
+        }
+
+
+class InferenceScheduler:
+    """Queue of requests to one model, run in micro-batches
+
+    predict takes a list of inputs and returns a list of results in the same
+    order; it runs in a worker thread, so it should spend its time in NumPy
+    or other code that releases the GIL.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        predict: Callable[[List[Any]], List[Any]],
+        max_batch_size: int,
+        max_wait_ms: float,
+        max_queue: int,
+        concurrency: int,
+        executor: ThreadPoolExecutor,
+    ):
+        self.name = name
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.stats = InferenceStats()
+        self.loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._running: set = set()
+        self._collector = self.loop.create_task(self._collect())
+
+    async def submit(self, item: Any) -> Any:
+        """Result of the model for item, once the batch it joins has run"""
+        if self._collector.done():
+            raise ServiceUnavailableException(f"{self.name} inference is shut down")
+        request = _Request(item, self.loop.create_future(), time.perf_counter())
+        try:
+            self._queue.put_nowait(request)
+        except asyncio.QueueFull:
+            self.stats.rejected += 1
+            raise ServiceUnavailableException(f"{self.name} inference queue is full, retry later")
+        self.stats.requests += 1
+        return await request.future
+
+    async def _collect(self) -> None:
+        """Form batches from the queue and start them as run slots free up"""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = batch[0].enqueued + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    if timeout > 0:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+
+            await self._slots.acquire()
+            # Requests that arrived while waiting for a slot join this batch
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            # Callers that went away (e.g. disconnected) are not run
+            batch = [request for request in batch if not request.future.done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = self.loop.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[_Request]) -> None:
+        """Run one batch in the worker pool and resolve its callers' futures"""
+        started = time.perf_counter()
+        self.stats.batches += 1
+        self.stats.batch_sizes.append(len(batch))
+        self.stats.queue_ms.extend((started - request.enqueued) * 1000 for request in batch)
+        try:
+            results = await self.loop.run_in_executor(
+                self.executor, self.predict, [request.item for request in batch]
+            )
+        except Exception as exc:
+            self.stats.failed += len(batch)
+            logger.error("%s inference batch of %s failed: %s", self.name, len(batch), exc, exc_info=exc)
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(exc)
+        else:
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result(result)
+        finally:
+            self.stats.run_ms.append((time.perf_counter() - started) * 1000)
+            self._slots.release()
+
+    def close(self) -> None:
+        """Stop forming batches and fail the requests still queued"""
+        self._collector.cancel()
+        while not self._queue.empty():
+            request = self._queue.get_nowait()
+            if not request.future.done():
+                request.future.set_exception(ServiceUnavailableException(f"{self.name} inference is shut down"))
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Thread pool running inference batches of every model, started on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(get_settings().INFERENCE_WORKERS, thread_name_prefix="inference")
+    return _executor
+
+
+def get_scheduler(name: str, predict: Callable[[List[Any]], List[Any]]) -> InferenceScheduler:
+    """The scheduler of model name on the running event loop, created on first use"""
+    scheduler = _schedulers.get(name)
+    if scheduler is None or scheduler.loop is not asyncio.get_running_loop():
+        settings = get_settings()
+        scheduler = InferenceScheduler(
+            name,
+            predict,
+            max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+            max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+            max_queue=settings.INFERENCE_MAX_QUEUE,
+            concurrency=settings.INFERENCE_CONCURRENCY.get(name, 1),
+            executor=get_inference_executor(),
+        )
+        _schedulers[name] = scheduler
+    return scheduler
+
+
+def inference_metrics() -> dict:
+    """Metrics of every model's scheduler, by model name"""
+    return {name: scheduler.stats.snapshot() for name, scheduler in sorted(_schedulers.items())}
+
+
+def shutdown_inference() -> None:
+    """Stop every scheduler and the inference threads"""
+    global _executor
+    for scheduler in _schedulers.values():
+        if not scheduler.loop.is_closed():
+            scheduler.close()
+    _schedulers.clear()
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
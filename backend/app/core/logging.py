@@ -1,18 +1,168 @@
 """
 Logging configuration with structured logging support
+
+Records are handed to a QueueHandler on the calling thread and written by a
+QueueListener on a background thread, so file I/O, rotation and JSON
+encoding never run on the event loop. The caller only merges the message
+arguments (the objects they reference may not be safe to touch from another
+thread) and attaches the request id and route of the current request.
+
+Handlers, the log directory and the listener thread are set up when the
+first record is logged, not when get_logger is called, so importing a
+module has no side effects.
 """
 
+import atexit
+import itertools
+import json
 import logging
 import logging.handlers
-import os
+import queue
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, Optional
 
 from app.core.config import get_settings
 
 
+_configured = False
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Set by RequestContextMiddleware for the duration of each request
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+request_scope_var: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+# Route templates by endpoint, filled on first lookup
+_route_templates: Dict[object, str] = {}
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "request_id",
+    "route",
+}
+
+
+def current_route() -> Optional[str]:
+    """Get the route template of the current request, e.g. /api/v1/purchase-orders/{po_id}"""
+    scope = request_scope_var.get()
+    if scope is None:
+        return None
+
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        # Not routed yet
+        return scope.get("path")
+
+    template = _route_templates.get(endpoint)
+    if template is None:
+        template = scope.get("path")
+        for route in getattr(scope.get("app"), "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                template = getattr(route, "path_format", route.path)
+                break
+        _route_templates[endpoint] = template
+    return template
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request id and route to each record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.route = current_route()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in N records at INFO and below for the configured loggers
+
+    Rates are keyed by logger name prefix; the longest matching prefix wins.
+    Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = {name: max(int(every), 1) for name, every in rates.items()}
+        self._counters: Dict[str, itertools.count] = {}
+
+    def _rate_for(self, name: str) -> int:
+        best, every = -1, 1
+        for prefix, rate in self.rates.items():
+            if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                best, every = len(prefix), rate
+        return every
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+
+        every = self._rate_for(record.name)
+        if every == 1:
+            return True
+
+        counter = self._counters.get(record.name)
+        if counter is None:
+            counter = self._counters.setdefault(record.name, itertools.count())
+        return next(counter) % every == 0
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves all formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render tracebacks here, where the objects are still
+        # safe to read; timestamps, JSON and I/O happen on the listener
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "route": getattr(record, "route", None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, default=str)
+
+
+def create_formatter(log_format: str) -> logging.Formatter:
+    """Create the formatter for LOG_FORMAT ("json" or "text")"""
+    if log_format == "text":
+        return logging.Formatter(
+            fmt="%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
+    return JSONFormatter()
+
+
 def setup_logging():
     """Configure logging for the application"""
+    global _configured, _listener
     settings = get_settings()
+    if _configured:
+        return logging.getLogger("textile_erp")
 
     # Create logs directory if it doesn't exist
     log_dir = Path(settings.LOG_FILE).parent
@@ -22,38 +172,78 @@ def setup_logging():
     logger = logging.getLogger("textile_erp")
     logger.setLevel(getattr(logging, settings.LOG_LEVEL))
 
+    formatter = create_formatter(settings.LOG_FORMAT)
+
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(getattr(logging, settings.LOG_LEVEL))
+    console_handler.setFormatter(formatter)
 
     # File handler
+    # The file is opened on the first record, not at startup
     file_handler = logging.handlers.RotatingFileHandler(
         settings.LOG_FILE,
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=5,
+        delay=True,
     )
     file_handler.setLevel(getattr(logging, settings.LOG_LEVEL))
+    file_handler.setFormatter(formatter)
 
-    # Formatter
-    formatter = logging.Formatter(
-        fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
+    # Both handlers run on the listener thread
+    log_queue = queue.SimpleQueue()
+    queue_handler = AsyncQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLING))
+    queue_handler.addFilter(RequestContextFilter())
+
+    _listener = logging.handlers.QueueListener(
+        log_queue,
+        console_handler,
+        file_handler,
+        respect_handler_level=True,
     )
+    _listener.start()
+    atexit.register(shutdown_logging)
 
-    console_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
-
-    # Add handlers
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    logger.removeHandler(_setup_handler)
+    logger.addHandler(queue_handler)
+    _configured = True
 
     return logger
 
 
-# Create the logger instance
-logger = setup_logging()
+def shutdown_logging() -> None:
+    """Write out queued records and stop the listener thread"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class SetupOnFirstRecordHandler(logging.Handler):
+    """Stand-in handler that configures logging when the first record arrives"""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        with self.lock:
+            logger = setup_logging()
+        if record.levelno < logger.level:
+            return False
+        for handler in logger.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        pass
+
+
+_setup_handler = SetupOnFirstRecordHandler()
+# Let every record through until the configured level is known
+logging.getLogger("textile_erp").setLevel(logging.DEBUG)
+logging.getLogger("textile_erp").addHandler(_setup_handler)
 
 
 def get_logger(name: str) -> logging.Logger:
-    """Get a logger instance"""
+    """Get a logger instance; logging is configured by its first record"""
     return logging.getLogger(f"textile_erp.{name}")
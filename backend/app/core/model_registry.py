@@ -0,0 +1,277 @@
+"""
+Versioned model registry on local disk
+
+Each model lives under MODEL_REGISTRY_DIR as:
+
+    <model>/versions/<n>/manifest.json   parameters, and the array files
+    <model>/versions/<n>/<array>.npy     one uncompressed NumPy file per array
+    <model>/CURRENT                      the active version number
+
+Models are loaded on first use, not at startup, and their arrays are opened
+with np.load(mmap_mode="r"): the operating system pages them in as they are
+read, and every worker process on the host shares the same page cache
+instead of holding a copy. A version is published into a temporary
+directory and renamed into place, and activated by replacing CURRENT with
+os.replace, so a reader sees either the old version or the new one whole.
+get() notices a new CURRENT on its next call; batches already running keep
+the model object they started with.
+
+Loaded models are kept in least recently used order and the coldest are
+unloaded once their arrays add up to more than MODEL_MEMORY_BUDGET_MB.
+Models without a published version use the default the code registers for
+them.
+
+    python -m app.core.model_registry list
+    python -m app.core.model_registry publish quality_prediction arrays.npz --params params.json
+    python -m app.core.model_registry activate quality_prediction 3
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.exceptions import NotFoundException
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ModelSpec:
+    """How to build a model from its artifacts, its default without any, and how to warm it up"""
+
+    load: Callable[[Dict[str, np.ndarray], dict], Any]
+    default: Callable[[], Any]
+    warm_up: Optional[Callable[[Any], None]] = None
+
+
+@dataclass
+class LoadedModel:
+    """A model in memory, and the version and CURRENT file it was loaded from"""
+
+    model: Any
+    version: Optional[int]
+    nbytes: int
+    # (inode, mtime) of CURRENT when loaded; None for the default
+    current_stamp: Optional[tuple]
+    loaded_at: float
+
+
+_specs: Dict[str, ModelSpec] = {}
+
+
+def register_model(
+    name: str,
+    load: Callable[[Dict[str, np.ndarray], dict], Any],
+    default: Callable[[], Any],
+    warm_up: Optional[Callable[[Any], None]] = None,
+) -> None:
+    """Declare model name: load builds it from a version's arrays and parameters"""
+    _specs[name] = ModelSpec(load, default, warm_up)
+
+
+class ModelRegistry:
+    """Published model versions under root, and the models loaded from them"""
+
+    def __init__(self, root: str, memory_budget_bytes: int):
+        self.root = root
+        self.memory_budget_bytes = memory_budget_bytes
+        self._loaded: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _path(self, name: str, *parts: str) -> str:
+        return os.path.join(self.root, name, *parts)
+
+    def versions(self, name: str) -> List[int]:
+        """Published versions of model name, oldest first"""
+        try:
+            entries = os.listdir(self._path(name, "versions"))
+        except FileNotFoundError:
+            return []
+        return sorted(int(entry) for entry in entries if entry.isdigit())
+
+    def current_version(self, name: str) -> Optional[int]:
+        """The active version of model name; None when none is published"""
+        try:
+            with open(self._path(name, "CURRENT")) as file:
+                return int(file.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def _current_stamp(self, name: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(self._path(name, "CURRENT"))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def publish(self, name: str, arrays: Dict[str, np.ndarray], params: dict, activate: bool = True) -> int:
+        """Write a new version of model name, and make it the active one unless activate is False"""
+        versions_dir = self._path(name, "versions")
+        os.makedirs(versions_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".publish-", dir=versions_dir)
+        for array_name, array in arrays.items():
+            np.save(os.path.join(staging, f"{array_name}.npy"), np.ascontiguousarray(array))
+        manifest = {"params": params, "arrays": sorted(arrays), "published_at": time.time()}
+        with open(os.path.join(staging, "manifest.json"), "w") as file:
+            json.dump(manifest, file)
+
+        # Renaming fails if another publisher took the number first: take the next
+        while True:
+            version = max(self.versions(name), default=0) + 1
+            try:
+                os.rename(staging, os.path.join(versions_dir, str(version)))
+                break
+            except OSError:
+                if os.path.isdir(os.path.join(versions_dir, str(version))):
+                    continue
+                raise
+        logger.info("Published %s version %s", name, version)
+        if activate:
+            self.activate(name, version)
+        return version
+
+    def activate(self, name: str, version: int) -> None:
+        """Make version the active one of model name, atomically"""
+        if version not in self.versions(name):
+            raise NotFoundException(f"Model {name} has no version {version}")
+        fd, staging = tempfile.mkstemp(prefix=".CURRENT-", dir=self._path(name))
+        with os.fdopen(fd, "w") as file:
+            file.write(f"{version}\n")
+        os.replace(staging, self._path(name, "CURRENT"))
+        logger.info("Activated %s version %s", name, version)
+
+    def get(self, name: str) -> Any:
+        """The active version of model name, loaded on first use or once another version is activated"""
+        if name not in _specs:
+            raise NotFoundException(f"Unknown model: {name}")
+        stamp = self._current_stamp(name)
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is None or loaded.current_stamp != stamp:
+                loaded = self._load(name, stamp)
+                self._loaded[name] = loaded
+                self._evict(keep=name)
+            self._loaded.move_to_end(name)
+            return loaded.model
+
+    def _load(self, name: str, stamp: Optional[tuple]) -> LoadedModel:
+        spec = _specs[name]
+        started = time.perf_counter()
+        version = self.current_version(name) if stamp else None
+        if version is None:
+            model, nbytes = spec.default(), 0
+        else:
+            directory = self._path(name, "versions", str(version))
+            with open(os.path.join(directory, "manifest.json")) as file:
+                manifest = json.load(file)
+            arrays = {
+                array_name: np.load(os.path.join(directory, f"{array_name}.npy"), mmap_mode="r")
+                for array_name in manifest["arrays"]
+            }
+            model = spec.load(arrays, manifest["params"])
+            nbytes = sum(array.nbytes for array in arrays.values())
+        if spec.warm_up:
+            spec.warm_up(model)
+        self.loads += 1
+        logger.info(
+            "Loaded %s version %s (%s bytes) in %.1fms",
+            name, version, nbytes, (time.perf_counter() - started) * 1000,
+        )
+        return LoadedModel(model, version, nbytes, stamp, time.time())
+
+    def _evict(self, keep: str) -> None:
+        """Unload the least recently used models until the rest fit the memory budget"""
+        total = sum(loaded.nbytes for loaded in self._loaded.values())
+        for name in list(self._loaded):
+            if total <= self.memory_budget_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._loaded.pop(name).nbytes
+            self.evictions += 1
+            logger.info("Unloaded %s to stay within the model memory budget", name)
+
+    def warm_up(self, names: List[str]) -> None:
+        """Load models ahead of their first request"""
+        for name in names:
+            self.get(name)
+
+    def status(self) -> dict:
+        """Versions of every registered model, and what is loaded"""
+        with self._lock:
+            loaded = dict(self._loaded)
+        models = []
+        for name in sorted(_specs):
+            entry = loaded.get(name)
+            models.append({
+                "name": name,
+                "versions": self.versions(name),
+                "current_version": self.current_version(name),
+                "loaded_version": entry.version if entry else None,
+                "loaded": entry is not None,
+                "bytes": entry.nbytes if entry else 0,
+            })
+        return {
+            "models": models,
+            "loaded_bytes": sum(entry.nbytes for entry in loaded.values()),
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+@lru_cache()
+def get_model_registry() -> ModelRegistry:
+    """The registry at MODEL_REGISTRY_DIR"""
+    settings = get_settings()
+    return ModelRegistry(settings.MODEL_REGISTRY_DIR, settings.MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
+
+
+def get_model(name: str) -> Any:
+    """The active version of model name from the registry"""
+    return get_model_registry().get(name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish, activate and list model versions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    publish = commands.add_parser("publish")
+    publish.add_argument("name")
+    publish.add_argument("arrays", help=".npz file of the model's arrays")
+    publish.add_argument("--params", help="JSON file of the model's parameters")
+    publish.add_argument("--no-activate", action="store_true")
+    activate = commands.add_parser("activate")
+    activate.add_argument("name")
+    activate.add_argument("version", type=int)
+    args = parser.parse_args()
+
+    # Registers the models
+    import app.services  # noqa: F401
+
+    registry = get_model_registry()
+    if args.command == "publish":
+        with np.load(args.arrays) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+        params = {}
+        if args.params:
+            with open(args.params) as file:
+                params = json.load(file)
+        print(registry.publish(args.name, arrays, params, activate=not args.no_activate))
+    elif args.command == "activate":
+        registry.activate(args.name, args.version)
+    else:
+        print(json.dumps(registry.status(), indent=2))
@@ -0,0 +1,210 @@
+"""
+On-demand CPU and memory profiling of the running process
+
+Nothing here runs until a capture is requested: the sampling profiler is a
+thread that exists only for the duration of a capture, and tracemalloc is
+started for an allocation window and stopped again afterwards (unless it was
+already running), so a worker that is not being profiled pays nothing.
+
+Only one capture of each kind can run at a time.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.core.exceptions import ConflictException
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Stack frames as (function, file, first line of the function)
+Frame = Tuple[str, str, int]
+
+_profiler_lock = threading.Lock()
+_allocations_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples another thread's stack on a timer
+
+    The stack of the target thread is read with sys._current_frames() from
+    a separate thread, so the profiled code is not instrumented at all.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.elapsed = 0.0
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling in a background thread"""
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self._started
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            # Root first, as flame graphs expect
+            stack.reverse()
+            self.samples[tuple(stack)] += 1
+            self.sample_count += 1
+
+    def collapsed(self) -> str:
+        """Render the samples in Brendan Gregg's collapsed-stack format"""
+        lines = [
+            ";".join(_frame_label(frame) for frame in stack) + f" {count}"
+            for stack, count in self.samples.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> dict:
+        """Render the samples as a speedscope sampled profile"""
+        frames: List[dict] = []
+        frame_index: Dict[Frame, int] = {}
+        samples = []
+        weights = []
+        # Weight each sample by the real time it stands for, which is longer
+        # than the interval when the sampler is delayed by the GIL
+        weight = self.elapsed / self.sample_count if self.sample_count else self.interval
+
+        for stack, count in self.samples.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(weight * count)
+
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "textile-erp-backend",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self.elapsed,
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+def _frame_label(frame: Frame) -> str:
+    """Label a frame for collapsed stacks; ';' separates frames so it is replaced"""
+    function, filename, line = frame
+    return f"{function} ({filename}:{line})".replace(";", ",")
+
+
+async def profile_event_loop(seconds: float, interval: float) -> SamplingProfiler:
+    """Sample the event loop thread for the given number of seconds
+
+    Must be awaited on the event loop; the caller's own request simply waits
+    while the other requests are profiled.
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        raise ConflictException("A profile is already being captured")
+
+    try:
+        profiler = SamplingProfiler(threading.get_ident(), interval)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+        return profiler
+    finally:
+        _profiler_lock.release()
+
+
+def _statistic_entry(stat, group_by: str) -> dict:
+    """Convert a tracemalloc Statistic or StatisticDiff to a dict"""
+    entry = {
+        "file": stat.traceback[0].filename,
+        "line": stat.traceback[0].lineno,
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_bytes"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    if group_by == "traceback":
+        entry["traceback"] = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    return entry
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    """Take a snapshot without the allocations made by tracemalloc itself"""
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+    )
+
+
+async def capture_allocations(seconds: float, top: int, group_by: str, frames: int) -> dict:
+    """Trace allocations for a window of requests and report top allocators and growth
+
+    The top allocators are the blocks still allocated at the end of the
+    window that were allocated while tracing; the growth is the difference
+    between the snapshots taken at the start and the end of the window.
+    """
+    if not _allocations_lock.acquire(blocking=False):
+        raise ConflictException("An allocation capture is already running")
+
+    started_here = not tracemalloc.is_tracing()
+    try:
+        if started_here:
+            tracemalloc.start(frames)
+        # Snapshots walk every traced block, so keep them off the event loop
+        before = await asyncio.to_thread(_take_snapshot)
+        await asyncio.sleep(seconds)
+        after = await asyncio.to_thread(_take_snapshot)
+        current, peak = tracemalloc.get_traced_memory()
+
+        statistics = await asyncio.to_thread(after.statistics, group_by)
+        growth = await asyncio.to_thread(after.compare_to, before, group_by)
+    finally:
+        if started_here:
+            tracemalloc.stop()
+        _allocations_lock.release()
+
+    return {
+        "window_seconds": seconds,
+        "group_by": group_by,
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "top_allocators": [_statistic_entry(stat, group_by) for stat in statistics[:top]],
+        "growth": [_statistic_entry(stat, group_by) for stat in growth[:top] if stat.size_diff],
+    }
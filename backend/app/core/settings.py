@@ -12,6 +12,7 @@ class ProductionSettings(Settings):
     DEBUG: bool = False
     SQLALCHEMY_ECHO: bool = False
     LOG_LEVEL: str = "INFO"
+    SCHEMA_STARTUP_MODE: str = "check"
 
     class Config:
         env_file = ".env.production"
@@ -24,6 +25,7 @@ class DevelopmentSettings(Settings):
     DEBUG: bool = True
     SQLALCHEMY_ECHO: bool = False
     LOG_LEVEL: str = "DEBUG"
+    LOG_FORMAT: str = "text"
 
     class Config:
         env_file = ".env.development"
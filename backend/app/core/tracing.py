@@ -0,0 +1,384 @@
+"""
+Request-scoped tracing with Server-Timing output
+
+ServerTimingMiddleware starts a Trace per request and keeps it in a
+contextvar. Spans opened with span() while a trace is active are recorded
+against it; with no active trace span() returns a shared no-op, so tracing
+costs one contextvar lookup when disabled.
+
+Phases reported in the Server-Timing header, as time spent in the phase
+itself (nested spans are subtracted from their parent):
+
+- pool: waiting for a pooled connection
+- sql: statements on the database cursor
+- orm: session work around the SQL, mostly hydrating rows into objects
+- validation: building the response model from the ORM objects
+- serialization: dumping the response model to JSON-compatible data
+- json: encoding the response body
+- app: everything else (routing, dependencies, endpoint code)
+
+When TRACE_EXPORT_FILE is set, finished traces are appended to it as
+OpenTelemetry (OTLP/JSON) lines by a background thread.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import secrets
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from app.core.config import get_settings
+from app.core.logging import AsyncQueueHandler, current_route, request_id_var
+
+PHASES = ("pool", "sql", "orm", "validation", "serialization", "json")
+
+SERVICE_NAME = "textile-erp-backend"
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+_trace_var: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_span_var: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+_exporter: Optional[logging.Logger] = None
+_export_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("name", "span_id", "parent", "kind", "start_ns", "end_ns", "child_ns", "attributes")
+
+    def __init__(self, name: str, parent: Optional["Span"], kind: int, attributes: dict):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.kind = kind
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = 0
+        self.child_ns = 0
+        self.attributes = attributes
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+    @property
+    def self_ns(self) -> int:
+        """Duration excluding nested spans"""
+        return self.duration_ns - self.child_ns
+
+
+class Trace:
+    """All spans recorded while handling one request"""
+
+    def __init__(self, name: str, attributes: dict):
+        self.trace_id = secrets.token_hex(16)
+        # Span times are monotonic; this anchors them to wall-clock time for export
+        self.epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self.spans: List[Span] = []
+        self.root = self.start_span(name, None, SPAN_KIND_SERVER, attributes)
+
+    def start_span(self, name: str, parent: Optional[Span], kind: int, attributes: dict) -> Span:
+        """Open a span under the given parent"""
+        span = Span(name, parent, kind, attributes)
+        self.spans.append(span)
+        return span
+
+    def end_span(self, span: Span) -> None:
+        """Close a span and charge its time to the parent"""
+        span.end_ns = time.perf_counter_ns()
+        if span.parent is not None:
+            span.parent.child_ns += span.duration_ns
+
+    def phase_totals(self) -> Dict[str, float]:
+        """Milliseconds spent in each phase, plus app time and the total so far"""
+        totals = dict.fromkeys(PHASES, 0)
+        counted = 0
+        for span in self.spans:
+            if span.name in totals and span.end_ns:
+                totals[span.name] += span.self_ns
+                counted += span.self_ns
+
+        total = (self.root.end_ns or time.perf_counter_ns()) - self.root.start_ns
+        totals["app"] = total - counted
+        totals["total"] = total
+        return {name: ns / 1e6 for name, ns in totals.items()}
+
+    def server_timing(self) -> str:
+        """Format the phase totals as a Server-Timing header value"""
+        return ", ".join(f"{name};dur={ms:.2f}" for name, ms in self.phase_totals().items())
+
+    def to_otlp(self) -> dict:
+        """Convert the trace to an OTLP/JSON ExportTraceServiceRequest"""
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [self._otlp_span(span) for span in self.spans if span.end_ns],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def _otlp_span(self, span: Span) -> dict:
+        entry = {
+            "traceId": self.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns + self.epoch_offset_ns),
+            "endTimeUnixNano": str(span.end_ns + self.epoch_offset_ns),
+            "attributes": _otlp_attributes(span.attributes),
+        }
+        if span.parent is not None:
+            entry["parentSpanId"] = span.parent.span_id
+        return entry
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    """Convert a dict to OTLP key/value attributes"""
+    converted = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        converted.append({"key": key, "value": typed})
+    return converted
+
+
+class _ActiveSpan:
+    """Context manager for a span in the current trace"""
+
+    __slots__ = ("trace", "name", "attributes", "span", "token")
+
+    def __init__(self, trace: Trace, name: str, attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        self.span = self.trace.start_span(self.name, _span_var.get(), SPAN_KIND_INTERNAL, self.attributes)
+        self.token = _span_var.set(self.span)
+        return self.span
+
+    def __exit__(self, *exc_info) -> None:
+        _span_var.reset(self.token)
+        self.trace.end_span(self.span)
+
+
+class _NoopSpan:
+    """Stand-in returned by span() when no trace is active"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes):
+    """Time a block as a span of the current request's trace"""
+    trace = _trace_var.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _ActiveSpan(trace, name, attributes)
+
+
+def tracing_active() -> bool:
+    """Check whether the current request is being traced"""
+    return _trace_var.get() is not None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace_var.get()
+    if trace is not None:
+        context._trace_span = trace.start_span(
+            "sql",
+            _span_var.get(),
+            SPAN_KIND_CLIENT,
+            {"db.system": conn.dialect.name, "db.statement": statement},
+        )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        _trace_var.get().end_span(span)
+        context._trace_span = None
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    if context is not None:
+        _after_cursor_execute(None, None, None, None, context, None)
+
+
+def instrument_engine(engine) -> None:
+    """Record a sql span for every statement the engine executes"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class _OTLPFormatter(logging.Formatter):
+    """Render the trace attached to a record as one OTLP/JSON line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.trace.to_otlp(), default=str)
+
+
+def _get_exporter() -> Optional[logging.Logger]:
+    """Get the logger that writes traces to TRACE_EXPORT_FILE, if configured"""
+    global _exporter, _export_listener
+
+    if _exporter is None:
+        settings = get_settings()
+        if not settings.TRACE_EXPORT_FILE:
+            return None
+
+        file_handler = logging.FileHandler(settings.TRACE_EXPORT_FILE, delay=True)
+        file_handler.setFormatter(_OTLPFormatter())
+        log_queue = queue.SimpleQueue()
+        _export_listener = logging.handlers.QueueListener(log_queue, file_handler)
+        _export_listener.start()
+        atexit.register(shutdown_tracing)
+
+        exporter = logging.getLogger("textile_erp_traces")
+        exporter.setLevel(logging.INFO)
+        exporter.propagate = False
+        exporter.addHandler(AsyncQueueHandler(log_queue))
+        _exporter = exporter
+
+    return _exporter
+
+
+def shutdown_tracing() -> None:
+    """Write out queued traces and stop the export thread"""
+    global _exporter, _export_listener
+
+    if _export_listener is not None:
+        _export_listener.stop()
+        _export_listener = None
+    if _exporter is not None:
+        for handler in list(_exporter.handlers):
+            _exporter.removeHandler(handler)
+        _exporter = None
+
+
+class ServerTimingMiddleware:
+    """Trace each request and report its phases in a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(
+            "HTTP " + scope["method"],
+            {"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        attributes = trace.root.attributes
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                attributes["http.status_code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        trace_token = _trace_var.set(trace)
+        span_token = _span_var.set(trace.root)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _span_var.reset(span_token)
+            _trace_var.reset(trace_token)
+            trace.end_span(trace.root)
+
+            route = current_route()
+            trace.root.name = f"{scope['method']} {route}"
+            attributes["http.route"] = route
+            attributes["request.id"] = request_id_var.get()
+
+            exporter = _get_exporter()
+            if exporter is not None:
+                exporter.info("", extra={"trace": trace})
+
+
+class _TracedResponseField:
+    """Response field wrapper timing validation and serialization"""
+
+    def __init__(self, field):
+        self._field = field
+
+    def __getattr__(self, name):
+        return getattr(self._field, name)
+
+    def validate(self, *args, **kwargs):
+        with span("validation"):
+            return self._field.validate(*args, **kwargs)
+
+    def serialize(self, *args, **kwargs):
+        with span("serialization"):
+            return self._field.serialize(*args, **kwargs)
+
+
+class TracedJSONResponse(JSONResponse):
+    """JSONResponse that times body encoding"""
+
+    def render(self, content) -> bytes:
+        with span("json"):
+            return super().render(content)
+
+
+class TracedRoute(APIRoute):
+    """APIRoute that records validation, serialization and JSON encoding spans"""
+
+    def get_route_handler(self):
+        if not get_settings().TRACING_ENABLED:
+            return super().get_route_handler()
+
+        field = self.secure_cloned_response_field
+        response_class = self.response_class
+        if field is not None:
+            self.secure_cloned_response_field = _TracedResponseField(field)
+        if isinstance(response_class, DefaultPlaceholder) and response_class.value is JSONResponse:
+            self.response_class = TracedJSONResponse
+        try:
+            return super().get_route_handler()
+        finally:
+            self.secure_cloned_response_field = field
+            self.response_class = response_class
@@ -1,7 +1,15 @@
 """Database module initialization"""
 
 from app.db.base import Base, BaseModel
-from app.db.session import AsyncSessionLocal, get_engine, get_session
+from app.db.loaders import BatchLoader, LoaderRegistry
+from app.db.session import (
+    AsyncSessionLocal,
+    dispose_engine,
+    get_engine,
+    get_session,
+    get_sessionmaker,
+    warm_up_pool,
+)
 
 __all__ = [
     "Base",
@@ -9,4 +17,9 @@ __all__ = [
     "AsyncSessionLocal",
     "get_engine",
     "get_session",
+    "get_sessionmaker",
+    "dispose_engine",
+    "warm_up_pool",
+    "BatchLoader",
+    "LoaderRegistry",
 ]
@@ -2,7 +2,7 @@
 SQLAlchemy Base model for all database models
 """
 
-from sqlalchemy import Column, DateTime, func
+from sqlalchemy import Column, DateTime, Integer, func
 from sqlalchemy.orm import declarative_base, declared_attr
 
 Base = declarative_base()
@@ -11,13 +11,16 @@ Base = declarative_base()
 class BaseModel:
     """Base model class with common columns"""
 
+    # Fetch server-generated values (created_at, updated_at) with RETURNING
+    # as part of the INSERT/UPDATE, so objects need no refresh after commit
+    __mapper_args__ = {"eager_defaults": True}
+
     @declared_attr
     def id(cls):
         return Column(
             "id",
-            type_=lambda: __import__("sqlalchemy").Integer,
+            Integer,
             primary_key=True,
-            index=True,
         )
 
     @declared_attr
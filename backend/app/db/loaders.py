@@ -0,0 +1,90 @@
+"""
+Request-scoped batch loading of related rows
+
+A BatchLoader collects the keys requested by everything awaiting it in the
+same event loop tick and fetches them with one ``WHERE key IN (...)``
+query, caching the results for the rest of the request. Use one
+LoaderRegistry per request (see get_loaders in the API dependencies) so the
+cache never outlives the session it was filled from.
+"""
+
+import asyncio
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+class BatchLoader:
+    """Batch and cache lookups of one model by a key column"""
+
+    def __init__(self, session: AsyncSession, model, key: str = "id"):
+        self.session = session
+        self.model = model
+        self.key = key
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._pending: List[Hashable] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self, key: Hashable) -> "asyncio.Future[Optional[Any]]":
+        """Get the row for a key, or None if there is none
+
+        Keys requested in the same tick are fetched together.
+        """
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._cache[key] = loop.create_future()
+            if not self._pending:
+                # Runs once the caller yields, after the rest of this tick's keys are queued
+                self._task = loop.create_task(self._dispatch())
+            self._pending.append(key)
+        return future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Optional[Any]]:
+        """Get the rows for several keys with at most one query"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    async def attach(self, objects: Iterable[Any], key_attribute: str, relationship: str) -> None:
+        """Load the related row of each object and set it on the relationship
+
+        The value is set as already loaded, so reading the relationship
+        afterwards does not query the database.
+        """
+        objects = list(objects)
+        keys = {getattr(obj, key_attribute) for obj in objects} - {None}
+        related = dict(zip(keys, await self.load_many(keys)))
+        for obj in objects:
+            set_committed_value(obj, relationship, related.get(getattr(obj, key_attribute)))
+
+    async def _dispatch(self) -> None:
+        keys, self._pending = self._pending, []
+        column = getattr(self.model, self.key)
+
+        try:
+            result = await self.session.execute(select(self.model).where(column.in_(keys)))
+            rows = {getattr(row, self.key): row for row in result.scalars()}
+        except Exception as e:
+            for key in keys:
+                # Failed lookups are not cached
+                self._cache.pop(key).set_exception(e)
+            return
+
+        for key in keys:
+            self._cache[key].set_result(rows.get(key))
+
+
+class LoaderRegistry:
+    """The batch loaders of one request, one per model and key"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._loaders: Dict[tuple, BatchLoader] = {}
+
+    def get(self, model, key: str = "id") -> BatchLoader:
+        """Get the loader for a model, creating it on first use"""
+        loader = self._loaders.get((model, key))
+        if loader is None:
+            loader = self._loaders[(model, key)] = BatchLoader(self.session, model, key)
+        return loader
@@ -2,12 +2,16 @@
 Alembic configuration for database migrations
 """
 
+import asyncio
+import io
 from logging.config import fileConfig
-from sqlalchemy import engine_from_config, pool
+from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
+from alembic.runtime.migration import MigrationContext
 
 from app.core import get_settings
-from app.db import Base
+from app.db import Base, online_migrations
 
 # Import all models to ensure they are registered with SQLAlchemy
 from app.models import (
@@ -18,6 +22,29 @@ from app.models import (
     SalesOrder,
     SOLineItem,
     WorkOrder,
+    WOMaterial,
+    Material,
+    StockMovement,
+    StockBalance,
+    StockSnapshot,
+    FabricRoll,
+    BOMLine,
+    WorkCenter,
+    DyeRecipe,
+    DemandForecast,
+    ForecastChange,
+    InventoryPolicy,
+    InventoryPolicyChange,
+    SupplierRiskProfile,
+    SupplierRiskScore,
+    Job,
+    TableVersion,
+    PurchaseOrderArchive,
+    POLineItemArchive,
+    SalesOrderArchive,
+    SOLineItemArchive,
+    WorkOrderArchive,
+    WOMaterialArchive,
 )
 
 # this is the Alembic Config object
@@ -49,20 +76,57 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
-    """Run migrations in 'online' mode"""
-    connectable = engine_from_config(
+def do_run_migrations(connection) -> None:
+    """Run migrations on a synchronous connection"""
+    if not dry_run:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    # Render plain operations as SQL instead of running them; the online
+    # migration helpers record a plan and read statistics from the live
+    # connection
+    current = MigrationContext.configure(connection).get_current_revision()
+    rendered = io.StringIO()
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        as_sql=True,
+        output_buffer=rendered,
+        starting_rev=current,
+    )
+    online_migrations.configure(dry_run=True, connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+    print(online_migrations.format_plan())
+    print("\nOther statements (run as written, not estimated):\n")
+    print(rendered.getvalue())
+
+
+async def run_async_migrations() -> None:
+    """Run migrations through the application's async driver"""
+    connectable = async_engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
 
-    with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode"""
+    asyncio.run(run_async_migrations())
 
-        with context.begin_transaction():
-            context.run_migrations()
 
+# alembic -x dry_run=true upgrade head
+dry_run = context.get_x_argument(as_dictionary=True).get("dry_run", "false").lower() == "true"
+online_migrations.configure(dry_run=dry_run)
 
 if context.is_offline_mode():
     run_migrations_offline()
@@ -1,9 +1,3 @@
-"""
-Script.py.mako template for Alembic migrations
-"""
-
-# Mako template
-
 """${message}
 
 Revision ID: ${up_revision}
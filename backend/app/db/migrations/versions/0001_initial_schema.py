@@ -0,0 +1,654 @@
+"""Initial schema: every table of the application models
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:21:46.108333
+
+Databases created before this revision by SCHEMA_STARTUP_MODE=create_all
+already have this schema; mark them with ``alembic stamp 0001``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('demand_forecasts',
+    sa.Column('product_code', sa.String(length=100), nullable=False),
+    sa.Column('product_name', sa.String(length=255), nullable=True),
+    sa.Column('model', sa.String(length=20), nullable=False),
+    sa.Column('alpha', sa.Float(), nullable=False),
+    sa.Column('history_start', sa.Date(), nullable=False),
+    sa.Column('weeks', sa.Integer(), nullable=False),
+    sa.Column('history_end', sa.Date(), nullable=False),
+    sa.Column('forecast', sa.Float(), nullable=False),
+    sa.Column('level', sa.Float(), nullable=False),
+    sa.Column('interval', sa.Float(), nullable=False),
+    sa.Column('weeks_since_demand', sa.Integer(), nullable=False),
+    sa.Column('error_weeks', sa.Integer(), nullable=False),
+    sa.Column('demand_weeks', sa.Integer(), nullable=False),
+    sa.Column('sum_abs_error', sa.Float(), nullable=False),
+    sa.Column('sum_squared_error', sa.Float(), nullable=False),
+    sa.Column('sum_demand', sa.Float(), nullable=False),
+    sa.Column('sum_squared_demand', sa.Float(), nullable=False),
+    sa.Column('sum_percentage_error', sa.Float(), nullable=False),
+    sa.Column('mae', sa.Float(), nullable=True),
+    sa.Column('rmse', sa.Float(), nullable=True),
+    sa.Column('mape', sa.Float(), nullable=True),
+    sa.Column('r_squared', sa.Float(), nullable=True),
+    sa.Column('accuracy', sa.Float(), nullable=True),
+    sa.Column('series', sa.LargeBinary(), nullable=False),
+    sa.Column('fitted_at', sa.DateTime(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_demand_forecasts_history_end'), 'demand_forecasts', ['history_end'], unique=False)
+    op.create_index(op.f('ix_demand_forecasts_product_code'), 'demand_forecasts', ['product_code'], unique=True)
+    op.create_table('dye_recipes',
+    sa.Column('code', sa.String(length=50), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('depth', sa.Float(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_dye_recipes_code'), 'dye_recipes', ['code'], unique=True)
+    op.create_table('forecast_changes',
+    sa.Column('product_code', sa.String(length=100), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('product_code')
+    )
+    op.create_table('materials',
+    sa.Column('material_code', sa.String(length=100), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('category', sa.String(length=100), nullable=True),
+    sa.Column('unit', sa.String(length=20), nullable=False),
+    sa.Column('reorder_level', sa.Float(), nullable=False),
+    sa.Column('standard_cost', sa.Float(), nullable=False),
+    sa.Column('lead_time_days', sa.Integer(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_material_category', 'materials', ['category'], unique=False)
+    op.create_index(op.f('ix_materials_material_code'), 'materials', ['material_code'], unique=True)
+    op.create_table('po_line_items_archive',
+    sa.Column('purchase_order_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('material_code', sa.String(length=100), autoincrement=False, nullable=False),
+    sa.Column('material_name', sa.String(length=255), autoincrement=False, nullable=False),
+    sa.Column('quantity', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('unit_price', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('amount', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('created_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.Column('updated_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('idx_po_line_items_archive_po_id', 'po_line_items_archive', ['purchase_order_id'], unique=False)
+    op.create_table('purchase_orders_archive',
+    sa.Column('po_number', sa.String(length=100), autoincrement=False, nullable=False),
+    sa.Column('supplier_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('supplier_name', sa.String(length=255), autoincrement=False, nullable=False),
+    sa.Column('po_date', sa.Date(), autoincrement=False, nullable=False),
+    sa.Column('due_date', sa.Date(), autoincrement=False, nullable=False),
+    sa.Column('status', sa.Enum('DRAFT', 'PENDING', 'APPROVED', 'RECEIVED', 'CANCELLED', name='postatus'),
+        autoincrement=False, nullable=False),
+    sa.Column('subtotal', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('tax_amount', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('tax_rate', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('total_amount', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('notes', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('created_by', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('created_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.Column('updated_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_table('sales_orders_archive',
+    sa.Column('so_number', sa.String(length=100), autoincrement=False, nullable=False),
+    sa.Column('customer_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('customer_name', sa.String(length=255), autoincrement=False, nullable=False),
+    sa.Column('order_date', sa.Date(), autoincrement=False, nullable=False),
+    sa.Column('due_date', sa.Date(), autoincrement=False, nullable=False),
+    sa.Column('status', sa.Enum('DRAFT', 'PENDING', 'CONFIRMED', 'SHIPPED', 'DELIVERED', 'CANCELLED',
+        name='sostatus'), autoincrement=False, nullable=False),
+    sa.Column('subtotal', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('tax_amount', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('tax_rate', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('total_amount', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('notes', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('created_by', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('created_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.Column('updated_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_table('so_line_items_archive',
+    sa.Column('sales_order_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('product_code', sa.String(length=100), autoincrement=False, nullable=False),
+    sa.Column('product_name', sa.String(length=255), autoincrement=False, nullable=False),
+    sa.Column('quantity', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('unit_price', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('amount', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('created_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.Column('updated_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('idx_so_line_items_archive_so_id', 'so_line_items_archive', ['sales_order_id'], unique=False)
+    op.create_table('stock_snapshots',
+    sa.Column('snapshot_date', sa.Date(), nullable=False),
+    sa.Column('cutoff', sa.DateTime(), nullable=False),
+    sa.Column('balance_count', sa.Integer(), nullable=False),
+    sa.Column('material_count', sa.Integer(), nullable=False),
+    sa.Column('total_quantity', sa.Float(), nullable=False),
+    sa.Column('format', sa.String(length=20), nullable=False),
+    sa.Column('size_bytes', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_snapshots_snapshot_date'), 'stock_snapshots', ['snapshot_date'], unique=True)
+    op.create_table('supplier_risk_profiles',
+    sa.Column('supplier_id', sa.Integer(), nullable=False),
+    sa.Column('supplier_name', sa.String(length=255), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('cancelled_orders', sa.Integer(), nullable=False),
+    sa.Column('received_orders', sa.Integer(), nullable=False),
+    sa.Column('on_time_orders', sa.Integer(), nullable=False),
+    sa.Column('average_days_late', sa.Float(), nullable=False),
+    sa.Column('spend', sa.Float(), nullable=False),
+    sa.Column('spend_share', sa.Float(), nullable=False),
+    sa.Column('materials', sa.Integer(), nullable=False),
+    sa.Column('price_volatility', sa.Float(), nullable=False),
+    sa.Column('delivery_risk', sa.Float(), nullable=False),
+    sa.Column('price_risk', sa.Float(), nullable=False),
+    sa.Column('concentration_risk', sa.Float(), nullable=False),
+    sa.Column('cancellation_risk', sa.Float(), nullable=False),
+    sa.Column('risk_score', sa.Float(), nullable=False),
+    sa.Column('previous_score', sa.Float(), nullable=True),
+    sa.Column('scored_at', sa.DateTime(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('supplier_id')
+    )
+    op.create_index(op.f('ix_supplier_risk_profiles_risk_score'), 'supplier_risk_profiles', ['risk_score'],
+        unique=False)
+    op.create_table('supplier_risk_scores',
+    sa.Column('supplier_id', sa.Integer(), nullable=False),
+    sa.Column('scored_on', sa.Date(), nullable=False),
+    sa.Column('risk_score', sa.Float(), nullable=False),
+    sa.Column('delivery_risk', sa.Float(), nullable=False),
+    sa.Column('price_risk', sa.Float(), nullable=False),
+    sa.Column('concentration_risk', sa.Float(), nullable=False),
+    sa.Column('cancellation_risk', sa.Float(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('supplier_id', 'scored_on', name='uq_supplier_risk_score_day')
+    )
+    op.create_index('idx_supplier_risk_score_day', 'supplier_risk_scores', ['scored_on'], unique=False)
+    op.create_table('table_versions',
+    sa.Column('table_name', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.create_table('users',
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('username', sa.String(length=255), nullable=False),
+    sa.Column('full_name', sa.String(length=255), nullable=True),
+    sa.Column('hashed_password', sa.String(length=255), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('role', sa.Enum('ADMIN', 'MANAGER', 'STAFF', 'VIEWER', name='userrole'), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_user_role', 'users', ['role'], unique=False)
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_table('wo_materials_archive',
+    sa.Column('work_order_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('material_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('warehouse_code', sa.String(length=50), autoincrement=False, nullable=False),
+    sa.Column('quantity', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('cut_length', sa.Float(), autoincrement=False, nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('created_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.Column('updated_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index('idx_wo_materials_archive_wo_id', 'wo_materials_archive', ['work_order_id'], unique=False)
+    op.create_table('work_centers',
+    sa.Column('code', sa.String(length=50), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('units_per_hour', sa.Float(), nullable=False),
+    sa.Column('setup_hours', sa.Float(), nullable=False),
+    sa.Column('batch_capacity', sa.Float(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_work_center_category', 'work_centers', ['category'], unique=False)
+    op.create_index(op.f('ix_work_centers_code'), 'work_centers', ['code'], unique=True)
+    op.create_table('work_orders_archive',
+    sa.Column('wo_number', sa.String(length=100), autoincrement=False, nullable=False),
+    sa.Column('product_name', sa.String(length=255), autoincrement=False, nullable=False),
+    sa.Column('product_id', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('quantity', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('due_date', sa.Date(), autoincrement=False, nullable=False),
+    sa.Column('priority', sa.String(length=50), autoincrement=False, nullable=False),
+    sa.Column('status', sa.Enum('DRAFT', 'PENDING', 'IN_PROGRESS', 'COMPLETED', 'CANCELLED', name='wostatus'),
+        autoincrement=False, nullable=False),
+    sa.Column('progress_percentage', sa.Float(), autoincrement=False, nullable=False),
+    sa.Column('estimated_completion_date', sa.Date(), autoincrement=False, nullable=True),
+    sa.Column('work_center_category', sa.String(length=50), autoincrement=False, nullable=True),
+    sa.Column('work_center_id', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('scheduled_start', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('scheduled_end', sa.DateTime(), autoincrement=False, nullable=True),
+    sa.Column('dye_recipe_id', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('fabric_type', sa.String(length=50), autoincrement=False, nullable=True),
+    sa.Column('notes', sa.Text(), autoincrement=False, nullable=True),
+    sa.Column('created_by', sa.Integer(), autoincrement=False, nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('created_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.Column('updated_at', sa.DateTime(), autoincrement=False, nullable=False),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_table('bom_lines',
+    sa.Column('parent_id', sa.Integer(), nullable=False),
+    sa.Column('component_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('scrap_percentage', sa.Float(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['component_id'], ['materials.id'], ondelete='RESTRICT'),
+    sa.ForeignKeyConstraint(['parent_id'], ['materials.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_bom_line_component', 'bom_lines', ['component_id'], unique=False)
+    op.create_index('uq_bom_line_parent_component', 'bom_lines', ['parent_id', 'component_id'], unique=True)
+    op.create_table('inventory_policies',
+    sa.Column('material_id', sa.Integer(), nullable=False),
+    sa.Column('material_code', sa.String(length=100), nullable=False),
+    sa.Column('material_name', sa.String(length=255), nullable=False),
+    sa.Column('history_end', sa.Date(), nullable=False),
+    sa.Column('demand_weeks', sa.Integer(), nullable=False),
+    sa.Column('sum_demand', sa.Float(), nullable=False),
+    sa.Column('sum_squared_demand', sa.Float(), nullable=False),
+    sa.Column('receipts', sa.Integer(), nullable=False),
+    sa.Column('sum_lead_time', sa.Float(), nullable=False),
+    sa.Column('sum_squared_lead_time', sa.Float(), nullable=False),
+    sa.Column('received_quantity', sa.Float(), nullable=False),
+    sa.Column('received_value', sa.Float(), nullable=False),
+    sa.Column('on_hand', sa.Float(), nullable=False),
+    sa.Column('abc_class', sa.String(length=1), nullable=False),
+    sa.Column('xyz_class', sa.String(length=1), nullable=False),
+    sa.Column('unit_cost', sa.Float(), nullable=False),
+    sa.Column('annual_demand', sa.Float(), nullable=False),
+    sa.Column('lead_time_days', sa.Float(), nullable=False),
+    sa.Column('economic_order_quantity', sa.Float(), nullable=False),
+    sa.Column('safety_stock', sa.Float(), nullable=False),
+    sa.Column('reorder_point', sa.Float(), nullable=False),
+    sa.Column('recommended_stock', sa.Float(), nullable=False),
+    sa.Column('current_cost', sa.Float(), nullable=False),
+    sa.Column('optimized_cost', sa.Float(), nullable=False),
+    sa.Column('potential_savings', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('material_id')
+    )
+    op.create_index('idx_inventory_policy_abc_class', 'inventory_policies', ['abc_class'], unique=False)
+    op.create_index(op.f('ix_inventory_policies_material_code'), 'inventory_policies', ['material_code'], unique=False)
+    op.create_index(op.f('ix_inventory_policies_potential_savings'), 'inventory_policies', ['potential_savings'],
+        unique=False)
+    op.create_table('inventory_policy_changes',
+    sa.Column('material_id', sa.Integer(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('material_id')
+    )
+    op.create_table('jobs',
+    sa.Column('job_type', sa.String(length=50), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED', 'CANCELLED', name='jobstatus'),
+        nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('dedup_key', sa.String(length=255), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(), nullable=False),
+    sa.Column('progress', sa.Float(), nullable=False),
+    sa.Column('progress_message', sa.String(length=255), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+    sa.Column('worker_id', sa.String(length=100), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_job_claim', 'jobs', ['status', 'priority', 'run_after'], unique=False)
+    op.create_index('idx_job_created_by', 'jobs', ['created_by'], unique=False)
+    op.create_index('uq_job_active_dedup_key', 'jobs', ['dedup_key'], unique=True,
+        postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING')"),
+        sqlite_where=sa.text("status IN ('QUEUED', 'RUNNING')"))
+    op.create_table('purchase_orders',
+    sa.Column('po_number', sa.String(length=100), nullable=False),
+    sa.Column('supplier_id', sa.Integer(), nullable=False),
+    sa.Column('supplier_name', sa.String(length=255), nullable=False),
+    sa.Column('po_date', sa.Date(), nullable=False),
+    sa.Column('due_date', sa.Date(), nullable=False),
+    sa.Column('status', sa.Enum('DRAFT', 'PENDING', 'APPROVED', 'RECEIVED', 'CANCELLED', name='postatus'),
+        nullable=False),
+    sa.Column('subtotal', sa.Float(), nullable=False),
+    sa.Column('tax_amount', sa.Float(), nullable=False),
+    sa.Column('tax_rate', sa.Float(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_po_created_by', 'purchase_orders', ['created_by'], unique=False)
+    op.create_index('idx_po_status', 'purchase_orders', ['status'], unique=False)
+    op.create_index('idx_po_supplier_id', 'purchase_orders', ['supplier_id'], unique=False)
+    op.create_index(op.f('ix_purchase_orders_po_number'), 'purchase_orders', ['po_number'], unique=True)
+    op.create_table('refresh_tokens',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=512), nullable=False),
+    sa.Column('is_revoked', sa.Boolean(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_refresh_token_is_revoked', 'refresh_tokens', ['is_revoked'], unique=False)
+    op.create_index('idx_refresh_token_user_id', 'refresh_tokens', ['user_id'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_token'), 'refresh_tokens', ['token'], unique=True)
+    op.create_table('sales_orders',
+    sa.Column('so_number', sa.String(length=100), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('customer_name', sa.String(length=255), nullable=False),
+    sa.Column('order_date', sa.Date(), nullable=False),
+    sa.Column('due_date', sa.Date(), nullable=False),
+    sa.Column('status', sa.Enum('DRAFT', 'PENDING', 'CONFIRMED', 'SHIPPED', 'DELIVERED', 'CANCELLED',
+        name='sostatus'), nullable=False),
+    sa.Column('subtotal', sa.Float(), nullable=False),
+    sa.Column('tax_amount', sa.Float(), nullable=False),
+    sa.Column('tax_rate', sa.Float(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_so_created_by', 'sales_orders', ['created_by'], unique=False)
+    op.create_index('idx_so_customer_id', 'sales_orders', ['customer_id'], unique=False)
+    op.create_index('idx_so_status', 'sales_orders', ['status'], unique=False)
+    op.create_index(op.f('ix_sales_orders_so_number'), 'sales_orders', ['so_number'], unique=True)
+    op.create_table('stock_balances',
+    sa.Column('material_id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_code', sa.String(length=50), nullable=False),
+    sa.Column('quantity_on_hand', sa.Float(), nullable=False),
+    sa.Column('last_movement_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('material_id', 'warehouse_code')
+    )
+    op.create_index('idx_stock_balance_warehouse', 'stock_balances', ['warehouse_code'], unique=False)
+    op.create_table('stock_movements',
+    sa.Column('material_id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_code', sa.String(length=50), nullable=False),
+    sa.Column('movement_type', sa.Enum('RECEIPT', 'ISSUE', 'ADJUSTMENT', name='movementtype'), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('unit_cost', sa.Float(), nullable=True),
+    sa.Column('reference_type', sa.String(length=50), nullable=True),
+    sa.Column('reference_id', sa.Integer(), nullable=True),
+    sa.Column('reference_line_id', sa.Integer(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='RESTRICT'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_stock_movement_created_at', 'stock_movements', ['created_at'], unique=False)
+    op.create_index('idx_stock_movement_created_by', 'stock_movements', ['created_by'], unique=False)
+    op.create_index('idx_stock_movement_material', 'stock_movements', ['material_id', 'warehouse_code', 'id'],
+        unique=False)
+    op.create_index('uq_stock_movement_reference_line', 'stock_movements', ['reference_type', 'reference_id',
+        'reference_line_id'], unique=True)
+    op.create_table('work_orders',
+    sa.Column('wo_number', sa.String(length=100), nullable=False),
+    sa.Column('product_name', sa.String(length=255), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('due_date', sa.Date(), nullable=False),
+    sa.Column('priority', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.Enum('DRAFT', 'PENDING', 'IN_PROGRESS', 'COMPLETED', 'CANCELLED', name='wostatus'),
+        nullable=False),
+    sa.Column('progress_percentage', sa.Float(), nullable=False),
+    sa.Column('estimated_completion_date', sa.Date(), nullable=True),
+    sa.Column('work_center_category', sa.String(length=50), nullable=True),
+    sa.Column('work_center_id', sa.Integer(), nullable=True),
+    sa.Column('scheduled_start', sa.DateTime(), nullable=True),
+    sa.Column('scheduled_end', sa.DateTime(), nullable=True),
+    sa.Column('dye_recipe_id', sa.Integer(), nullable=True),
+    sa.Column('fabric_type', sa.String(length=50), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['dye_recipe_id'], ['dye_recipes.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['product_id'], ['materials.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['work_center_id'], ['work_centers.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_wo_created_by', 'work_orders', ['created_by'], unique=False)
+    op.create_index('idx_wo_dye_recipe_id', 'work_orders', ['dye_recipe_id'], unique=False)
+    op.create_index('idx_wo_product_id', 'work_orders', ['product_id'], unique=False)
+    op.create_index('idx_wo_status', 'work_orders', ['status'], unique=False)
+    op.create_index('idx_wo_work_center_schedule', 'work_orders', ['work_center_id', 'scheduled_start'], unique=False)
+    op.create_index(op.f('ix_work_orders_wo_number'), 'work_orders', ['wo_number'], unique=True)
+    op.create_table('po_line_items',
+    sa.Column('purchase_order_id', sa.Integer(), nullable=False),
+    sa.Column('material_code', sa.String(length=100), nullable=False),
+    sa.Column('material_name', sa.String(length=255), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['purchase_order_id'], ['purchase_orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_po_line_item_po_id', 'po_line_items', ['purchase_order_id'], unique=False)
+    op.create_table('so_line_items',
+    sa.Column('sales_order_id', sa.Integer(), nullable=False),
+    sa.Column('product_code', sa.String(length=100), nullable=False),
+    sa.Column('product_name', sa.String(length=255), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['sales_order_id'], ['sales_orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_so_line_item_so_id', 'so_line_items', ['sales_order_id'], unique=False)
+    op.create_table('wo_materials',
+    sa.Column('work_order_id', sa.Integer(), nullable=False),
+    sa.Column('material_id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_code', sa.String(length=50), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('cut_length', sa.Float(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='RESTRICT'),
+    sa.ForeignKeyConstraint(['work_order_id'], ['work_orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_wo_material_material_id', 'wo_materials', ['material_id'], unique=False)
+    op.create_index('idx_wo_material_wo_id', 'wo_materials', ['work_order_id'], unique=False)
+    op.create_table('fabric_rolls',
+    sa.Column('roll_number', sa.String(length=100), nullable=False),
+    sa.Column('material_id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_code', sa.String(length=50), nullable=False),
+    sa.Column('po_line_item_id', sa.Integer(), nullable=True),
+    sa.Column('length', sa.Float(), nullable=False),
+    sa.Column('remaining_length', sa.Float(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ondelete='RESTRICT'),
+    sa.ForeignKeyConstraint(['po_line_item_id'], ['po_line_items.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_fabric_roll_material', 'fabric_rolls', ['material_id', 'remaining_length'], unique=False)
+    op.create_index('idx_fabric_roll_po_line_item', 'fabric_rolls', ['po_line_item_id'], unique=False)
+    op.create_index(op.f('ix_fabric_rolls_roll_number'), 'fabric_rolls', ['roll_number'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_fabric_rolls_roll_number'), table_name='fabric_rolls')
+    op.drop_index('idx_fabric_roll_po_line_item', table_name='fabric_rolls')
+    op.drop_index('idx_fabric_roll_material', table_name='fabric_rolls')
+    op.drop_table('fabric_rolls')
+    op.drop_index('idx_wo_material_wo_id', table_name='wo_materials')
+    op.drop_index('idx_wo_material_material_id', table_name='wo_materials')
+    op.drop_table('wo_materials')
+    op.drop_index('idx_so_line_item_so_id', table_name='so_line_items')
+    op.drop_table('so_line_items')
+    op.drop_index('idx_po_line_item_po_id', table_name='po_line_items')
+    op.drop_table('po_line_items')
+    op.drop_index(op.f('ix_work_orders_wo_number'), table_name='work_orders')
+    op.drop_index('idx_wo_work_center_schedule', table_name='work_orders')
+    op.drop_index('idx_wo_status', table_name='work_orders')
+    op.drop_index('idx_wo_product_id', table_name='work_orders')
+    op.drop_index('idx_wo_dye_recipe_id', table_name='work_orders')
+    op.drop_index('idx_wo_created_by', table_name='work_orders')
+    op.drop_table('work_orders')
+    op.drop_index('uq_stock_movement_reference_line', table_name='stock_movements')
+    op.drop_index('idx_stock_movement_material', table_name='stock_movements')
+    op.drop_index('idx_stock_movement_created_by', table_name='stock_movements')
+    op.drop_index('idx_stock_movement_created_at', table_name='stock_movements')
+    op.drop_table('stock_movements')
+    op.drop_index('idx_stock_balance_warehouse', table_name='stock_balances')
+    op.drop_table('stock_balances')
+    op.drop_index(op.f('ix_sales_orders_so_number'), table_name='sales_orders')
+    op.drop_index('idx_so_status', table_name='sales_orders')
+    op.drop_index('idx_so_customer_id', table_name='sales_orders')
+    op.drop_index('idx_so_created_by', table_name='sales_orders')
+    op.drop_table('sales_orders')
+    op.drop_index(op.f('ix_refresh_tokens_token'), table_name='refresh_tokens')
+    op.drop_index('idx_refresh_token_user_id', table_name='refresh_tokens')
+    op.drop_index('idx_refresh_token_is_revoked', table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
+    op.drop_index(op.f('ix_purchase_orders_po_number'), table_name='purchase_orders')
+    op.drop_index('idx_po_supplier_id', table_name='purchase_orders')
+    op.drop_index('idx_po_status', table_name='purchase_orders')
+    op.drop_index('idx_po_created_by', table_name='purchase_orders')
+    op.drop_table('purchase_orders')
+    op.drop_index('uq_job_active_dedup_key', table_name='jobs',
+        postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING')"),
+        sqlite_where=sa.text("status IN ('QUEUED', 'RUNNING')"))
+    op.drop_index('idx_job_created_by', table_name='jobs')
+    op.drop_index('idx_job_claim', table_name='jobs')
+    op.drop_table('jobs')
+    op.drop_table('inventory_policy_changes')
+    op.drop_index(op.f('ix_inventory_policies_potential_savings'), table_name='inventory_policies')
+    op.drop_index(op.f('ix_inventory_policies_material_code'), table_name='inventory_policies')
+    op.drop_index('idx_inventory_policy_abc_class', table_name='inventory_policies')
+    op.drop_table('inventory_policies')
+    op.drop_index('uq_bom_line_parent_component', table_name='bom_lines')
+    op.drop_index('idx_bom_line_component', table_name='bom_lines')
+    op.drop_table('bom_lines')
+    op.drop_table('work_orders_archive')
+    op.drop_index(op.f('ix_work_centers_code'), table_name='work_centers')
+    op.drop_index('idx_work_center_category', table_name='work_centers')
+    op.drop_table('work_centers')
+    op.drop_index('idx_wo_materials_archive_wo_id', table_name='wo_materials_archive')
+    op.drop_table('wo_materials_archive')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_index('idx_user_role', table_name='users')
+    op.drop_table('users')
+    op.drop_table('table_versions')
+    op.drop_index('idx_supplier_risk_score_day', table_name='supplier_risk_scores')
+    op.drop_table('supplier_risk_scores')
+    op.drop_index(op.f('ix_supplier_risk_profiles_risk_score'), table_name='supplier_risk_profiles')
+    op.drop_table('supplier_risk_profiles')
+    op.drop_index(op.f('ix_stock_snapshots_snapshot_date'), table_name='stock_snapshots')
+    op.drop_table('stock_snapshots')
+    op.drop_index('idx_so_line_items_archive_so_id', table_name='so_line_items_archive')
+    op.drop_table('so_line_items_archive')
+    op.drop_table('sales_orders_archive')
+    op.drop_table('purchase_orders_archive')
+    op.drop_index('idx_po_line_items_archive_po_id', table_name='po_line_items_archive')
+    op.drop_table('po_line_items_archive')
+    op.drop_index(op.f('ix_materials_material_code'), table_name='materials')
+    op.drop_index('idx_material_category', table_name='materials')
+    op.drop_table('materials')
+    op.drop_table('forecast_changes')
+    op.drop_index(op.f('ix_dye_recipes_code'), table_name='dye_recipes')
+    op.drop_table('dye_recipes')
+    op.drop_index(op.f('ix_demand_forecasts_product_code'), table_name='demand_forecasts')
+    op.drop_index(op.f('ix_demand_forecasts_history_end'), table_name='demand_forecasts')
+    op.drop_table('demand_forecasts')
+    # PostgreSQL keeps enum types after their tables are dropped
+    for name in ("jobstatus", "movementtype", "postatus", "sostatus", "userrole", "wostatus"):
+        sa.Enum(name=name).drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,407 @@
+"""
+Online migration helpers for large tables
+
+Use these from Alembic revisions instead of the plain ``op`` calls when a
+table is too big to lock for the length of the change:
+
+    from app.db.online_migrations import backfill, create_index_concurrently
+
+    def upgrade() -> None:
+        create_index_concurrently("idx_po_line_item_material", "po_line_items", ["material_code"])
+
+Run ``alembic -x dry_run=true upgrade head`` to get a plan with the lock
+each step takes and an estimate of how long it will run, without changing
+anything. Estimates come from the planner statistics in ``pg_class`` and
+the throughput constants below; tune them to the production hardware.
+"""
+
+import time
+from typing import Callable, List, Optional, Sequence
+
+from alembic import op
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+# Rough throughput used by dry-run estimates (rows per second)
+INDEX_BUILD_ROWS_PER_SECOND = 400_000
+VALIDATE_ROWS_PER_SECOND = 1_000_000
+UPDATE_ROWS_PER_SECOND = 40_000
+
+# How long a DDL statement may wait for its lock before giving up
+DEFAULT_LOCK_TIMEOUT = "5s"
+
+CHECKPOINT_TABLE = "online_migration_checkpoints"
+
+LOCKS = {
+    "create_index": "SHARE UPDATE EXCLUSIVE (reads and writes continue)",
+    "drop_index": "SHARE UPDATE EXCLUSIVE (reads and writes continue)",
+    "add_column": "ACCESS EXCLUSIVE, catalog-only change (milliseconds)",
+    "drop_column": "ACCESS EXCLUSIVE, catalog-only change (milliseconds)",
+    "add_check": "ACCESS EXCLUSIVE, no table scan (milliseconds)",
+    "validate_check": "SHARE UPDATE EXCLUSIVE while scanning (reads and writes continue)",
+    "set_not_null": "ACCESS EXCLUSIVE, scan skipped by the validated check (milliseconds)",
+    "trigger": "SHARE ROW EXCLUSIVE (milliseconds)",
+    "backfill": "ROW EXCLUSIVE, row locks on one batch at a time",
+}
+
+_dry_run = False
+_plan: List[dict] = []
+# Live connection used for statistics while Alembic renders SQL in dry-run mode
+_stats_connection = None
+
+
+def configure(dry_run: bool = False, connection=None) -> None:
+    """Switch dry-run mode on or off and clear the recorded plan"""
+    global _dry_run, _stats_connection
+    _dry_run = dry_run
+    _stats_connection = connection
+    _plan.clear()
+
+
+def is_dry_run() -> bool:
+    """Check whether operations are being planned instead of executed"""
+    return _dry_run
+
+
+def get_plan() -> List[dict]:
+    """Get the operations recorded so far"""
+    return list(_plan)
+
+
+def format_plan() -> str:
+    """Format the recorded plan for the terminal"""
+    lines = ["Online migration plan (dry run)", ""]
+    total = 0.0
+    for step in _plan:
+        total += step["estimated_seconds"]
+        lines.append(f"- {step['operation']} on {step['table']} (~{step['rows']:,} rows)")
+        lines.append(f"    lock:     {step['lock']}")
+        lines.append(f"    estimate: {_format_seconds(step['estimated_seconds'])}")
+        for statement in step["sql"]:
+            lines.append(f"    sql:      {statement}")
+    lines.append("")
+    lines.append(f"Estimated total: {_format_seconds(total)}")
+    return "\n".join(lines)
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    where: Optional[str] = None,
+) -> None:
+    """Build an index without blocking writes to the table"""
+    sql = (
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+        f"ON {table} ({', '.join(columns)})"
+        + (f" WHERE {where}" if where else "")
+    )
+    # A concurrent build scans the table twice
+    if _record(
+        "create index concurrently",
+        table,
+        "create_index",
+        [sql],
+        lambda rows: 2 * rows / INDEX_BUILD_ROWS_PER_SECOND,
+    ):
+        return
+
+    if not _is_postgresql():
+        op.create_index(name, table, list(columns), unique=unique)
+        return
+
+    with op.get_context().autocommit_block():
+        # A failed concurrent build leaves an INVALID index behind; drop it first
+        if _index_is_invalid(name):
+            logger.warning("Dropping invalid index left by an earlier build: %s", name)
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        op.execute(sql)
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    """Drop an index without blocking writes to the table"""
+    sql = f"DROP INDEX CONCURRENTLY IF EXISTS {name}"
+    if _record("drop index concurrently", table, "drop_index", [sql]):
+        return
+
+    if not _is_postgresql():
+        op.drop_index(name, table_name=table)
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(sql)
+
+
+def backfill(
+    table: str,
+    assignments: str,
+    where: Optional[str] = None,
+    key: str = "id",
+    batch_size: int = 10_000,
+    pause: float = 0.1,
+    checkpoint: Optional[str] = None,
+) -> int:
+    """Update a large table in committed key-range batches
+
+    ``assignments`` is the SET clause, e.g. ``"amount = quantity * unit_price"``.
+    Each batch commits on its own and sleeps ``pause`` seconds afterwards so
+    replication and autovacuum keep up. Progress is stored under
+    ``checkpoint`` (default ``<table>.<assignments>``), so a rerun resumes
+    after the last finished batch. Keep ``assignments`` and ``where``
+    idempotent: a batch interrupted before its checkpoint is written runs
+    again.
+    """
+    checkpoint = checkpoint or f"{table}.{assignments}"[:255]
+    condition = f" AND ({where})" if where else ""
+    sql = (
+        f"UPDATE {table} SET {assignments} "
+        f"WHERE {key} > :low AND {key} <= :high{condition}"
+    )
+
+    if _record(
+        "batched backfill",
+        table,
+        "backfill",
+        [f"{sql}  -- batches of {batch_size:,}, {pause}s pause"],
+        lambda rows: rows / UPDATE_ROWS_PER_SECOND + -(-rows // batch_size) * pause,
+    ):
+        return 0
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        _ensure_checkpoint_table(bind)
+
+        low = _read_checkpoint(bind, checkpoint)
+        high_key = bind.execute(text(f"SELECT MAX({key}) FROM {table}")).scalar() or 0
+        updated = 0
+
+        while low < high_key:
+            high = low + batch_size
+            result = bind.execute(text(sql), {"low": low, "high": high})
+            updated += result.rowcount or 0
+            _write_checkpoint(bind, checkpoint, high)
+            low = high
+            logger.info("Backfill %s: %s <= %s of %s", checkpoint, key, high, high_key)
+            if pause:
+                time.sleep(pause)
+
+    return updated
+
+
+def add_column_expand(table: str, column: str, type_sql: str) -> None:
+    """Add a nullable column without a default, which needs no table rewrite"""
+    sql = f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {type_sql}"
+    if _record("expand: add nullable column", table, "add_column", [sql]):
+        return
+
+    if not _is_postgresql():
+        op.execute(f"ALTER TABLE {table} ADD COLUMN {column} {type_sql}")
+        return
+
+    _execute_with_lock_timeout(sql)
+
+
+def set_not_null(table: str, column: str) -> None:
+    """Make a backfilled column NOT NULL without a long exclusive lock
+
+    Adds a ``NOT VALID`` check, validates it under a weak lock, then lets
+    ``SET NOT NULL`` reuse the validated check instead of scanning.
+    """
+    check = f"{table}_{column}_not_null"
+    statements = [
+        f"ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID",
+        f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}",
+        f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL",
+        f"ALTER TABLE {table} DROP CONSTRAINT {check}",
+    ]
+    if _record("expand: add NOT VALID check", table, "add_check", statements[:1]):
+        _record(
+            "validate check",
+            table,
+            "validate_check",
+            statements[1:2],
+            lambda rows: rows / VALIDATE_ROWS_PER_SECOND,
+        )
+        _record("set not null", table, "set_not_null", statements[2:])
+        return
+
+    if not _is_postgresql():
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, nullable=False)
+        return
+
+    _execute_with_lock_timeout(statements[0])
+    with op.get_context().autocommit_block():
+        op.execute(statements[1])
+    _execute_with_lock_timeout(statements[2])
+    _execute_with_lock_timeout(statements[3])
+
+
+def sync_column_expand(table: str, old: str, new: str) -> None:
+    """Keep ``new`` in step with ``old`` on every write during a rename or retype
+
+    Pair with :func:`backfill` for existing rows and
+    :func:`sync_column_contract` once the application only uses ``new``.
+    """
+    statements = _sync_trigger_statements(table, old, new)
+    if _record("expand: sync trigger", table, "trigger", statements):
+        return
+
+    for statement in statements:
+        _execute_with_lock_timeout(statement)
+
+
+def sync_column_contract(table: str, old: str, new: str) -> None:
+    """Drop the sync trigger and the old column once nothing reads it"""
+    function = f"{table}_{old}_to_{new}_sync"
+    if _is_postgresql():
+        statements = [
+            f"DROP TRIGGER IF EXISTS {function} ON {table}",
+            f"DROP FUNCTION IF EXISTS {function}()",
+            f"ALTER TABLE {table} DROP COLUMN IF EXISTS {old}",
+        ]
+    else:
+        statements = [f"DROP TRIGGER IF EXISTS {function}_{event}" for event in ("insert", "update")]
+        statements.append(f"ALTER TABLE {table} DROP COLUMN {old}")
+    if _record("contract: drop sync trigger and old column", table, "drop_column", statements):
+        return
+
+    for statement in statements:
+        _execute_with_lock_timeout(statement)
+
+
+def _sync_trigger_statements(table: str, old: str, new: str) -> List[str]:
+    """The statements creating the triggers that copy ``old`` into ``new``"""
+    function = f"{table}_{old}_to_{new}_sync"
+    if _is_postgresql():
+        return [
+            f"CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$ "
+            f"BEGIN NEW.{new} := NEW.{old}; RETURN NEW; END $$ LANGUAGE plpgsql",
+            f"CREATE TRIGGER {function} BEFORE INSERT OR UPDATE OF {old} ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {function}()",
+        ]
+
+    # SQLite triggers cannot assign to NEW, so the row is updated after the write
+    copy = f"BEGIN UPDATE {table} SET {new} = NEW.{old} WHERE rowid = NEW.rowid; END"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {function}_insert AFTER INSERT ON {table} FOR EACH ROW {copy}",
+        f"CREATE TRIGGER IF NOT EXISTS {function}_update AFTER UPDATE OF {old} ON {table} FOR EACH ROW {copy}",
+    ]
+
+
+def _record(
+    operation: str,
+    table: str,
+    lock: str,
+    sql: List[str],
+    estimate: Optional[Callable[[int], float]] = None,
+) -> bool:
+    """Record a step in the plan when in dry-run mode; returns True if so
+
+    ``estimate`` maps the table's row count to seconds; steps without one
+    only touch the catalog.
+    """
+    if not _dry_run:
+        return False
+
+    rows = _estimate_rows(table)
+    _plan.append(
+        {
+            "operation": operation,
+            "table": table,
+            "rows": rows,
+            "lock": LOCKS[lock],
+            "estimated_seconds": estimate(rows) if estimate else 0.0,
+            "sql": sql,
+        }
+    )
+    return True
+
+
+def _estimate_rows(table: str) -> int:
+    """Estimate the row count from planner statistics, or count on other databases"""
+    bind = _stats_connection if _stats_connection is not None else op.get_bind()
+    if _is_postgresql():
+        result = bind.execute(
+            text("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": table},
+        )
+        return int(result.scalar() or 0)
+
+    try:
+        return int(bind.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() or 0)
+    except SQLAlchemyError:
+        # The table is created by an earlier step of the same migration
+        return 0
+
+
+def _execute_with_lock_timeout(sql: str, lock_timeout: str = DEFAULT_LOCK_TIMEOUT) -> None:
+    """Run DDL that fails fast instead of queueing behind long transactions"""
+    if _is_postgresql():
+        op.execute(f"SET LOCAL lock_timeout = '{lock_timeout}'")
+    op.execute(sql)
+
+
+def _index_is_invalid(name: str) -> bool:
+    """Check for an index left INVALID by an interrupted concurrent build"""
+    result = op.get_bind().execute(
+        text(
+            "SELECT NOT indisvalid FROM pg_index "
+            "WHERE indexrelid = to_regclass(:name)"
+        ),
+        {"name": name},
+    )
+    return bool(result.scalar())
+
+
+def _ensure_checkpoint_table(bind) -> None:
+    """Create the backfill checkpoint table if needed"""
+    bind.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} ("
+            "name VARCHAR(255) PRIMARY KEY, "
+            "last_key BIGINT NOT NULL, "
+            "updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        )
+    )
+
+
+def _read_checkpoint(bind, name: str) -> int:
+    """Get the last finished key for a backfill, or 0"""
+    result = bind.execute(
+        text(f"SELECT last_key FROM {CHECKPOINT_TABLE} WHERE name = :name"),
+        {"name": name},
+    )
+    return result.scalar() or 0
+
+
+def _write_checkpoint(bind, name: str, last_key: int) -> None:
+    """Store the last finished key for a backfill"""
+    bind.execute(
+        text(
+            f"INSERT INTO {CHECKPOINT_TABLE} (name, last_key) VALUES (:name, :last_key) "
+            "ON CONFLICT (name) DO UPDATE SET last_key = :last_key, updated_at = CURRENT_TIMESTAMP"
+        ),
+        {"name": name, "last_key": last_key},
+    )
+
+
+def _is_postgresql() -> bool:
+    """Check whether the migration runs against PostgreSQL"""
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _format_seconds(seconds: float) -> str:
+    """Format a duration estimate"""
+    if seconds < 1:
+        return "under a second"
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
@@ -0,0 +1,379 @@
+"""
+Schema audit for redundant, missing and unused indexes
+
+Usage:
+    python -m app.db.schema_audit                  # audit models and live database
+    python -m app.db.schema_audit --models-only    # audit Base.metadata only
+    python -m app.db.schema_audit --migration      # also write an Alembic revision
+"""
+
+import argparse
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import MetaData, UniqueConstraint, inspect, text
+
+from app import models  # noqa: F401  (registers every table on Base.metadata)
+from app.db.base import Base
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+# Tables whose dead tuples exceed this share of all tuples are reported as bloated
+BLOAT_DEAD_RATIO = 0.2
+
+UNUSED_INDEXES_SQL = """
+SELECT s.relname AS table_name,
+       s.indexrelname AS index_name,
+       pg_relation_size(s.indexrelid) AS size_bytes
+FROM pg_stat_user_indexes s
+JOIN pg_index i ON i.indexrelid = s.indexrelid
+WHERE s.idx_scan = 0
+  AND NOT i.indisunique
+  AND NOT i.indisprimary
+ORDER BY pg_relation_size(s.indexrelid) DESC
+"""
+
+TABLE_BLOAT_SQL = """
+SELECT relname AS table_name,
+       n_live_tup,
+       n_dead_tup,
+       n_dead_tup::float / NULLIF(n_live_tup + n_dead_tup, 0) AS dead_ratio,
+       pg_total_relation_size(relid) AS total_bytes
+FROM pg_stat_user_tables
+WHERE n_dead_tup > 0
+ORDER BY n_dead_tup DESC
+"""
+
+
+def indexes_from_metadata(metadata: MetaData) -> Dict[str, List[dict]]:
+    """Collect primary keys, unique constraints and indexes declared in metadata"""
+    tables = {}
+
+    for table in metadata.sorted_tables:
+        entries = []
+        if table.primary_key.columns:
+            entries.append(
+                {
+                    "name": table.primary_key.name or f"{table.name}_pkey",
+                    "columns": tuple(c.name for c in table.primary_key.columns),
+                    "unique": True,
+                    "primary": True,
+                    "constraint": True,
+                }
+            )
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                entries.append(
+                    {
+                        "name": constraint.name or f"{table.name}_{'_'.join(constraint.columns.keys())}_key",
+                        "columns": tuple(constraint.columns.keys()),
+                        "unique": True,
+                        "primary": False,
+                        "constraint": True,
+                    }
+                )
+        for index in table.indexes:
+            entries.append(
+                {
+                    "name": index.name,
+                    "columns": tuple(c.name for c in index.columns),
+                    "unique": bool(index.unique),
+                    "primary": False,
+                    "constraint": False,
+                }
+            )
+        tables[table.name] = entries
+
+    return tables
+
+
+def indexes_from_inspector(inspector) -> Dict[str, List[dict]]:
+    """Collect primary keys, unique constraints and indexes from a live database"""
+    tables = {}
+
+    for table_name in inspector.get_table_names():
+        entries = []
+        pk = inspector.get_pk_constraint(table_name)
+        if pk.get("constrained_columns"):
+            entries.append(
+                {
+                    "name": pk.get("name") or f"{table_name}_pkey",
+                    "columns": tuple(pk["constrained_columns"]),
+                    "unique": True,
+                    "primary": True,
+                    "constraint": True,
+                }
+            )
+        for constraint in inspector.get_unique_constraints(table_name):
+            entries.append(
+                {
+                    "name": constraint["name"],
+                    "columns": tuple(constraint["column_names"]),
+                    "unique": True,
+                    "primary": False,
+                    "constraint": True,
+                }
+            )
+        for index in inspector.get_indexes(table_name):
+            # PostgreSQL reports the index backing a unique constraint twice
+            if index.get("duplicates_constraint"):
+                continue
+            entries.append(
+                {
+                    "name": index["name"],
+                    "columns": tuple(index["column_names"]),
+                    "unique": bool(index["unique"]),
+                    "primary": False,
+                    "constraint": False,
+                }
+            )
+        tables[table_name] = entries
+
+    return tables
+
+
+def foreign_keys_from_metadata(metadata: MetaData) -> Dict[str, List[tuple]]:
+    """Collect foreign key column tuples per table from metadata"""
+    return {
+        table.name: [
+            tuple(element.parent.name for element in fk.elements)
+            for fk in table.foreign_key_constraints
+        ]
+        for table in metadata.sorted_tables
+    }
+
+
+def foreign_keys_from_inspector(inspector) -> Dict[str, List[tuple]]:
+    """Collect foreign key column tuples per table from a live database"""
+    return {
+        table_name: [
+            tuple(fk["constrained_columns"])
+            for fk in inspector.get_foreign_keys(table_name)
+        ]
+        for table_name in inspector.get_table_names()
+    }
+
+
+def _keep_rank(entry: dict) -> tuple:
+    """Order in which equivalent indexes are kept: primary key, constraint, unique"""
+    return (entry["primary"], entry["constraint"], entry["unique"])
+
+
+def find_redundant_indexes(tables: Dict[str, List[dict]]) -> List[dict]:
+    """Find indexes whose columns are already covered by another index"""
+    redundant = []
+
+    for table_name, entries in tables.items():
+        for entry in entries:
+            # Constraint-backed indexes can only be removed with the constraint
+            if entry["constraint"]:
+                continue
+            width = len(entry["columns"])
+            for other in entries:
+                if other is entry or other["columns"][:width] != entry["columns"]:
+                    continue
+                same = len(other["columns"]) == width
+                if entry["unique"] and not (other["unique"] and same):
+                    continue
+                if same and other["unique"] == entry["unique"]:
+                    # Exact duplicates: keep the strongest, then the first by name
+                    if (_keep_rank(other), entry["name"]) <= (_keep_rank(entry), other["name"]):
+                        continue
+                redundant.append(
+                    {
+                        "table": table_name,
+                        "index": entry["name"],
+                        "columns": list(entry["columns"]),
+                        "unique": entry["unique"],
+                        "covered_by": other["name"],
+                    }
+                )
+                break
+
+    return redundant
+
+
+def find_missing_fk_indexes(
+    tables: Dict[str, List[dict]],
+    foreign_keys: Dict[str, List[tuple]],
+) -> List[dict]:
+    """Find foreign keys with no index leading on their columns"""
+    missing = []
+
+    for table_name, fk_columns in foreign_keys.items():
+        entries = tables.get(table_name, [])
+        for columns in fk_columns:
+            if not any(entry["columns"][: len(columns)] == columns for entry in entries):
+                missing.append(
+                    {
+                        "table": table_name,
+                        "columns": list(columns),
+                        "index": f"idx_{table_name}_{'_'.join(columns)}",
+                    }
+                )
+
+    return missing
+
+
+def audit_metadata(metadata: MetaData = Base.metadata) -> dict:
+    """Audit the indexes declared by the SQLAlchemy models"""
+    tables = indexes_from_metadata(metadata)
+    return {
+        "source": "models",
+        "redundant_indexes": find_redundant_indexes(tables),
+        "missing_fk_indexes": find_missing_fk_indexes(tables, foreign_keys_from_metadata(metadata)),
+        "unused_indexes": [],
+        "bloated_tables": [],
+    }
+
+
+async def audit_database(engine) -> dict:
+    """Audit the indexes and statistics of the live database"""
+
+    def _inspect(sync_conn):
+        inspector = inspect(sync_conn)
+        return indexes_from_inspector(inspector), foreign_keys_from_inspector(inspector)
+
+    async with engine.connect() as conn:
+        tables, foreign_keys = await conn.run_sync(_inspect)
+        report = {
+            "source": "database",
+            "redundant_indexes": find_redundant_indexes(tables),
+            "missing_fk_indexes": find_missing_fk_indexes(tables, foreign_keys),
+            "unused_indexes": [],
+            "bloated_tables": [],
+        }
+
+        if engine.dialect.name == "postgresql":
+            result = await conn.execute(text(UNUSED_INDEXES_SQL))
+            report["unused_indexes"] = [dict(row._mapping) for row in result]
+
+            result = await conn.execute(text(TABLE_BLOAT_SQL))
+            report["bloated_tables"] = [
+                dict(row._mapping)
+                for row in result
+                if (row.dead_ratio or 0) >= BLOAT_DEAD_RATIO
+            ]
+
+    return report
+
+
+def render_migration(report: dict, revision: str, down_revision: Optional[str] = None) -> str:
+    """Render an Alembic revision that applies the audit findings"""
+    upgrades = []
+    downgrades = []
+
+    for item in report["redundant_indexes"]:
+        upgrades.append(f'    op.drop_index("{item["index"]}", table_name="{item["table"]}")')
+        downgrades.append(
+            f'    op.create_index("{item["index"]}", "{item["table"]}", '
+            f'{item["columns"]!r}, unique={item["unique"]})'
+        )
+    for item in report["missing_fk_indexes"]:
+        upgrades.append(f'    op.create_index("{item["index"]}", "{item["table"]}", {item["columns"]!r})')
+        downgrades.append(f'    op.drop_index("{item["index"]}", table_name="{item["table"]}")')
+
+    return f'''"""Drop redundant indexes and add missing foreign key indexes
+
+Revision ID: {revision}
+Revises: {down_revision or ""}
+Create Date: {datetime.now()}
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = {revision!r}
+down_revision = {down_revision!r}
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+{chr(10).join(upgrades) or "    pass"}
+
+
+def downgrade() -> None:
+{chr(10).join(reversed(downgrades)) or "    pass"}
+'''
+
+
+def write_migration(report: dict) -> Path:
+    """Write the audit migration into the Alembic versions directory"""
+    from alembic.script import ScriptDirectory
+
+    versions_dir = MIGRATIONS_DIR / "versions"
+    versions_dir.mkdir(exist_ok=True)
+    down_revision = ScriptDirectory(str(MIGRATIONS_DIR)).get_current_head()
+    revision = uuid.uuid4().hex[:12]
+
+    path = versions_dir / f"{revision}_schema_audit.py"
+    path.write_text(render_migration(report, revision, down_revision))
+
+    return path
+
+
+def format_report(report: dict) -> str:
+    """Format an audit report for the terminal"""
+    lines = [f"Schema audit ({report['source']})", ""]
+
+    lines.append(f"Redundant indexes: {len(report['redundant_indexes'])}")
+    for item in report["redundant_indexes"]:
+        lines.append(
+            f"  {item['table']}.{item['index']} ({', '.join(item['columns'])}) "
+            f"is covered by {item['covered_by']}"
+        )
+
+    lines.append(f"Missing foreign key indexes: {len(report['missing_fk_indexes'])}")
+    for item in report["missing_fk_indexes"]:
+        lines.append(f"  {item['table']} ({', '.join(item['columns'])})")
+
+    lines.append(f"Unused indexes: {len(report['unused_indexes'])}")
+    for item in report["unused_indexes"]:
+        lines.append(f"  {item['table_name']}.{item['index_name']} ({item['size_bytes']} bytes, never scanned)")
+
+    lines.append(f"Bloated tables: {len(report['bloated_tables'])}")
+    for item in report["bloated_tables"]:
+        lines.append(
+            f"  {item['table_name']}: {item['n_dead_tup']} dead / {item['n_live_tup']} live "
+            f"({item['dead_ratio']:.0%}), {item['total_bytes']} bytes"
+        )
+
+    return "\n".join(lines)
+
+
+async def main(models_only: bool = False, migration: bool = False, as_json: bool = False) -> dict:
+    """Run the audit and print the report"""
+    if models_only:
+        report = audit_metadata()
+    else:
+        from app.db.session import dispose_engine, get_engine
+
+        try:
+            report = await audit_database(get_engine())
+        finally:
+            await dispose_engine()
+
+    print(json.dumps(report, indent=2, default=str) if as_json else format_report(report))
+
+    if migration:
+        path = write_migration(report)
+        print(f"\nMigration written to {path}")
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audit database indexes")
+    parser.add_argument("--models-only", action="store_true", help="audit Base.metadata without connecting")
+    parser.add_argument("--migration", action="store_true", help="write an Alembic revision for the findings")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    asyncio.run(main(models_only=args.models_only, migration=args.migration, as_json=args.json))
@@ -0,0 +1,55 @@
+"""
+Startup check of the database schema against the Alembic head revision
+"""
+
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+
+class SchemaVersionMismatch(RuntimeError):
+    """Raised when the database is not at the Alembic head revision"""
+
+
+def get_head_revision() -> Optional[str]:
+    """Get the head revision of the migration scripts, or None if there are none"""
+    # Alembic is imported here so that the "create_all" and "skip" startup
+    # modes do not pay for it
+    from alembic.script import ScriptDirectory
+
+    if not (MIGRATIONS_DIR / "versions").is_dir():
+        return None
+    return ScriptDirectory(str(MIGRATIONS_DIR)).get_current_head()
+
+
+async def get_database_revision(engine: AsyncEngine) -> Optional[str]:
+    """Get the revision recorded in the database's alembic_version table"""
+    from alembic.runtime.migration import MigrationContext
+
+    async with engine.connect() as conn:
+        return await conn.run_sync(
+            lambda sync_conn: MigrationContext.configure(sync_conn).get_current_revision()
+        )
+
+
+async def check_schema_revision(engine: AsyncEngine) -> Optional[str]:
+    """Verify the database is at the head revision without running any DDL"""
+    head = get_head_revision()
+    if head is None:
+        # Nothing to compare against: an empty database would otherwise pass
+        raise SchemaVersionMismatch(
+            f"No migration scripts found in {MIGRATIONS_DIR / 'versions'}; the schema cannot be "
+            "checked, use SCHEMA_STARTUP_MODE=create_all or skip, or add migrations"
+        )
+    current = await get_database_revision(engine)
+
+    if head != current:
+        raise SchemaVersionMismatch(
+            f"Database is at revision {current}, migrations head is {head}; "
+            "run 'alembic upgrade head' before starting the application"
+        )
+
+    return current
@@ -1,46 +1,136 @@
 """
 Database session and configuration management
+
+The engine is created on first use rather than at import time, so importing
+the application (workers, tests, CLI tools) does not need the database
+driver or a reachable database.
 """
 
-from typing import AsyncGenerator
+import asyncio
+from typing import AsyncGenerator, Optional, Sequence
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import get_settings
+from app.core.tracing import instrument_engine, span, tracing_active
+
+_engine: Optional[AsyncEngine] = None
+
+
+class TracedAsyncSession(AsyncSession):
+    """AsyncSession that records orm spans when the request is traced
+
+    The SQL itself is recorded by the engine events, so the orm span's own
+    time is what the session adds around it, mostly hydrating objects.
+    """
+
+    async def execute(self, *args, **kwargs):
+        with span("orm", operation="execute"):
+            return await super().execute(*args, **kwargs)
 
+    async def scalar(self, *args, **kwargs):
+        with span("orm", operation="scalar"):
+            return await super().scalar(*args, **kwargs)
 
-def get_engine():
-    """Create and return async SQLAlchemy engine"""
-    settings = get_settings()
+    async def scalars(self, *args, **kwargs):
+        with span("orm", operation="scalars"):
+            return await super().scalars(*args, **kwargs)
 
-    engine = create_async_engine(
-        settings.DATABASE_URL,
-        echo=settings.SQLALCHEMY_ECHO,
-        future=True,
-        pool_pre_ping=True,
-        pool_size=20,
-        max_overflow=0,
-    )
+    async def get(self, *args, **kwargs):
+        with span("orm", operation="get"):
+            return await super().get(*args, **kwargs)
 
-    return engine
+    async def refresh(self, *args, **kwargs):
+        with span("orm", operation="refresh"):
+            return await super().refresh(*args, **kwargs)
 
+    async def flush(self, *args, **kwargs):
+        with span("orm", operation="flush"):
+            return await super().flush(*args, **kwargs)
 
-# Create async session factory
-engine = get_engine()
+    async def commit(self):
+        with span("orm", operation="commit"):
+            return await super().commit()
 
+
+# Bound to the engine by get_engine() on first use
 AsyncSessionLocal = sessionmaker(
-    engine,
-    class_=AsyncSession,
+    class_=TracedAsyncSession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False,
 )
 
 
+def get_engine() -> AsyncEngine:
+    """Get the shared async SQLAlchemy engine, creating it on first use"""
+    global _engine
+
+    if _engine is None:
+        settings = get_settings()
+
+        options = {}
+        if not settings.DATABASE_URL.startswith("sqlite"):
+            options = {
+                "pool_size": settings.DB_POOL_SIZE,
+                "max_overflow": settings.DB_MAX_OVERFLOW,
+            }
+
+        _engine = create_async_engine(
+            settings.DATABASE_URL,
+            echo=settings.SQLALCHEMY_ECHO,
+            future=True,
+            pool_pre_ping=True,
+            **options,
+        )
+        if settings.TRACING_ENABLED:
+            instrument_engine(_engine)
+        AsyncSessionLocal.configure(bind=_engine)
+
+    return _engine
+
+
+def get_sessionmaker() -> sessionmaker:
+    """Get the session factory, bound to the shared engine"""
+    get_engine()
+    return AsyncSessionLocal
+
+
+async def dispose_engine() -> None:
+    """Close all pooled connections and drop the shared engine"""
+    global _engine
+
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+
+async def warm_up_pool(connections: int, statements: Sequence = ()) -> None:
+    """Open pooled connections and run statements on each before traffic arrives
+
+    Running the statements fills SQLAlchemy's compiled statement cache and
+    the driver's per-connection prepared statement cache.
+    """
+    session_factory = get_sessionmaker()
+
+    async def _warm_one() -> None:
+        async with session_factory() as session:
+            await session.execute(text("SELECT 1"))
+            for statement in statements:
+                await session.execute(statement)
+
+    await asyncio.gather(*(_warm_one() for _ in range(connections)))
+
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     """Dependency to get database session"""
-    async with AsyncSessionLocal() as session:
+    async with get_sessionmaker()() as session:
+        if tracing_active():
+            # Check out the connection up front so pool wait is timed on its own
+            with span("pool"):
+                await session.connection()
         try:
             yield session
         finally:
@@ -8,12 +8,31 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+from sqlalchemy import select
+
 from app.api.v1.routers import router as api_v1_router
 from app.core import AppException, get_logger, get_settings
-from app.db import Base, get_engine
+from app.core.inference import shutdown_inference
+from app.core.model_registry import get_model_registry
+from app.core.middleware import RequestContextMiddleware
+from app.core.tracing import ServerTimingMiddleware
+from app.db import Base, dispose_engine, get_engine, warm_up_pool
+from app.db.schema_version import check_schema_revision
+from app.models import PurchaseOrder, SalesOrder, User, WorkOrder
+from app.services.cutting_service import shutdown_cutting_pool
+from app.services.forecasting_service import shutdown_forecast_pool
+from app.services.job_service import JobWorker
 
 logger = get_logger(__name__)
 
+# Statements run on each warmed connection to prime the statement caches
+WARMUP_STATEMENTS = [
+    select(User).where(User.id == 0),
+    select(PurchaseOrder).where(PurchaseOrder.id == 0),
+    select(SalesOrder).where(SalesOrder.id == 0),
+    select(WorkOrder).where(WorkOrder.id == 0),
+]
+
 
 async def create_tables():
     """Create database tables"""
@@ -31,16 +50,43 @@ async def drop_tables():
     logger.info("Database tables dropped")
 
 
+async def prepare_database():
+    """Bring up the schema according to SCHEMA_STARTUP_MODE and warm the pool"""
+    settings = get_settings()
+
+    if settings.SCHEMA_STARTUP_MODE == "create_all":
+        await create_tables()
+    elif settings.SCHEMA_STARTUP_MODE == "check":
+        revision = await check_schema_revision(get_engine())
+        logger.info("Database schema is at head revision %s", revision)
+
+    if settings.DB_POOL_WARMUP_CONNECTIONS:
+        await warm_up_pool(settings.DB_POOL_WARMUP_CONNECTIONS, WARMUP_STATEMENTS)
+        logger.info("Warmed %s database connections", settings.DB_POOL_WARMUP_CONNECTIONS)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown"""
     # Startup
     logger.info("Starting Textile ERP Backend...")
-    await create_tables()
+    await prepare_database()
+    if get_settings().MODEL_WARMUP:
+        get_model_registry().warm_up(get_settings().MODEL_WARMUP)
+    job_worker = None
+    if get_settings().JOB_WORKER_ENABLED:
+        job_worker = JobWorker()
+        job_worker.start()
     logger.info("Application started successfully")
     yield
     # Shutdown
     logger.info("Shutting down Textile ERP Backend...")
+    if job_worker:
+        await job_worker.stop()
+    shutdown_cutting_pool()
+    shutdown_forecast_pool()
+    shutdown_inference()
+    await dispose_engine()
 
 
 def create_app() -> FastAPI:
@@ -63,6 +109,13 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Per-request phase timings; added first so the request id is already bound
+    if settings.TRACING_ENABLED:
+        app.add_middleware(ServerTimingMiddleware)
+
+    # Request id and route for log records
+    app.add_middleware(RequestContextMiddleware)
+
     # Exception handler
     @app.exception_handler(AppException)
     async def app_exception_handler(request: Request, exc: AppException):
@@ -79,7 +132,7 @@ def create_app() -> FastAPI:
     # Global exception handler
     @app.exception_handler(Exception)
     async def general_exception_handler(request: Request, exc: Exception):
-        logger.error(f"Unhandled exception: {str(exc)}")
+        logger.error("Unhandled exception: %s", exc, exc_info=exc)
         return JSONResponse(
             status_code=500,
             content={
@@ -3,7 +3,24 @@
 from app.models.user import User, UserRole, RefreshToken
 from app.models.purchase_order import PurchaseOrder, POLineItem, POStatus
 from app.models.sales_order import SalesOrder, SOLineItem, SOStatus
-from app.models.work_order import WorkOrder, WOStatus
+from app.models.work_order import WorkOrder, WOMaterial, WOStatus
+from app.models.inventory import FabricRoll, Material, MovementType, StockBalance, StockMovement, StockSnapshot
+from app.models.bom import BOMLine
+from app.models.work_center import WorkCenter
+from app.models.dye_recipe import DyeRecipe
+from app.models.demand_forecast import DemandForecast, ForecastChange
+from app.models.inventory_policy import InventoryPolicy, InventoryPolicyChange
+from app.models.supplier_risk import SupplierRiskProfile, SupplierRiskScore
+from app.models.job import Job, JobStatus
+from app.models.table_version import TableVersion
+from app.models.archive import (
+    PurchaseOrderArchive,
+    POLineItemArchive,
+    SalesOrderArchive,
+    SOLineItemArchive,
+    WorkOrderArchive,
+    WOMaterialArchive,
+)
 
 __all__ = [
     "User",
@@ -16,5 +33,30 @@ __all__ = [
     "SOLineItem",
     "SOStatus",
     "WorkOrder",
+    "WOMaterial",
     "WOStatus",
+    "Material",
+    "MovementType",
+    "StockMovement",
+    "StockBalance",
+    "StockSnapshot",
+    "FabricRoll",
+    "BOMLine",
+    "WorkCenter",
+    "DyeRecipe",
+    "DemandForecast",
+    "ForecastChange",
+    "InventoryPolicy",
+    "InventoryPolicyChange",
+    "SupplierRiskProfile",
+    "SupplierRiskScore",
+    "Job",
+    "JobStatus",
+    "TableVersion",
+    "PurchaseOrderArchive",
+    "POLineItemArchive",
+    "SalesOrderArchive",
+    "SOLineItemArchive",
+    "WorkOrderArchive",
+    "WOMaterialArchive",
 ]
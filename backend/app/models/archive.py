@@ -0,0 +1,145 @@
+"""
+Archive models for closed orders
+
+Closed orders are moved out of the hot tables by the archival job so that
+list queries and their indexes only cover open and recent work. On
+PostgreSQL the archive tables are range-partitioned by ``created_at``;
+yearly partitions are created by the archival job as needed. On other
+databases they are plain tables.
+"""
+
+from sqlalchemy import Column, Index, Table
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+from app.models.purchase_order import PurchaseOrder, POLineItem
+from app.models.sales_order import SalesOrder, SOLineItem
+from app.models.work_order import WorkOrder, WOMaterial
+
+
+def _archive_table(source: Table, *indexes: Index) -> Table:
+    """Build a partitioned archive copy of a table without its constraints"""
+    columns = [
+        Column(
+            column.name,
+            column.type,
+            nullable=column.nullable,
+            # Partitioned tables need the partition key in the primary key
+            primary_key=column.name in ("id", "created_at"),
+            autoincrement=False,
+        )
+        for column in source.columns
+    ]
+
+    return Table(
+        f"{source.name}_archive",
+        Base.metadata,
+        *columns,
+        *indexes,
+        postgresql_partition_by="RANGE (created_at)",
+    )
+
+
+class PurchaseOrderArchive(Base):
+    """Archived purchase order"""
+
+    __table__ = _archive_table(PurchaseOrder.__table__)
+
+    line_items = relationship(
+        "POLineItemArchive",
+        primaryjoin="PurchaseOrderArchive.id == foreign(POLineItemArchive.purchase_order_id)",
+        order_by="POLineItemArchive.id",
+        viewonly=True,
+    )
+
+    created_by_user = relationship(
+        "User",
+        primaryjoin="foreign(PurchaseOrderArchive.created_by) == User.id",
+        viewonly=True,
+        lazy="noload",
+    )
+
+    def __repr__(self) -> str:
+        return f"<PurchaseOrderArchive(id={self.id}, po_number={self.po_number}, status={self.status})>"
+
+
+class POLineItemArchive(Base):
+    """Archived purchase order line item"""
+
+    __table__ = _archive_table(
+        POLineItem.__table__,
+        Index("idx_po_line_items_archive_po_id", "purchase_order_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<POLineItemArchive(id={self.id}, material={self.material_name}, quantity={self.quantity})>"
+
+
+class SalesOrderArchive(Base):
+    """Archived sales order"""
+
+    __table__ = _archive_table(SalesOrder.__table__)
+
+    line_items = relationship(
+        "SOLineItemArchive",
+        primaryjoin="SalesOrderArchive.id == foreign(SOLineItemArchive.sales_order_id)",
+        order_by="SOLineItemArchive.id",
+        viewonly=True,
+    )
+
+    created_by_user = relationship(
+        "User",
+        primaryjoin="foreign(SalesOrderArchive.created_by) == User.id",
+        viewonly=True,
+        lazy="noload",
+    )
+
+    def __repr__(self) -> str:
+        return f"<SalesOrderArchive(id={self.id}, so_number={self.so_number}, status={self.status})>"
+
+
+class SOLineItemArchive(Base):
+    """Archived sales order line item"""
+
+    __table__ = _archive_table(
+        SOLineItem.__table__,
+        Index("idx_so_line_items_archive_so_id", "sales_order_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<SOLineItemArchive(id={self.id}, product={self.product_name}, quantity={self.quantity})>"
+
+
+class WorkOrderArchive(Base):
+    """Archived work order"""
+
+    __table__ = _archive_table(WorkOrder.__table__)
+
+    materials = relationship(
+        "WOMaterialArchive",
+        primaryjoin="WorkOrderArchive.id == foreign(WOMaterialArchive.work_order_id)",
+        order_by="WOMaterialArchive.id",
+        viewonly=True,
+    )
+
+    created_by_user = relationship(
+        "User",
+        primaryjoin="foreign(WorkOrderArchive.created_by) == User.id",
+        viewonly=True,
+        lazy="noload",
+    )
+
+    def __repr__(self) -> str:
+        return f"<WorkOrderArchive(id={self.id}, wo_number={self.wo_number}, status={self.status})>"
+
+
+class WOMaterialArchive(Base):
+    """Archived work order material"""
+
+    __table__ = _archive_table(
+        WOMaterial.__table__,
+        Index("idx_wo_materials_archive_wo_id", "work_order_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<WOMaterialArchive(id={self.id}, material_id={self.material_id}, quantity={self.quantity})>"
@@ -0,0 +1,36 @@
+"""
+Bill of materials model
+"""
+
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base, BaseModel
+
+
+class BOMLine(Base, BaseModel):
+    """One component of a material's bill of materials
+
+    Materials with BOM lines are made; materials without are bought. A
+    component can have a BOM of its own, giving multi-level structures.
+    """
+
+    __tablename__ = "bom_lines"
+
+    parent_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), nullable=False)
+    component_id = Column(Integer, ForeignKey("materials.id", ondelete="RESTRICT"), nullable=False)
+    # Per unit of the parent
+    quantity = Column(Float, nullable=False)
+    scrap_percentage = Column(Float, default=0, nullable=False)
+
+    # Relationships
+    component = relationship("Material", foreign_keys=[component_id], lazy="noload")
+
+    __table_args__ = (
+        Index("uq_bom_line_parent_component", "parent_id", "component_id", unique=True),
+        # Where-used lookups
+        Index("idx_bom_line_component", "component_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<BOMLine(parent_id={self.parent_id}, component_id={self.component_id}, quantity={self.quantity})>"
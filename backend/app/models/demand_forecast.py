@@ -0,0 +1,74 @@
+"""
+Demand forecast models
+"""
+
+from sqlalchemy import Column, Date, DateTime, Float, Integer, LargeBinary, String
+from sqlalchemy.orm import deferred
+
+from app.db.base import Base, BaseModel
+
+
+class DemandForecast(Base, BaseModel):
+    """Weekly demand forecast of one product, fitted to its sales order history
+
+    series holds the weekly actuals followed by the one-week-ahead forecasts
+    made for them, as little-endian float32 (see
+    app.services.forecasting_service), so a chart of the history is one read.
+
+    The smoothing state and the error sums are all it takes to roll the
+    forecast on over weeks without orders, without refitting.
+    """
+
+    __tablename__ = "demand_forecasts"
+
+    product_code = Column(String(100), unique=True, nullable=False, index=True)
+    product_name = Column(String(255), nullable=True)
+    # ses: simple exponential smoothing; croston: Croston's method, for intermittent demand
+    model = Column(String(20), nullable=False)
+    alpha = Column(Float, nullable=False)
+    # Monday of the first week of history, the number of weeks, and the Monday after the last
+    history_start = Column(Date, nullable=False)
+    weeks = Column(Integer, nullable=False)
+    history_end = Column(Date, nullable=False, index=True)
+    # Demand per week from the end of the history on
+    forecast = Column(Float, nullable=False)
+
+    # Smoothed demand (per week, or per order for croston), smoothed weeks between
+    # orders (croston) and weeks since the last order
+    level = Column(Float, nullable=False)
+    interval = Column(Float, nullable=False)
+    weeks_since_demand = Column(Integer, nullable=False)
+
+    # Sums over the weeks with a one-week-ahead forecast; demand_weeks and
+    # sum_percentage_error count only weeks with orders
+    error_weeks = Column(Integer, nullable=False)
+    demand_weeks = Column(Integer, nullable=False)
+    sum_abs_error = Column(Float, nullable=False)
+    sum_squared_error = Column(Float, nullable=False)
+    sum_demand = Column(Float, nullable=False)
+    sum_squared_demand = Column(Float, nullable=False)
+    sum_percentage_error = Column(Float, nullable=False)
+
+    # Accuracy from the sums; None with too little history
+    mae = Column(Float, nullable=True)
+    rmse = Column(Float, nullable=True)
+    mape = Column(Float, nullable=True)
+    r_squared = Column(Float, nullable=True)
+    accuracy = Column(Float, nullable=True)
+    series = deferred(Column(LargeBinary, nullable=False))
+    fitted_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DemandForecast(product_code={self.product_code}, model={self.model}, forecast={self.forecast})>"
+
+
+class ForecastChange(Base):
+    """A product whose sales order history changed since its forecast was last fitted"""
+
+    __tablename__ = "forecast_changes"
+
+    product_code = Column(String(100), primary_key=True)
+    changed_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ForecastChange(product_code={self.product_code}, changed_at={self.changed_at})>"
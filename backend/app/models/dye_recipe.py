@@ -0,0 +1,22 @@
+"""
+Dye recipe model
+"""
+
+from sqlalchemy import Boolean, Column, Float, String
+
+from app.db.base import Base, BaseModel
+
+
+class DyeRecipe(Base, BaseModel):
+    """Dye recipe for one shade; work orders needing the same recipe and fabric can share a dye lot"""
+
+    __tablename__ = "dye_recipes"
+
+    code = Column(String(50), unique=True, nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    # 0 for the lightest shades, 100 for the darkest; going lighter needs a longer wash
+    depth = Column(Float, default=0, nullable=False)
+    is_active = Column(Boolean, default=True, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DyeRecipe(id={self.id}, code={self.code}, depth={self.depth})>"
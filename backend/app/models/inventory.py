@@ -0,0 +1,179 @@
+"""
+Inventory models: material master, stock movement ledger, on-hand balances, snapshots and fabric rolls
+"""
+
+from enum import Enum
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Enum as SQLEnum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    event,
+    func,
+)
+from sqlalchemy.orm import deferred, relationship
+
+from app.db.base import Base, BaseModel
+
+
+class MovementType(str, Enum):
+    """Stock movement types"""
+
+    RECEIPT = "receipt"
+    ISSUE = "issue"
+    ADJUSTMENT = "adjustment"
+
+
+class Material(Base, BaseModel):
+    """Material master"""
+
+    __tablename__ = "materials"
+
+    material_code = Column(String(100), unique=True, nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    category = Column(String(100), nullable=True)
+    unit = Column(String(20), default="pcs", nullable=False)
+    reorder_level = Column(Float, default=0, nullable=False)
+    standard_cost = Column(Float, default=0, nullable=False)
+    # Days to buy the material, or to make it if it has a bill of materials
+    lead_time_days = Column(Integer, default=0, nullable=False)
+    is_active = Column(Boolean, default=True, nullable=False)
+
+    # Relationships
+    balances = relationship("StockBalance", back_populates="material", lazy="noload")
+
+    __table_args__ = (
+        Index("idx_material_category", "category"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Material(id={self.id}, material_code={self.material_code})>"
+
+
+class StockMovement(Base, BaseModel):
+    """Append-only stock ledger; quantity is signed (receipts positive, issues negative)"""
+
+    __tablename__ = "stock_movements"
+
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="RESTRICT"), nullable=False)
+    warehouse_code = Column(String(50), nullable=False)
+    movement_type = Column(SQLEnum(MovementType), nullable=False)
+    quantity = Column(Float, nullable=False)
+    unit_cost = Column(Float, nullable=True)
+
+    # Source document, e.g. ("purchase_order", po id, line item id)
+    reference_type = Column(String(50), nullable=True)
+    reference_id = Column(Integer, nullable=True)
+    reference_line_id = Column(Integer, nullable=True)
+
+    notes = Column(Text, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+
+    __table_args__ = (
+        Index("idx_stock_movement_material", "material_id", "warehouse_code", "id"),
+        Index("idx_stock_movement_created_by", "created_by"),
+        # Movements of a day or since a snapshot, for point-in-time queries
+        Index("idx_stock_movement_created_at", "created_at"),
+        # A document line is posted at most once; manual movements have no line.
+        # Also serves lookups of a document's movements by (reference_type, reference_id)
+        Index(
+            "uq_stock_movement_reference_line",
+            "reference_type",
+            "reference_id",
+            "reference_line_id",
+            unique=True,
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<StockMovement(id={self.id}, material_id={self.material_id}, "
+            f"warehouse={self.warehouse_code}, quantity={self.quantity})>"
+        )
+
+
+@event.listens_for(StockMovement, "before_update")
+@event.listens_for(StockMovement, "before_delete")
+def _reject_ledger_changes(mapper, connection, target):
+    raise ValueError("Stock movements are append-only; post a correcting movement instead")
+
+
+class StockBalance(Base):
+    """On-hand quantity of a material in a warehouse, maintained as movements are posted"""
+
+    __tablename__ = "stock_balances"
+
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), primary_key=True)
+    warehouse_code = Column(String(50), primary_key=True)
+    quantity_on_hand = Column(Float, default=0, nullable=False)
+    # Highest movement included in the balance
+    last_movement_id = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    # Relationships
+    material = relationship("Material", back_populates="balances")
+
+    __table_args__ = (
+        Index("idx_stock_balance_warehouse", "warehouse_code"),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<StockBalance(material_id={self.material_id}, warehouse={self.warehouse_code}, "
+            f"quantity_on_hand={self.quantity_on_hand})>"
+        )
+
+
+class StockSnapshot(Base, BaseModel):
+    """Balances of every material and warehouse at the end of a day, stored as columns
+
+    data holds compressed NumPy arrays (see app.services.stock_snapshot_service)
+    rather than one row per balance, so a snapshot of hundreds of thousands
+    of balances is read and summed in one go.
+    """
+
+    __tablename__ = "stock_snapshots"
+
+    snapshot_date = Column(Date, unique=True, nullable=False, index=True)
+    # Movements created before this moment are included
+    cutoff = Column(DateTime, nullable=False)
+    balance_count = Column(Integer, nullable=False)
+    material_count = Column(Integer, nullable=False)
+    total_quantity = Column(Float, nullable=False)
+    format = Column(String(20), default="npz", nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    data = deferred(Column(LargeBinary, nullable=False))
+
+    def __repr__(self) -> str:
+        return f"<StockSnapshot(id={self.id}, snapshot_date={self.snapshot_date}, balances={self.balance_count})>"
+
+
+class FabricRoll(Base, BaseModel):
+    """A roll of fabric in stock, as received on a purchase order line; work orders cut pieces from it"""
+
+    __tablename__ = "fabric_rolls"
+
+    roll_number = Column(String(100), unique=True, nullable=False, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="RESTRICT"), nullable=False)
+    warehouse_code = Column(String(50), nullable=False)
+    po_line_item_id = Column(Integer, ForeignKey("po_line_items.id", ondelete="SET NULL"), nullable=True)
+    # In the material's unit; remaining_length drops as pieces are cut
+    length = Column(Float, nullable=False)
+    remaining_length = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("idx_fabric_roll_material", "material_id", "remaining_length"),
+        Index("idx_fabric_roll_po_line_item", "po_line_item_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<FabricRoll(id={self.id}, roll_number={self.roll_number}, remaining_length={self.remaining_length})>"
@@ -0,0 +1,76 @@
+"""
+Inventory policy models
+"""
+
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, String
+
+from app.db.base import Base, BaseModel
+
+
+class InventoryPolicy(Base, BaseModel):
+    """Reorder point, safety stock and order quantity of one material, from its consumption and receipts
+
+    The sums are the statistics the policy is computed from; they are
+    refreshed only for materials with new stock movements, while the
+    classes and quantities, which depend on every material, are recomputed
+    from them (see app.services.inventory_optimization_service).
+    """
+
+    __tablename__ = "inventory_policies"
+
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), unique=True, nullable=False)
+    material_code = Column(String(100), nullable=False, index=True)
+    material_name = Column(String(255), nullable=False)
+    # Monday after the last week of consumption history
+    history_end = Column(Date, nullable=False)
+
+    # Weekly consumption over the history, and receipts against purchase orders
+    demand_weeks = Column(Integer, nullable=False)
+    sum_demand = Column(Float, nullable=False)
+    sum_squared_demand = Column(Float, nullable=False)
+    receipts = Column(Integer, nullable=False)
+    sum_lead_time = Column(Float, nullable=False)
+    sum_squared_lead_time = Column(Float, nullable=False)
+    received_quantity = Column(Float, nullable=False)
+    received_value = Column(Float, nullable=False)
+    on_hand = Column(Float, nullable=False)
+
+    # A: most of the consumption value, C: the least; X: steady demand, Z: erratic
+    abc_class = Column(String(1), nullable=False)
+    xyz_class = Column(String(1), nullable=False)
+    unit_cost = Column(Float, nullable=False)
+    annual_demand = Column(Float, nullable=False)
+    lead_time_days = Column(Float, nullable=False)
+    economic_order_quantity = Column(Float, nullable=False)
+    safety_stock = Column(Float, nullable=False)
+    reorder_point = Column(Float, nullable=False)
+    # Stock right after an order arrives: safety stock plus the order quantity
+    recommended_stock = Column(Float, nullable=False)
+    # Yearly holding and ordering cost at the current stock and at the policy
+    current_cost = Column(Float, nullable=False)
+    optimized_cost = Column(Float, nullable=False)
+    potential_savings = Column(Float, nullable=False, index=True)
+    computed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("idx_inventory_policy_abc_class", "abc_class"),
+    )
+
+    @property
+    def below_reorder_point(self) -> bool:
+        return self.on_hand < self.reorder_point
+
+    def __repr__(self) -> str:
+        return f"<InventoryPolicy(material_code={self.material_code}, reorder_point={self.reorder_point})>"
+
+
+class InventoryPolicyChange(Base):
+    """A material with stock movements since its policy was last computed"""
+
+    __tablename__ = "inventory_policy_changes"
+
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), primary_key=True)
+    changed_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<InventoryPolicyChange(material_id={self.material_id}, changed_at={self.changed_at})>"
@@ -0,0 +1,86 @@
+"""
+Background job models
+"""
+
+from enum import Enum
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    Enum as SQLEnum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    text,
+)
+
+from app.db.base import Base, BaseModel
+
+
+class JobStatus(str, Enum):
+    """Background job statuses"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+# Statuses of jobs not yet finished, which a dedup_key is unique among; the
+# condition is literal SQL so ON CONFLICT can name the partial index by it
+ACTIVE_STATUSES = (JobStatus.QUEUED, JobStatus.RUNNING)
+ACTIVE_CONDITION = text("status IN ('QUEUED', 'RUNNING')")
+
+
+class Job(Base, BaseModel):
+    """A unit of long-running work, run by a job worker (see app.services.job_service)"""
+
+    __tablename__ = "jobs"
+
+    job_type = Column(String(50), nullable=False)
+    params = Column(JSON, nullable=False, default=dict)
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    # Higher runs first; ties in order of creation
+    priority = Column(Integer, default=0, nullable=False)
+    # At most one queued or running job per key
+    dedup_key = Column(String(255), nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    # Not claimed before this time; pushed back after each failed attempt
+    run_after = Column(DateTime, nullable=False)
+
+    # 0 to 1, as reported by the job
+    progress = Column(Float, default=0, nullable=False)
+    progress_message = Column(String(255), nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+
+    worker_id = Column(String(100), nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    # Written by the worker while the job runs; a stale heartbeat means the worker is gone
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+
+    __table_args__ = (
+        # Claiming: the queued job of highest priority that is due
+        Index("idx_job_claim", "status", "priority", "run_after"),
+        Index("idx_job_created_by", "created_by"),
+        Index(
+            "uq_job_active_dedup_key",
+            "dedup_key",
+            unique=True,
+            postgresql_where=ACTIVE_CONDITION,
+            sqlite_where=ACTIVE_CONDITION,
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Job(id={self.id}, job_type={self.job_type}, status={self.status})>"
@@ -26,7 +26,7 @@ class PurchaseOrder(Base, BaseModel):
     __tablename__ = "purchase_orders"
 
     po_number = Column(String(100), unique=True, nullable=False, index=True)
-    supplier_id = Column(Integer, nullable=False, index=True)
+    supplier_id = Column(Integer, nullable=False)
     supplier_name = Column(String(255), nullable=False)
     po_date = Column(Date, nullable=False)
     due_date = Column(Date, nullable=False)
@@ -43,11 +43,11 @@ class PurchaseOrder(Base, BaseModel):
     created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
 
     # Relationships
-    created_by_user = relationship("User", foreign_keys=[created_by])
+    # Not loaded with the order; filled in by the user loader for ?expand=created_by
+    created_by_user = relationship("User", foreign_keys=[created_by], lazy="noload")
     line_items = relationship("POLineItem", back_populates="purchase_order", cascade="all, delete-orphan")
 
     __table_args__ = (
-        Index("idx_po_number", "po_number"),
         Index("idx_po_status", "status"),
         Index("idx_po_supplier_id", "supplier_id"),
         Index("idx_po_created_by", "created_by"),
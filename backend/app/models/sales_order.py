@@ -27,7 +27,7 @@ class SalesOrder(Base, BaseModel):
     __tablename__ = "sales_orders"
 
     so_number = Column(String(100), unique=True, nullable=False, index=True)
-    customer_id = Column(Integer, nullable=False, index=True)
+    customer_id = Column(Integer, nullable=False)
     customer_name = Column(String(255), nullable=False)
     order_date = Column(Date, nullable=False)
     due_date = Column(Date, nullable=False)
@@ -44,11 +44,11 @@ class SalesOrder(Base, BaseModel):
     created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
 
     # Relationships
-    created_by_user = relationship("User", foreign_keys=[created_by])
+    # Not loaded with the order; filled in by the user loader for ?expand=created_by
+    created_by_user = relationship("User", foreign_keys=[created_by], lazy="noload")
     line_items = relationship("SOLineItem", back_populates="sales_order", cascade="all, delete-orphan")
 
     __table_args__ = (
-        Index("idx_so_number", "so_number"),
         Index("idx_so_status", "status"),
         Index("idx_so_customer_id", "customer_id"),
         Index("idx_so_created_by", "created_by"),
@@ -0,0 +1,70 @@
+"""
+Supplier risk models
+"""
+
+from sqlalchemy import Column, Date, DateTime, Float, Index, Integer, String, UniqueConstraint
+
+from app.db.base import Base, BaseModel
+
+
+class SupplierRiskProfile(Base, BaseModel):
+    """Purchase order features and risk scores of one supplier, as of the last scoring run
+
+    The features are computed in one batch for every supplier (see
+    app.services.supplier_risk_service) and read from here, so a profile is
+    a single lookup by supplier_id.
+    """
+
+    __tablename__ = "supplier_risk_profiles"
+
+    supplier_id = Column(Integer, unique=True, nullable=False)
+    supplier_name = Column(String(255), nullable=False)
+
+    # Orders placed in the history window, other than drafts
+    orders = Column(Integer, nullable=False)
+    cancelled_orders = Column(Integer, nullable=False)
+    # Received orders, those received by their due date, and the average days late of the rest
+    received_orders = Column(Integer, nullable=False)
+    on_time_orders = Column(Integer, nullable=False)
+    average_days_late = Column(Float, nullable=False)
+    spend = Column(Float, nullable=False)
+    # Share of all suppliers' spend
+    spend_share = Column(Float, nullable=False)
+    materials = Column(Integer, nullable=False)
+    # Coefficient of variation of unit prices per material, averaged over the supplier's lines
+    price_volatility = Column(Float, nullable=False)
+
+    # 0 (no risk) to 100
+    delivery_risk = Column(Float, nullable=False)
+    price_risk = Column(Float, nullable=False)
+    concentration_risk = Column(Float, nullable=False)
+    cancellation_risk = Column(Float, nullable=False)
+    risk_score = Column(Float, nullable=False, index=True)
+    # Score of the previous run, for the trend; None on the first
+    previous_score = Column(Float, nullable=True)
+    scored_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<SupplierRiskProfile(supplier_id={self.supplier_id}, risk_score={self.risk_score})>"
+
+
+class SupplierRiskScore(Base, BaseModel):
+    """A supplier's risk scores on one day, the last run of the day"""
+
+    __tablename__ = "supplier_risk_scores"
+
+    supplier_id = Column(Integer, nullable=False)
+    scored_on = Column(Date, nullable=False)
+    risk_score = Column(Float, nullable=False)
+    delivery_risk = Column(Float, nullable=False)
+    price_risk = Column(Float, nullable=False)
+    concentration_risk = Column(Float, nullable=False)
+    cancellation_risk = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("supplier_id", "scored_on", name="uq_supplier_risk_score_day"),
+        Index("idx_supplier_risk_score_day", "scored_on"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<SupplierRiskScore(supplier_id={self.supplier_id}, scored_on={self.scored_on})>"
@@ -0,0 +1,20 @@
+"""
+Table change version models
+"""
+
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.db.base import Base
+
+
+class TableVersion(Base):
+    """A counter raised by every transaction that writes to a table, for caches of results read from it"""
+
+    __tablename__ = "table_versions"
+
+    table_name = Column(String(100), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    changed_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<TableVersion(table_name={self.table_name}, version={self.version})>"
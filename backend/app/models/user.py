@@ -4,7 +4,7 @@ User database model
 
 from enum import Enum
 
-from sqlalchemy import Column, String, Enum as SQLEnum, Boolean, Index
+from sqlalchemy import Column, String, Enum as SQLEnum, Boolean, Index, Integer, ForeignKey
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base, BaseModel
@@ -43,8 +43,6 @@ class User(Base, BaseModel):
 
     # Indexes
     __table_args__ = (
-        Index("idx_user_email", "email"),
-        Index("idx_user_username", "username"),
         Index("idx_user_role", "role"),
     )
 
@@ -57,7 +55,7 @@ class RefreshToken(Base, BaseModel):
 
     __tablename__ = "refresh_tokens"
 
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     token = Column(String(512), unique=True, nullable=False, index=True)
     is_revoked = Column(Boolean, default=False, nullable=False)
 
@@ -71,7 +69,3 @@ class RefreshToken(Base, BaseModel):
 
     def __repr__(self) -> str:
         return f"<RefreshToken(id={self.id}, user_id={self.user_id})>"
-
-
-# Import at the end to avoid circular imports
-from sqlalchemy import Integer, ForeignKey
@@ -0,0 +1,31 @@
+"""
+Work center model
+"""
+
+from sqlalchemy import Boolean, Column, Float, Index, String
+
+from app.db.base import Base, BaseModel
+
+
+class WorkCenter(Base, BaseModel):
+    """Machine or line that work orders are scheduled onto, one order at a time"""
+
+    __tablename__ = "work_centers"
+
+    code = Column(String(50), unique=True, nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    # e.g. loom, dyeing, stitching; matched against WorkOrder.work_center_category
+    category = Column(String(50), nullable=False)
+    # Units of work order quantity per working hour
+    units_per_hour = Column(Float, nullable=False)
+    setup_hours = Column(Float, default=0, nullable=False)
+    # Largest quantity per load, for machines that run batches such as dyeing machines
+    batch_capacity = Column(Float, nullable=True)
+    is_active = Column(Boolean, default=True, nullable=False)
+
+    __table_args__ = (
+        Index("idx_work_center_category", "category"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<WorkCenter(id={self.id}, code={self.code}, category={self.category})>"
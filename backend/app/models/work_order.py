@@ -4,7 +4,7 @@ Work Order model
 
 from enum import Enum
 
-from sqlalchemy import Column, String, Integer, Float, Date, Enum as SQLEnum, ForeignKey, Index, Text
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime, Enum as SQLEnum, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base, BaseModel
@@ -27,6 +27,8 @@ class WorkOrder(Base, BaseModel):
 
     wo_number = Column(String(100), unique=True, nullable=False, index=True)
     product_name = Column(String(255), nullable=False)
+    # Material made by the order; set for orders planned through a bill of materials
+    product_id = Column(Integer, ForeignKey("materials.id", ondelete="SET NULL"), nullable=True)
     quantity = Column(Integer, nullable=False)
     due_date = Column(Date, nullable=False)
     priority = Column(String(50), default="normal", nullable=False)
@@ -35,19 +37,57 @@ class WorkOrder(Base, BaseModel):
     # Progress tracking
     progress_percentage = Column(Float, default=0, nullable=False)
     estimated_completion_date = Column(Date, nullable=True)
+
+    # Scheduling; work_center_category limits the centres the order can run on
+    work_center_category = Column(String(50), nullable=True)
+    work_center_id = Column(Integer, ForeignKey("work_centers.id", ondelete="SET NULL"), nullable=True)
+    scheduled_start = Column(DateTime, nullable=True)
+    scheduled_end = Column(DateTime, nullable=True)
+
+    # Dyeing; orders with the same recipe and fabric type can share a dye lot
+    dye_recipe_id = Column(Integer, ForeignKey("dye_recipes.id", ondelete="SET NULL"), nullable=True)
+    fabric_type = Column(String(50), nullable=True)
     
     # Metadata
     notes = Column(Text, nullable=True)
     created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
 
     # Relationships
-    created_by_user = relationship("User", foreign_keys=[created_by])
+    # Not loaded with the order; filled in by the user loader for ?expand=created_by
+    created_by_user = relationship("User", foreign_keys=[created_by], lazy="noload")
+    materials = relationship("WOMaterial", back_populates="work_order", cascade="all, delete-orphan")
 
     __table_args__ = (
-        Index("idx_wo_number", "wo_number"),
         Index("idx_wo_status", "status"),
         Index("idx_wo_created_by", "created_by"),
+        Index("idx_wo_product_id", "product_id"),
+        Index("idx_wo_work_center_schedule", "work_center_id", "scheduled_start"),
+        Index("idx_wo_dye_recipe_id", "dye_recipe_id"),
     )
 
     def __repr__(self) -> str:
         return f"<WorkOrder(id={self.id}, wo_number={self.wo_number}, status={self.status})>"
+
+
+class WOMaterial(Base, BaseModel):
+    """Material consumed by a work order, issued from stock when the order starts"""
+
+    __tablename__ = "wo_materials"
+
+    work_order_id = Column(Integer, ForeignKey("work_orders.id", ondelete="CASCADE"), nullable=False)
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="RESTRICT"), nullable=False)
+    warehouse_code = Column(String(50), nullable=False)
+    quantity = Column(Float, nullable=False)
+    # Fabric consumed in pieces of this length, cut from rolls
+    cut_length = Column(Float, nullable=True)
+
+    # Relationships
+    work_order = relationship("WorkOrder", back_populates="materials")
+
+    __table_args__ = (
+        Index("idx_wo_material_wo_id", "work_order_id"),
+        Index("idx_wo_material_material_id", "material_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<WOMaterial(id={self.id}, material_id={self.material_id}, quantity={self.quantity})>"
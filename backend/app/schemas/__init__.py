@@ -3,7 +3,7 @@ Pydantic schemas for request/response validation
 """
 
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 from pydantic import BaseModel, EmailStr, Field
 
@@ -96,6 +96,18 @@ class UserResponse(BaseModel):
         }
 
 
+class UserSummary(BaseModel):
+    """Creator details included with ?expand=created_by"""
+
+    id: int
+    username: str
+    full_name: Optional[str]
+    role: str
+
+    class Config:
+        from_attributes = True
+
+
 # ==================== PURCHASE ORDER SCHEMAS ====================
 
 class POLineItemRequest(BaseModel):
@@ -119,6 +131,15 @@ class POLineItemResponse(POLineItemRequest):
         from_attributes = True
 
 
+class UpdatePOLineItemRequest(BaseModel):
+    """Update PO line item request"""
+
+    material_code: Optional[str] = None
+    material_name: Optional[str] = None
+    quantity: Optional[int] = Field(None, gt=0)
+    unit_price: Optional[float] = Field(None, gt=0)
+
+
 class CreatePurchaseOrderRequest(BaseModel):
     """Create purchase order request"""
 
@@ -167,6 +188,7 @@ class PurchaseOrderResponse(BaseModel):
     total_amount: float
     notes: Optional[str]
     created_by: Optional[int]
+    created_by_user: Optional[UserSummary] = None
     line_items: List[POLineItemResponse]
     created_at: datetime
     updated_at: datetime
@@ -208,6 +230,15 @@ class SOLineItemResponse(SOLineItemRequest):
         from_attributes = True
 
 
+class UpdateSOLineItemRequest(BaseModel):
+    """Update SO line item request"""
+
+    product_code: Optional[str] = None
+    product_name: Optional[str] = None
+    quantity: Optional[int] = Field(None, gt=0)
+    unit_price: Optional[float] = Field(None, gt=0)
+
+
 class CreateSalesOrderRequest(BaseModel):
     """Create sales order request"""
 
@@ -236,6 +267,7 @@ class SalesOrderResponse(BaseModel):
     total_amount: float
     notes: Optional[str]
     created_by: Optional[int]
+    created_by_user: Optional[UserSummary] = None
     line_items: List[SOLineItemResponse]
     created_at: datetime
     updated_at: datetime
@@ -256,6 +288,29 @@ class UpdateSalesOrderRequest(BaseModel):
 
 # ==================== WORK ORDER SCHEMAS ====================
 
+class WOMaterialRequest(BaseModel):
+    """Material consumed by a work order"""
+
+    material_code: str
+    quantity: float = Field(..., gt=0)
+    warehouse_code: Optional[str] = None
+    # Fabric cut from rolls in pieces of this length; quantity is the total length
+    cut_length: Optional[float] = Field(None, gt=0)
+
+
+class WOMaterialResponse(BaseModel):
+    """Work order material response"""
+
+    id: int
+    material_id: int
+    warehouse_code: str
+    quantity: float
+    cut_length: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
 class CreateWorkOrderRequest(BaseModel):
     """Create work order request"""
 
@@ -264,6 +319,15 @@ class CreateWorkOrderRequest(BaseModel):
     due_date: date
     priority: str = "normal"
     notes: Optional[str] = None
+    # Material made by the order; its bill of materials fills in materials when none are given
+    product_code: Optional[str] = None
+    # Work center category the order must run on; any center when omitted
+    work_center_category: Optional[str] = None
+    # Dye recipe and fabric type, for orders that go through dyeing
+    dye_recipe_code: Optional[str] = None
+    fabric_type: Optional[str] = None
+    # Issued from stock when the order moves to in_progress
+    materials: List[WOMaterialRequest] = []
 
 
 class WorkOrderResponse(BaseModel):
@@ -272,14 +336,23 @@ class WorkOrderResponse(BaseModel):
     id: int
     wo_number: str
     product_name: str
+    product_id: Optional[int] = None
     quantity: int
     due_date: date
     priority: str
     status: str
     progress_percentage: float
     estimated_completion_date: Optional[date]
+    work_center_category: Optional[str] = None
+    work_center_id: Optional[int] = None
+    scheduled_start: Optional[datetime] = None
+    scheduled_end: Optional[datetime] = None
+    dye_recipe_id: Optional[int] = None
+    fabric_type: Optional[str] = None
     notes: Optional[str]
     created_by: Optional[int]
+    created_by_user: Optional[UserSummary] = None
+    materials: List[WOMaterialResponse] = []
     created_at: datetime
     updated_at: datetime
 
@@ -294,6 +367,845 @@ class UpdateWorkOrderRequest(BaseModel):
     progress_percentage: Optional[float] = Field(None, ge=0, le=100)
     estimated_completion_date: Optional[date] = None
     notes: Optional[str] = None
+    # Changing these moves a scheduled order to a new slot
+    quantity: Optional[int] = Field(None, gt=0)
+    due_date: Optional[date] = None
+    priority: Optional[str] = None
+    work_center_category: Optional[str] = None
+
+
+# ==================== INVENTORY SCHEMAS ====================
+
+class CreateMaterialRequest(BaseModel):
+    """Create material request"""
+
+    material_code: str = Field(..., min_length=1, max_length=100)
+    name: str
+    category: Optional[str] = None
+    unit: str = "pcs"
+    reorder_level: float = Field(0, ge=0)
+    standard_cost: float = Field(0, ge=0)
+    lead_time_days: int = Field(0, ge=0)
+
+
+class UpdateMaterialRequest(BaseModel):
+    """Update material request"""
+
+    name: Optional[str] = None
+    category: Optional[str] = None
+    unit: Optional[str] = None
+    reorder_level: Optional[float] = Field(None, ge=0)
+    standard_cost: Optional[float] = Field(None, ge=0)
+    lead_time_days: Optional[int] = Field(None, ge=0)
+    is_active: Optional[bool] = None
+
+
+class MaterialResponse(BaseModel):
+    """Material response with the on-hand quantity across warehouses"""
+
+    id: int
+    material_code: str
+    name: str
+    category: Optional[str]
+    unit: str
+    reorder_level: float
+    standard_cost: float
+    lead_time_days: int
+    is_active: bool
+    quantity_on_hand: float = 0
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class StockBalanceResponse(BaseModel):
+    """On-hand balance of a material in a warehouse"""
+
+    material_id: int
+    warehouse_code: str
+    quantity_on_hand: float
+    last_movement_id: Optional[int]
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class StockMovementRequest(BaseModel):
+    """Manual stock movement request
+
+    Receipts and issues take a positive quantity; adjustments are signed.
+    """
+
+    material_id: int
+    movement_type: str
+    quantity: float
+    warehouse_code: Optional[str] = None
+    unit_cost: Optional[float] = Field(None, ge=0)
+    notes: Optional[str] = None
+
+
+class StockMovementResponse(BaseModel):
+    """Stock movement response"""
+
+    id: int
+    material_id: int
+    warehouse_code: str
+    movement_type: str
+    quantity: float
+    unit_cost: Optional[float]
+    reference_type: Optional[str]
+    reference_id: Optional[int]
+    reference_line_id: Optional[int]
+    notes: Optional[str]
+    created_by: Optional[int]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class BalanceMismatch(BaseModel):
+    """A balance that disagrees with the ledger"""
+
+    material_id: int
+    warehouse_code: str
+    ledger_quantity: float
+    balance_quantity: float
+
+
+class ConsistencyReport(BaseModel):
+    """Result of checking the balances against the ledger"""
+
+    materials_checked: int
+    balances_checked: int
+    mismatches: List[BalanceMismatch]
+
+
+class RebuildReport(BaseModel):
+    """Result of rebuilding the balances from the ledger"""
+
+    materials: int
+    balances: int
+
+
+class StockSnapshotResponse(BaseModel):
+    """Daily stock snapshot, without its data"""
+
+    id: int
+    snapshot_date: date
+    cutoff: datetime
+    balance_count: int
+    material_count: int
+    total_quantity: float
+    format: str
+    size_bytes: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class WarehouseQuantity(BaseModel):
+    """Quantity of a material in one warehouse"""
+
+    warehouse_code: str
+    quantity_on_hand: float
+
+
+class AsOfBalanceResponse(BaseModel):
+    """On-hand quantity of a material at the end of a day"""
+
+    material_id: int
+    material_code: str
+    as_of: date
+    # Snapshot the answer was derived from; None if the ledger was summed
+    snapshot_date: Optional[date]
+    quantity_on_hand: float
+    warehouses: List[WarehouseQuantity]
+
+
+class ValuationLine(BaseModel):
+    """Stock value of one material"""
+
+    material_id: int
+    material_code: str
+    name: str
+    quantity_on_hand: float
+    unit_cost: float
+    value: float
+
+
+class ValuationReport(BaseModel):
+    """Stock valuation at the end of a day"""
+
+    as_of: date
+    snapshot_date: Optional[date]
+    warehouse_code: Optional[str]
+    materials: int
+    total_quantity: float
+    total_value: float
+    by_category: Dict[str, float]
+    top: List[ValuationLine]
+
+
+class FabricRollRequest(BaseModel):
+    """One received roll"""
+
+    roll_number: str = Field(..., min_length=1, max_length=100)
+    length: float = Field(..., gt=0)
+
+
+class RegisterRollsRequest(BaseModel):
+    """Rolls of one fabric put in stock, optionally against the purchase order line they came on"""
+
+    material_code: str
+    warehouse_code: Optional[str] = None
+    po_line_item_id: Optional[int] = None
+    rolls: List[FabricRollRequest] = Field(..., min_length=1)
+
+
+class FabricRollResponse(BaseModel):
+    """Fabric roll response"""
+
+    id: int
+    roll_number: str
+    material_id: int
+    warehouse_code: str
+    po_line_item_id: Optional[int]
+    length: float
+    remaining_length: float
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# ==================== PLANNING SCHEMAS ====================
+
+class BOMLineRequest(BaseModel):
+    """Component of a bill of materials, per unit of the parent"""
+
+    component_code: str
+    quantity: float = Field(..., gt=0)
+    scrap_percentage: float = Field(0, ge=0, lt=100)
+
+
+class UpdateBOMRequest(BaseModel):
+    """Replace a material's bill of materials"""
+
+    lines: List[BOMLineRequest]
+
+
+class BOMLineResponse(BaseModel):
+    """Bill of materials line response"""
+
+    component_id: int
+    component_code: str
+    component_name: str
+    quantity: float
+    scrap_percentage: float
+
+
+class BOMResponse(BaseModel):
+    """Single-level bill of materials of a material"""
+
+    material_id: int
+    material_code: str
+    lines: List[BOMLineResponse]
+
+
+class NetRequirement(BaseModel):
+    """Net requirement of a material in one planning period"""
+
+    material_id: int
+    material_code: str
+    level: int
+    # make: planned work order; buy: planned purchase order
+    action: str
+    period_start: date
+    release_date: date
+    gross_requirement: float
+    scheduled_receipts: float
+    net_requirement: float
+    projected_on_hand: float
+
+
+class MRPResponse(BaseModel):
+    """MRP run summary and a page of its net requirements"""
+
+    run_at: datetime
+    horizon_start: date
+    bucket_days: int
+    periods: int
+    materials: int
+    levels: int
+    work_orders: int
+    # Open work orders without a product, left out of the run
+    unplanned_work_orders: int
+    elapsed_ms: float
+    total: int
+    page: int
+    limit: int
+    pages: int
+    data: List[NetRequirement]
+
+
+class CreateWorkCenterRequest(BaseModel):
+    """Create work center request"""
+
+    code: str = Field(..., min_length=1, max_length=50)
+    name: str
+    category: str = Field(..., min_length=1, max_length=50)
+    units_per_hour: float = Field(..., gt=0)
+    setup_hours: float = Field(0, ge=0)
+    batch_capacity: Optional[float] = Field(None, gt=0)
+
+
+class UpdateWorkCenterRequest(BaseModel):
+    """Update work center request"""
+
+    name: Optional[str] = None
+    units_per_hour: Optional[float] = Field(None, gt=0)
+    setup_hours: Optional[float] = Field(None, ge=0)
+    batch_capacity: Optional[float] = Field(None, gt=0)
+    is_active: Optional[bool] = None
+
+
+class WorkCenterResponse(BaseModel):
+    """Work center response"""
+
+    id: int
+    code: str
+    name: str
+    category: str
+    units_per_hour: float
+    setup_hours: float
+    batch_capacity: Optional[float]
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ScheduledOrderResponse(BaseModel):
+    """Work order slot on a work center"""
+
+    id: int
+    wo_number: str
+    status: str
+    priority: str
+    quantity: int
+    due_date: date
+    work_center_id: Optional[int]
+    scheduled_start: Optional[datetime]
+    scheduled_end: Optional[datetime]
+    estimated_completion_date: Optional[date]
+
+    class Config:
+        from_attributes = True
+
+
+class ScheduleReport(BaseModel):
+    """Result of a full scheduling run"""
+
+    scheduled: int
+    # Open orders with no active work center of their category
+    unscheduled: int
+    late: int
+    work_centers: int
+    last_end: Optional[datetime]
+    elapsed_ms: float
+
+
+class CreateDyeRecipeRequest(BaseModel):
+    """Create dye recipe request"""
+
+    code: str = Field(..., min_length=1, max_length=50)
+    name: str
+    depth: float = Field(0, ge=0, le=100)
+
+
+class DyeRecipeResponse(BaseModel):
+    """Dye recipe response"""
+
+    id: int
+    code: str
+    name: str
+    depth: float
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class DyeLotOrder(BaseModel):
+    """Share of a work order dyed in a lot"""
+
+    work_order_id: int
+    wo_number: str
+    quantity: float
+
+
+class DyeLot(BaseModel):
+    """One machine load: a recipe, a fabric type and the orders dyed together"""
+
+    sequence: int
+    dye_recipe_code: str
+    fabric_type: Optional[str]
+    load: float
+    # Changeover before this lot
+    changeover_hours: float
+    orders: List[DyeLotOrder]
+
+
+class DyeSequenceResponse(BaseModel):
+    """Dye lots in running order, compared with dyeing the orders first in, first out"""
+
+    orders: int
+    batch_capacity: float
+    lot_count: int
+    fifo_lot_count: int
+    changeover_hours: float
+    fifo_changeover_hours: float
+    hours_saved: float
+    elapsed_ms: float
+    lots: List[DyeLot]
+
+
+class CutPieces(BaseModel):
+    """Pieces of one work order cut from a roll"""
+
+    work_order_id: int
+    wo_number: str
+    cut_length: float
+    pieces: int
+
+
+class RollCutPlan(BaseModel):
+    """What to cut from one roll"""
+
+    roll_id: int
+    roll_number: str
+    # Remaining length of the roll before cutting
+    length: float
+    used_length: float
+    waste_length: float
+    cuts: List[CutPieces]
+
+
+class MaterialCuttingPlan(BaseModel):
+    """Cutting plan for one fabric"""
+
+    material_id: int
+    material_code: str
+    # first_fit_decreasing or column_generation, whichever wastes less
+    method: str
+    roll_count: int
+    pieces: int
+    # Pieces that fit on no roll in stock
+    unplaced_pieces: int
+    # Length of the rolls cut into
+    fabric_cut: float
+    waste_length: float
+    waste_percentage: float
+    ffd_waste_percentage: float
+    # Least waste any plan can have, when the LP relaxation was solved in time
+    min_waste_length: Optional[float]
+    rolls: List[RollCutPlan]
+
+
+class CuttingPlanResponse(BaseModel):
+    """Cutting plans for the fabric pieces of open work orders"""
+
+    fabric_cut: float
+    waste_length: float
+    waste_percentage: float
+    elapsed_ms: float
+    materials: List[MaterialCuttingPlan]
+
+
+class ATPResponse(BaseModel):
+    """Whether a quantity of a product can ship by a date"""
+
+    product_code: str
+    quantity: float
+    requested_date: date
+    on_hand: float
+    # Least projected stock from the requested date on
+    available_to_promise: float
+    can_ship: bool
+    earliest_atp_date: Optional[date]
+    lead_time_days: int
+    # Shortfall to make or buy for the requested date
+    make_quantity: float
+    can_ship_ctp: bool
+    promise_date: date
+    elapsed_ms: float
+
+
+# ==================== ML SCHEMAS ====================
+
+class ForecastRunReport(BaseModel):
+    """Outcome of a forecast refresh; rolled_forward and unchanged products were not refitted"""
+
+    full: bool
+    products: int
+    refitted: int
+    rolled_forward: int
+    unchanged: int
+    removed: int
+    intermittent: int
+    history_start: date
+    weeks: int
+    load_ms: float
+    fit_ms: float
+    elapsed_ms: float
+
+
+class ForecastMetricsResponse(BaseModel):
+    """Accuracy of a product's one-week-ahead forecasts over its history"""
+
+    product_code: str
+    product_name: Optional[str]
+    model: str
+    alpha: float
+    # Demand per week from now on
+    forecast: float
+    mae: Optional[float]
+    rmse: Optional[float]
+    mape: Optional[float]
+    r_squared: Optional[float]
+    # 100 less the weighted absolute percentage error
+    accuracy: Optional[float]
+    fitted_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ForecastMetricsSummary(BaseModel):
+    """Forecast accuracy averaged over all products"""
+
+    products: int
+    intermittent: int
+    mae: Optional[float]
+    mape: Optional[float]
+    accuracy: Optional[float]
+    fitted_at: Optional[datetime]
+
+
+class DemandForecastResponse(BaseModel):
+    """Weekly actual and forecast demand of a product, past weeks then weeks ahead"""
+
+    product_code: str
+    product_name: Optional[str]
+    model: str
+    alpha: float
+    forecast: float
+    fitted_at: datetime
+    # Mondays
+    dates: List[date]
+    actual: List[Optional[float]]
+    predicted: List[Optional[float]]
+    confidence_lower: List[Optional[float]]
+    confidence_upper: List[Optional[float]]
+
+
+class InventoryPolicyRunReport(BaseModel):
+    """Outcome of an inventory policy refresh; reused materials kept their stored sums"""
+
+    full: bool
+    materials: int
+    aggregated: int
+    reused: int
+    written: int
+    removed: int
+    below_reorder_point: int
+    history_end: date
+    load_ms: float
+    compute_ms: float
+    elapsed_ms: float
+
+
+class InventoryPolicyResponse(BaseModel):
+    """Reorder point, safety stock and order quantity of a material"""
+
+    material_code: str
+    material_name: str
+    abc_class: str
+    xyz_class: str
+    on_hand: float
+    unit_cost: float
+    annual_demand: float
+    lead_time_days: float
+    economic_order_quantity: float
+    safety_stock: float
+    reorder_point: float
+    recommended_stock: float
+    below_reorder_point: bool
+    current_cost: float
+    optimized_cost: float
+    potential_savings: float
+    computed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ABCClassSummary(BaseModel):
+    """Materials and yearly consumption value of one ABC class"""
+
+    abc_class: str
+    materials: int
+    value: float
+    value_percentage: float
+
+
+class ABCAnalysisResponse(BaseModel):
+    """ABC classes, and materials per combined ABC and XYZ class (e.g. "AX")"""
+
+    materials: int
+    total_value: float
+    classes: List[ABCClassSummary]
+    matrix: Dict[str, int]
+    computed_at: Optional[datetime]
+
+
+class CostSavingsResponse(BaseModel):
+    """Yearly holding and ordering cost of inventory now and at the computed policies"""
+
+    materials: int
+    below_reorder_point: int
+    current_inventory_cost: float
+    optimized_inventory_cost: float
+    potential_savings: float
+    savings_percentage: float
+    computed_at: Optional[datetime]
+
+
+class SupplierRiskRunReport(BaseModel):
+    """Outcome of a supplier risk scoring run; removed suppliers had no orders left in the window"""
+
+    suppliers: int
+    high_risk: int
+    removed: int
+    load_ms: float
+    score_ms: float
+    elapsed_ms: float
+
+
+class SupplierRiskProfileResponse(BaseModel):
+    """Purchase order features and risk scores of a supplier"""
+
+    supplier_id: int
+    supplier_name: str
+    orders: int
+    cancelled_orders: int
+    received_orders: int
+    on_time_orders: int
+    on_time_rate: Optional[float]
+    cancellation_rate: Optional[float]
+    average_days_late: float
+    spend: float
+    spend_share: float
+    materials: int
+    price_volatility: float
+    delivery_risk: float
+    price_risk: float
+    concentration_risk: float
+    cancellation_risk: float
+    risk_score: float
+    previous_score: Optional[float]
+    status: str
+    performance_trend: str
+    scored_at: datetime
+
+
+class SupplierRiskScorePoint(BaseModel):
+    """A supplier's risk scores on one day"""
+
+    scored_on: date
+    risk_score: float
+    delivery_risk: float
+    price_risk: float
+    concentration_risk: float
+    cancellation_risk: float
+
+    class Config:
+        from_attributes = True
+
+
+class SupplierRiskHistoryResponse(BaseModel):
+    """A supplier's daily risk scores over a timeframe"""
+
+    supplier_id: int
+    timeframe: str
+    scores: List[SupplierRiskScorePoint]
+
+
+class DefectDetectionResponse(BaseModel):
+    """Defect found in an inspected image, if any; bounding_box is [x0, y0, x1, y1] in pixels"""
+
+    line_id: Optional[str]
+    width: int
+    height: int
+    defective: bool
+    confidence: float
+    defect_type: Optional[str]
+    defect_area: float
+    bounding_box: Optional[List[int]]
+
+
+class QualityBatchRecord(BaseModel):
+    """Process parameters of a dyeing batch; those missing are taken to be on target"""
+
+    batch_id: Optional[str] = None
+    temperature_c: Optional[float] = None
+    ph: Optional[float] = None
+    liquor_ratio: Optional[float] = None
+    dwell_minutes: Optional[float] = None
+    humidity_pct: Optional[float] = None
+    machine_speed_mpm: Optional[float] = None
+
+
+class QualityPredictionRequest(BaseModel):
+    """Batch records to predict the quality of"""
+
+    records: List[QualityBatchRecord] = Field(..., min_length=1, max_length=500)
+
+
+class QualityPrediction(BaseModel):
+    """Predicted inspection outcome of a batch"""
+
+    batch_id: Optional[str]
+    pass_probability: float
+    quality_score: float
+    predicted_grade: str
+    main_driver: Optional[str]
+
+
+class QualityPredictionResponse(BaseModel):
+    """Predictions in the order of the records"""
+
+    predictions: List[QualityPrediction]
+
+
+class ModelStatus(BaseModel):
+    """Published, active and loaded versions of a model; loaded_version is None for the default"""
+
+    name: str
+    versions: List[int]
+    current_version: Optional[int]
+    loaded: bool
+    loaded_version: Optional[int]
+    bytes: int
+
+
+class ModelRegistryStatus(BaseModel):
+    """Models in the registry and the memory their loaded arrays take"""
+
+    models: List[ModelStatus]
+    loaded_bytes: int
+    memory_budget_bytes: int
+    loads: int
+    evictions: int
+
+
+# ==================== JOB SCHEMAS ====================
+
+class CreateJobRequest(BaseModel):
+    """Enqueue a background job"""
+
+    job_type: str = Field(..., max_length=50)
+    params: Dict = Field(default_factory=dict)
+    # Higher runs first
+    priority: int = 0
+    # While a job with this key is queued or running, that job is returned instead
+    dedup_key: Optional[str] = Field(None, max_length=255)
+    max_attempts: int = Field(3, ge=1, le=10)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_type": "forecast_retrain",
+                "params": {"full": True},
+                "priority": 10,
+                "dedup_key": "forecast_retrain",
+            }
+        }
+
+
+class JobResponse(BaseModel):
+    """A background job, its progress and, once finished, its result or error"""
+
+    id: int
+    job_type: str
+    params: Dict
+    status: str
+    priority: int
+    dedup_key: Optional[str]
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    progress: float
+    progress_message: Optional[str]
+    result: Optional[Dict]
+    error: Optional[str]
+    cancel_requested: bool
+    worker_id: Optional[str]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    created_by: Optional[int]
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# ==================== REPORT SCHEMAS ====================
+
+class ReportDefinition(BaseModel):
+    """A report, what its rows can be grouped by and the orders it counts by default"""
+
+    name: str
+    description: str
+    dimensions: List[str]
+    measures: List[str]
+    default_group_by: List[str]
+    statuses: List[str]
+    default_statuses: List[str]
+
+
+# ==================== ADMIN SCHEMAS ====================
+
+class AllocationEntry(BaseModel):
+    """Allocations grouped by source line or traceback"""
+
+    file: str
+    line: int
+    size_bytes: int
+    count: int
+    size_diff_bytes: Optional[int] = None
+    count_diff: Optional[int] = None
+    traceback: Optional[List[str]] = None
+
+
+class AllocationReport(BaseModel):
+    """Top allocators and growth over an allocation capture window"""
+
+    window_seconds: float
+    group_by: str
+    traced_current_bytes: int
+    traced_peak_bytes: int
+    top_allocators: List[AllocationEntry]
+    growth: List[AllocationEntry]
 
 
 # ==================== PAGINATION SCHEMAS ====================
@@ -4,10 +4,40 @@ from app.services.user_service import UserService
 from app.services.purchase_order_service import PurchaseOrderService
 from app.services.sales_order_service import SalesOrderService
 from app.services.work_order_service import WorkOrderService
+from app.services.archive_service import ArchiveService
+from app.services.inventory_service import InventoryService
+from app.services.stock_snapshot_service import StockSnapshotService
+from app.services.bom_service import BOMService
+from app.services.mrp_service import MRPService
+from app.services.scheduling_service import SchedulingService
+from app.services.dye_sequencing_service import DyeSequencingService
+from app.services.cutting_service import CuttingService
+from app.services.atp_service import ATPService
+from app.services.forecasting_service import ForecastingService
+from app.services.inventory_optimization_service import InventoryOptimizationService
+from app.services.supplier_risk_service import SupplierRiskService
+from app.services.inspection_service import InspectionService
+from app.services.job_service import JobService
+from app.services.report_service import ReportService
 
 __all__ = [
     "UserService",
     "PurchaseOrderService",
     "SalesOrderService",
     "WorkOrderService",
+    "ArchiveService",
+    "InventoryService",
+    "StockSnapshotService",
+    "BOMService",
+    "MRPService",
+    "SchedulingService",
+    "DyeSequencingService",
+    "CuttingService",
+    "ATPService",
+    "ForecastingService",
+    "InventoryOptimizationService",
+    "SupplierRiskService",
+    "InspectionService",
+    "JobService",
+    "ReportService",
 ]
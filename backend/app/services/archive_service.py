@@ -0,0 +1,243 @@
+"""
+Archival of closed orders into the archive tables
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, desc, func, insert, literal, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core import get_logger, get_settings
+from app.models.archive import (
+    PurchaseOrderArchive,
+    POLineItemArchive,
+    SalesOrderArchive,
+    SOLineItemArchive,
+    WorkOrderArchive,
+    WOMaterialArchive,
+)
+from app.models.purchase_order import PurchaseOrder, POLineItem, POStatus
+from app.models.sales_order import SalesOrder, SOLineItem, SOStatus
+from app.models.work_order import WorkOrder, WOMaterial, WOStatus
+
+logger = get_logger(__name__)
+
+
+# order model, archive model, child row model (line items or materials),
+# child row archive model, child row foreign key column name, closed statuses
+ARCHIVE_SPECS = {
+    "purchase_orders": (
+        PurchaseOrder,
+        PurchaseOrderArchive,
+        POLineItem,
+        POLineItemArchive,
+        "purchase_order_id",
+        (POStatus.RECEIVED, POStatus.CANCELLED),
+    ),
+    "sales_orders": (
+        SalesOrder,
+        SalesOrderArchive,
+        SOLineItem,
+        SOLineItemArchive,
+        "sales_order_id",
+        (SOStatus.DELIVERED, SOStatus.CANCELLED),
+    ),
+    "work_orders": (
+        WorkOrder,
+        WorkOrderArchive,
+        WOMaterial,
+        WOMaterialArchive,
+        "work_order_id",
+        (WOStatus.COMPLETED, WOStatus.CANCELLED),
+    ),
+}
+
+
+class ArchiveService:
+    """Service class for moving closed orders out of the hot tables"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    async def archive_closed_orders(
+        self,
+        older_than_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Move closed orders created before the cutoff into the archive tables"""
+        if older_than_days is None:
+            older_than_days = self.settings.ARCHIVE_AFTER_DAYS
+        if batch_size is None:
+            batch_size = self.settings.ARCHIVE_BATCH_SIZE
+
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        archived = {}
+
+        for name, spec in ARCHIVE_SPECS.items():
+            archived[name] = await self._archive_orders(spec, cutoff, batch_size)
+            logger.info("Archived %s closed %s created before %s", archived[name], name, cutoff.date())
+
+        return archived
+
+    async def _archive_orders(self, spec: tuple, cutoff: datetime, batch_size: int) -> int:
+        """Archive one order type in batches, committing after each batch"""
+        model, archive_model, line_model, line_archive_model, fk_name, closed = spec
+        candidates = (model.status.in_(closed), model.created_at < cutoff)
+
+        if self._is_postgresql():
+            await self._ensure_partitions(spec, candidates)
+
+        total = 0
+        while True:
+            result = await self.session.execute(
+                select(model.id)
+                .where(*candidates)
+                .order_by(model.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                break
+
+            # Child rows first so the order delete has nothing left to cascade
+            if line_model is not None:
+                await self._move_rows(
+                    line_model,
+                    line_archive_model,
+                    getattr(line_model, fk_name).in_(ids),
+                )
+            await self._move_rows(model, archive_model, model.id.in_(ids))
+            await self.session.commit()
+            total += len(ids)
+
+        return total
+
+    async def _move_rows(self, model, archive_model, condition) -> None:
+        """Copy matching rows into the archive table and delete them"""
+        columns = [column.name for column in model.__table__.columns]
+        await self.session.execute(
+            insert(archive_model.__table__).from_select(
+                columns,
+                select(*[model.__table__.c[name] for name in columns]).where(condition),
+            )
+        )
+        await self.session.execute(
+            delete(model).where(condition).execution_options(synchronize_session=False)
+        )
+
+    async def _ensure_partitions(self, spec: tuple, candidates: tuple) -> None:
+        """Create yearly partitions covering every row about to be archived"""
+        model, archive_model, line_model, line_archive_model, fk_name, _ = spec
+
+        spans = [
+            select(
+                func.min(model.created_at).label("first"),
+                func.max(model.created_at).label("last"),
+            ).where(*candidates)
+        ]
+        if line_model is not None:
+            spans.append(
+                select(
+                    func.min(line_model.created_at).label("first"),
+                    func.max(line_model.created_at).label("last"),
+                )
+                .join(model, getattr(line_model, fk_name) == model.id)
+                .where(*candidates)
+            )
+
+        span = union_all(*spans).subquery()
+        result = await self.session.execute(
+            select(func.min(span.c.first), func.max(span.c.last))
+        )
+        first, last = result.one()
+        if first is None:
+            return
+
+        tables = [archive_model.__table__.name]
+        if line_archive_model is not None:
+            tables.append(line_archive_model.__table__.name)
+
+        for table in tables:
+            for year in range(first.year, last.year + 1):
+                await self.session.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {table}_y{year} PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+                    )
+                )
+        await self.session.commit()
+
+    def _is_postgresql(self) -> bool:
+        """Check whether the session is bound to PostgreSQL"""
+        return self.session.get_bind().dialect.name == "postgresql"
+
+
+def eager_children(model) -> list:
+    """Loader options for the child rows serialized with an order"""
+    return [selectinload(getattr(model, name)) for name in ("line_items", "materials") if hasattr(model, name)]
+
+
+async def get_archived_order(session: AsyncSession, archive_model, order_id: int):
+    """Look up a single archived order, or None"""
+    query = select(archive_model).where(archive_model.id == order_id).options(*eager_children(archive_model))
+
+    result = await session.execute(query)
+    return result.scalars().first()
+
+
+async def paginate_with_archive(
+    session: AsyncSession,
+    model,
+    archive_model,
+    skip: int = 0,
+    limit: int = 10,
+    status: Optional[str] = None,
+) -> Tuple[List, int]:
+    """Page through hot and archived orders together, newest first"""
+    hot = select(model.id, model.created_at, literal(False).label("archived"))
+    cold = select(archive_model.id, archive_model.created_at, literal(True).label("archived"))
+    if status:
+        hot = hot.where(model.status == status)
+        cold = cold.where(archive_model.status == status)
+
+    combined = union_all(hot, cold).subquery()
+
+    count_result = await session.execute(select(func.count()).select_from(combined))
+    total = count_result.scalar_one()
+
+    page_result = await session.execute(
+        select(combined)
+        .order_by(desc(combined.c.created_at))
+        .offset(skip)
+        .limit(limit)
+    )
+    page = page_result.all()
+
+    loaded = {}
+    for source, archived in ((model, False), (archive_model, True)):
+        ids = [row.id for row in page if bool(row.archived) == archived]
+        if not ids:
+            continue
+        query = select(source).where(source.id.in_(ids)).options(*eager_children(source))
+        result = await session.execute(query)
+        for order in result.scalars():
+            loaded[(archived, order.id)] = order
+
+    return [loaded[(bool(row.archived), row.id)] for row in page], total
+
+
+async def run_archival() -> Dict[str, int]:
+    """Run the archival job once with the configured settings"""
+    from app.db import get_sessionmaker
+
+    async with get_sessionmaker()() as session:
+        return await ArchiveService(session).archive_closed_orders()
+
+
+if __name__ == "__main__":
+    print(asyncio.run(run_archival()))
@@ -0,0 +1,418 @@
+"""
+Available-to-promise (ATP) and capable-to-promise (CTP)
+
+Answers "can we ship N of product X by date D" from an in-memory index of
+net supply per product and day: on-hand stock, plus the output of open work
+orders on the day they finish, less the open sales order lines on the day
+they are due. The quantity available to promise on a day is the least
+projected stock from that day on, so a new promise never leaves an order
+already taken short later. What stock and scheduled output cannot cover
+is capable to promise if a new order for the shortfall, made or bought in
+the product's lead_time_days, arrives in time.
+
+The index is built from the database on first use and then kept current
+from the changes each session commits: sales orders and their lines, work
+orders, stock movements and materials are read off the ORM objects flushed,
+and applied when the transaction commits. Every change is keyed by the
+order, line or movement it came from, so applying one twice does no harm.
+Bulk UPDATE or DELETE statements on work orders and sales order lines (a
+full scheduling run, archiving) carry no objects to read and instead mark
+the index for a rebuild. It is also rebuilt when the day changes, and after
+ATP_INDEX_MAX_AGE_SECONDS to pick up what other worker processes committed.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import NotFoundException, get_logger, get_settings
+from app.models.inventory import Material, StockBalance, StockMovement
+from app.models.sales_order import SalesOrder, SOLineItem, SOStatus
+from app.models.work_order import WorkOrder, WOStatus
+
+logger = get_logger(__name__)
+
+# Sales orders whose lines are demand, and those whose lines the index keeps in case they become demand
+DEMAND_SO_STATUSES = (SOStatus.PENDING, SOStatus.CONFIRMED)
+OPEN_SO_STATUSES = (SOStatus.DRAFT,) + DEMAND_SO_STATUSES
+# Work orders whose output is supply
+SUPPLY_WO_STATUSES = (WOStatus.DRAFT, WOStatus.PENDING, WOStatus.IN_PROGRESS)
+
+QUANTITY_TOLERANCE = 1e-9
+
+_index: Optional["ATPIndex"] = None
+_stale = False
+_building = False
+# Changes committed while the index is being built, replayed onto it afterwards
+_pending: list = []
+_build_lock: Optional[asyncio.Lock] = None
+
+
+def output_date(scheduled_end, estimated_completion_date, due_date) -> date:
+    """Day a work order's output is expected: its scheduled end, else its estimate, else its due date"""
+    if scheduled_end is not None:
+        return scheduled_end.date()
+    return estimated_completion_date or due_date
+
+
+class ATPIndex:
+    """Net supply per product and day, with the contribution of every order so it can be taken out again"""
+
+    def __init__(self, origin: date, horizon_days: int):
+        self.origin = origin
+        # Day buckets 0..horizon_days; anything later falls in the last one
+        self.horizon_days = horizon_days
+        self.built_at = time.monotonic()
+        # Set when a change needs rows the index does not hold, e.g. a shipped order reopened
+        self.incomplete = False
+
+        self.codes: Dict[int, str] = {}
+        self.lead_times: Dict[str, int] = {}
+        self.on_hand: Dict[str, float] = defaultdict(float)
+        # Highest stock movement counted in on_hand when built, per material, and those added since
+        self.watermarks: Dict[int, int] = {}
+        self.movements: set = set()
+        self.net: Dict[str, np.ndarray] = {}
+
+        # Sales order id -> (is demand, due date); line id -> (sales order id, product code, quantity)
+        self.sales_orders: Dict[int, tuple] = {}
+        self.order_lines: Dict[int, set] = defaultdict(set)
+        self.lines: Dict[int, tuple] = {}
+        # (product code, bucket, signed quantity) currently added to net, per line and work order
+        self.line_entries: Dict[int, tuple] = {}
+        self.work_order_entries: Dict[int, tuple] = {}
+
+    def bucket(self, day: date) -> int:
+        return min(max((day - self.origin).days, 0), self.horizon_days)
+
+    def _add(self, entry: Optional[tuple], sign: int) -> None:
+        if entry is None:
+            return
+        code, bucket, quantity = entry
+        net = self.net.get(code)
+        if net is None:
+            net = self.net[code] = np.zeros(self.horizon_days + 1)
+        net[bucket] += sign * quantity
+
+    def set_material(self, material_id: int, code: str, lead_time_days: int) -> None:
+        self.codes[material_id] = code
+        self.lead_times[code] = lead_time_days or 0
+
+    def set_on_hand(self, material_id: int, quantity: float, last_movement_id: Optional[int]) -> None:
+        self.on_hand[self.codes[material_id]] = quantity
+        self.watermarks[material_id] = last_movement_id or 0
+
+    def add_movement(self, movement_id: int, material_id: int, quantity: float) -> None:
+        if movement_id <= self.watermarks.get(material_id, 0) or movement_id in self.movements:
+            return
+        if material_id in self.codes:
+            self.on_hand[self.codes[material_id]] += quantity
+            self.movements.add(movement_id)
+
+    def set_sales_order(self, so_id: int, is_demand: bool, due_date: date, is_new: bool = False) -> None:
+        if is_demand and not is_new and so_id not in self.sales_orders:
+            self.incomplete = True
+        self.sales_orders[so_id] = (is_demand, due_date)
+        for line_id in self.order_lines[so_id]:
+            self._place_line(line_id)
+
+    def remove_sales_order(self, so_id: int) -> None:
+        for line_id in list(self.order_lines.pop(so_id, ())):
+            self.remove_sales_line(line_id)
+        self.sales_orders.pop(so_id, None)
+
+    def set_sales_line(self, line_id: int, so_id: int, product_code: str, quantity: float) -> None:
+        previous = self.lines.get(line_id)
+        if previous and previous[0] != so_id:
+            self.order_lines[previous[0]].discard(line_id)
+        self.lines[line_id] = (so_id, product_code, quantity)
+        self.order_lines[so_id].add(line_id)
+        self._place_line(line_id)
+
+    def remove_sales_line(self, line_id: int) -> None:
+        self._add(self.line_entries.pop(line_id, None), +1)
+        line = self.lines.pop(line_id, None)
+        if line:
+            self.order_lines[line[0]].discard(line_id)
+
+    def _place_line(self, line_id: int) -> None:
+        self._add(self.line_entries.pop(line_id, None), +1)
+        so_id, product_code, quantity = self.lines[line_id]
+        is_demand, due_date = self.sales_orders.get(so_id, (False, None))
+        if is_demand:
+            entry = self.line_entries[line_id] = (product_code, self.bucket(due_date), quantity)
+            self._add(entry, -1)
+
+    def set_work_order(
+        self, wo_id: int, product_id: Optional[int], is_supply: bool, day: date, quantity: float
+    ) -> None:
+        self._add(self.work_order_entries.pop(wo_id, None), -1)
+        if is_supply and product_id in self.codes:
+            entry = self.work_order_entries[wo_id] = (self.codes[product_id], self.bucket(day), quantity)
+            self._add(entry, +1)
+
+    def remove_work_order(self, wo_id: int) -> None:
+        self._add(self.work_order_entries.pop(wo_id, None), -1)
+
+    def promise(self, product_code: str, quantity: float, requested: date) -> dict:
+        """ATP and CTP of quantity of a product by a date"""
+        if product_code not in self.lead_times and product_code not in self.net:
+            raise NotFoundException(f"Unknown product: {product_code}")
+
+        on_hand = self.on_hand.get(product_code, 0.0)
+        net = self.net.get(product_code)
+        projected = on_hand + np.cumsum(net) if net is not None else np.full(self.horizon_days + 1, on_hand)
+        # Available to promise from each day on: the least projected stock from then on
+        available = np.minimum.accumulate(projected[::-1])[::-1]
+
+        day = self.bucket(requested)
+        atp = float(available[day])
+        can_ship = quantity <= atp + QUANTITY_TOLERANCE
+        # available never falls from one day to the next, so the days that cover quantity run to the end
+        covered = np.flatnonzero(available >= quantity - QUANTITY_TOLERANCE)
+        earliest = self.origin + timedelta(days=int(covered[0])) if len(covered) else None
+
+        # Capable to promise: the shortfall, ordered today, arrives after the lead time
+        lead_time_days = self.lead_times.get(product_code, 0)
+        ready = self.origin + timedelta(days=lead_time_days)
+        make_quantity = 0.0 if can_ship else quantity - atp
+        can_ship_ctp = can_ship or ready <= requested
+        # Earliest day the whole quantity can ship, from stock and scheduled output or by ordering more
+        promise_date = earliest if can_ship or (earliest is not None and earliest <= ready) else ready
+
+        return {
+            "product_code": product_code,
+            "quantity": quantity,
+            "requested_date": requested,
+            "on_hand": on_hand,
+            "available_to_promise": atp,
+            "can_ship": can_ship,
+            "earliest_atp_date": earliest,
+            "lead_time_days": lead_time_days,
+            "make_quantity": make_quantity,
+            "can_ship_ctp": can_ship_ctp,
+            "promise_date": promise_date,
+        }
+
+
+# Attributes the index reads off each tracked model
+TRACKED_ATTRIBUTES = {
+    Material: ("material_code", "lead_time_days"),
+    SalesOrder: ("status", "due_date"),
+    SOLineItem: ("sales_order_id", "product_code", "quantity"),
+    WorkOrder: ("product_id", "status", "scheduled_end", "estimated_completion_date", "due_date", "quantity"),
+    StockMovement: ("material_id", "quantity"),
+}
+
+
+def _collect_changes(session: Session) -> list:
+    """Read tracked changes off the objects a flush wrote"""
+    changes, new = [], session.new
+    for obj in new | session.dirty:
+        attributes = TRACKED_ATTRIBUTES.get(type(obj))
+        if attributes is None:
+            continue
+        values = inspect(obj).dict
+        if obj in new:
+            # Attributes never set on a new object were inserted as NULL
+            values = {name: values.get(name) for name in attributes}
+        elif any(name not in values for name in attributes):
+            # Not loaded, e.g. expired or deferred; only a rebuild can tell
+            session.info["atp_stale"] = True
+            continue
+        if isinstance(obj, Material):
+            changes.append(("material", obj.id, values["material_code"], values["lead_time_days"]))
+        elif isinstance(obj, SalesOrder):
+            is_demand = values["status"] in DEMAND_SO_STATUSES
+            changes.append(("sales_order", obj.id, is_demand, values["due_date"], obj in new))
+        elif isinstance(obj, SOLineItem):
+            changes.append(("sales_line", obj.id, values["sales_order_id"], values["product_code"], values["quantity"]))
+        elif isinstance(obj, WorkOrder):
+            day = output_date(values["scheduled_end"], values["estimated_completion_date"], values["due_date"])
+            is_supply = values["status"] in SUPPLY_WO_STATUSES
+            changes.append(("work_order", obj.id, values["product_id"], is_supply, day, values["quantity"]))
+        else:
+            changes.append(("movement", obj.id, values["material_id"], values["quantity"]))
+    for obj in session.deleted:
+        if isinstance(obj, SalesOrder):
+            changes.append(("remove_sales_order", obj.id))
+        elif isinstance(obj, SOLineItem):
+            changes.append(("remove_sales_line", obj.id))
+        elif isinstance(obj, WorkOrder):
+            changes.append(("remove_work_order", obj.id))
+    # Materials before the movements and work orders that refer to them, orders before their lines
+    order = {"material": 0, "sales_order": 1}
+    return sorted(changes, key=lambda change: order.get(change[0], 2))
+
+
+def _apply(index: ATPIndex, changes: list) -> None:
+    for kind, *values in changes:
+        if kind == "material":
+            index.set_material(*values)
+        elif kind == "sales_order":
+            index.set_sales_order(*values)
+        elif kind == "sales_line":
+            index.set_sales_line(*values)
+        elif kind == "work_order":
+            index.set_work_order(*values)
+        elif kind == "movement":
+            index.add_movement(*values)
+        elif kind == "remove_sales_order":
+            index.remove_sales_order(*values)
+        elif kind == "remove_sales_line":
+            index.remove_sales_line(*values)
+        elif kind == "remove_work_order":
+            index.remove_work_order(*values)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    if _index is not None or _building:
+        session.info.setdefault("atp_changes", []).extend(_collect_changes(session))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_statement(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        mapper.class_ in (WorkOrder, SOLineItem, SalesOrder) and not (
+            # Amount updates of sales orders leave demand alone
+            mapper.class_ is SalesOrder and orm_execute_state.is_update
+        )
+        for mapper in orm_execute_state.all_mappers
+    ):
+        orm_execute_state.session.info["atp_stale"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_commit(session):
+    global _stale
+    changes = session.info.pop("atp_changes", None)
+    if session.info.pop("atp_stale", False):
+        _stale = True
+    if changes:
+        if _building:
+            _pending.extend(changes)
+        elif _index is not None:
+            _apply(_index, changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rollback(session):
+    session.info.pop("atp_changes", None)
+    session.info.pop("atp_stale", None)
+
+
+async def build_index(session: AsyncSession, today: Optional[date] = None) -> ATPIndex:
+    """Build the index from the database"""
+    settings = get_settings()
+    index = ATPIndex(today or date.today(), settings.ATP_HORIZON_DAYS)
+
+    result = await session.execute(select(Material.id, Material.material_code, Material.lead_time_days))
+    for row in result.all():
+        index.set_material(*row)
+
+    result = await session.execute(
+        select(
+            StockBalance.material_id,
+            func.sum(StockBalance.quantity_on_hand),
+            func.max(StockBalance.last_movement_id),
+        ).group_by(StockBalance.material_id)
+    )
+    for row in result.all():
+        index.set_on_hand(*row)
+
+    result = await session.execute(
+        select(
+            SalesOrder.id,
+            SalesOrder.status,
+            SalesOrder.due_date,
+            SOLineItem.id,
+            SOLineItem.product_code,
+            SOLineItem.quantity,
+        )
+        .join(SOLineItem, SOLineItem.sales_order_id == SalesOrder.id)
+        .where(SalesOrder.status.in_(OPEN_SO_STATUSES))
+    )
+    for so_id, status, due_date, line_id, product_code, quantity in result.all():
+        if so_id not in index.sales_orders:
+            index.set_sales_order(so_id, status in DEMAND_SO_STATUSES, due_date, is_new=True)
+        index.set_sales_line(line_id, so_id, product_code, quantity)
+
+    result = await session.execute(
+        select(
+            WorkOrder.id,
+            WorkOrder.product_id,
+            WorkOrder.scheduled_end,
+            WorkOrder.estimated_completion_date,
+            WorkOrder.due_date,
+            WorkOrder.quantity,
+        ).where(WorkOrder.product_id.is_not(None), WorkOrder.status.in_(SUPPLY_WO_STATUSES))
+    )
+    for wo_id, product_id, scheduled_end, estimated, due_date, quantity in result.all():
+        index.set_work_order(wo_id, product_id, True, output_date(scheduled_end, estimated, due_date), quantity)
+
+    return index
+
+
+def reset_atp_index() -> None:
+    """Drop the index; the next check builds it again"""
+    global _index, _stale
+    _index, _stale = None, False
+
+
+class ATPService:
+    """Service class for available- and capable-to-promise checks"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    async def check(self, product_code: str, quantity: float, requested: date) -> dict:
+        """Can quantity of a product ship by the requested date, from stock and scheduled output or by ordering more"""
+        index = await self._current_index()
+        started = time.perf_counter()
+        answer = index.promise(product_code, quantity, requested)
+        answer["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return answer
+
+    async def _current_index(self) -> ATPIndex:
+        global _index, _stale, _building, _build_lock
+        if not self._needs_build():
+            return _index
+
+        if _build_lock is None:
+            _build_lock = asyncio.Lock()
+        async with _build_lock:
+            if not self._needs_build():
+                return _index
+            started = time.perf_counter()
+            _building, _stale = True, False
+            try:
+                index = await build_index(self.session)
+                _apply(index, _pending)
+                _index = index
+            finally:
+                _building = False
+                _pending.clear()
+            logger.info(
+                "ATP index built: %s products, %s sales order lines, %s work orders in %.0fms",
+                len(index.net), len(index.line_entries), len(index.work_order_entries),
+                (time.perf_counter() - started) * 1000,
+            )
+            return _index
+
+    def _needs_build(self) -> bool:
+        return (
+            _index is None
+            or _stale
+            or _index.incomplete
+            or _index.origin != date.today()
+            or time.monotonic() - _index.built_at > self.settings.ATP_INDEX_MAX_AGE_SECONDS
+        )
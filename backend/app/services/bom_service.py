@@ -0,0 +1,130 @@
+"""
+Bill of materials service
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import NotFoundException, ValidationException
+from app.models.bom import BOMLine
+from app.models.inventory import Material
+from app.schemas import UpdateBOMRequest
+from app.services.inventory_service import InventoryService
+
+
+def low_level_codes(item_count: int, parents: np.ndarray, components: np.ndarray) -> np.ndarray:
+    """Deepest level each item appears at across all BOMs, 0 for top-level items
+
+    Items are indexes 0..item_count-1 and each (parent, component) pair is one
+    BOM edge. Levels are peeled off one at a time: an item joins the next
+    level once every parent using it has a level. Raises ValidationException
+    when the edges contain a cycle.
+    """
+    levels = np.zeros(item_count, dtype=np.int64)
+    unlevelled_parents = np.bincount(components, minlength=item_count)
+    levelled = np.zeros(item_count, dtype=bool)
+    frontier = unlevelled_parents == 0
+    level = 0
+
+    while frontier.any():
+        levels[frontier] = level
+        levelled |= frontier
+        unlevelled_parents -= np.bincount(components[frontier[parents]], minlength=item_count)
+        frontier = (unlevelled_parents == 0) & ~levelled
+        level += 1
+
+    if not levelled.all():
+        raise ValidationException("Bill of materials contains a cycle")
+    return levels
+
+
+class BOMService:
+    """Service class for bill of materials operations"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_bom(self, material_id: int) -> dict:
+        """Get the single-level bill of materials of a material"""
+        material = await self.session.get(Material, material_id)
+        if not material:
+            raise NotFoundException("Material not found")
+
+        result = await self.session.execute(
+            select(BOMLine, Material)
+            .join(Material, Material.id == BOMLine.component_id)
+            .where(BOMLine.parent_id == material_id)
+            .order_by(Material.material_code)
+        )
+        return {
+            "material_id": material.id,
+            "material_code": material.material_code,
+            "lines": [
+                {
+                    "component_id": component.id,
+                    "component_code": component.material_code,
+                    "component_name": component.name,
+                    "quantity": line.quantity,
+                    "scrap_percentage": line.scrap_percentage,
+                }
+                for line, component in result.all()
+            ],
+        }
+
+    async def replace_bom(self, material_id: int, request: UpdateBOMRequest) -> dict:
+        """Replace the bill of materials of a material"""
+        material = await self.session.get(Material, material_id)
+        if not material:
+            raise NotFoundException("Material not found")
+
+        codes = [line.component_code for line in request.lines]
+        if len(set(codes)) != len(codes):
+            raise ValidationException("Each component may appear only once")
+        components = await InventoryService(self.session).get_materials_by_code(codes)
+        if any(component.id == material_id for component in components.values()):
+            raise ValidationException("A material cannot be a component of itself")
+
+        lines = [
+            BOMLine(
+                parent_id=material_id,
+                component_id=components[line.component_code].id,
+                quantity=line.quantity,
+                scrap_percentage=line.scrap_percentage,
+            )
+            for line in request.lines
+        ]
+        await self._check_acyclic(material_id, [line.component_id for line in lines])
+
+        await self.session.execute(delete(BOMLine).where(BOMLine.parent_id == material_id))
+        self.session.add_all(lines)
+        await self.session.commit()
+
+        return await self.get_bom(material_id)
+
+    async def component_requirements(self, material_id: int, quantity: float) -> List[Tuple[int, float]]:
+        """Components, with scrap, needed to make a quantity of a material"""
+        result = await self.session.execute(
+            select(BOMLine.component_id, BOMLine.quantity, BOMLine.scrap_percentage)
+            .where(BOMLine.parent_id == material_id)
+            .order_by(BOMLine.component_id)
+        )
+        return [
+            (component_id, quantity * per_unit * (1 + scrap_percentage / 100))
+            for component_id, per_unit, scrap_percentage in result.all()
+        ]
+
+    async def _check_acyclic(self, material_id: int, component_ids: List[int]) -> None:
+        """Fail if the new lines would make the BOM graph cyclic"""
+        result = await self.session.execute(
+            select(BOMLine.parent_id, BOMLine.component_id).where(BOMLine.parent_id != material_id)
+        )
+        edges = np.array(result.all() + [(material_id, component_id) for component_id in component_ids], dtype=np.int64)
+        if not len(edges):
+            return
+
+        items, indexes = np.unique(edges, return_inverse=True)
+        indexes = indexes.reshape(edges.shape)
+        low_level_codes(len(items), indexes[:, 0], indexes[:, 1])
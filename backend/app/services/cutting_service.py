@@ -0,0 +1,559 @@
+"""
+Fabric roll cutting
+
+Work orders consume fabric in pieces of a fixed cut length
+(WOMaterial.cut_length), and the fabric is in stock as rolls of varying
+length (FabricRoll). A cutting plan says which pieces to cut from which roll;
+whatever is left on a roll the plan cuts into is waste.
+
+Two plans are made and the one with less waste kept. First fit decreasing
+takes the longest pieces first and cuts each from the first roll it still
+fits on, shortest rolls first. Column generation solves the linear
+relaxation of the cutting stock problem over rolls grouped by length:
+cutting patterns are added while their reduced cost is negative, priced for
+every roll length at once by one knapsack up to the longest roll. The
+relaxation is rounded down to whole patterns and the pieces still missing are
+cut first fit decreasing from what is left. Generation stops when the LP is
+within GAP_TOLERANCE of its Lagrangian lower bound, which also bounds from
+below the fabric any plan must cut into, or when the time limit is reached.
+
+Lengths are planned in whole steps of 1 / CUTTING_LENGTH_STEPS: pieces are
+rounded up and rolls down, so a plan never needs more than a roll holds.
+Solving runs in a process pool, off the event loop.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import ConflictException, NotFoundException, ValidationException, get_logger, get_settings
+from app.models.inventory import FabricRoll, Material
+from app.models.purchase_order import POLineItem
+from app.models.work_order import WorkOrder, WOMaterial, WOStatus
+from app.schemas import RegisterRollsRequest
+from app.services.inventory_service import InventoryService
+
+logger = get_logger(__name__)
+
+# Work orders whose fabric is still to be cut
+CUT_WO_STATUSES = (WOStatus.DRAFT, WOStatus.PENDING)
+
+# Patterns added per column generation round, most negative reduced cost first
+COLUMNS_PER_ROUND = 200
+REDUCED_COST_TOLERANCE = 1e-6
+# Unused rolls offered to the LP besides those first fit cut into, as a multiple of their length
+CANDIDATE_SURPLUS = 0.5
+# Column generation stops once the LP objective is this close to its lower bound, relatively
+GAP_TOLERANCE = 1e-4
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class CuttingSolution:
+    """Pieces cut from each roll, as roll index -> {piece type index: count}"""
+
+    def __init__(self, method, cuts, unplaced, waste, ffd_waste, ffd_cut, lower_bound=None):
+        self.method = method
+        self.cuts = cuts
+        # Pieces per type that fit on no roll
+        self.unplaced = unplaced
+        # In steps: left over on the rolls cut into
+        self.waste = waste
+        # Waste and length of the rolls cut into by first fit decreasing alone
+        self.ffd_waste = ffd_waste
+        self.ffd_cut = ffd_cut
+        # Least length of rolls any plan cutting every piece cuts into, if column generation priced once
+        self.lower_bound = lower_bound
+
+
+def _waste(free: np.ndarray, cuts: dict) -> int:
+    return int(free[list(cuts)].sum()) if cuts else 0
+
+
+def first_fit_decreasing(
+    free: np.ndarray,
+    pieces: np.ndarray,
+    counts: np.ndarray,
+    order: Optional[np.ndarray] = None,
+    cuts: Optional[dict] = None,
+) -> np.ndarray:
+    """Cut pieces longest first, each from the first roll in order with room for it
+
+    free is updated in place and the cuts added to cuts; returns the pieces
+    per type that fit nowhere.
+    """
+    order = np.argsort(free, kind="stable") if order is None else order
+    cuts = {} if cuts is None else cuts
+    unplaced = np.zeros(len(pieces), dtype=np.int64)
+    for piece in np.argsort(-pieces, kind="stable"):
+        length, left = int(pieces[piece]), int(counts[piece])
+        while left:
+            fits = np.flatnonzero(free[order] >= length)
+            if not len(fits):
+                unplaced[piece] = left
+                break
+            # Pieces of one length fill the first roll that fits before the next
+            for roll in order[fits]:
+                count = min(left, int(free[roll] // length))
+                free[roll] -= count * length
+                cuts.setdefault(int(roll), {})
+                cuts[int(roll)][int(piece)] = cuts[int(roll)].get(int(piece), 0) + count
+                left -= count
+                if not left:
+                    break
+    return unplaced
+
+
+def _knapsack(values: np.ndarray, pieces: np.ndarray, counts: np.ndarray, capacity: int) -> tuple:
+    """Most value packable into every capacity up to capacity, and how to recover the packing
+
+    Bounded knapsack as 0/1 over binary splits of each piece's count.
+    """
+    best = np.zeros(capacity + 1)
+    groups, taken = [], []
+    for piece in np.flatnonzero(values > REDUCED_COST_TOLERANCE):
+        length = int(pieces[piece])
+        remaining, size = min(int(counts[piece]), capacity // length), 1
+        while remaining > 0:
+            copies = min(size, remaining)
+            weight = copies * length
+            if weight <= capacity:
+                candidate = best[:-weight] + copies * values[piece]
+                take = np.zeros(capacity + 1, dtype=bool)
+                take[weight:] = candidate > best[weight:] + REDUCED_COST_TOLERANCE
+                best[weight:] = np.where(take[weight:], candidate, best[weight:])
+                groups.append((int(piece), copies, weight))
+                taken.append(take)
+            remaining -= copies
+            size *= 2
+    return best, groups, taken
+
+
+def _recover(capacities: np.ndarray, groups: list, taken: list, piece_count: int) -> np.ndarray:
+    """Best patterns for several capacities at once, one row each"""
+    patterns = np.zeros((len(capacities), piece_count), dtype=np.int64)
+    capacities = capacities.copy()
+    rows = np.arange(len(capacities))
+    for (piece, copies, weight), take in zip(reversed(groups), reversed(taken)):
+        chosen = take[capacities]
+        patterns[rows[chosen], piece] += copies
+        capacities[chosen] -= weight
+    return patterns
+
+
+def column_generation(
+    rolls: np.ndarray,
+    pieces: np.ndarray,
+    counts: np.ndarray,
+    initial: List[tuple],
+    deadline: float,
+) -> tuple:
+    """LP relaxation of cutting stock over roll lengths by column generation
+
+    initial holds (roll length index, pattern) columns to start from. Returns
+    the columns, how many rolls to cut with each, and a lower bound on the
+    length of rolls any plan cutting every piece needs. Generation stops when
+    the LP objective is within GAP_TOLERANCE of the bound, or at the deadline.
+    """
+    # Imported here: scipy.optimize adds a fifth of a second to startup and only solve processes need it
+    from scipy.optimize import linprog
+
+    lengths, available = np.unique(rolls, return_counts=True)
+    piece_count = len(pieces)
+    # Leaving a piece uncut costs more than any roll, so the LP always has a solution
+    penalty = float(lengths.max()) + 1
+
+    columns = list(initial)
+    seen = {(kind, pattern.tobytes()) for kind, pattern in columns}
+    solution, bound = None, None
+    while time.perf_counter() < deadline:
+        patterns = sparse.csc_matrix(np.array([pattern for _, pattern in columns], dtype=float).T)
+        kinds = np.array([kind for kind, _ in columns], dtype=np.int64)
+        supply = sparse.csc_matrix(
+            (np.ones(len(columns)), (kinds, np.arange(len(columns)))),
+            shape=(len(lengths), len(columns)),
+        )
+        # Rows: pieces cut at least as many as needed, rolls of each length at most as many as there are
+        result = linprog(
+            np.concatenate([lengths[kinds].astype(float), np.full(piece_count, penalty)]),
+            A_ub=sparse.bmat([[-patterns, -sparse.identity(piece_count)], [supply, None]], format="csc"),
+            b_ub=np.concatenate([-counts, available]).astype(float),
+            bounds=(0, None),
+            method="highs",
+            options={"time_limit": max(deadline - time.perf_counter(), 0.01)},
+        )
+        if result.status != 0:
+            break
+        solution = result.x[:len(columns)]
+
+        duals = result.ineqlin.marginals
+        prices, roll_duals = -duals[:piece_count], duals[piece_count:]
+        best, groups, taken = _knapsack(prices, pieces, counts, int(lengths.max()))
+        # Lagrangian bound: every roll of a length cut to its best pattern at these prices
+        lagrangian = (
+            prices @ counts
+            + available @ np.minimum(lengths - best[lengths], 0)
+            + counts @ np.minimum(penalty - prices, 0)
+        )
+        bound = lagrangian if bound is None else max(bound, lagrangian)
+        if result.fun - bound <= GAP_TOLERANCE * result.fun:
+            break
+
+        reduced = lengths - best[lengths] - roll_duals
+        improving = np.flatnonzero(reduced < -REDUCED_COST_TOLERANCE * lengths)
+        added = 0
+        chosen = improving[np.argsort(reduced[improving])][:COLUMNS_PER_ROUND]
+        for kind, pattern in zip(chosen, _recover(lengths[chosen], groups, taken, piece_count)):
+            key = (int(kind), pattern.tobytes())
+            if pattern.any() and key not in seen:
+                seen.add(key)
+                columns.append((int(kind), pattern))
+                added += 1
+        if not added:
+            bound = max(bound, result.fun)
+            break
+    return columns, solution, bound
+
+
+def solve_cutting(rolls: np.ndarray, pieces: np.ndarray, counts: np.ndarray, time_limit: float) -> CuttingSolution:
+    """Cut counts pieces of each length from rolls, with as little waste as can be found within time_limit seconds
+
+    All lengths are in whole steps.
+    """
+    deadline = time.perf_counter() + time_limit
+    rolls = np.asarray(rolls, dtype=np.int64)
+    pieces = np.asarray(pieces, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+
+    ffd_free = rolls.copy()
+    ffd_cuts = {}
+    ffd_unplaced = first_fit_decreasing(ffd_free, pieces, counts, cuts=ffd_cuts)
+    ffd_waste = _waste(ffd_free, ffd_cuts)
+    ffd_cut = int(rolls[list(ffd_cuts)].sum()) if ffd_cuts else 0
+    ffd = CuttingSolution("first_fit_decreasing", ffd_cuts, ffd_unplaced, ffd_waste, ffd_waste, ffd_cut)
+    if not len(rolls) or not counts.any():
+        return ffd
+
+    # The LP sees the rolls first fit cut into and enough others to choose from, shortest first
+    unused = np.setdiff1d(np.argsort(rolls, kind="stable"), list(ffd_cuts), assume_unique=True)
+    spare = np.searchsorted(np.cumsum(rolls[unused]), CANDIDATE_SURPLUS * ffd_cut) + 1
+    candidates = np.sort(np.concatenate([np.array(list(ffd_cuts), dtype=np.int64), unused[:spare]]))
+
+    # Start from the first-fit patterns
+    lengths = np.unique(rolls[candidates])
+    initial = {}
+    for roll, cut in ffd_cuts.items():
+        pattern = np.zeros(len(pieces), dtype=np.int64)
+        for piece, count in cut.items():
+            pattern[piece] = count
+        kind = int(np.searchsorted(lengths, rolls[roll]))
+        initial[(kind, pattern.tobytes())] = (kind, pattern)
+    columns, solution, bound = column_generation(
+        rolls[candidates], pieces, counts, list(initial.values()), deadline
+    )
+    if solution is None:
+        return ffd
+    if len(candidates) < len(rolls):
+        # A bound for the candidates only
+        bound = None
+
+    # Whole patterns on rolls of their length, dropping pieces beyond the demand
+    free = rolls.copy()
+    cuts = {}
+    left = counts.copy()
+    rolls_by_kind = defaultdict(deque)
+    for roll in candidates[np.argsort(rolls[candidates], kind="stable")]:
+        rolls_by_kind[int(np.searchsorted(lengths, rolls[roll]))].append(int(roll))
+    for column in np.argsort(-solution, kind="stable"):
+        kind, pattern = columns[column]
+        for _ in range(int(math.floor(solution[column] + 1e-9))):
+            pattern = np.minimum(pattern, left)
+            if not pattern.any() or not rolls_by_kind[kind]:
+                break
+            roll = rolls_by_kind[kind].popleft()
+            cuts[roll] = {int(piece): int(pattern[piece]) for piece in np.flatnonzero(pattern)}
+            free[roll] -= int(pattern @ pieces)
+            left -= pattern
+
+    # The rest first fit decreasing, on rolls already cut into before fresh ones
+    order = np.array(
+        sorted(range(len(rolls)), key=lambda roll: (roll not in cuts, free[roll])),
+        dtype=np.int64,
+    )
+    unplaced = first_fit_decreasing(free, pieces, left, order=order, cuts=cuts)
+    waste = _waste(free, cuts)
+    generated = CuttingSolution("column_generation", cuts, unplaced, waste, ffd_waste, ffd_cut, bound)
+
+    # Fewest pieces left uncut, then least waste
+    if (int(unplaced @ pieces), waste) < (int(ffd_unplaced @ pieces), ffd_waste):
+        return generated
+    ffd.lower_bound = bound
+    return ffd
+
+
+def get_cutting_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool for cutting solves, started on first use; None when CUTTING_PROCESS_WORKERS is 0"""
+    global _pool
+    workers = get_settings().CUTTING_PROCESS_WORKERS
+    if workers and _pool is None:
+        # Spawned, not forked: the server process runs threads of its own
+        _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_cutting_pool() -> None:
+    """Stop the cutting solve processes"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def run_solve(*args) -> CuttingSolution:
+    """solve_cutting in the process pool, so the event loop keeps serving requests"""
+    pool = get_cutting_pool()
+    if pool is None:
+        return await asyncio.to_thread(solve_cutting, *args)
+    return await asyncio.get_running_loop().run_in_executor(pool, solve_cutting, *args)
+
+
+class CuttingService:
+    """Service class for fabric rolls and cutting plans"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    async def register_rolls(self, request: RegisterRollsRequest) -> List[FabricRoll]:
+        """Put received rolls of a fabric in stock"""
+        material = (await InventoryService(self.session).get_materials_by_code([request.material_code]))[
+            request.material_code
+        ]
+        if request.po_line_item_id is not None:
+            line = await self.session.get(POLineItem, request.po_line_item_id)
+            if not line:
+                raise NotFoundException("Purchase order line item not found")
+            if line.material_code != material.material_code:
+                raise ValidationException(
+                    f"Purchase order line item is for {line.material_code}, not {material.material_code}"
+                )
+
+        numbers = [roll.roll_number for roll in request.rolls]
+        if len(set(numbers)) != len(numbers):
+            raise ValidationException("Roll numbers must be unique")
+        existing = await self.session.execute(
+            select(FabricRoll.roll_number).where(FabricRoll.roll_number.in_(numbers))
+        )
+        taken = existing.scalars().all()
+        if taken:
+            raise ConflictException(f"Rolls already in stock: {', '.join(sorted(taken))}")
+
+        warehouse_code = request.warehouse_code or self.settings.INVENTORY_DEFAULT_WAREHOUSE
+        rolls = [
+            FabricRoll(
+                roll_number=roll.roll_number,
+                material_id=material.id,
+                warehouse_code=warehouse_code,
+                po_line_item_id=request.po_line_item_id,
+                length=roll.length,
+                remaining_length=roll.length,
+            )
+            for roll in request.rolls
+        ]
+        self.session.add_all(rolls)
+        await self.session.commit()
+
+        return rolls
+
+    async def get_rolls(
+        self,
+        material_id: Optional[int] = None,
+        available_only: bool = True,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> tuple:
+        """Get fabric rolls with total count"""
+        query = select(FabricRoll)
+        if material_id is not None:
+            query = query.where(FabricRoll.material_id == material_id)
+        if available_only:
+            query = query.where(FabricRoll.remaining_length > 0)
+
+        total = (await self.session.execute(select(func.count()).select_from(query.subquery()))).scalar()
+        result = await self.session.execute(query.order_by(FabricRoll.id).offset(skip).limit(limit))
+
+        return result.scalars().all(), total
+
+    async def plan_cuts(
+        self,
+        material_code: Optional[str] = None,
+        work_order_ids: Optional[List[int]] = None,
+        time_limit_ms: Optional[int] = None,
+    ) -> dict:
+        """Plan cutting the fabric pieces of open work orders from the rolls in stock"""
+        started = time.perf_counter()
+        steps = self.settings.CUTTING_LENGTH_STEPS
+        time_limit = (time_limit_ms or self.settings.CUTTING_TIME_LIMIT_MS) / 1000
+
+        query = (
+            select(
+                WOMaterial.material_id,
+                WOMaterial.cut_length,
+                WOMaterial.quantity,
+                WorkOrder.id,
+                WorkOrder.wo_number,
+            )
+            .join(WorkOrder, WorkOrder.id == WOMaterial.work_order_id)
+            .where(WOMaterial.cut_length.is_not(None), WorkOrder.status.in_(CUT_WO_STATUSES))
+            # Earliest due work orders get their pieces first
+            .order_by(WorkOrder.due_date, WorkOrder.id)
+        )
+        if material_code:
+            query = query.join(Material, Material.id == WOMaterial.material_id).where(
+                Material.material_code == material_code
+            )
+        if work_order_ids:
+            query = query.where(WorkOrder.id.in_(work_order_ids))
+        lines = (await self.session.execute(query)).all()
+
+        # Pieces per (step length, work order), in order
+        demand: Dict[int, Dict[int, list]] = defaultdict(lambda: defaultdict(list))
+        for material_id, cut_length, quantity, wo_id, wo_number in lines:
+            length = math.ceil(cut_length * steps - 1e-9)
+            demand[material_id][length].append([wo_id, wo_number, math.ceil(quantity / cut_length - 1e-9)])
+
+        rolls_by_material = defaultdict(list)
+        materials = {}
+        if demand:
+            result = await self.session.execute(
+                select(FabricRoll, Material.material_code)
+                .join(Material, Material.id == FabricRoll.material_id)
+                .where(FabricRoll.material_id.in_(demand), FabricRoll.remaining_length > 0)
+                .order_by(FabricRoll.id)
+            )
+            for roll, code in result.all():
+                rolls_by_material[roll.material_id].append(roll)
+                materials[roll.material_id] = code
+            missing = set(demand) - materials.keys()
+            if missing:
+                result = await self.session.execute(
+                    select(Material.id, Material.material_code).where(Material.id.in_(missing))
+                )
+                materials.update(dict(result.all()))
+
+        # One solve per material, in parallel across the pool
+        problems = []
+        for material_id in sorted(demand):
+            lengths = sorted(demand[material_id])
+            rolls = rolls_by_material[material_id]
+            problems.append((
+                material_id,
+                lengths,
+                np.array([math.floor(roll.remaining_length * steps + 1e-9) for roll in rolls], dtype=np.int64),
+                np.array(lengths, dtype=np.int64),
+                np.array([sum(line[2] for line in demand[material_id][length]) for length in lengths], dtype=np.int64),
+            ))
+        solutions = await asyncio.gather(*[
+            run_solve(roll_lengths, pieces, counts, time_limit) for _, _, roll_lengths, pieces, counts in problems
+        ])
+
+        plans = []
+        for (material_id, lengths, _, pieces, counts), solution in zip(problems, solutions):
+            plans.append(self._material_plan(
+                material_id,
+                materials[material_id],
+                rolls_by_material[material_id],
+                lengths,
+                demand[material_id],
+                solution,
+            ))
+
+        cut_into = sum(plan["fabric_cut"] for plan in plans)
+        waste = sum(plan["waste_length"] for plan in plans)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            "Cutting plan: %s materials, %s rolls, %.2f waste (%.2f%%) in %.0fms",
+            len(plans), sum(plan["roll_count"] for plan in plans), waste,
+            100 * waste / cut_into if cut_into else 0, elapsed_ms,
+        )
+        return {
+            "fabric_cut": round(cut_into, 4),
+            "waste_length": round(waste, 4),
+            "waste_percentage": round(100 * waste / cut_into, 2) if cut_into else 0.0,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "materials": plans,
+        }
+
+    def _material_plan(
+        self,
+        material_id: int,
+        material_code: str,
+        rolls: List[FabricRoll],
+        lengths: List[int],
+        demand: Dict[int, list],
+        solution: CuttingSolution,
+    ) -> dict:
+        steps = self.settings.CUTTING_LENGTH_STEPS
+        # Work orders waiting for pieces of each length, earliest due first
+        waiting = {piece: deque([list(line) for line in demand[length]]) for piece, length in enumerate(lengths)}
+
+        roll_plans = []
+        for index in sorted(solution.cuts, key=lambda index: rolls[index].id):
+            roll = rolls[index]
+            cuts = []
+            for piece, count in sorted(solution.cuts[index].items()):
+                while count:
+                    line = waiting[piece][0]
+                    taken = min(count, line[2])
+                    cuts.append({
+                        "work_order_id": line[0],
+                        "wo_number": line[1],
+                        "cut_length": lengths[piece] / steps,
+                        "pieces": taken,
+                    })
+                    line[2] -= taken
+                    count -= taken
+                    if not line[2]:
+                        waiting[piece].popleft()
+            used = sum(cut["cut_length"] * cut["pieces"] for cut in cuts)
+            roll_plans.append({
+                "roll_id": roll.id,
+                "roll_number": roll.roll_number,
+                "length": roll.remaining_length,
+                "used_length": round(used, 4),
+                "waste_length": round(roll.remaining_length - used, 4),
+                "cuts": cuts,
+            })
+
+        fabric_cut = sum(plan["length"] for plan in roll_plans)
+        waste = sum(plan["waste_length"] for plan in roll_plans)
+        counts = [sum(line[2] for line in demand[length]) for length in lengths]
+        min_waste = None
+        if solution.lower_bound is not None:
+            needed = sum(count * length for length, count in zip(lengths, counts))
+            min_waste = round(max(solution.lower_bound - needed, 0) / steps, 4)
+        return {
+            "material_id": material_id,
+            "material_code": material_code,
+            "method": solution.method,
+            "roll_count": len(roll_plans),
+            "pieces": sum(counts),
+            "unplaced_pieces": int(solution.unplaced.sum()),
+            "fabric_cut": round(fabric_cut, 4),
+            "waste_length": round(waste, 4),
+            "waste_percentage": round(100 * waste / fabric_cut, 2) if fabric_cut else 0.0,
+            "ffd_waste_percentage": (
+                round(100 * solution.ffd_waste / solution.ffd_cut, 2) if solution.ffd_cut else 0.0
+            ),
+            "min_waste_length": min_waste,
+            "rolls": roll_plans,
+        }
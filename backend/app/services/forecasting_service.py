@@ -0,0 +1,594 @@
+"""
+Demand forecasting over sales order history
+
+Weekly demand per product_code is summed from the lines of sales orders,
+live and archived, in one aggregate query over the last
+FORECAST_HISTORY_WEEKS complete weeks. Every product's series is then fitted
+at once as rows of one matrix: a product whose weeks with demand are on
+average more than 1.32 weeks apart (Syntetos and Boylan) is intermittent and
+gets Croston's method with the SBA bias correction, any other simple
+exponential smoothing. Both run as the same recursion over the weeks,
+vectorized across products and a grid of smoothing constants, keeping per
+product the constant with the least squared one-week-ahead error. Chunks of
+FORECAST_CHUNK_SIZE products are fitted in parallel in a process pool.
+
+A product's history starts at its first week with demand. Accuracy is that
+of the one-week-ahead forecasts over the rest of it; accuracy is 100 less the
+weighted absolute percentage error, which unlike MAPE is defined for weeks
+without demand.
+
+Refreshes are incremental. Sales order changes that add to or take from a
+product's demand record its code in forecast_changes, and only those
+products are refitted from their history. Every other product had no
+orders since its last fit, so its forecast is rolled on over the weeks
+since with no demand, from the smoothing state and error sums stored with
+it, keeping its smoothing constant. A full refit refits every product and
+picks the constants afresh.
+
+Forecasts are stored per product with the series they were fitted to, and
+refreshed by POST /ml/demand-forecasting/retrain or once a night with:
+
+    python -m app.services.forecasting_service [--full]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, delete, func, or_, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from app.core import NotFoundException, get_logger, get_settings
+from app.models.archive import SalesOrderArchive, SOLineItemArchive
+from app.models.demand_forecast import DemandForecast, ForecastChange
+from app.models.sales_order import SalesOrder, SOLineItem, SOStatus
+
+logger = get_logger(__name__)
+
+# Orders taken, whatever has happened to them since
+DEMAND_STATUSES = (SOStatus.PENDING, SOStatus.CONFIRMED, SOStatus.SHIPPED, SOStatus.DELIVERED)
+
+# Smoothing constants tried for every product
+ALPHAS = np.round(np.arange(0.05, 0.55, 0.05), 2)
+# Average weeks from one demand to the next above which demand is intermittent
+INTERMITTENT_ADI = 1.32
+# Half-width of a 95% prediction interval in standard errors
+Z_95 = 1.96
+
+# Error sums kept per product, from which accuracy is computed
+ERROR_SUMS = (
+    "error_weeks",
+    "demand_weeks",
+    "sum_abs_error",
+    "sum_squared_error",
+    "sum_demand",
+    "sum_squared_demand",
+    "sum_percentage_error",
+)
+
+# Forecasts written per statement
+WRITE_BATCH_SIZE = 1000
+
+# Columns read to roll a forecast forward
+STALE_COLUMNS = (
+    "id", "model", "alpha", "weeks", "history_end", "level", "interval", "weeks_since_demand", "series",
+) + ERROR_SUMS
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ForecastFit:
+    """Fitted forecasts of a batch of products, one row per product"""
+
+    def __init__(self, intermittent, alpha, level, interval, since, fitted, sums):
+        self.intermittent = intermittent
+        self.alpha = alpha
+        # Smoothing state at the end of the history
+        self.level = level
+        self.interval = interval
+        self.since = since
+        # One-week-ahead forecast of every week, NaN before the second week of history
+        self.fitted = fitted
+        # ERROR_SUMS, each an array
+        self.sums = sums
+
+    @property
+    def forecast(self) -> np.ndarray:
+        """Demand per week from the end of the history on"""
+        return forecast_of(self.intermittent, self.alpha, self.level, self.interval)
+
+    @classmethod
+    def concatenate(cls, fits: List["ForecastFit"]) -> "ForecastFit":
+        fields = [np.concatenate([getattr(fit, name) for fit in fits]) for name in list(vars(fits[0]))[:-1]]
+        sums = {name: np.concatenate([fit.sums[name] for fit in fits]) for name in ERROR_SUMS}
+        return cls(*fields, sums)
+
+
+def forecast_of(intermittent, alpha, level, interval):
+    """Forecast from the smoothing state; SBA takes alpha / 2 off Croston's size over interval"""
+    return np.where(intermittent, 1 - alpha / 2, 1.0) * level / interval
+
+
+def _smooth(
+    demand: np.ndarray,
+    start: np.ndarray,
+    alpha: np.ndarray,
+    intermittent: np.ndarray,
+    interval: np.ndarray,
+    keep: bool = False,
+) -> tuple:
+    """Run exponential smoothing or Croston over the weeks, for every product (rows) and alpha (columns)
+
+    Returns the squared one-week-ahead error summed per product and alpha,
+    the forecasts themselves when keep is set, and the state at the end:
+    level, interval and weeks since the last demand.
+    """
+    count, weeks = demand.shape
+    alpha = np.broadcast_to(alpha, (count, alpha.shape[-1]))
+    croston = intermittent[:, None]
+
+    level = np.zeros(alpha.shape)
+    interval = np.broadcast_to(interval[:, None], alpha.shape).copy()
+    since = np.zeros((count, 1))
+    squared_error = np.zeros(alpha.shape)
+    fitted = np.full((count, alpha.shape[1], weeks), np.nan) if keep else None
+
+    for week in range(weeks):
+        actual = demand[:, week:week + 1]
+        first = (start == week)[:, None]
+        live = (start < week)[:, None]
+        forecast = forecast_of(croston, alpha, level, interval)
+        squared_error += np.where(live, actual - forecast, 0) ** 2
+        if keep:
+            fitted[:, :, week] = np.where(live, forecast, np.nan)
+
+        # Exponential smoothing updates every week; Croston only weeks with demand, and the interval too
+        since += 1
+        ordered = actual > 0
+        update = live & (ordered | ~croston)
+        level = np.where(first, actual, np.where(update, level + alpha * (actual - level), level))
+        interval = np.where(live & ordered & croston, interval + alpha * (since - interval), interval)
+        since = np.where(ordered | first, 0, since)
+
+    return squared_error, fitted, (level, interval, np.broadcast_to(since, alpha.shape))
+
+
+def error_sums(demand: np.ndarray, fitted: np.ndarray) -> Dict[str, np.ndarray]:
+    """ERROR_SUMS of one-week-ahead forecasts, over the weeks that have one (fitted not NaN)"""
+    live = ~np.isnan(fitted)
+    error = np.where(live, demand - np.nan_to_num(fitted), 0)
+    absolute = np.abs(error)
+    actual = np.where(live, demand, 0)
+    ordered = live & (demand > 0)
+    return {
+        "error_weeks": live.sum(axis=1),
+        "demand_weeks": ordered.sum(axis=1),
+        "sum_abs_error": absolute.sum(axis=1),
+        "sum_squared_error": (error ** 2).sum(axis=1),
+        "sum_demand": actual.sum(axis=1),
+        "sum_squared_demand": (actual ** 2).sum(axis=1),
+        "sum_percentage_error": np.where(ordered, absolute / np.where(ordered, demand, 1), 0).sum(axis=1),
+    }
+
+
+def accuracy_metrics(sums: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """MAE, RMSE, MAPE, R squared and accuracy from ERROR_SUMS; NaN where undefined"""
+    weeks = sums["error_weeks"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = sums["sum_squared_demand"] - sums["sum_demand"] ** 2 / weeks
+        # Rounding can leave a little spread in a series without any
+        spread = np.where(spread > 1e-9 * sums["sum_squared_demand"], spread, 0)
+        return {
+            "mae": sums["sum_abs_error"] / weeks,
+            "rmse": np.sqrt(sums["sum_squared_error"] / weeks),
+            "mape": 100 * sums["sum_percentage_error"] / sums["demand_weeks"],
+            "r_squared": 1 - sums["sum_squared_error"] / spread,
+            "accuracy": np.clip(100 * (1 - sums["sum_abs_error"] / sums["sum_demand"]), 0, 100),
+        }
+
+
+def fit_batch(demand: np.ndarray, start: np.ndarray) -> ForecastFit:
+    """Fit every product's weekly series, starting at its week index start"""
+    weeks = demand.shape[1]
+
+    # Average demand interval over the weeks since the first demand
+    ordered_weeks = (demand > 0).sum(axis=1)
+    adi = (weeks - start) / np.maximum(ordered_weeks, 1)
+    intermittent = adi > INTERMITTENT_ADI
+    interval = np.where(intermittent, adi, 1.0)
+
+    squared_error, _, _ = _smooth(demand, start, ALPHAS[None, :], intermittent, interval)
+    alpha = ALPHAS[squared_error.argmin(axis=1)]
+    _, fitted, state = _smooth(demand, start, alpha[:, None], intermittent, interval, keep=True)
+    fitted = fitted[:, 0]
+    level, interval, since = (values[:, 0] for values in state)
+    return ForecastFit(intermittent, alpha, level, interval, since, fitted, error_sums(demand, fitted))
+
+
+def roll_forward(fit: ForecastFit, weeks: np.ndarray) -> np.ndarray:
+    """Advance every product's state in place over weeks[i] weeks without demand
+
+    Returns the one-week-ahead forecast made for each of those weeks, NaN
+    past a product's own number of weeks.
+    """
+    fitted = np.full((len(weeks), int(weeks.max(initial=0))), np.nan)
+    for week in range(fitted.shape[1]):
+        live = week < weeks
+        forecast = fit.forecast
+        fitted[:, week] = np.where(live, forecast, np.nan)
+        fit.sums["error_weeks"] += live
+        fit.sums["sum_abs_error"] += np.where(live, forecast, 0)
+        fit.sums["sum_squared_error"] += np.where(live, forecast ** 2, 0)
+        # A week without demand: Croston leaves size and interval as they are
+        fit.level = np.where(live & ~fit.intermittent, fit.level - fit.alpha * fit.level, fit.level)
+        fit.since = fit.since + live
+    return fitted
+
+
+def get_forecast_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool for forecast fitting, started on first use; None when FORECAST_PROCESS_WORKERS is 0"""
+    global _pool
+    workers = get_settings().FORECAST_PROCESS_WORKERS
+    if workers and _pool is None:
+        # Spawned, not forked: the server process runs threads of its own
+        _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_forecast_pool() -> None:
+    """Stop the forecast fitting processes"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def run_fit(demand: np.ndarray, start: np.ndarray, chunk_size: int) -> ForecastFit:
+    """fit_batch over chunks of products in parallel in the process pool"""
+    pool = get_forecast_pool()
+    loop = asyncio.get_running_loop()
+    chunks = [
+        (demand[offset:offset + chunk_size], start[offset:offset + chunk_size])
+        for offset in range(0, len(demand), chunk_size)
+    ]
+    if pool is None:
+        fits = [await asyncio.to_thread(fit_batch, *chunk) for chunk in chunks]
+    else:
+        fits = await asyncio.gather(*(loop.run_in_executor(pool, fit_batch, *chunk) for chunk in chunks))
+    return ForecastFit.concatenate(fits)
+
+
+def encode_series(actual: np.ndarray, fitted: np.ndarray) -> bytes:
+    return np.concatenate([actual, fitted]).astype("<f4").tobytes()
+
+
+def decode_series(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    values = np.frombuffer(data, dtype="<f4").astype(np.float64)
+    return values[:len(values) // 2], values[len(values) // 2:]
+
+
+def _number(value: float) -> Optional[float]:
+    return None if not np.isfinite(value) else round(float(value), 4)
+
+
+def _state(fit: ForecastFit, metrics: Dict[str, np.ndarray], index: int) -> dict:
+    """Forecast, smoothing state, error sums and accuracy (see accuracy_metrics) of one product, as columns"""
+    sums = {name: values[index] for name, values in fit.sums.items()}
+    return {
+        "forecast": round(float(fit.forecast[index]), 4),
+        "level": float(fit.level[index]),
+        "interval": float(fit.interval[index]),
+        "weeks_since_demand": int(fit.since[index]),
+        **{name: (int if name.endswith("weeks") else float)(value) for name, value in sums.items()},
+        **{name: _number(values[index]) for name, values in metrics.items()},
+    }
+
+
+class ForecastingService:
+    """Service class for demand forecasts"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    async def load_history(self, end: date, product_codes=None) -> tuple:
+        """Weekly demand per product over the FORECAST_HISTORY_WEEKS weeks before end, a Monday
+
+        Returns the product codes, their names, the demand matrix (products by
+        weeks) and the Monday of the first week. product_codes, a list or a
+        subquery, limits it to those products.
+        """
+        first_week = end - timedelta(weeks=self.settings.FORECAST_HISTORY_WEEKS)
+        selects = []
+        for order, line in ((SalesOrder, SOLineItem), (SalesOrderArchive, SOLineItemArchive)):
+            query = (
+                select(line.product_code, line.product_name, line.quantity, order.order_date)
+                .join(order, order.id == line.sales_order_id)
+                .where(order.status.in_(DEMAND_STATUSES), order.order_date >= first_week, order.order_date < end)
+            )
+            if product_codes is not None:
+                query = query.where(line.product_code.in_(product_codes))
+            selects.append(query)
+        lines = union_all(*selects).subquery()
+        week = self._week_start(lines.c.order_date)
+        result = await self.session.execute(
+            select(lines.c.product_code, week, func.sum(lines.c.quantity), func.max(lines.c.product_name))
+            .group_by(lines.c.product_code, week)
+        )
+        rows = result.all()
+
+        codes = sorted({row[0] for row in rows})
+        position = {code: index for index, code in enumerate(codes)}
+        names = {}
+        demand = np.zeros((len(codes), self.settings.FORECAST_HISTORY_WEEKS))
+        for code, week_start, quantity, name in rows:
+            week_index = (date.fromisoformat(str(week_start)[:10]) - first_week).days // 7
+            demand[position[code], week_index] += quantity
+            names[code] = name
+        return codes, [names[code] for code in codes], demand, first_week
+
+    async def mark_changed(self, product_codes: Iterable[str]) -> None:
+        """Record that the demand of these products changed, for the next refresh to refit them"""
+        changed_at = datetime.utcnow()
+        rows = [{"product_code": code, "changed_at": changed_at} for code in sorted(set(product_codes))]
+        if not rows:
+            return
+        stmt = self._dialect_insert()(ForecastChange).values(rows)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[ForecastChange.product_code],
+                set_={"changed_at": stmt.excluded.changed_at},
+            )
+        )
+
+    async def retrain(self, full: bool = False) -> dict:
+        """Refresh the forecasts up to the start of this week
+
+        Refits the products in forecast_changes and rolls every other
+        forecast on over the weeks since it was last refreshed; with full,
+        refits every product.
+        """
+        started = time.perf_counter()
+        fitted_at = datetime.utcnow()
+        today = fitted_at.date()
+        end = today - timedelta(days=today.weekday())
+        changed = select(ForecastChange.product_code).where(ForecastChange.changed_at <= fitted_at)
+
+        codes, names, demand, first_week = await self.load_history(end, None if full else changed)
+        stale = [] if full else await self._load_stale(end)
+        loaded = time.perf_counter()
+        start = (demand > 0).argmax(axis=1)
+        fit = await run_fit(demand, start, self.settings.FORECAST_CHUNK_SIZE) if codes else None
+        rows = self._roll_forward(stale, end) if stale else []
+        fitting = time.perf_counter()
+
+        if codes:
+            await self._write(codes, names, demand, first_week, end, fit, fitted_at)
+        if rows:
+            await self.session.execute(update(DemandForecast), rows)
+        # Products with no orders left in the history
+        stmt = delete(DemandForecast).where(DemandForecast.fitted_at < fitted_at)
+        if not full:
+            stmt = stmt.where(DemandForecast.product_code.in_(changed))
+        removed = (await self.session.execute(stmt)).rowcount
+        await self.session.execute(delete(ForecastChange).where(ForecastChange.changed_at <= fitted_at))
+        products = (await self.session.execute(select(func.count(DemandForecast.id)))).scalar_one()
+        await self.session.commit()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        intermittent = int(fit.intermittent.sum()) if codes else 0
+        logger.info(
+            "Forecasts refreshed: %s products refitted (%s intermittent), %s rolled forward, %s unchanged in %.0fms",
+            len(codes), intermittent, len(rows), products - len(codes) - len(rows), elapsed_ms,
+        )
+        return {
+            "full": full,
+            "products": products,
+            "refitted": len(codes),
+            "rolled_forward": len(rows),
+            "unchanged": products - len(codes) - len(rows),
+            "removed": removed,
+            "intermittent": intermittent,
+            "history_start": first_week,
+            "weeks": demand.shape[1],
+            "load_ms": round((loaded - started) * 1000, 1),
+            "fit_ms": round((fitting - loaded) * 1000, 1),
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
+
+    async def _write(self, codes, names, demand, first_week, end, fit: ForecastFit, fitted_at: datetime) -> None:
+        """Upsert the forecasts WRITE_BATCH_SIZE products per statement"""
+        insert_ = self._dialect_insert()
+        metrics = accuracy_metrics(fit.sums)
+        rows = [
+            {
+                "product_code": code,
+                "product_name": names[index],
+                "model": "croston" if fit.intermittent[index] else "ses",
+                "alpha": float(fit.alpha[index]),
+                "history_start": first_week,
+                "weeks": demand.shape[1],
+                "history_end": end,
+                **_state(fit, metrics, index),
+                "series": encode_series(demand[index], fit.fitted[index]),
+                "fitted_at": fitted_at,
+            }
+            for index, code in enumerate(codes)
+        ]
+        for offset in range(0, len(rows), WRITE_BATCH_SIZE):
+            stmt = insert_(DemandForecast).values(rows[offset:offset + WRITE_BATCH_SIZE])
+            columns = set(rows[0]) - {"product_code"}
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[DemandForecast.product_code],
+                set_={**{name: stmt.excluded[name] for name in columns}, "updated_at": func.now()},
+            )
+            await self.session.execute(stmt)
+
+    async def _load_stale(self, end: date) -> list:
+        """State and series of the forecasts of unchanged products that end before end"""
+        result = await self.session.execute(
+            select(*(getattr(DemandForecast, name) for name in STALE_COLUMNS)).where(
+                DemandForecast.history_end < end,
+                DemandForecast.product_code.not_in(select(ForecastChange.product_code)),
+            )
+        )
+        return result.all()
+
+    def _roll_forward(self, stale: list, end: date) -> List[dict]:
+        """Roll the stale forecasts on to end, as bulk UPDATE parameters"""
+        columns = dict(zip(STALE_COLUMNS, zip(*stale)))
+        fit = ForecastFit(
+            np.array(columns["model"]) == "croston",
+            np.array(columns["alpha"]),
+            np.array(columns["level"]),
+            np.array(columns["interval"]),
+            np.array(columns["weeks_since_demand"], dtype=float),
+            None,
+            {name: np.array(columns[name], dtype=float) for name in ERROR_SUMS},
+        )
+        weeks = np.array([(end - history_end).days // 7 for history_end in columns["history_end"]])
+        appended = roll_forward(fit, weeks)
+        metrics = accuracy_metrics(fit.sums)
+        rows = []
+        for index, forecast_id in enumerate(columns["id"]):
+            actual, fitted = decode_series(columns["series"][index])
+            added = appended[index, :weeks[index]]
+            rows.append({
+                "id": forecast_id,
+                "weeks": columns["weeks"][index] + int(weeks[index]),
+                "history_end": end,
+                **_state(fit, metrics, index),
+                "series": encode_series(
+                    np.concatenate([actual, np.zeros(len(added))]), np.concatenate([fitted, added])
+                ),
+            })
+        return rows
+
+    async def get_forecasts(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        search: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> tuple[List[DemandForecast], int]:
+        """Get the products with a forecast"""
+        query = select(DemandForecast)
+        if search:
+            pattern = f"%{search}%"
+            query = query.where(
+                or_(DemandForecast.product_code.ilike(pattern), DemandForecast.product_name.ilike(pattern))
+            )
+        if model:
+            query = query.where(DemandForecast.model == model)
+
+        count_result = await self.session.execute(select(func.count()).select_from(query.subquery()))
+        total = count_result.scalar_one()
+
+        result = await self.session.execute(query.order_by(DemandForecast.product_code).offset(skip).limit(limit))
+        return result.scalars().all(), total
+
+    async def get_forecast(self, product_code: str, load_series: bool = False) -> DemandForecast:
+        """Get the forecast of a product"""
+        query = select(DemandForecast).where(DemandForecast.product_code == product_code)
+        if load_series:
+            query = query.options(undefer(DemandForecast.series))
+        result = await self.session.execute(query)
+        forecast = result.scalar_one_or_none()
+        if not forecast:
+            raise NotFoundException(f"No forecast for product: {product_code}")
+        return forecast
+
+    async def forecast_chart(self, product_code: str, history_weeks: int, horizon_weeks: Optional[int] = None) -> dict:
+        """Actual and forecast demand per week, the last history_weeks weeks and horizon_weeks ahead"""
+        forecast = await self.get_forecast(product_code, load_series=True)
+        horizon_weeks = horizon_weeks or self.settings.FORECAST_HORIZON_WEEKS
+        actual, fitted = decode_series(forecast.series)
+        shown = min(history_weeks, forecast.weeks)
+        first_shown = forecast.weeks - shown
+        error = forecast.rmse or 0.0
+
+        # Variance of an h-week-ahead forecast grows by alpha squared for every week past the first
+        ahead = np.arange(1, horizon_weeks + 1)
+        spread = Z_95 * error * np.sqrt(1 + (ahead - 1) * forecast.alpha ** 2)
+        predicted = np.concatenate([fitted[first_shown:], np.full(horizon_weeks, forecast.forecast)])
+        half_width = np.concatenate([np.full(shown, Z_95 * error), spread])
+
+        def values(array) -> list:
+            return [None if np.isnan(value) else round(float(value), 2) for value in array]
+
+        return {
+            "product_code": forecast.product_code,
+            "product_name": forecast.product_name,
+            "model": forecast.model,
+            "alpha": forecast.alpha,
+            "forecast": forecast.forecast,
+            "fitted_at": forecast.fitted_at,
+            "dates": [
+                forecast.history_start + timedelta(weeks=week)
+                for week in range(first_shown, forecast.weeks + horizon_weeks)
+            ],
+            "actual": values(actual[first_shown:]) + [None] * horizon_weeks,
+            "predicted": values(predicted),
+            "confidence_lower": values(np.maximum(predicted - half_width, 0)),
+            "confidence_upper": values(predicted + half_width),
+        }
+
+    async def get_metrics_summary(self) -> dict:
+        """Forecast accuracy over all products"""
+        result = await self.session.execute(
+            select(
+                func.count(),
+                func.sum(case((DemandForecast.model == "croston", 1), else_=0)),
+                func.avg(DemandForecast.mae),
+                func.avg(DemandForecast.mape),
+                func.avg(DemandForecast.accuracy),
+                func.max(DemandForecast.fitted_at),
+            )
+        )
+        products, intermittent, mae, mape, accuracy, fitted_at = result.one()
+        return {
+            "products": products,
+            "intermittent": intermittent or 0,
+            "mae": mae,
+            "mape": mape,
+            "accuracy": accuracy,
+            "fitted_at": fitted_at,
+        }
+
+    def _week_start(self, column):
+        """Monday of the week of a date column, in the bound database's dialect"""
+        if self.session.get_bind().dialect.name == "postgresql":
+            return func.date_trunc("week", column)
+        return func.date(column, "weekday 0", "-6 days")
+
+    def _dialect_insert(self):
+        """INSERT construct with ON CONFLICT support for the bound database"""
+        if self.session.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert
+
+
+async def run_retrain(full: bool = False) -> dict:
+    """Refresh the forecasts once"""
+    from app.db import get_sessionmaker
+
+    try:
+        async with get_sessionmaker()() as session:
+            return await ForecastingService(session).retrain(full=full)
+    finally:
+        shutdown_forecast_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the demand forecasts")
+    parser.add_argument("--full", action="store_true", help="refit every product, not only those with changed orders")
+    args = parser.parse_args()
+    print(asyncio.run(run_retrain(full=args.full)))
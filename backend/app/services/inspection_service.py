@@ -0,0 +1,281 @@
+"""
+Quality inspection: fabric defect detection and batch quality prediction
+
+Both models take a batch of inputs at once and are called through the
+micro-batching schedulers of app.core.inference, one request per image or
+batch record. Each batch runs the version active in the model registry
+(app.core.model_registry); the constants below are the defaults used until
+a version is published.
+
+Defect detection splits an image into TILE_GRID x TILE_GRID tiles and flags
+tiles whose mean or spread of gray levels is a robust outlier (more than
+DEFECT_Z median absolute deviations) among the image's tiles: a hole, stain
+or broken thread against a regular weave. Images are uploaded as binary PGM
+(P5) or NumPy .npy files, the formats inspection cameras write raw frames
+in. Uploads are spooled to disk past 1 MB, and then read from a memory map
+of the spooled file rather than loaded whole.
+
+Quality prediction scores a dyeing batch from its process parameters: the
+probability of passing inspection falls with the squared distance of each
+parameter from its target, in tolerances.
+"""
+
+import asyncio
+import os
+import re
+import tempfile
+from typing import BinaryIO, List, Optional
+
+import numpy as np
+
+from app.core import ValidationException
+from app.core.inference import get_scheduler
+from app.core.model_registry import get_model, register_model
+
+# Tiles per side an image is split into; images must be at least this many pixels a side
+TILE_GRID = 32
+# Pixels of an image converted to floats at once
+TILE_BAND_PIXELS = 1 << 20
+# Robust z-score of a tile's mean or spread from which it is a defect
+DEFECT_Z = 4.0
+# Least spread of tile means and spreads, in gray levels, so a flawless uniform image flags nothing
+MIN_SPREAD = 1.0
+# A defect region this many times longer than wide is a line (broken end or pick)
+LINE_ASPECT = 4
+
+# Process parameters of a dyeing batch: target and tolerance
+QUALITY_FEATURES = {
+    "temperature_c": (130.0, 4.0),
+    "ph": (4.5, 0.5),
+    "liquor_ratio": (8.0, 2.0),
+    "dwell_minutes": (45.0, 10.0),
+    "humidity_pct": (65.0, 10.0),
+    "machine_speed_mpm": (40.0, 8.0),
+}
+# Log-odds of passing on target; each squared tolerance off target takes off a half
+QUALITY_INTERCEPT = 3.0
+# Pass probability from which a batch is grade A, and grade B
+QUALITY_GRADES = (0.9, 0.5)
+
+PGM_HEADER = re.compile(rb"P5(?:\s+|#[^\n]*\n)+(\d+)(?:\s+|#[^\n]*\n)+(\d+)(?:\s+|#[^\n]*\n)+(\d+)\s")
+NPY_DTYPES = {np.dtype(name) for name in ("uint8", "uint16", ">u2", "float32", "float64")}
+
+
+def read_image(file: BinaryIO) -> np.ndarray:
+    """Pixels of a binary PGM or .npy upload, memory-mapped when it is on disk"""
+    file.seek(0)
+    head = file.read(512)
+    file.seek(0)
+    if head.startswith(b"\x93NUMPY"):
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        if fortran_order or dtype not in NPY_DTYPES or len(shape) not in (2, 3):
+            raise ValidationException("Images must be C-ordered 2-D or 3-D arrays of uint8, uint16 or floats")
+        offset = file.tell()
+    elif head.startswith(b"P5"):
+        match = PGM_HEADER.match(head)
+        if not match:
+            raise ValidationException("Invalid PGM header")
+        width, height, maxval = (int(value) for value in match.groups())
+        shape, dtype, offset = (height, width), np.dtype("u1" if maxval < 256 else ">u2"), match.end()
+    else:
+        raise ValidationException("Images must be binary PGM (P5) or NumPy .npy files")
+
+    if shape[0] < TILE_GRID or shape[1] < TILE_GRID:
+        raise ValidationException(f"Images must be at least {TILE_GRID}x{TILE_GRID} pixels")
+    size = int(np.prod(shape)) * dtype.itemsize
+    file.seek(0, os.SEEK_END)
+    if file.tell() < offset + size:
+        raise ValidationException("Image is truncated")
+
+    # A spooled upload still in memory is small: copy it. One on disk is mapped, not read
+    if not _on_disk(file):
+        file.seek(offset)
+        return np.frombuffer(file.read(size), dtype=dtype).reshape(shape)
+    return np.memmap(file, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+def _on_disk(file: BinaryIO) -> bool:
+    """Whether file is backed by a file descriptor, as a spooled file is once rolled over"""
+    if isinstance(file, tempfile.SpooledTemporaryFile):
+        # fileno() would roll it over
+        return file._rolled
+    try:
+        file.fileno()
+    except OSError:
+        return False
+    return True
+
+
+def tile_statistics(image: np.ndarray) -> np.ndarray:
+    """Mean and standard deviation of each tile, shape (2, TILE_GRID, TILE_GRID)
+
+    Works TILE_BAND_PIXELS at a time, so a memory-mapped image is read once
+    and never held whole as floats.
+    """
+    height, width = image.shape[0] // TILE_GRID, image.shape[1] // TILE_GRID
+    rows = max(1, min(TILE_GRID, TILE_BAND_PIXELS // (height * width * TILE_GRID)))
+    statistics = np.empty((2, TILE_GRID, TILE_GRID))
+    for first in range(0, TILE_GRID, rows):
+        last = min(first + rows, TILE_GRID)
+        band = np.asarray(image[first * height:last * height, :width * TILE_GRID], dtype=np.float32)
+        if band.ndim == 3:
+            band = band.mean(axis=2)
+        tiles = band.reshape(last - first, height, TILE_GRID, width)
+        statistics[0, first:last] = tiles.mean(axis=(1, 3))
+        statistics[1, first:last] = tiles.std(axis=(1, 3))
+    return statistics
+
+
+class DefectDetector:
+    """Flags tiles whose mean or spread is a robust outlier among an image's tiles"""
+
+    def __init__(self, defect_z: float = DEFECT_Z, min_spread: float = MIN_SPREAD, line_aspect: float = LINE_ASPECT):
+        self.defect_z = defect_z
+        self.min_spread = min_spread
+        self.line_aspect = line_aspect
+
+    @classmethod
+    def from_artifacts(cls, arrays: dict, params: dict) -> "DefectDetector":
+        """A detector from a registry version's parameters"""
+        return cls(**params)
+
+    def _robust_z(self, values: np.ndarray) -> np.ndarray:
+        """Distance of each tile from the image's median, in median absolute deviations"""
+        median = np.median(values, axis=(1, 2), keepdims=True)
+        spread = 1.4826 * np.median(np.abs(values - median), axis=(1, 2), keepdims=True)
+        return (values - median) / np.maximum(spread, self.min_spread)
+
+    def predict(self, images: List[np.ndarray]) -> List[dict]:
+        """Defect found in each image, if any, with its confidence, type, area and bounding box"""
+        statistics = np.stack([tile_statistics(image) for image in images])
+        mean_z, spread_z = self._robust_z(statistics[:, 0]), self._robust_z(statistics[:, 1])
+        anomaly = np.maximum(np.abs(mean_z), spread_z)
+        flagged = anomaly >= self.defect_z
+        confidence = 1 / (1 + np.exp(-(anomaly.max(axis=(1, 2)) - self.defect_z)))
+
+        results = []
+        for index, image in enumerate(images):
+            result = {
+                "defective": bool(flagged[index].any()),
+                "confidence": round(float(confidence[index]), 4),
+                "defect_type": None,
+                "defect_area": round(float(flagged[index].mean()), 4),
+                "bounding_box": None,
+            }
+            if result["defective"]:
+                rows, columns = np.nonzero(flagged[index])
+                tile_height, tile_width = image.shape[0] // TILE_GRID, image.shape[1] // TILE_GRID
+                result["bounding_box"] = [
+                    int(columns.min() * tile_width),
+                    int(rows.min() * tile_height),
+                    int((columns.max() + 1) * tile_width),
+                    int((rows.max() + 1) * tile_height),
+                ]
+                tall, wide = np.ptp(rows) + 1, np.ptp(columns) + 1
+                shift = mean_z[index][flagged[index]].mean()
+                if max(tall, wide) >= self.line_aspect * min(tall, wide):
+                    result["defect_type"] = "line"
+                elif abs(shift) < self.defect_z:
+                    result["defect_type"] = "texture"
+                else:
+                    result["defect_type"] = "dark_spot" if shift < 0 else "light_spot"
+            results.append(result)
+        return results
+
+    def warm_up(self) -> None:
+        self.predict([np.zeros((TILE_GRID, TILE_GRID), dtype=np.uint8)])
+
+
+class QualityPredictor:
+    """Pass probability of a batch from the squared distance of its parameters from target, in tolerances"""
+
+    def __init__(
+        self,
+        features: List[str],
+        targets: np.ndarray,
+        tolerances: np.ndarray,
+        intercept: float = QUALITY_INTERCEPT,
+        grades: tuple = QUALITY_GRADES,
+    ):
+        self.features = list(features)
+        self.targets = targets
+        self.tolerances = tolerances
+        self.intercept = intercept
+        self.grades = tuple(grades)
+
+    @classmethod
+    def default(cls) -> "QualityPredictor":
+        """The predictor of QUALITY_FEATURES"""
+        return cls(
+            list(QUALITY_FEATURES),
+            np.array([target for target, _ in QUALITY_FEATURES.values()]),
+            np.array([tolerance for _, tolerance in QUALITY_FEATURES.values()]),
+        )
+
+    @classmethod
+    def from_artifacts(cls, arrays: dict, params: dict) -> "QualityPredictor":
+        """A predictor from a registry version: targets and tolerances arrays, features and the rest as parameters"""
+        return cls(targets=arrays["targets"], tolerances=arrays["tolerances"], **params)
+
+    def predict(self, records: List[dict]) -> List[dict]:
+        """Pass probability, quality score, grade and main driver of each batch record
+
+        A parameter a record lacks is taken to be on target.
+        """
+        values = np.array(
+            [[np.nan if record.get(name) is None else record[name] for name in self.features] for record in records],
+            dtype=float,
+        )
+        penalty = np.nan_to_num((values - self.targets) / self.tolerances) ** 2 / 2
+        probability = 1 / (1 + np.exp(-(self.intercept - penalty.sum(axis=1))))
+
+        results = []
+        for index, record in enumerate(records):
+            driver = int(penalty[index].argmax())
+            p = float(probability[index])
+            results.append({
+                "batch_id": record.get("batch_id"),
+                "pass_probability": round(p, 4),
+                "quality_score": round(100 * p, 1),
+                "predicted_grade": "A" if p >= self.grades[0] else "B" if p >= self.grades[1] else "C",
+                "main_driver": self.features[driver] if penalty[index, driver] > 0 else None,
+            })
+        return results
+
+    def warm_up(self) -> None:
+        self.predict([{}])
+
+
+register_model("defect_detection", DefectDetector.from_artifacts, DefectDetector, DefectDetector.warm_up)
+register_model(
+    "quality_prediction", QualityPredictor.from_artifacts, QualityPredictor.default, QualityPredictor.warm_up
+)
+
+
+def detect_defects(images: List[np.ndarray]) -> List[dict]:
+    """Defects in images, by the active defect detection model"""
+    return get_model("defect_detection").predict(images)
+
+
+def predict_quality(records: List[dict]) -> List[dict]:
+    """Quality of batch records, by the active quality prediction model"""
+    return get_model("quality_prediction").predict(records)
+
+
+class InspectionService:
+    """Service class for defect detection and quality prediction, through the inference schedulers"""
+
+    async def detect(self, file: BinaryIO, line_id: Optional[str] = None) -> dict:
+        """Defect detection on one uploaded image"""
+        image = read_image(file)
+        result = await get_scheduler("defect_detection", detect_defects).submit(image)
+        return {"line_id": line_id, "height": image.shape[0], "width": image.shape[1], **result}
+
+    async def predict(self, records: List[dict]) -> List[dict]:
+        """Quality predictions of batch records, each queued on its own"""
+        scheduler = get_scheduler("quality_prediction", predict_quality)
+        return list(await asyncio.gather(*(scheduler.submit(record) for record in records)))
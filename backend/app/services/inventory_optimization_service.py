@@ -0,0 +1,523 @@
+"""
+Inventory optimization: ABC/XYZ classes, order quantities, safety stock and reorder points
+
+Per material, weekly consumption (issues in the stock ledger) over the last
+INVENTORY_POLICY_HISTORY_WEEKS complete weeks gives the demand and how much
+it varies, and receipts against purchase orders since then give the lead
+time, from the order's po_date to the day of receipt, and the unit cost paid. Materials
+never received fall back to their master lead_time_days and standard_cost.
+From these, one vectorized pass over every material computes:
+
+- the ABC class by share of the yearly consumption value: the materials
+  making up the first 80% are A, the next 15% B and the rest C
+- the XYZ class by the coefficient of variation of weekly demand: X below
+  0.5, Y below 1 and Z above
+- the economic order quantity sqrt(2 D S / h), for yearly demand D, order
+  cost S and yearly holding cost h of a unit
+- safety stock z sqrt(L var(d) + d^2 var(L)) at the service level of the ABC
+  class, and the reorder point d L plus safety stock, for daily demand d
+  and lead time L in days
+
+The sums the statistics come from are stored per material with its policy.
+Postings to the stock ledger record their materials in
+inventory_policy_changes, and a refresh aggregates the ledger again only
+for those, for new materials, and for all of them once the history window
+has moved on a week; the classes and quantities of every material are then
+recomputed from the stored sums, and only rows that changed are written.
+Refresh with POST /ml/inventory-optimization/recompute or once a night with:
+
+    python -m app.services.inventory_optimization_service [--full]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from scipy.special import ndtri
+from sqlalchemy import Date, case, cast, delete, func, or_, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import get_logger, get_settings
+from app.models.archive import PurchaseOrderArchive
+from app.models.inventory import Material, MovementType, StockBalance, StockMovement
+from app.models.inventory_policy import InventoryPolicy, InventoryPolicyChange
+from app.models.purchase_order import PurchaseOrder
+
+logger = get_logger(__name__)
+
+# Cumulative share of the consumption value up to which materials are A, then B
+ABC_LIMITS = (0.80, 0.95)
+# Coefficient of variation of weekly demand below which materials are X, then Y
+XYZ_LIMITS = (0.5, 1.0)
+# Chance of not running out during a lead time, per ABC class
+SERVICE_LEVELS = {"A": 0.98, "B": 0.95, "C": 0.90}
+
+# Sums kept per material, from which the policy is computed
+STATISTICS = (
+    "demand_weeks",
+    "sum_demand",
+    "sum_squared_demand",
+    "receipts",
+    "sum_lead_time",
+    "sum_squared_lead_time",
+    "received_quantity",
+    "received_value",
+    "on_hand",
+)
+# Columns computed from them
+POLICY_COLUMNS = (
+    "abc_class",
+    "xyz_class",
+    "unit_cost",
+    "annual_demand",
+    "lead_time_days",
+    "economic_order_quantity",
+    "safety_stock",
+    "reorder_point",
+    "recommended_stock",
+    "current_cost",
+    "optimized_cost",
+    "potential_savings",
+)
+
+# Policies written per statement
+WRITE_BATCH_SIZE = 1000
+
+
+def compute_policies(
+    statistics: Dict[str, np.ndarray],
+    standard_cost: np.ndarray,
+    default_lead_time: np.ndarray,
+    order_cost: float,
+    holding_rate: float,
+) -> Dict[str, np.ndarray]:
+    """POLICY_COLUMNS of every material from its STATISTICS, one array each"""
+    weeks = np.maximum(statistics["demand_weeks"], 1)
+    weekly = statistics["sum_demand"] / weeks
+    weekly_variance = np.maximum(statistics["sum_squared_demand"] / weeks - weekly ** 2, 0)
+    daily, daily_variance = weekly / 7, weekly_variance / 7
+    annual_demand = weekly * 52
+
+    receipts = statistics["receipts"]
+    received = statistics["received_quantity"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit_cost = np.where(received > 0, statistics["received_value"] / received, standard_cost)
+        lead_time = np.where(receipts > 0, statistics["sum_lead_time"] / receipts, default_lead_time)
+        lead_time_variance = np.where(
+            receipts > 1, np.maximum(statistics["sum_squared_lead_time"] / receipts - lead_time ** 2, 0), 0
+        )
+        variation = np.where(weekly > 0, np.sqrt(weekly_variance) / weekly, np.inf)
+
+    # ABC by where a material's value starts in the cumulative share, largest first
+    value = annual_demand * unit_cost
+    order = np.argsort(-value, kind="stable")
+    before = np.empty_like(value)
+    before[order] = np.cumsum(value[order]) - value[order]
+    share = before / value.sum() if value.sum() > 0 else np.ones_like(value)
+    abc_index = np.where(value > 0, np.searchsorted(ABC_LIMITS, share, side="right"), 2)
+    abc_class = np.array(list("ABC"))[abc_index]
+    xyz_class = np.array(list("XYZ"))[np.searchsorted(XYZ_LIMITS, variation, side="right")]
+
+    z = ndtri(np.array([SERVICE_LEVELS[name] for name in "ABC"]))[abc_index]
+    holding = holding_rate * unit_cost
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eoq = np.where((annual_demand > 0) & (holding > 0), np.sqrt(2 * annual_demand * order_cost / holding), 0)
+        orders_now = np.where(received > 0, annual_demand * receipts / received, 0)
+        orders_at_eoq = np.where(eoq > 0, annual_demand / eoq, 0)
+    safety_stock = z * np.sqrt(lead_time * daily_variance + daily ** 2 * lead_time_variance)
+    reorder_point = daily * lead_time + safety_stock
+
+    current_cost = holding * np.maximum(statistics["on_hand"], 0) + order_cost * orders_now
+    optimized_cost = holding * (safety_stock + eoq / 2) + order_cost * orders_at_eoq
+    return {
+        "abc_class": abc_class,
+        "xyz_class": xyz_class,
+        "unit_cost": unit_cost,
+        "annual_demand": annual_demand,
+        "lead_time_days": lead_time,
+        "economic_order_quantity": eoq,
+        "safety_stock": safety_stock,
+        "reorder_point": reorder_point,
+        "recommended_stock": safety_stock + eoq,
+        "current_cost": current_cost,
+        "optimized_cost": optimized_cost,
+        "potential_savings": np.maximum(current_cost - optimized_cost, 0),
+    }
+
+
+def _rows_of(ids: np.ndarray, material_ids) -> tuple:
+    """Positions in the sorted ids of those material_ids that are in it, and their own positions"""
+    material_ids = np.asarray(material_ids, dtype=np.int64)
+    at = np.searchsorted(ids, material_ids)
+    found = at < len(ids)
+    found[found] = ids[at[found]] == material_ids[found]
+    return at[found], np.flatnonzero(found)
+
+
+class InventoryOptimizationService:
+    """Service class for inventory policies"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    async def mark_changed(self, material_ids: Iterable[int]) -> None:
+        """Record that these materials had stock movements, for the next refresh to aggregate again"""
+        changed_at = datetime.utcnow()
+        rows = [{"material_id": material_id, "changed_at": changed_at} for material_id in sorted(set(material_ids))]
+        if not rows:
+            return
+        stmt = self._dialect_insert()(InventoryPolicyChange).values(rows)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[InventoryPolicyChange.material_id],
+                set_={"changed_at": stmt.excluded.changed_at},
+            )
+        )
+
+    async def load_statistics(self, end: date, material_ids: Optional[List[int]] = None) -> Dict[str, np.ndarray]:
+        """STATISTICS of the materials over the history weeks before end, a Monday
+
+        Rows follow material_ids, or with None every material with stock
+        movements or balances; "material_id" maps a material id to its row.
+        """
+        weeks = self.settings.INVENTORY_POLICY_HISTORY_WEEKS
+        first_week = datetime.combine(end - timedelta(weeks=weeks), datetime.min.time())
+        last = datetime.combine(end, datetime.min.time())
+
+        def only(column):
+            return true() if material_ids is None else column.in_(material_ids)
+
+        # Consumption per week, then its sum and sum of squares per material
+        week = self._week_start(StockMovement.created_at)
+        weekly = (
+            select(StockMovement.material_id, week.label("week"), func.sum(-StockMovement.quantity).label("quantity"))
+            .where(
+                StockMovement.movement_type == MovementType.ISSUE,
+                StockMovement.created_at >= first_week,
+                StockMovement.created_at < last,
+                only(StockMovement.material_id),
+            )
+            .group_by(StockMovement.material_id, week)
+            .subquery()
+        )
+        demand = await self.session.execute(
+            select(weekly.c.material_id, func.sum(weekly.c.quantity), func.sum(weekly.c.quantity * weekly.c.quantity))
+            .group_by(weekly.c.material_id)
+        )
+
+        # Days from order to receipt of every purchase order line received since the history began
+        orders = union_all(*(
+            select(order.id, order.po_date) for order in (PurchaseOrder, PurchaseOrderArchive)
+        )).subquery()
+        lead_time = self._days_between(orders.c.po_date, StockMovement.created_at)
+        receipts = await self.session.execute(
+            select(
+                StockMovement.material_id,
+                func.count(),
+                func.sum(lead_time),
+                func.sum(lead_time * lead_time),
+                func.sum(StockMovement.quantity),
+                func.sum(StockMovement.quantity * StockMovement.unit_cost),
+            )
+            .join(orders, orders.c.id == StockMovement.reference_id)
+            .where(
+                StockMovement.movement_type == MovementType.RECEIPT,
+                StockMovement.reference_type == "purchase_order",
+                StockMovement.created_at >= first_week,
+                only(StockMovement.material_id),
+            )
+            .group_by(StockMovement.material_id)
+        )
+
+        on_hand = await self.session.execute(
+            select(StockBalance.material_id, func.sum(StockBalance.quantity_on_hand))
+            .where(only(StockBalance.material_id))
+            .group_by(StockBalance.material_id)
+        )
+
+        demand, receipts, on_hand = demand.all(), receipts.all(), on_hand.all()
+        if material_ids is None:
+            material_ids = sorted({row[0] for rows in (demand, receipts, on_hand) for row in rows})
+        position = {material_id: index for index, material_id in enumerate(material_ids)}
+        statistics = {name: np.zeros(len(material_ids)) for name in STATISTICS}
+        statistics["demand_weeks"][:] = weeks
+        for rows, names in (
+            (demand, ("sum_demand", "sum_squared_demand")),
+            (receipts, ("receipts", "sum_lead_time", "sum_squared_lead_time", "received_quantity", "received_value")),
+            (on_hand, ("on_hand",)),
+        ):
+            if not rows:
+                continue
+            columns = list(zip(*rows))
+            at = np.array([position[material_id] for material_id in columns[0]])
+            for name, values in zip(names, columns[1:]):
+                statistics[name][at] = np.array(values, dtype=float)
+        statistics["material_id"] = np.array(material_ids, dtype=np.int64)
+        return statistics
+
+    async def refresh(self, full: bool = False) -> dict:
+        """Recompute the policy of every active material
+
+        Aggregates the ledger again for materials with changes or without a
+        current policy, or for all with full, and reuses the stored sums of
+        the rest.
+        """
+        started = time.perf_counter()
+        computed_at = datetime.utcnow()
+        today = computed_at.date()
+        end = today - timedelta(days=today.weekday())
+
+        result = await self.session.execute(
+            select(Material.id, Material.material_code, Material.name, Material.standard_cost, Material.lead_time_days)
+            .where(Material.is_active.is_(True))
+            .order_by(Material.id)
+        )
+        materials = result.all()
+        ids = np.array([row[0] for row in materials], dtype=np.int64)
+        labels = np.array([f"{row[1]}|{row[2]}|" for row in materials], dtype=object)
+
+        result = await self.session.execute(
+            select(
+                InventoryPolicy.material_id,
+                InventoryPolicy.history_end,
+                InventoryPolicy.material_code + "|" + InventoryPolicy.material_name + "|"
+                + InventoryPolicy.abc_class + InventoryPolicy.xyz_class,
+                *(getattr(InventoryPolicy, name) for name in STATISTICS + POLICY_COLUMNS),
+            )
+        )
+        stored = dict(zip(("material_id", "history_end", "label") + STATISTICS + POLICY_COLUMNS, zip(*result.all())))
+        result = await self.session.execute(
+            select(InventoryPolicyChange.material_id).where(InventoryPolicyChange.changed_at <= computed_at)
+        )
+        changed = list(result.scalars())
+
+        # Stored sums and policies, in the rows of the active materials
+        statistics = {name: np.zeros(len(ids)) for name in STATISTICS}
+        previous = {name: np.full(len(ids), np.nan) for name in POLICY_COLUMNS[2:]}
+        previous_labels = np.full(len(ids), None, dtype=object)
+        current = np.zeros(len(ids), dtype=bool)
+        at, rows = _rows_of(ids, stored.get("material_id", ()))
+        if len(at):
+            for name in STATISTICS:
+                statistics[name][at] = np.array(stored[name], dtype=float)[rows]
+            for name in previous:
+                previous[name][at] = np.array(stored[name], dtype=float)[rows]
+            previous_labels[at] = np.array(stored["label"], dtype=object)[rows]
+            current[at] = np.array(stored["history_end"], dtype=object)[rows] >= end
+
+        # Aggregated again: changed, new, or a week behind; with a long list, a query over everything is cheaper
+        refresh = full | ~current | np.isin(ids, changed)
+        refresh_ids = ids[refresh].tolist()
+        if refresh_ids:
+            fresh = await self.load_statistics(end, refresh_ids if len(refresh_ids) <= len(ids) // 2 else None)
+            for name in STATISTICS:
+                statistics[name][refresh] = 0
+            statistics["demand_weeks"][refresh] = self.settings.INVENTORY_POLICY_HISTORY_WEEKS
+            at, rows = _rows_of(ids, fresh["material_id"])
+            rows, at = rows[refresh[at]], at[refresh[at]]
+            for name in STATISTICS:
+                statistics[name][at] = fresh[name][rows]
+        loaded = time.perf_counter()
+
+        # In a thread, so the event loop keeps serving requests meanwhile
+        policies = await asyncio.to_thread(
+            compute_policies,
+            statistics,
+            np.array([row[3] for row in materials], dtype=float),
+            np.array([row[4] for row in materials], dtype=float),
+            self.settings.INVENTORY_ORDER_COST,
+            self.settings.INVENTORY_HOLDING_RATE,
+        )
+        # Write only materials aggregated again or whose policy moved
+        moved = refresh.copy()
+        for name, values in previous.items():
+            moved |= ~np.isclose(policies[name], values, rtol=1e-9, atol=1e-9)
+        moved |= previous_labels != labels + np.char.add(policies["abc_class"], policies["xyz_class"]).astype(object)
+        write = np.flatnonzero(moved)
+        computing = time.perf_counter()
+
+        await self._write(materials, write, statistics, policies, end, computed_at)
+        # Materials deleted or made inactive
+        active = select(Material.id).where(Material.is_active.is_(True))
+        result = await self.session.execute(delete(InventoryPolicy).where(InventoryPolicy.material_id.not_in(active)))
+        removed = result.rowcount
+        await self.session.execute(delete(InventoryPolicyChange).where(InventoryPolicyChange.changed_at <= computed_at))
+        await self.session.commit()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        below = int((statistics["on_hand"] < policies["reorder_point"]).sum())
+        logger.info(
+            "Inventory policies computed: %s materials, %s aggregated again, %s written in %.0fms",
+            len(ids), len(refresh_ids), len(write), elapsed_ms,
+        )
+        return {
+            "full": full,
+            "materials": len(ids),
+            "aggregated": len(refresh_ids),
+            "reused": len(ids) - len(refresh_ids),
+            "written": len(write),
+            "removed": removed,
+            "below_reorder_point": below,
+            "history_end": end,
+            "load_ms": round((loaded - started) * 1000, 1),
+            "compute_ms": round((computing - loaded) * 1000, 1),
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
+
+    async def _write(self, materials, write, statistics, policies, end: date, computed_at: datetime) -> None:
+        """Upsert the policies of the materials at the indexes write, WRITE_BATCH_SIZE per statement"""
+        insert_ = self._dialect_insert()
+        rows = [
+            {
+                "material_id": materials[index][0],
+                "material_code": materials[index][1],
+                "material_name": materials[index][2],
+                "history_end": end,
+                **{name: int(statistics[name][index]) for name in ("demand_weeks", "receipts")},
+                **{
+                    name: float(statistics[name][index])
+                    for name in STATISTICS if name not in ("demand_weeks", "receipts")
+                },
+                **{name: str(policies[name][index]) for name in ("abc_class", "xyz_class")},
+                **{name: float(policies[name][index]) for name in POLICY_COLUMNS[2:]},
+                "computed_at": computed_at,
+            }
+            for index in write
+        ]
+        for offset in range(0, len(rows), WRITE_BATCH_SIZE):
+            stmt = insert_(InventoryPolicy).values(rows[offset:offset + WRITE_BATCH_SIZE])
+            columns = set(rows[0]) - {"material_id"}
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[InventoryPolicy.material_id],
+                set_={**{name: stmt.excluded[name] for name in columns}, "updated_at": func.now()},
+            )
+            await self.session.execute(stmt)
+
+    async def get_policies(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        search: Optional[str] = None,
+        abc_class: Optional[str] = None,
+        xyz_class: Optional[str] = None,
+        below_reorder_point: bool = False,
+        order_by: str = "savings",
+    ) -> tuple[List[InventoryPolicy], int]:
+        """Get the policies, by potential savings or, with order_by "reorder", by stock left over the reorder point"""
+        query = select(InventoryPolicy)
+        if search:
+            pattern = f"%{search}%"
+            query = query.where(
+                or_(InventoryPolicy.material_code.ilike(pattern), InventoryPolicy.material_name.ilike(pattern))
+            )
+        if abc_class:
+            query = query.where(InventoryPolicy.abc_class == abc_class.upper())
+        if xyz_class:
+            query = query.where(InventoryPolicy.xyz_class == xyz_class.upper())
+        if below_reorder_point:
+            query = query.where(InventoryPolicy.on_hand < InventoryPolicy.reorder_point)
+
+        count_result = await self.session.execute(select(func.count()).select_from(query.subquery()))
+        total = count_result.scalar_one()
+
+        if order_by == "reorder":
+            order = (InventoryPolicy.on_hand - InventoryPolicy.reorder_point, InventoryPolicy.material_code)
+        else:
+            order = (InventoryPolicy.potential_savings.desc(), InventoryPolicy.material_code)
+        result = await self.session.execute(query.order_by(*order).offset(skip).limit(limit))
+        return result.scalars().all(), total
+
+    async def get_abc_analysis(self) -> dict:
+        """Materials and consumption value per ABC class, and materials per ABC and XYZ class"""
+        value = InventoryPolicy.annual_demand * InventoryPolicy.unit_cost
+        result = await self.session.execute(
+            select(
+                InventoryPolicy.abc_class,
+                InventoryPolicy.xyz_class,
+                func.count(),
+                func.sum(value),
+                func.max(InventoryPolicy.computed_at),
+            ).group_by(InventoryPolicy.abc_class, InventoryPolicy.xyz_class)
+        )
+        rows = result.all()
+        total_value = sum(row[3] or 0 for row in rows)
+        classes = []
+        for abc_class in "ABC":
+            materials = sum(row[2] for row in rows if row[0] == abc_class)
+            class_value = sum(row[3] or 0 for row in rows if row[0] == abc_class)
+            classes.append({
+                "abc_class": abc_class,
+                "materials": materials,
+                "value": round(class_value, 2),
+                "value_percentage": round(100 * class_value / total_value, 2) if total_value else 0.0,
+            })
+        return {
+            "materials": sum(row[2] for row in rows),
+            "total_value": round(total_value, 2),
+            "classes": classes,
+            "matrix": {abc + xyz: 0 for abc in "ABC" for xyz in "XYZ"} | {row[0] + row[1]: row[2] for row in rows},
+            "computed_at": max((row[4] for row in rows), default=None),
+        }
+
+    async def get_cost_savings(self) -> dict:
+        """Yearly holding and ordering cost at the current stock and at the computed policies"""
+        result = await self.session.execute(
+            select(
+                func.count(),
+                func.sum(InventoryPolicy.current_cost),
+                func.sum(InventoryPolicy.optimized_cost),
+                func.sum(InventoryPolicy.potential_savings),
+                func.sum(case((InventoryPolicy.on_hand < InventoryPolicy.reorder_point, 1), else_=0)),
+                func.max(InventoryPolicy.computed_at),
+            )
+        )
+        materials, current, optimized, savings, below, computed_at = result.one()
+        current, optimized, savings = current or 0.0, optimized or 0.0, savings or 0.0
+        return {
+            "materials": materials,
+            "below_reorder_point": below or 0,
+            "current_inventory_cost": round(current, 2),
+            "optimized_inventory_cost": round(optimized, 2),
+            "potential_savings": round(savings, 2),
+            "savings_percentage": round(100 * savings / current, 2) if current else 0.0,
+            "computed_at": computed_at,
+        }
+
+    def _week_start(self, column):
+        """Monday of the week of a date or timestamp column, in the bound database's dialect"""
+        if self.session.get_bind().dialect.name == "postgresql":
+            return func.date_trunc("week", column)
+        return func.date(column, "weekday 0", "-6 days")
+
+    def _days_between(self, start, end):
+        """Days from the date start to the day of the timestamp end, in the bound database's dialect"""
+        if self.session.get_bind().dialect.name == "postgresql":
+            return cast(end, Date) - start
+        return func.julianday(func.date(end)) - func.julianday(start)
+
+    def _dialect_insert(self):
+        """INSERT construct with ON CONFLICT support for the bound database"""
+        if self.session.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert
+
+
+async def run_refresh(full: bool = False) -> dict:
+    """Refresh the inventory policies once"""
+    from app.db import get_sessionmaker
+
+    async with get_sessionmaker()() as session:
+        return await InventoryOptimizationService(session).refresh(full=full)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the reorder points and safety stock of every material")
+    parser.add_argument("--full", action="store_true", help="aggregate the ledger for every material")
+    args = parser.parse_args()
+    print(asyncio.run(run_refresh(full=args.full)))
@@ -0,0 +1,538 @@
+"""
+Inventory service: material master, stock ledger postings and on-hand balances
+
+Every posting appends to the stock_movements ledger and applies the same
+quantities to stock_balances in one transaction, with an atomic
+``on_hand = on_hand + delta`` upsert, so balance reads never aggregate the
+ledger. rebuild_balances and check_consistency recompute balances from the
+ledger one chunk of materials at a time for repair and auditing. Postings
+also mark their materials for the next inventory policy refresh.
+"""
+
+import argparse
+import asyncio
+import json
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, delete, desc, func, insert, or_, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import ConflictException, NotFoundException, ValidationException, get_logger, get_settings
+from app.models.inventory import Material, MovementType, StockBalance, StockMovement
+from app.schemas import (
+    CreateMaterialRequest,
+    StockMovementRequest,
+    UpdateMaterialRequest,
+)
+from app.services.inventory_optimization_service import InventoryOptimizationService
+
+logger = get_logger(__name__)
+
+# Differences smaller than this are float rounding, not inconsistencies
+QUANTITY_TOLERANCE = 1e-6
+
+# Key of a balance row
+BalanceKey = Tuple[int, str]
+
+
+class InventoryService:
+    """Service class for inventory operations"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    # ----- Materials -----
+
+    async def create_material(self, request: CreateMaterialRequest) -> Material:
+        """Create a new material"""
+        existing = await self.session.execute(
+            select(Material.id).where(Material.material_code == request.material_code)
+        )
+        if existing.first():
+            raise ConflictException(f"Material {request.material_code} already exists")
+
+        material = Material(**request.model_dump())
+        self.session.add(material)
+        await self.session.commit()
+
+        material.quantity_on_hand = 0
+        return material
+
+    async def get_material(self, material_id: int) -> Material:
+        """Get material by ID with its on-hand quantity across warehouses"""
+        on_hand = self._on_hand_by_material()
+        result = await self.session.execute(
+            select(Material, func.coalesce(on_hand.c.quantity_on_hand, 0))
+            .outerjoin(on_hand, on_hand.c.material_id == Material.id)
+            .where(Material.id == material_id)
+        )
+        row = result.first()
+        if not row:
+            raise NotFoundException("Material not found")
+
+        material, on_hand_quantity = row
+        material.quantity_on_hand = on_hand_quantity
+        return material
+
+    async def get_all_materials(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        search: Optional[str] = None,
+        category: Optional[str] = None,
+        below_reorder: bool = False,
+    ) -> tuple[List[Material], int]:
+        """Get materials with their on-hand quantities"""
+        on_hand = self._on_hand_by_material()
+        quantity = func.coalesce(on_hand.c.quantity_on_hand, 0)
+        query = select(Material, quantity).outerjoin(on_hand, on_hand.c.material_id == Material.id)
+
+        if search:
+            pattern = f"%{search}%"
+            query = query.where(or_(Material.material_code.ilike(pattern), Material.name.ilike(pattern)))
+        if category:
+            query = query.where(Material.category == category)
+        if below_reorder:
+            query = query.where(quantity < Material.reorder_level)
+
+        count_result = await self.session.execute(select(func.count()).select_from(query.subquery()))
+        total = count_result.scalar_one()
+
+        result = await self.session.execute(
+            query.order_by(Material.material_code).offset(skip).limit(limit)
+        )
+        materials = []
+        for material, on_hand_quantity in result.all():
+            material.quantity_on_hand = on_hand_quantity
+            materials.append(material)
+
+        return materials, total
+
+    async def update_material(self, material_id: int, request: UpdateMaterialRequest) -> Material:
+        """Update material"""
+        material = await self.get_material(material_id)
+
+        for field, value in request.model_dump(exclude_unset=True).items():
+            if value is not None:
+                setattr(material, field, value)
+
+        await self.session.commit()
+
+        return material
+
+    async def get_materials_by_code(self, codes: Iterable[str]) -> Dict[str, Material]:
+        """Look up materials by code, failing if any code is unknown"""
+        codes = set(codes)
+        materials = await self._materials_by_code(codes)
+        missing = codes - materials.keys()
+        if missing:
+            raise NotFoundException(f"Unknown material codes: {', '.join(sorted(missing))}")
+        return materials
+
+    async def _materials_by_code(self, codes: Iterable[str]) -> Dict[str, Material]:
+        codes = set(codes)
+        if not codes:
+            return {}
+        result = await self.session.execute(select(Material).where(Material.material_code.in_(codes)))
+        return {material.material_code: material for material in result.scalars()}
+
+    def _on_hand_by_material(self):
+        """On-hand quantity per material, summed over its warehouse balances"""
+        return (
+            select(
+                StockBalance.material_id,
+                func.sum(StockBalance.quantity_on_hand).label("quantity_on_hand"),
+            )
+            .group_by(StockBalance.material_id)
+            .subquery()
+        )
+
+    # ----- Balances and movements -----
+
+    async def get_balances(
+        self,
+        material_id: Optional[int] = None,
+        warehouse_code: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> tuple[List[StockBalance], int]:
+        """Get on-hand balances per material and warehouse"""
+        query = select(StockBalance)
+        if material_id is not None:
+            query = query.where(StockBalance.material_id == material_id)
+        if warehouse_code:
+            query = query.where(StockBalance.warehouse_code == warehouse_code)
+
+        count_result = await self.session.execute(select(func.count()).select_from(query.subquery()))
+        total = count_result.scalar_one()
+
+        result = await self.session.execute(
+            query.order_by(StockBalance.material_id, StockBalance.warehouse_code)
+            .offset(skip)
+            .limit(limit)
+        )
+        return result.scalars().all(), total
+
+    async def get_movements(
+        self,
+        material_id: Optional[int] = None,
+        warehouse_code: Optional[str] = None,
+        reference_type: Optional[str] = None,
+        reference_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> tuple[List[StockMovement], int]:
+        """Get ledger entries, newest first"""
+        query = select(StockMovement)
+        if material_id is not None:
+            query = query.where(StockMovement.material_id == material_id)
+        if warehouse_code:
+            query = query.where(StockMovement.warehouse_code == warehouse_code)
+        if reference_type:
+            query = query.where(StockMovement.reference_type == reference_type)
+        if reference_id is not None:
+            query = query.where(StockMovement.reference_id == reference_id)
+
+        count_result = await self.session.execute(select(func.count()).select_from(query.subquery()))
+        total = count_result.scalar_one()
+
+        result = await self.session.execute(
+            query.order_by(desc(StockMovement.id)).offset(skip).limit(limit)
+        )
+        return result.scalars().all(), total
+
+    async def create_movement(self, request: StockMovementRequest, user_id: int = None) -> StockMovement:
+        """Post a manual receipt, issue or adjustment"""
+        try:
+            movement_type = MovementType(request.movement_type)
+        except ValueError:
+            raise ValidationException(f"Invalid movement type: {request.movement_type}")
+
+        if movement_type == MovementType.ADJUSTMENT:
+            if request.quantity == 0:
+                raise ValidationException("Adjustment quantity must not be zero")
+            quantity = request.quantity
+        elif request.quantity <= 0:
+            raise ValidationException("Quantity must be positive")
+        else:
+            quantity = request.quantity if movement_type == MovementType.RECEIPT else -request.quantity
+
+        material = await self.session.get(Material, request.material_id)
+        if not material:
+            raise NotFoundException("Material not found")
+
+        movement = StockMovement(
+            material_id=material.id,
+            warehouse_code=request.warehouse_code or self.settings.INVENTORY_DEFAULT_WAREHOUSE,
+            movement_type=movement_type,
+            quantity=quantity,
+            unit_cost=request.unit_cost,
+            reference_type="manual",
+            notes=request.notes,
+            created_by=user_id,
+        )
+        await self.post_movements([movement])
+        await self.session.commit()
+
+        return movement
+
+    async def post_movements(self, movements: List[StockMovement]) -> List[StockMovement]:
+        """Append movements to the ledger and apply them to the balances
+
+        Does not commit, so a posting is part of the caller's transaction
+        together with the document change that caused it.
+        """
+        if not movements:
+            return movements
+
+        deltas: Dict[BalanceKey, float] = defaultdict(float)
+        for movement in movements:
+            deltas[(movement.material_id, movement.warehouse_code)] += movement.quantity
+
+        if not self.settings.INVENTORY_ALLOW_NEGATIVE_STOCK:
+            await self._check_available(deltas)
+
+        self.session.add_all(movements)
+        await self.session.flush()
+
+        last_ids: Dict[BalanceKey, int] = {}
+        for movement in movements:
+            key = (movement.material_id, movement.warehouse_code)
+            last_ids[key] = max(last_ids.get(key, 0), movement.id)
+
+        await self._apply_to_balances(deltas, last_ids)
+        # Consumption, receipts and stock changed: the materials' reorder points are due again
+        await InventoryOptimizationService(self.session).mark_changed(material_id for material_id, _ in deltas)
+        return movements
+
+    async def _check_available(self, deltas: Dict[BalanceKey, float]) -> None:
+        """Fail if any decrease would take a balance below zero
+
+        The balance rows are locked until the end of the transaction, so two
+        concurrent issues cannot both spend the same stock.
+        """
+        keys = sorted(key for key, delta in deltas.items() if delta < 0)
+        if not keys:
+            return
+
+        result = await self.session.execute(
+            select(StockBalance.material_id, StockBalance.warehouse_code, StockBalance.quantity_on_hand)
+            .where(tuple_(StockBalance.material_id, StockBalance.warehouse_code).in_(keys))
+            .order_by(StockBalance.material_id, StockBalance.warehouse_code)
+            .with_for_update()
+        )
+        on_hand = {(row.material_id, row.warehouse_code): row.quantity_on_hand for row in result}
+
+        for key in keys:
+            available = on_hand.get(key, 0)
+            if available + deltas[key] < -QUANTITY_TOLERANCE:
+                material_id, warehouse_code = key
+                raise ValidationException(
+                    f"Insufficient stock of material {material_id} in {warehouse_code}: "
+                    f"{available:g} on hand, {-deltas[key]:g} required"
+                )
+
+    async def _apply_to_balances(self, deltas: Dict[BalanceKey, float], last_ids: Dict[BalanceKey, int]) -> None:
+        """Add the deltas to the balances with one upsert"""
+        insert_ = self._dialect_insert()
+        # Sorted so concurrent postings lock balance rows in the same order
+        stmt = insert_(StockBalance).values(
+            [
+                {
+                    "material_id": material_id,
+                    "warehouse_code": warehouse_code,
+                    "quantity_on_hand": deltas[(material_id, warehouse_code)],
+                    "last_movement_id": last_ids[(material_id, warehouse_code)],
+                }
+                for material_id, warehouse_code in sorted(deltas)
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StockBalance.material_id, StockBalance.warehouse_code],
+            set_={
+                "quantity_on_hand": StockBalance.quantity_on_hand + stmt.excluded.quantity_on_hand,
+                # Transactions can commit out of id order, so keep the highest
+                "last_movement_id": case(
+                    (
+                        func.coalesce(StockBalance.last_movement_id, 0) > stmt.excluded.last_movement_id,
+                        StockBalance.last_movement_id,
+                    ),
+                    else_=stmt.excluded.last_movement_id,
+                ),
+                "updated_at": func.now(),
+            },
+        )
+        await self.session.execute(stmt)
+
+    def _dialect_insert(self):
+        """INSERT construct with ON CONFLICT support for the bound database"""
+        if self.session.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert
+
+    # ----- Postings from documents -----
+
+    async def post_purchase_order_receipt(self, po) -> List[StockMovement]:
+        """Receive the line items of a purchase order into the default warehouse
+
+        Materials are created from the line items' codes if they are not in
+        the master yet. Lines that were already received are skipped.
+        """
+        posted = await self._posted_lines("purchase_order", po.id)
+        items = [item for item in po.line_items if item.id not in posted]
+        if not items:
+            return []
+
+        materials = await self._materials_by_code(item.material_code for item in items)
+        for item in items:
+            if item.material_code not in materials:
+                material = Material(
+                    material_code=item.material_code,
+                    name=item.material_name,
+                    standard_cost=item.unit_price,
+                )
+                self.session.add(material)
+                materials[item.material_code] = material
+        await self.session.flush()
+
+        warehouse_code = self.settings.INVENTORY_DEFAULT_WAREHOUSE
+        movements = [
+            StockMovement(
+                material_id=materials[item.material_code].id,
+                warehouse_code=warehouse_code,
+                movement_type=MovementType.RECEIPT,
+                quantity=item.quantity,
+                unit_cost=item.unit_price,
+                reference_type="purchase_order",
+                reference_id=po.id,
+                reference_line_id=item.id,
+                created_by=po.created_by,
+            )
+            for item in items
+        ]
+        logger.info("Receiving %s lines of purchase order %s", len(movements), po.po_number)
+        return await self.post_movements(movements)
+
+    async def post_work_order_issue(self, wo) -> List[StockMovement]:
+        """Issue the materials of a work order; lines already issued are skipped"""
+        posted = await self._posted_lines("work_order", wo.id)
+        movements = [
+            StockMovement(
+                material_id=line.material_id,
+                warehouse_code=line.warehouse_code,
+                movement_type=MovementType.ISSUE,
+                quantity=-line.quantity,
+                reference_type="work_order",
+                reference_id=wo.id,
+                reference_line_id=line.id,
+                created_by=wo.created_by,
+            )
+            for line in wo.materials
+            if line.id not in posted
+        ]
+        if movements:
+            logger.info("Issuing %s materials to work order %s", len(movements), wo.wo_number)
+        return await self.post_movements(movements)
+
+    async def _posted_lines(self, reference_type: str, reference_id: int) -> set:
+        """Ids of the document lines that already have a movement"""
+        result = await self.session.execute(
+            select(StockMovement.reference_line_id).where(
+                StockMovement.reference_type == reference_type,
+                StockMovement.reference_id == reference_id,
+            )
+        )
+        return set(result.scalars())
+
+    # ----- Rebuild and consistency check -----
+
+    async def rebuild_balances(self, chunk_size: Optional[int] = None) -> Dict[str, int]:
+        """Recompute every balance from the ledger, one chunk of materials at a time
+
+        Runs in a single transaction that blocks postings (not reads) until
+        it commits, so no movement can land between the chunks.
+        """
+        chunk_size = chunk_size or self.settings.INVENTORY_CHUNK_SIZE
+
+        if self.session.get_bind().dialect.name == "postgresql":
+            await self.session.execute(text("LOCK TABLE stock_balances IN SHARE ROW EXCLUSIVE MODE"))
+        await self.session.execute(delete(StockBalance))
+
+        materials = balances = 0
+        async for first_id, last_id, count in material_chunks(self.session, chunk_size):
+            result = await self.session.execute(
+                insert(StockBalance).from_select(
+                    ["material_id", "warehouse_code", "quantity_on_hand", "last_movement_id"],
+                    select(
+                        StockMovement.material_id,
+                        StockMovement.warehouse_code,
+                        func.sum(StockMovement.quantity),
+                        func.max(StockMovement.id),
+                    )
+                    .where(StockMovement.material_id.between(first_id, last_id))
+                    .group_by(StockMovement.material_id, StockMovement.warehouse_code),
+                )
+            )
+            materials += count
+            balances += result.rowcount
+
+        await self.session.commit()
+        logger.info("Rebuilt %s stock balances for %s materials", balances, materials)
+
+        return {"materials": materials, "balances": balances}
+
+    async def check_consistency(self, chunk_size: Optional[int] = None) -> dict:
+        """Compare every balance with the sum of its ledger, one chunk of materials at a time
+
+        Each chunk is compared in a single statement, which sees a consistent
+        snapshot of both tables, so postings running concurrently are never
+        reported as mismatches.
+        """
+        chunk_size = chunk_size or self.settings.INVENTORY_CHUNK_SIZE
+        materials = balances = 0
+        mismatches = []
+
+        async for first_id, last_id, count in material_chunks(self.session, chunk_size):
+            ledger = (
+                select(
+                    StockMovement.material_id,
+                    StockMovement.warehouse_code,
+                    func.sum(StockMovement.quantity).label("quantity"),
+                )
+                .where(StockMovement.material_id.between(first_id, last_id))
+                .group_by(StockMovement.material_id, StockMovement.warehouse_code)
+                .subquery()
+            )
+            balance = (
+                select(
+                    StockBalance.material_id,
+                    StockBalance.warehouse_code,
+                    StockBalance.quantity_on_hand.label("quantity"),
+                )
+                .where(StockBalance.material_id.between(first_id, last_id))
+                .subquery()
+            )
+            result = await self.session.execute(
+                select(
+                    func.coalesce(ledger.c.material_id, balance.c.material_id).label("material_id"),
+                    func.coalesce(ledger.c.warehouse_code, balance.c.warehouse_code).label("warehouse_code"),
+                    func.coalesce(ledger.c.quantity, 0).label("ledger_quantity"),
+                    func.coalesce(balance.c.quantity, 0).label("balance_quantity"),
+                ).select_from(
+                    ledger.join(
+                        balance,
+                        and_(
+                            ledger.c.material_id == balance.c.material_id,
+                            ledger.c.warehouse_code == balance.c.warehouse_code,
+                        ),
+                        full=True,
+                    )
+                )
+            )
+            for row in result:
+                balances += 1
+                if abs(row.ledger_quantity - row.balance_quantity) > QUANTITY_TOLERANCE:
+                    mismatches.append(dict(row._mapping))
+            materials += count
+
+        if mismatches:
+            logger.warning("Stock balance check found %s mismatches", len(mismatches))
+
+        return {"materials_checked": materials, "balances_checked": balances, "mismatches": mismatches}
+
+
+async def material_chunks(session: AsyncSession, chunk_size: int) -> AsyncIterator[Tuple[int, int, int]]:
+    """Yield (first id, last id, count) for consecutive chunks of materials"""
+    last_id = 0
+    while True:
+        result = await session.execute(
+            select(Material.id).where(Material.id > last_id).order_by(Material.id).limit(chunk_size)
+        )
+        ids = result.scalars().all()
+        if not ids:
+            return
+        yield ids[0], ids[-1], len(ids)
+        last_id = ids[-1]
+
+
+async def run_inventory_job(job: str, chunk_size: Optional[int] = None) -> dict:
+    """Run the balance rebuild or the consistency check once"""
+    from app.db import get_sessionmaker
+
+    async with get_sessionmaker()() as session:
+        service = InventoryService(session)
+        if job == "rebuild":
+            return await service.rebuild_balances(chunk_size)
+        return await service.check_consistency(chunk_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or check stock balances against the ledger")
+    parser.add_argument("job", choices=["check", "rebuild"])
+    parser.add_argument("--chunk-size", type=int, default=None, help="materials per chunk")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run_inventory_job(args.job, args.chunk_size)), indent=2))
@@ -0,0 +1,527 @@
+"""
+Background jobs
+
+Work too long for a request (retraining, refreshes, MRP runs) is enqueued
+as a row of the jobs table and run by job workers: one in each API process
+unless JOB_WORKER_ENABLED is off, and any number on their own with
+
+    python -m app.services.job_service
+
+A worker claims the due queued job of highest priority with one statement,
+
+    UPDATE jobs SET status = 'RUNNING', ... WHERE id = (
+        SELECT id FROM jobs WHERE status = 'QUEUED' AND run_after <= now
+        ORDER BY priority DESC, id LIMIT 1 FOR UPDATE SKIP LOCKED
+    ) RETURNING ...
+
+so on PostgreSQL concurrent workers pass over each other's locked rows
+instead of waiting on them. SQLite renders no FOR UPDATE; it takes one
+writer at a time, which makes the statement atomic there as it stands.
+A worker runs at most JOB_CONCURRENCY jobs of each type at once, and only
+claims types below their limit.
+
+Handlers report progress through their JobContext, which is where a
+requested cancellation interrupts them; a heartbeat does the same for
+handlers that report rarely. A failed job is retried after
+JOB_RETRY_DELAY_SECONDS, doubling with each attempt, until max_attempts,
+and a job whose worker stops writing its heartbeat is requeued after
+JOB_STALE_SECONDS. Jobs enqueued with a dedup_key are not enqueued again
+while one with the same key is queued or running.
+
+Workers are asyncio tasks, and handlers run on the worker's event loop,
+which in an API process also serves requests. The services they call keep
+their CPU-bound steps off it: forecasts are fitted in a process pool, and
+inventory policies, supplier risk scores and MRP plans are computed in a
+thread.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import ConflictException, NotFoundException, ValidationException, get_logger, get_settings
+from app.db import dispose_engine, get_sessionmaker
+from app.models.job import ACTIVE_CONDITION, ACTIVE_STATUSES, Job, JobStatus
+from app.services.forecasting_service import ForecastingService, shutdown_forecast_pool
+from app.services.inventory_optimization_service import InventoryOptimizationService
+from app.services.mrp_service import MRPService
+from app.services.supplier_risk_service import SupplierRiskService
+
+logger = get_logger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised in a handler once cancellation of its job is requested"""
+
+
+class JobContext:
+    """What a handler knows of its job, and how it reports progress"""
+
+    def __init__(self, job_id: int, params: dict, attempt: int, worker_id: str):
+        self.job_id = job_id
+        self.params = params
+        self.attempt = attempt
+        self.worker_id = worker_id
+        self.cancel_requested = False
+
+    async def report(self, progress: float, message: Optional[str] = None) -> None:
+        """Record progress from 0 to 1; raises JobCancelled once the job's cancellation is requested"""
+        async with get_sessionmaker()() as session:
+            result = await session.execute(
+                update(Job)
+                .where(Job.id == self.job_id, Job.worker_id == self.worker_id)
+                .values(
+                    progress=min(max(progress, 0.0), 1.0),
+                    progress_message=message,
+                    heartbeat_at=datetime.utcnow(),
+                )
+                .returning(Job.cancel_requested)
+            )
+            cancel_requested = result.scalar()
+            await session.commit()
+        # None: the job was requeued as stale and belongs to another worker now
+        if cancel_requested is not False:
+            self.cancel_requested = True
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[dict]]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(job_type: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the decorated coroutine function as the handler of job_type; what it returns is the job's result"""
+
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[job_type] = handler
+        return handler
+
+    return register
+
+
+def job_types() -> List[str]:
+    """The job types with a registered handler"""
+    return sorted(_handlers)
+
+
+class JobService:
+    """Enqueueing, reading and cancelling jobs"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    async def enqueue(
+        self,
+        job_type: str,
+        params: Optional[dict] = None,
+        priority: int = 0,
+        dedup_key: Optional[str] = None,
+        max_attempts: int = 3,
+        run_after: Optional[datetime] = None,
+        created_by: Optional[int] = None,
+    ) -> Tuple[Job, bool]:
+        """Queue a job; with a dedup_key already queued or running, that job instead. True if queued"""
+        if job_type not in _handlers:
+            raise ValidationException(f"Unknown job type: {job_type}")
+
+        stmt = self._dialect_insert()(Job).values(
+            job_type=job_type,
+            params=jsonable_encoder(params or {}),
+            status=JobStatus.QUEUED,
+            priority=priority,
+            dedup_key=dedup_key,
+            max_attempts=max_attempts,
+            run_after=run_after or datetime.utcnow(),
+            created_by=created_by,
+        )
+        if dedup_key:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["dedup_key"], index_where=ACTIVE_CONDITION)
+        job_id = (await self.session.execute(stmt.returning(Job.id))).scalar()
+        await self.session.commit()
+        if job_id is not None:
+            return await self.get_job(job_id), True
+
+        result = await self.session.execute(
+            select(Job).where(Job.dedup_key == dedup_key, Job.status.in_(ACTIVE_STATUSES))
+        )
+        job = result.scalar_one_or_none()
+        if job is None:
+            # Finished between the insert and the read: the key is free again
+            return await self.enqueue(job_type, params, priority, dedup_key, max_attempts, run_after, created_by)
+        return job, False
+
+    async def get_job(self, job_id: int) -> Job:
+        """Get a job by ID"""
+        result = await self.session.execute(select(Job).where(Job.id == job_id))
+        job = result.scalar_one_or_none()
+        if not job:
+            raise NotFoundException(f"Job {job_id} not found")
+        return job
+
+    async def get_jobs(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        status: Optional[JobStatus] = None,
+        job_type: Optional[str] = None,
+    ) -> tuple[List[Job], int]:
+        """Get jobs, newest first"""
+        query = select(Job)
+        if status:
+            query = query.where(Job.status == status)
+        if job_type:
+            query = query.where(Job.job_type == job_type)
+
+        count_result = await self.session.execute(select(func.count()).select_from(query.subquery()))
+        total = count_result.scalar_one()
+
+        result = await self.session.execute(query.order_by(Job.id.desc()).offset(skip).limit(limit))
+        return result.scalars().all(), total
+
+    async def cancel(self, job_id: int) -> Job:
+        """Cancel a queued job, or ask the worker running it to stop"""
+        cancel_queued = (
+            update(Job)
+            .where(Job.id == job_id, Job.status == JobStatus.QUEUED)
+            .values(status=JobStatus.CANCELLED, cancel_requested=True, finished_at=datetime.utcnow())
+        )
+        cancel_running = (
+            update(Job).where(Job.id == job_id, Job.status == JobStatus.RUNNING).values(cancel_requested=True)
+        )
+        for stmt in (cancel_queued, cancel_running):
+            result = await self.session.execute(
+                stmt.returning(Job).execution_options(populate_existing=True, synchronize_session=False)
+            )
+            job = result.scalar_one_or_none()
+            if job:
+                await self.session.commit()
+                return job
+        await self.get_job(job_id)
+        raise ConflictException(f"Job {job_id} has already finished")
+
+    def _dialect_insert(self):
+        """INSERT construct with ON CONFLICT support for the bound database"""
+        if self.session.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert
+
+
+class JobWorker:
+    """Claims jobs and runs their handlers, within the per-type concurrency limits"""
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        job_types: Optional[List[str]] = None,
+        concurrency: Optional[Dict[str, int]] = None,
+        retry_delay_seconds: Optional[float] = None,
+    ):
+        self.settings = get_settings()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        # Job types this worker runs; every registered type by default
+        self.job_types = job_types
+        self.concurrency = {**self.settings.JOB_CONCURRENCY, **(concurrency or {})}
+        self.retry_delay_seconds = (
+            self.settings.JOB_RETRY_DELAY_SECONDS if retry_delay_seconds is None else retry_delay_seconds
+        )
+        self._running: Dict[int, asyncio.Task] = {}
+        self._running_types: Counter = Counter()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._recovered_at = float("-inf")
+        self._task: Optional[asyncio.Task] = None
+
+    def _open_types(self) -> List[str]:
+        """Job types running fewer jobs than their limit"""
+        default = self.settings.JOB_DEFAULT_CONCURRENCY
+        return [
+            name for name in self.job_types or _handlers
+            if self._running_types[name] < self.concurrency.get(name, default)
+        ]
+
+    async def poll(self) -> int:
+        """Start as many due jobs as the concurrency limits allow; the number started"""
+        await self._recover_stale()
+        started = 0
+        while not self._stopping:
+            job_types = self._open_types()
+            if not job_types:
+                break
+            job = await self._claim(job_types)
+            if job is None:
+                break
+            self._start(job)
+            started += 1
+        return started
+
+    async def _claim(self, job_types: List[str]) -> Optional[dict]:
+        """Mark the next due job of job_types as running on this worker"""
+        now = datetime.utcnow()
+        due = (
+            select(Job.id)
+            .where(Job.status == JobStatus.QUEUED, Job.run_after <= now, Job.job_type.in_(job_types))
+            .order_by(Job.priority.desc(), Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Job)
+            .where(Job.id == due, Job.status == JobStatus.QUEUED)
+            .values(
+                status=JobStatus.RUNNING,
+                attempts=Job.attempts + 1,
+                worker_id=self.worker_id,
+                started_at=now,
+                heartbeat_at=now,
+            )
+            .returning(Job.id, Job.job_type, Job.params, Job.attempts, Job.max_attempts)
+        )
+        async with get_sessionmaker()() as session:
+            row = (await session.execute(stmt)).mappings().first()
+            await session.commit()
+        return dict(row) if row else None
+
+    def _start(self, job: dict) -> None:
+        self._running_types[job["job_type"]] += 1
+        task = asyncio.ensure_future(self._execute(job))
+        self._running[job["id"]] = task
+
+        def finished(_):
+            self._running.pop(job["id"], None)
+            self._running_types[job["job_type"]] -= 1
+            # A slot is free: look for the next job without waiting out the poll interval
+            self._wake.set()
+
+        task.add_done_callback(finished)
+
+    async def _execute(self, job: dict) -> None:
+        context = JobContext(job["id"], job["params"] or {}, job["attempts"], self.worker_id)
+        work = asyncio.ensure_future(_handlers[job["job_type"]](context))
+        heartbeat = asyncio.ensure_future(self._heartbeat(context, work))
+        started = time.perf_counter()
+        try:
+            result = await work
+        except (JobCancelled, asyncio.CancelledError):
+            if context.cancel_requested:
+                logger.info("Job %s (%s) cancelled", job["id"], job["job_type"])
+                await self._finish(job["id"], status=JobStatus.CANCELLED, finished_at=datetime.utcnow())
+                return
+            # The worker is stopping: the job goes back to the queue, without counting the attempt
+            await self._finish(
+                job["id"], status=JobStatus.QUEUED, attempts=job["attempts"] - 1, worker_id=None, started_at=None
+            )
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job["attempts"] < job["max_attempts"]:
+                delay = self.retry_delay_seconds * 2 ** (job["attempts"] - 1)
+                logger.warning(
+                    "Job %s (%s) failed on attempt %s, retrying in %.0fs: %s",
+                    job["id"], job["job_type"], job["attempts"], delay, error,
+                )
+                await self._finish(
+                    job["id"],
+                    status=JobStatus.QUEUED,
+                    run_after=datetime.utcnow() + timedelta(seconds=delay),
+                    worker_id=None,
+                    error=error,
+                )
+            else:
+                logger.error("Job %s (%s) failed: %s", job["id"], job["job_type"], error, exc_info=e)
+                await self._finish(job["id"], status=JobStatus.FAILED, finished_at=datetime.utcnow(), error=error)
+        else:
+            logger.info("Job %s (%s) succeeded in %.1fs", job["id"], job["job_type"], time.perf_counter() - started)
+            await self._finish(
+                job["id"],
+                status=JobStatus.SUCCEEDED,
+                progress=1.0,
+                result=jsonable_encoder(result),
+                finished_at=datetime.utcnow(),
+            )
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, context: JobContext, work: asyncio.Task) -> None:
+        """Keep the job from looking stale, and stop it once its cancellation is requested"""
+        while True:
+            await asyncio.sleep(self.settings.JOB_HEARTBEAT_SECONDS)
+            async with get_sessionmaker()() as session:
+                result = await session.execute(
+                    update(Job)
+                    .where(Job.id == context.job_id, Job.worker_id == self.worker_id)
+                    .values(heartbeat_at=datetime.utcnow())
+                    .returning(Job.cancel_requested)
+                )
+                cancel_requested = result.scalar()
+                await session.commit()
+            # None: the job was requeued as stale and belongs to another worker now
+            if cancel_requested is not False:
+                context.cancel_requested = True
+                work.cancel()
+                return
+
+    async def _finish(self, job_id: int, **values) -> None:
+        """Record the outcome of an attempt, unless the job has meanwhile passed to another worker"""
+        async with get_sessionmaker()() as session:
+            await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.worker_id == self.worker_id, Job.status == JobStatus.RUNNING)
+                .values(**values)
+            )
+            await session.commit()
+
+    async def _recover_stale(self) -> None:
+        """Requeue running jobs whose worker stopped writing their heartbeat, at most once a heartbeat"""
+        if time.monotonic() - self._recovered_at < self.settings.JOB_HEARTBEAT_SECONDS:
+            return
+        self._recovered_at = time.monotonic()
+        now = datetime.utcnow()
+        stale = and_(
+            Job.status == JobStatus.RUNNING,
+            Job.heartbeat_at < now - timedelta(seconds=self.settings.JOB_STALE_SECONDS),
+        )
+        error = "Worker stopped responding"
+        async with get_sessionmaker()() as session:
+            requeued = await session.execute(
+                update(Job)
+                .where(stale, Job.attempts < Job.max_attempts)
+                .values(status=JobStatus.QUEUED, worker_id=None, error=error)
+            )
+            failed = await session.execute(
+                update(Job).where(stale).values(status=JobStatus.FAILED, finished_at=now, error=error)
+            )
+            await session.commit()
+        if requeued.rowcount or failed.rowcount:
+            logger.warning("Requeued %s and failed %s stale jobs", requeued.rowcount, failed.rowcount)
+
+    async def run(self) -> None:
+        """Run jobs until stopped; the jobs still running then go back to the queue"""
+        logger.info("Job worker %s started", self.worker_id)
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error("Job worker %s failed to poll: %s", self.worker_id, e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.settings.JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+        running = list(self._running.values())
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        logger.info("Job worker %s stopped", self.worker_id)
+
+    async def run_until_idle(self) -> None:
+        """Run jobs until none is due and none is running"""
+        while True:
+            started = await self.poll()
+            if not started and not self._running:
+                return
+            if self._running:
+                await asyncio.wait(list(self._running.values()), return_when=asyncio.FIRST_COMPLETED)
+
+    def start(self) -> None:
+        """Run the worker as a task of the running event loop"""
+        self._task = asyncio.ensure_future(self.run())
+
+    def request_stop(self) -> None:
+        """Stop claiming jobs and hand back those running"""
+        self._stopping = True
+        self._wake.set()
+
+    async def stop(self) -> None:
+        """Stop the worker started with start(), and wait for it"""
+        self.request_stop()
+        if self._task:
+            await self._task
+
+
+@job_handler("forecast_retrain")
+async def retrain_forecasts(context: JobContext) -> dict:
+    """Refresh the demand forecasts; params: full"""
+    async with get_sessionmaker()() as session:
+        return await ForecastingService(session).retrain(full=bool(context.params.get("full")))
+
+
+@job_handler("inventory_policy_refresh")
+async def refresh_inventory_policies(context: JobContext) -> dict:
+    """Recompute the inventory policies; params: full"""
+    async with get_sessionmaker()() as session:
+        return await InventoryOptimizationService(session).refresh(full=bool(context.params.get("full")))
+
+
+@job_handler("supplier_risk_refresh")
+async def refresh_supplier_risk(context: JobContext) -> dict:
+    """Score every supplier"""
+    async with get_sessionmaker()() as session:
+        return await SupplierRiskService(session).refresh()
+
+
+@job_handler("mrp_run")
+async def run_mrp(context: JobContext) -> dict:
+    """Run MRP over the open work orders; params: bucket_days, material_id, action, limit"""
+    params = context.params
+    async with get_sessionmaker()() as session:
+        return await MRPService(session).run(
+            bucket_days=params.get("bucket_days"),
+            material_id=params.get("material_id"),
+            action=params.get("action"),
+            limit=params.get("limit", 100),
+        )
+
+
+@job_handler("ml_refresh")
+async def refresh_ml(context: JobContext) -> dict:
+    """The nightly refresh: forecasts, then the inventory policies built on them, then supplier risk"""
+    steps = [
+        ("forecast_retrain", retrain_forecasts),
+        ("inventory_policy_refresh", refresh_inventory_policies),
+        ("supplier_risk_refresh", refresh_supplier_risk),
+    ]
+    results = {}
+    for done, (name, step) in enumerate(steps):
+        await context.report(done / len(steps), name)
+        results[name] = await step(context)
+    return results
+
+
+async def run_worker(job_types: Optional[List[str]] = None, once: bool = False) -> None:
+    """Run a job worker until SIGINT or SIGTERM, or with once until no job is due"""
+    worker = JobWorker(job_types=job_types)
+    try:
+        if once:
+            await worker.run_until_idle()
+        else:
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signum, worker.request_stop)
+            await worker.run()
+    finally:
+        shutdown_forecast_pool()
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a background job worker")
+    parser.add_argument("--type", dest="job_types", action="append", choices=job_types(), help="run only these types")
+    parser.add_argument("--once", action="store_true", help="run the jobs due now and exit")
+    args = parser.parse_args()
+    asyncio.run(run_worker(job_types=args.job_types, once=args.once))
@@ -5,13 +5,21 @@ Purchase Order service with business logic
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.core import NotFoundException, ValidationException
+from app.models.archive import PurchaseOrderArchive
 from app.models.purchase_order import PurchaseOrder, POLineItem, POStatus
-from app.schemas import CreatePurchaseOrderRequest, UpdatePurchaseOrderRequest
+from app.schemas import (
+    CreatePurchaseOrderRequest,
+    POLineItemRequest,
+    UpdatePOLineItemRequest,
+    UpdatePurchaseOrderRequest,
+)
+from app.services.archive_service import get_archived_order, paginate_with_archive
+from app.services.inventory_service import InventoryService
 from app.utils import ValidationUtil
 
 
@@ -75,11 +83,10 @@ class PurchaseOrderService:
 
         self.session.add(po)
         await self.session.commit()
-        await self.session.refresh(po)
 
         return po
 
-    async def get_purchase_order(self, po_id: int) -> PurchaseOrder:
+    async def get_purchase_order(self, po_id: int, include_archived: bool = False) -> PurchaseOrder:
         """Get purchase order by ID"""
         result = await self.session.execute(
             select(PurchaseOrder)
@@ -88,6 +95,9 @@ class PurchaseOrderService:
         )
         po = result.scalar_one_or_none()
 
+        if not po and include_archived:
+            po = await get_archived_order(self.session, PurchaseOrderArchive, po_id)
+
         if not po:
             raise NotFoundException("Purchase order not found")
 
@@ -98,8 +108,14 @@ class PurchaseOrderService:
         skip: int = 0,
         limit: int = 10,
         status: Optional[str] = None,
+        include_archived: bool = False,
     ) -> tuple[List[PurchaseOrder], int]:
         """Get all purchase orders with optional filtering"""
+        if include_archived:
+            return await paginate_with_archive(
+                self.session, PurchaseOrder, PurchaseOrderArchive, skip=skip, limit=limit, status=status
+            )
+
         query = select(PurchaseOrder).options(selectinload(PurchaseOrder.line_items))
 
         if status:
@@ -125,7 +141,7 @@ class PurchaseOrderService:
         request: UpdatePurchaseOrderRequest,
     ) -> PurchaseOrder:
         """Update purchase order"""
-        po = await self.get_purchase_order(po_id)
+        po = await self._lock_purchase_order(po_id)
 
         # Validate dates if provided
         if request.due_date and request.due_date < po.po_date:
@@ -138,16 +154,20 @@ class PurchaseOrderService:
             po.due_date = request.due_date
         if request.tax_rate is not None:
             po.tax_rate = request.tax_rate
-            # Recalculate amounts
-            po.tax_amount = po.subtotal * (request.tax_rate / 100)
-            po.total_amount = po.subtotal + po.tax_amount
+            # Recalculated in the UPDATE, from the subtotal in the row
+            po.tax_amount = PurchaseOrder.subtotal * request.tax_rate / 100
+            po.total_amount = PurchaseOrder.subtotal + PurchaseOrder.subtotal * request.tax_rate / 100
         if request.notes is not None:
             po.notes = request.notes
         if request.status:
+            if request.status == POStatus.RECEIVED and po.status != POStatus.RECEIVED:
+                # Posted in the same transaction as the status change
+                await InventoryService(self.session).post_purchase_order_receipt(po)
             po.status = request.status
 
         await self.session.commit()
-        await self.session.refresh(po)
+        if request.tax_rate is not None:
+            await self.session.refresh(po, ["tax_amount", "total_amount"])
 
         return po
 
@@ -157,6 +177,135 @@ class PurchaseOrderService:
         await self.session.delete(po)
         await self.session.commit()
 
+    async def add_line_item(
+        self,
+        po_id: int,
+        request: POLineItemRequest,
+    ) -> PurchaseOrder:
+        """Add a line item to an existing purchase order"""
+        await self._lock_editable_purchase_order(po_id)
+
+        amount = request.quantity * request.unit_price
+        line_item = POLineItem(
+            purchase_order_id=po_id,
+            material_code=request.material_code,
+            material_name=request.material_name,
+            quantity=request.quantity,
+            unit_price=request.unit_price,
+            amount=amount,
+        )
+        self.session.add(line_item)
+        await self._apply_amount_delta(po_id, amount)
+        await self.session.commit()
+
+        return await self._reload_purchase_order(po_id)
+
+    async def update_line_item(
+        self,
+        po_id: int,
+        item_id: int,
+        request: UpdatePOLineItemRequest,
+    ) -> PurchaseOrder:
+        """Update a line item and adjust the order totals by the difference"""
+        await self._lock_editable_purchase_order(po_id)
+        line_item = await self._lock_line_item(po_id, item_id)
+
+        old_amount = line_item.amount
+        if request.material_code:
+            line_item.material_code = request.material_code
+        if request.material_name:
+            line_item.material_name = request.material_name
+        if request.quantity is not None:
+            line_item.quantity = request.quantity
+        if request.unit_price is not None:
+            line_item.unit_price = request.unit_price
+        line_item.amount = line_item.quantity * line_item.unit_price
+
+        await self.session.flush()
+        await self._apply_amount_delta(po_id, line_item.amount - old_amount)
+        await self.session.commit()
+
+        return await self._reload_purchase_order(po_id)
+
+    async def delete_line_item(self, po_id: int, item_id: int) -> None:
+        """Remove a line item and subtract it from the order totals"""
+        await self._lock_editable_purchase_order(po_id)
+        line_item = await self._lock_line_item(po_id, item_id)
+
+        amount = line_item.amount
+        await self.session.delete(line_item)
+        await self.session.flush()
+        await self._apply_amount_delta(po_id, -amount)
+        await self.session.commit()
+
+    async def _lock_purchase_order(self, po_id: int) -> PurchaseOrder:
+        """Get a purchase order with its line items, its row locked against concurrent edits"""
+        result = await self.session.execute(
+            select(PurchaseOrder)
+            .where(PurchaseOrder.id == po_id)
+            .options(selectinload(PurchaseOrder.line_items))
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        po = result.scalar_one_or_none()
+
+        if not po:
+            raise NotFoundException("Purchase order not found")
+
+        return po
+
+    async def _lock_editable_purchase_order(self, po_id: int) -> None:
+        """Lock the order row so concurrent line-item edits are serialized"""
+        result = await self.session.execute(
+            select(PurchaseOrder.status)
+            .where(PurchaseOrder.id == po_id)
+            .with_for_update()
+        )
+        po_status = result.scalar_one_or_none()
+
+        if po_status is None:
+            raise NotFoundException("Purchase order not found")
+        if po_status in (POStatus.RECEIVED, POStatus.CANCELLED):
+            raise ValidationException(f"Cannot edit line items of a {po_status.value} purchase order")
+
+    async def _lock_line_item(self, po_id: int, item_id: int) -> POLineItem:
+        """Get a line item of the given order, locked for update"""
+        result = await self.session.execute(
+            select(POLineItem)
+            .where(POLineItem.id == item_id, POLineItem.purchase_order_id == po_id)
+            .with_for_update()
+        )
+        line_item = result.scalar_one_or_none()
+
+        if not line_item:
+            raise NotFoundException("Line item not found")
+
+        return line_item
+
+    async def _apply_amount_delta(self, po_id: int, delta: float) -> None:
+        """Shift subtotal, tax and total by delta in a single UPDATE"""
+        new_subtotal = PurchaseOrder.subtotal + delta
+        await self.session.execute(
+            update(PurchaseOrder)
+            .where(PurchaseOrder.id == po_id)
+            .values(
+                subtotal=new_subtotal,
+                tax_amount=new_subtotal * PurchaseOrder.tax_rate / 100,
+                total_amount=new_subtotal + new_subtotal * PurchaseOrder.tax_rate / 100,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _reload_purchase_order(self, po_id: int) -> PurchaseOrder:
+        """Re-read a purchase order, overwriting any stale copy in the session"""
+        result = await self.session.execute(
+            select(PurchaseOrder)
+            .where(PurchaseOrder.id == po_id)
+            .options(selectinload(PurchaseOrder.line_items))
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one()
+
     async def _generate_po_number(self) -> str:
         """Generate unique PO number"""
         result = await self.session.execute(
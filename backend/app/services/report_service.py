@@ -0,0 +1,466 @@
+"""
+Reports: parameterized aggregates over orders and their line items
+
+Each report in REPORTS sums the lines of live and archived orders with the
+given statuses over a date range, grouped by any of its dimensions: purchase
+spend by supplier, material and month, say, or sales by customer, product
+and week. The aggregate is one GROUP BY in the database over the union of
+the live and archive tables; its rows come back as columns, which are
+encoded as CSV, JSON or Parquet and streamed in chunks of REPORT_CHUNK_ROWS
+rows.
+
+Results are cached in each worker, up to REPORT_CACHE_MAX_ROWS rows in all,
+keyed by the report and its parameters, along with the versions of the
+tables the report reads. Every transaction that writes to one of those
+tables raises the table's version in table_versions as its last statement
+before it commits: ORM objects flushed and bulk INSERT, UPDATE and DELETE
+statements run through a session are both seen, and the version rows stay
+locked only while the transaction commits. Reading the versions is then all
+an unchanged report costs, and a report whose tables changed is recomputed.
+Writes made outside the application's sessions are picked up once a result
+is REPORT_CACHE_TTL_SECONDS old.
+"""
+
+import csv
+import io
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import distinct, event, func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import NotFoundException, ValidationException, get_logger, get_settings
+from app.models.archive import POLineItemArchive, PurchaseOrderArchive, SalesOrderArchive, SOLineItemArchive
+from app.models.purchase_order import POLineItem, POStatus, PurchaseOrder
+from app.models.sales_order import SalesOrder, SOLineItem, SOStatus
+from app.models.table_version import TableVersion
+
+logger = get_logger(__name__)
+
+# Date dimensions, each value the first day of its period
+PERIODS = ("day", "week", "month")
+
+
+@dataclass
+class ReportSpec:
+    """An aggregate over order lines: where they come from and what they can be grouped by"""
+
+    description: str
+    # (order model, line model) pairs, live and archived
+    sources: Tuple[tuple, ...]
+    # Column of the line models referring to their order
+    order_key: str
+    # Column of the order models the periods and the date range apply to
+    date_column: str
+    status_enum: type
+    # Statuses of the orders counted unless others are asked for
+    statuses: tuple
+    # Dimension name: (key column, name column), on the order or the line model
+    dimensions: Dict[str, Tuple[str, Optional[str]]]
+    default_group_by: Tuple[str, ...]
+    # Name of the summed line amount
+    amount: str
+
+    @property
+    def tables(self) -> List[str]:
+        """Tables the report reads"""
+        return sorted(model.__table__.name for pair in self.sources for model in pair)
+
+
+REPORTS: Dict[str, ReportSpec] = {
+    "purchase-spend": ReportSpec(
+        description="Purchase spend and quantities",
+        sources=((PurchaseOrder, POLineItem), (PurchaseOrderArchive, POLineItemArchive)),
+        order_key="purchase_order_id",
+        date_column="po_date",
+        status_enum=POStatus,
+        statuses=(POStatus.PENDING, POStatus.APPROVED, POStatus.RECEIVED),
+        dimensions={"supplier": ("supplier_id", "supplier_name"), "material": ("material_code", "material_name")},
+        default_group_by=("supplier", "material", "month"),
+        amount="spend",
+    ),
+    "sales": ReportSpec(
+        description="Sales revenue and quantities",
+        sources=((SalesOrder, SOLineItem), (SalesOrderArchive, SOLineItemArchive)),
+        order_key="sales_order_id",
+        date_column="order_date",
+        status_enum=SOStatus,
+        statuses=(SOStatus.PENDING, SOStatus.CONFIRMED, SOStatus.SHIPPED, SOStatus.DELIVERED),
+        dimensions={"customer": ("customer_id", "customer_name"), "product": ("product_code", "product_name")},
+        default_group_by=("customer", "product", "week"),
+        amount="revenue",
+    ),
+}
+
+# Tables whose writes raise their version
+VERSIONED_TABLES = frozenset(table for spec in REPORTS.values() for table in spec.tables)
+
+
+@dataclass
+class ReportResult:
+    """The rows of a report, by column"""
+
+    report: str
+    columns: List[str]
+    data: Dict[str, list]
+    rows: int
+    # Versions of the report's tables the result was computed at
+    versions: Tuple[int, ...]
+    computed_at: datetime
+    elapsed_ms: float
+    created: float = field(default_factory=time.monotonic)
+
+    def chunks(self, size: int) -> Iterator[Dict[str, list]]:
+        """The columns, size rows at a time"""
+        for offset in range(0, self.rows, size):
+            yield {name: values[offset:offset + size] for name, values in self.data.items()}
+
+
+class ReportCache:
+    """Report results by parameters, valid while the versions of their tables stay the same"""
+
+    def __init__(self, max_rows: int, ttl_seconds: float):
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, ReportResult]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, versions: Tuple[int, ...]) -> Optional[ReportResult]:
+        """The cached result for key, if computed at these versions and not expired"""
+        result = self._entries.get(key)
+        if (
+            result is None
+            or result.versions != versions
+            or time.monotonic() - result.created > self.ttl_seconds
+        ):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: tuple, result: ReportResult) -> None:
+        """Cache result, dropping the least recently used results past max_rows; larger results are not kept"""
+        self._entries.pop(key, None)
+        if result.rows > self.max_rows:
+            return
+        self._entries[key] = result
+        rows = sum(entry.rows for entry in self._entries.values())
+        while rows > self.max_rows:
+            rows -= self._entries.popitem(last=False)[1].rows
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def status(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "rows": sum(entry.rows for entry in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+@lru_cache()
+def get_report_cache() -> ReportCache:
+    """This worker's report cache"""
+    settings = get_settings()
+    return ReportCache(settings.REPORT_CACHE_MAX_ROWS, settings.REPORT_CACHE_TTL_SECONDS)
+
+
+class ReportService:
+    """Running reports through the cache"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    def describe(self) -> List[dict]:
+        """The reports, their dimensions and measures"""
+        return [
+            {
+                "name": name,
+                "description": spec.description,
+                "dimensions": list(spec.dimensions) + list(PERIODS),
+                "measures": ["quantity", spec.amount, "lines", "orders"],
+                "default_group_by": list(spec.default_group_by),
+                "statuses": [status.value for status in spec.status_enum],
+                "default_statuses": [status.value for status in spec.statuses],
+            }
+            for name, spec in REPORTS.items()
+        ]
+
+    async def run(
+        self,
+        name: str,
+        group_by: Optional[List[str]] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        statuses: Optional[List[str]] = None,
+    ) -> Tuple[ReportResult, bool]:
+        """A report's rows from the cache, or computed if its tables changed; True if cached"""
+        spec = REPORTS.get(name)
+        if spec is None:
+            raise NotFoundException(f"Report {name} not found")
+        group_by = list(dict.fromkeys(group_by if group_by is not None else spec.default_group_by))
+        unknown = [dimension for dimension in group_by if dimension not in spec.dimensions and dimension not in PERIODS]
+        if unknown:
+            raise ValidationException(f"Report {name} cannot be grouped by {', '.join(unknown)}")
+        if sum(dimension in PERIODS for dimension in group_by) > 1:
+            raise ValidationException("Group by at most one of day, week and month")
+        if start and end and start > end:
+            raise ValidationException("start must not be after end")
+        try:
+            statuses = sorted({spec.status_enum(status) for status in statuses}) if statuses else list(spec.statuses)
+        except ValueError as e:
+            raise ValidationException(str(e))
+
+        key = (name, tuple(group_by), start, end, tuple(statuses))
+        cache = get_report_cache()
+        versions = await self.table_versions(spec.tables)
+        result = cache.get(key, versions)
+        if result is not None:
+            return result, True
+
+        result = await self._compute(name, spec, group_by, start, end, statuses, versions)
+        cache.put(key, result)
+        logger.info("Report %s computed: %s rows in %.0fms", name, result.rows, result.elapsed_ms)
+        return result, False
+
+    async def table_versions(self, tables: List[str]) -> Tuple[int, ...]:
+        """Versions of tables, in their order; 0 for a table never written since versions were kept"""
+        result = await self.session.execute(
+            select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(tables))
+        )
+        versions = dict(result.all())
+        return tuple(versions.get(table, 0) for table in tables)
+
+    async def _compute(
+        self,
+        name: str,
+        spec: ReportSpec,
+        group_by: List[str],
+        start: Optional[date],
+        end: Optional[date],
+        statuses: list,
+        versions: Tuple[int, ...],
+    ) -> ReportResult:
+        started = time.perf_counter()
+        wanted = [column for dimension in group_by if dimension in spec.dimensions
+                  for column in spec.dimensions[dimension] if column]
+
+        selects = []
+        for order, line in spec.sources:
+            day = getattr(order, spec.date_column)
+            query = (
+                select(
+                    order.id.label("order_id"),
+                    day.label("day"),
+                    line.quantity,
+                    line.amount,
+                    *(getattr(order if hasattr(order, column) else line, column) for column in wanted),
+                )
+                .join(order, order.id == getattr(line, spec.order_key))
+                .where(order.status.in_(statuses))
+            )
+            if start:
+                query = query.where(day >= start)
+            if end:
+                query = query.where(day <= end)
+            selects.append(query)
+        lines = union_all(*selects).subquery()
+
+        columns, keys = [], []
+        for dimension in group_by:
+            if dimension in PERIODS:
+                period = self._period_start(dimension, lines.c.day).label(dimension)
+                columns.append(period)
+                keys.append(period)
+            else:
+                key_column, name_column = spec.dimensions[dimension]
+                columns.append(lines.c[key_column])
+                keys.append(lines.c[key_column])
+                if name_column:
+                    columns.append(func.max(lines.c[name_column]).label(name_column))
+        columns += [
+            func.sum(lines.c.quantity).label("quantity"),
+            func.sum(lines.c.amount).label(spec.amount),
+            func.count().label("lines"),
+            func.count(distinct(lines.c.order_id)).label("orders"),
+        ]
+        result = await self.session.execute(select(*columns).group_by(*keys).order_by(*keys))
+        names = list(result.keys())
+        rows = result.all()
+
+        data = {column: list(values) for column, values in zip(names, zip(*rows))} if rows else {
+            column: [] for column in names
+        }
+        for dimension in PERIODS:
+            if dimension in data:
+                data[dimension] = [date.fromisoformat(str(value)[:10]) for value in data[dimension]]
+        return ReportResult(
+            report=name,
+            columns=names,
+            data=data,
+            rows=len(rows),
+            versions=versions,
+            computed_at=datetime.utcnow(),
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+        )
+
+    def _period_start(self, period: str, column):
+        """First day of the day, week (Monday) or month of a date column, in the bound database's dialect"""
+        postgresql = self.session.get_bind().dialect.name == "postgresql"
+        if period == "day":
+            return column
+        if period == "week":
+            return func.date_trunc("week", column) if postgresql else func.date(column, "weekday 0", "-6 days")
+        return func.date_trunc("month", column) if postgresql else func.date(column, "start of month")
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def stream_csv(result: ReportResult, chunk_rows: int) -> Iterator[bytes]:
+    """The result as CSV with a header row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result.columns)
+    for chunk in result.chunks(chunk_rows):
+        writer.writerows(zip(*(chunk[column] for column in result.columns)))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_json(result: ReportResult, chunk_rows: int) -> Iterator[bytes]:
+    """The result as a JSON object, its rows as objects under data"""
+    head = {"report": result.report, "columns": result.columns, "total": result.rows}
+    yield (json.dumps(head)[:-1] + ', "data": [').encode()
+    separator = ""
+    for chunk in result.chunks(chunk_rows):
+        rows = (dict(zip(result.columns, values)) for values in zip(*(chunk[column] for column in result.columns)))
+        yield (separator + ", ".join(json.dumps(row, default=_json_default) for row in rows)).encode()
+        separator = ", "
+    yield b"]}"
+
+
+class _ChunkSink:
+    """Write-only file handing out the bytes written since the last take, for streaming"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # The writer records row group offsets from this, so it counts every byte ever written
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def stream_parquet(result: ReportResult, chunk_rows: int) -> Iterator[bytes]:
+    """The result as a Parquet file, one row group of chunk_rows rows written and sent at a time"""
+    # Imported on first use: pyarrow adds to the startup of every worker
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Types from each column's first value, so that every row group shares one schema
+    schema = pa.schema([
+        pa.field(column, next((pa.scalar(v).type for v in result.data[column] if v is not None), pa.null()))
+        for column in result.columns
+    ])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for chunk in result.chunks(chunk_rows):
+            writer.write_table(pa.table(chunk, schema=schema), row_group_size=chunk_rows)
+            yield sink.take()
+    yield sink.take()
+
+
+# Format: (media type, file extension, encoder)
+FORMATS = {
+    "csv": ("text/csv", "csv", stream_csv),
+    "json": ("application/json", "json", stream_json),
+    "parquet": ("application/vnd.apache.parquet", "parquet", stream_parquet),
+}
+
+
+def _record_written(session: Session, tables) -> None:
+    session.info.setdefault("written_tables", set()).update(set(tables) & VERSIONED_TABLES)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    written = [obj for obj in session.new] + [obj for obj in session.deleted]
+    written += [obj for obj in session.dirty if session.is_modified(obj)]
+    _record_written(session, {obj.__table__.name for obj in written})
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _record_written(orm_execute_state.session, {table.name})
+
+
+@event.listens_for(Session, "before_commit")
+def _raise_versions(session):
+    """Raise the versions of the tables the transaction wrote to, as its last statement"""
+    # Commit flushes only after this hook: flush now so its writes are counted
+    session.flush()
+    tables = session.info.pop("written_tables", None)
+    if not tables:
+        return
+
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    changed_at = datetime.utcnow()
+    stmt = dialect_insert(TableVersion).values(
+        [{"table_name": table, "version": 1, "changed_at": changed_at} for table in sorted(tables)]
+    )
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[TableVersion.table_name],
+            set_={"version": TableVersion.version + 1, "changed_at": stmt.excluded.changed_at},
+        )
+    )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written(session):
+    session.info.pop("written_tables", None)
@@ -4,18 +4,31 @@ Sales Order service with business logic
 
 from typing import List, Optional
 
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.core import NotFoundException, ValidationException
+from app.models.archive import SalesOrderArchive
 from app.models.sales_order import SalesOrder, SOLineItem, SOStatus
-from app.schemas import CreateSalesOrderRequest, UpdateSalesOrderRequest
+from app.schemas import (
+    CreateSalesOrderRequest,
+    SOLineItemRequest,
+    UpdateSalesOrderRequest,
+    UpdateSOLineItemRequest,
+)
+from app.services.archive_service import get_archived_order, paginate_with_archive
+from app.services.forecasting_service import DEMAND_STATUSES, ForecastingService
 from app.utils import ValidationUtil
 
 
 class SalesOrderService:
-    """Service class for sales order operations"""
+    """Service class for sales order operations
+
+    Changes to the demand of orders in DEMAND_STATUSES mark their products
+    for the next forecast refresh (ForecastingService.mark_changed). New
+    orders are drafts and count only once their status moves on.
+    """
 
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -73,11 +86,10 @@ class SalesOrderService:
 
         self.session.add(so)
         await self.session.commit()
-        await self.session.refresh(so)
 
         return so
 
-    async def get_sales_order(self, so_id: int) -> SalesOrder:
+    async def get_sales_order(self, so_id: int, include_archived: bool = False) -> SalesOrder:
         """Get sales order by ID"""
         result = await self.session.execute(
             select(SalesOrder)
@@ -86,6 +98,9 @@ class SalesOrderService:
         )
         so = result.scalar_one_or_none()
 
+        if not so and include_archived:
+            so = await get_archived_order(self.session, SalesOrderArchive, so_id)
+
         if not so:
             raise NotFoundException("Sales order not found")
 
@@ -96,8 +111,14 @@ class SalesOrderService:
         skip: int = 0,
         limit: int = 10,
         status: Optional[str] = None,
+        include_archived: bool = False,
     ) -> tuple[List[SalesOrder], int]:
         """Get all sales orders with optional filtering"""
+        if include_archived:
+            return await paginate_with_archive(
+                self.session, SalesOrder, SalesOrderArchive, skip=skip, limit=limit, status=status
+            )
+
         query = select(SalesOrder).options(selectinload(SalesOrder.line_items))
 
         if status:
@@ -123,7 +144,7 @@ class SalesOrderService:
         request: UpdateSalesOrderRequest,
     ) -> SalesOrder:
         """Update sales order"""
-        so = await self.get_sales_order(so_id)
+        so = await self._lock_sales_order(so_id)
 
         if request.due_date and request.due_date < so.order_date:
             raise ValidationException("Due date must be after order date")
@@ -134,24 +155,169 @@ class SalesOrderService:
             so.due_date = request.due_date
         if request.tax_rate is not None:
             so.tax_rate = request.tax_rate
-            so.tax_amount = so.subtotal * (request.tax_rate / 100)
-            so.total_amount = so.subtotal + so.tax_amount
+            # Recalculated in the UPDATE, from the subtotal in the row
+            so.tax_amount = SalesOrder.subtotal * request.tax_rate / 100
+            so.total_amount = SalesOrder.subtotal + SalesOrder.subtotal * request.tax_rate / 100
         if request.notes is not None:
             so.notes = request.notes
         if request.status:
+            if (so.status in DEMAND_STATUSES) != (request.status in DEMAND_STATUSES):
+                await ForecastingService(self.session).mark_changed(item.product_code for item in so.line_items)
             so.status = request.status
 
         await self.session.commit()
-        await self.session.refresh(so)
+        if request.tax_rate is not None:
+            await self.session.refresh(so, ["tax_amount", "total_amount"])
 
         return so
 
     async def delete_sales_order(self, so_id: int) -> None:
         """Delete sales order"""
         so = await self.get_sales_order(so_id)
+        if so.status in DEMAND_STATUSES:
+            await ForecastingService(self.session).mark_changed(item.product_code for item in so.line_items)
         await self.session.delete(so)
         await self.session.commit()
 
+    async def add_line_item(
+        self,
+        so_id: int,
+        request: SOLineItemRequest,
+    ) -> SalesOrder:
+        """Add a line item to an existing sales order"""
+        so_status = await self._lock_editable_sales_order(so_id)
+
+        amount = request.quantity * request.unit_price
+        line_item = SOLineItem(
+            sales_order_id=so_id,
+            product_code=request.product_code,
+            product_name=request.product_name,
+            quantity=request.quantity,
+            unit_price=request.unit_price,
+            amount=amount,
+        )
+        self.session.add(line_item)
+        await self._apply_amount_delta(so_id, amount)
+        if so_status in DEMAND_STATUSES:
+            await ForecastingService(self.session).mark_changed([request.product_code])
+        await self.session.commit()
+
+        return await self._reload_sales_order(so_id)
+
+    async def update_line_item(
+        self,
+        so_id: int,
+        item_id: int,
+        request: UpdateSOLineItemRequest,
+    ) -> SalesOrder:
+        """Update a line item and adjust the order totals by the difference"""
+        so_status = await self._lock_editable_sales_order(so_id)
+        line_item = await self._lock_line_item(so_id, item_id)
+
+        old_amount = line_item.amount
+        old_product_code = line_item.product_code
+        if request.product_code:
+            line_item.product_code = request.product_code
+        if request.product_name:
+            line_item.product_name = request.product_name
+        if request.quantity is not None:
+            line_item.quantity = request.quantity
+        if request.unit_price is not None:
+            line_item.unit_price = request.unit_price
+        line_item.amount = line_item.quantity * line_item.unit_price
+
+        await self.session.flush()
+        await self._apply_amount_delta(so_id, line_item.amount - old_amount)
+        if so_status in DEMAND_STATUSES:
+            await ForecastingService(self.session).mark_changed([old_product_code, line_item.product_code])
+        await self.session.commit()
+
+        return await self._reload_sales_order(so_id)
+
+    async def delete_line_item(self, so_id: int, item_id: int) -> None:
+        """Remove a line item and subtract it from the order totals"""
+        so_status = await self._lock_editable_sales_order(so_id)
+        line_item = await self._lock_line_item(so_id, item_id)
+
+        amount = line_item.amount
+        product_code = line_item.product_code
+        await self.session.delete(line_item)
+        await self.session.flush()
+        await self._apply_amount_delta(so_id, -amount)
+        if so_status in DEMAND_STATUSES:
+            await ForecastingService(self.session).mark_changed([product_code])
+        await self.session.commit()
+
+    async def _lock_sales_order(self, so_id: int) -> SalesOrder:
+        """Get a sales order with its line items, its row locked against concurrent edits"""
+        result = await self.session.execute(
+            select(SalesOrder)
+            .where(SalesOrder.id == so_id)
+            .options(selectinload(SalesOrder.line_items))
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        so = result.scalar_one_or_none()
+
+        if not so:
+            raise NotFoundException("Sales order not found")
+
+        return so
+
+    async def _lock_editable_sales_order(self, so_id: int) -> SOStatus:
+        """Lock the order row so concurrent line-item edits are serialized; returns its status"""
+        result = await self.session.execute(
+            select(SalesOrder.status)
+            .where(SalesOrder.id == so_id)
+            .with_for_update()
+        )
+        so_status = result.scalar_one_or_none()
+
+        if so_status is None:
+            raise NotFoundException("Sales order not found")
+        if so_status in (SOStatus.SHIPPED, SOStatus.DELIVERED, SOStatus.CANCELLED):
+            raise ValidationException(f"Cannot edit line items of a {so_status.value} sales order")
+
+        return so_status
+
+    async def _lock_line_item(self, so_id: int, item_id: int) -> SOLineItem:
+        """Get a line item of the given order, locked for update"""
+        result = await self.session.execute(
+            select(SOLineItem)
+            .where(SOLineItem.id == item_id, SOLineItem.sales_order_id == so_id)
+            .with_for_update()
+        )
+        line_item = result.scalar_one_or_none()
+
+        if not line_item:
+            raise NotFoundException("Line item not found")
+
+        return line_item
+
+    async def _apply_amount_delta(self, so_id: int, delta: float) -> None:
+        """Shift subtotal, tax and total by delta in a single UPDATE"""
+        new_subtotal = SalesOrder.subtotal + delta
+        await self.session.execute(
+            update(SalesOrder)
+            .where(SalesOrder.id == so_id)
+            .values(
+                subtotal=new_subtotal,
+                tax_amount=new_subtotal * SalesOrder.tax_rate / 100,
+                total_amount=new_subtotal + new_subtotal * SalesOrder.tax_rate / 100,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _reload_sales_order(self, so_id: int) -> SalesOrder:
+        """Re-read a sales order, overwriting any stale copy in the session"""
+        result = await self.session.execute(
+            select(SalesOrder)
+            .where(SalesOrder.id == so_id)
+            .options(selectinload(SalesOrder.line_items))
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one()
+
     async def _generate_so_number(self) -> str:
         """Generate unique SO number"""
         result = await self.session.execute(
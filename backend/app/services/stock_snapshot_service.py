@@ -0,0 +1,454 @@
+"""
+Daily stock snapshots and point-in-time (as-of) balance queries
+
+A snapshot holds the balance of every material and warehouse at the end of
+a day as sorted columns (material id, warehouse index, quantity) in one
+compressed .npz blob. The balance as of any day is the nearest snapshot plus
+the movements from its cutoff to the end of that day (or minus them, when
+the nearest snapshot is later), so no query replays more of the ledger than
+the days in between.
+
+Snapshots are written by take_snapshots, once a day after midnight UTC:
+
+    python -m app.services.stock_snapshot_service
+"""
+
+import argparse
+import asyncio
+import io
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import NotFoundException, get_logger, get_settings
+from app.models.inventory import Material, StockMovement, StockSnapshot
+from app.services.inventory_service import QUANTITY_TOLERANCE, material_chunks
+
+logger = get_logger(__name__)
+
+# Decoded snapshots kept per worker; snapshots never change once written
+SNAPSHOT_CACHE_SIZE = 8
+
+_snapshot_cache: "OrderedDict[tuple, SnapshotColumns]" = OrderedDict()
+
+
+class SnapshotColumns:
+    """Balances as columns, sorted by material id and then warehouse"""
+
+    def __init__(self, material_ids, warehouse_index, quantities, warehouses):
+        self.material_ids = material_ids
+        self.warehouse_index = warehouse_index
+        self.quantities = quantities
+        self.warehouses = warehouses
+
+    @classmethod
+    def empty(cls) -> "SnapshotColumns":
+        return cls(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=str),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple[int, str, float]]) -> "SnapshotColumns":
+        """Build from (material id, warehouse code, quantity) rows, summing repeated keys"""
+        if not rows:
+            return cls.empty()
+        material_ids, codes, quantities = zip(*rows)
+        warehouses, warehouse_index = np.unique(np.array(codes, dtype=str), return_inverse=True)
+        return cls._summed(
+            np.array(material_ids, dtype=np.int64),
+            warehouse_index.ravel(),
+            np.array(quantities, dtype=np.float64),
+            warehouses,
+        )
+
+    @classmethod
+    def _summed(cls, material_ids, warehouse_index, quantities, warehouses) -> "SnapshotColumns":
+        """Sort by key, add up repeated keys and drop zero balances"""
+        width = max(len(warehouses), 1)
+        keys, inverse = np.unique(material_ids * width + warehouse_index, return_inverse=True)
+        sums = np.bincount(inverse.ravel(), weights=quantities, minlength=len(keys))
+        keep = np.abs(sums) > QUANTITY_TOLERANCE
+        keys = keys[keep]
+        return cls(keys // width, keys % width, sums[keep], warehouses)
+
+    def combine(self, other: "SnapshotColumns", sign: float = 1.0) -> "SnapshotColumns":
+        """Add (or with sign=-1 subtract) other's quantities"""
+        if not len(other.quantities):
+            return self
+        warehouses = np.union1d(self.warehouses, other.warehouses)
+        return self._summed(
+            np.concatenate([self.material_ids, other.material_ids]),
+            np.concatenate(
+                [
+                    np.searchsorted(warehouses, self.warehouses)[self.warehouse_index],
+                    np.searchsorted(warehouses, other.warehouses)[other.warehouse_index],
+                ]
+            ),
+            np.concatenate([self.quantities, sign * other.quantities]),
+            warehouses,
+        )
+
+    def for_material(self, material_id: int) -> "SnapshotColumns":
+        """The rows of one material"""
+        start, end = np.searchsorted(self.material_ids, [material_id, material_id + 1])
+        return SnapshotColumns(
+            self.material_ids[start:end],
+            self.warehouse_index[start:end],
+            self.quantities[start:end],
+            self.warehouses,
+        )
+
+    def in_warehouse(self, warehouse_code: str) -> "SnapshotColumns":
+        """The rows of one warehouse"""
+        matches = np.flatnonzero(self.warehouses == warehouse_code)
+        mask = self.warehouse_index == matches[0] if len(matches) else np.zeros(len(self.quantities), bool)
+        return SnapshotColumns(
+            self.material_ids[mask],
+            self.warehouse_index[mask],
+            self.quantities[mask],
+            self.warehouses,
+        )
+
+    def by_warehouse(self) -> List[Tuple[str, float]]:
+        return [
+            (str(self.warehouses[index]), float(quantity))
+            for index, quantity in zip(self.warehouse_index, self.quantities)
+        ]
+
+    def totals_by_material(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Material ids and their quantities summed over warehouses"""
+        if not len(self.material_ids):
+            return self.material_ids, self.quantities
+        # Rows are sorted by material, so each material is one contiguous run
+        starts = np.flatnonzero(np.r_[True, self.material_ids[1:] != self.material_ids[:-1]])
+        return self.material_ids[starts], np.add.reduceat(self.quantities, starts)
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            material_id=self.material_ids.astype(np.int32),
+            warehouse_index=self.warehouse_index.astype(np.int32),
+            quantity=self.quantities,
+            warehouses=self.warehouses,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SnapshotColumns":
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return cls(
+                arrays["material_id"].astype(np.int64),
+                arrays["warehouse_index"].astype(np.int64),
+                arrays["quantity"],
+                arrays["warehouses"],
+            )
+
+
+def day_cutoff(day: date) -> datetime:
+    """The end of a day: movements created before it belong to the day or earlier"""
+    return datetime.combine(day + timedelta(days=1), time.min)
+
+
+class StockSnapshotService:
+    """Service class for stock snapshots and as-of balances"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    async def take_snapshots(self, through: Optional[date] = None) -> List[StockSnapshot]:
+        """Snapshot every day after the latest snapshot, up to and including through
+
+        through defaults to yesterday (UTC); later days are still open. Days
+        without movements get no snapshot of their own, since the previous
+        one answers for them. The first snapshot is built from the ledger,
+        one chunk of materials at a time; each later one from the snapshot
+        before it and the movements of its day, read with one query for all
+        pending days.
+        """
+        through = through or datetime.utcnow().date() - timedelta(days=1)
+        latest = await self._latest_snapshot()
+        if latest is not None and latest.snapshot_date >= through:
+            return []
+
+        created = []
+        if latest is None:
+            columns = await self._ledger_columns(day_cutoff(through))
+            created.append(await self._save(through, columns))
+        else:
+            columns = await self._columns(latest)
+            daily = await self._daily_movement_totals(latest.cutoff, day_cutoff(through))
+            for day in sorted(daily):
+                columns = columns.combine(SnapshotColumns.from_rows(daily[day]))
+                created.append(await self._save(day, columns))
+
+        await self._expire_snapshots(through)
+        await self.session.commit()
+
+        for snapshot in created:
+            logger.info(
+                "Stock snapshot %s: %s balances, %s bytes",
+                snapshot.snapshot_date,
+                snapshot.balance_count,
+                snapshot.size_bytes,
+            )
+        return created
+
+    async def get_snapshots(self, skip: int = 0, limit: int = 100) -> tuple[List[StockSnapshot], int]:
+        """Get snapshots, newest first, without their data"""
+        count_result = await self.session.execute(select(func.count()).select_from(StockSnapshot))
+        total = count_result.scalar_one()
+
+        result = await self.session.execute(
+            select(StockSnapshot).order_by(desc(StockSnapshot.snapshot_date)).offset(skip).limit(limit)
+        )
+        return result.scalars().all(), total
+
+    async def balances_as_of(
+        self,
+        as_of: date,
+        material_id: Optional[int] = None,
+    ) -> Tuple[SnapshotColumns, Optional[StockSnapshot]]:
+        """Balances at the end of a day, optionally of one material only
+
+        Returns the balances and the snapshot they were derived from, or None
+        if there are no snapshots and the ledger was summed from the start.
+        """
+        end = day_cutoff(as_of)
+        snapshot = await self._nearest_snapshot(end)
+
+        if snapshot is None:
+            rows = await self._movement_totals(None, end, material_id)
+            return SnapshotColumns.from_rows(rows), None
+
+        columns = await self._columns(snapshot)
+        if material_id is not None:
+            columns = columns.for_material(material_id)
+
+        if snapshot.cutoff <= end:
+            rows = await self._movement_totals(snapshot.cutoff, end, material_id)
+            sign = 1.0
+        else:
+            rows = await self._movement_totals(end, snapshot.cutoff, material_id)
+            sign = -1.0
+
+        return columns.combine(SnapshotColumns.from_rows(rows), sign), snapshot
+
+    async def material_as_of(self, as_of: date, material_id: int) -> dict:
+        """On-hand quantity of one material per warehouse at the end of a day"""
+        material = await self.session.get(Material, material_id)
+        if not material:
+            raise NotFoundException("Material not found")
+
+        columns, snapshot = await self.balances_as_of(as_of, material.id)
+        warehouses = columns.by_warehouse()
+
+        return {
+            "material_id": material.id,
+            "material_code": material.material_code,
+            "as_of": as_of,
+            "snapshot_date": snapshot.snapshot_date if snapshot else None,
+            "quantity_on_hand": sum(quantity for _, quantity in warehouses),
+            "warehouses": [
+                {"warehouse_code": code, "quantity_on_hand": quantity} for code, quantity in warehouses
+            ],
+        }
+
+    async def valuation(self, as_of: date, warehouse_code: Optional[str] = None, top: int = 50) -> dict:
+        """Value every material's stock at the end of a day at its standard cost
+
+        Quantities come from the nearest snapshot; costs are the current
+        standard costs of the material master.
+        """
+        columns, snapshot = await self.balances_as_of(as_of)
+        if warehouse_code:
+            columns = columns.in_warehouse(warehouse_code)
+        material_ids, quantities = columns.totals_by_material()
+
+        result = await self.session.execute(
+            select(Material.id, Material.standard_cost, Material.category).order_by(Material.id)
+        )
+        master = result.all()
+        master_ids = np.array([row.id for row in master], dtype=np.int64)
+        costs = np.array([row.standard_cost for row in master], dtype=np.float64)
+        categories = np.array([row.category or "uncategorized" for row in master], dtype=str)
+
+        # Every material in the ledger is in the master (the foreign key sees to that)
+        positions = np.searchsorted(master_ids, material_ids)
+        values = quantities * costs[positions]
+
+        category_names, category_index = np.unique(categories[positions], return_inverse=True)
+        category_values = np.bincount(category_index.ravel(), weights=values, minlength=len(category_names))
+
+        top_positions = np.argsort(-values, kind="stable")[:top]
+        top_ids = [int(material_id) for material_id in material_ids[top_positions]]
+        names = {}
+        if top_ids:
+            result = await self.session.execute(
+                select(Material.id, Material.material_code, Material.name).where(Material.id.in_(top_ids))
+            )
+            names = {row.id: row for row in result}
+
+        return {
+            "as_of": as_of,
+            "snapshot_date": snapshot.snapshot_date if snapshot else None,
+            "warehouse_code": warehouse_code,
+            "materials": int(len(material_ids)),
+            "total_quantity": float(quantities.sum()),
+            "total_value": float(values.sum()),
+            "by_category": {str(name): float(value) for name, value in zip(category_names, category_values)},
+            "top": [
+                {
+                    "material_id": material_id,
+                    "material_code": names[material_id].material_code,
+                    "name": names[material_id].name,
+                    "quantity_on_hand": float(quantities[position]),
+                    "unit_cost": float(costs[positions[position]]),
+                    "value": float(values[position]),
+                }
+                for material_id, position in zip(top_ids, top_positions)
+            ],
+        }
+
+    async def _latest_snapshot(self) -> Optional[StockSnapshot]:
+        result = await self.session.execute(
+            select(StockSnapshot).order_by(desc(StockSnapshot.snapshot_date)).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def _nearest_snapshot(self, moment: datetime) -> Optional[StockSnapshot]:
+        """The snapshot whose cutoff is closest to a moment, on either side"""
+        before = await self.session.execute(
+            select(StockSnapshot).where(StockSnapshot.cutoff <= moment).order_by(desc(StockSnapshot.cutoff)).limit(1)
+        )
+        after = await self.session.execute(
+            select(StockSnapshot).where(StockSnapshot.cutoff > moment).order_by(StockSnapshot.cutoff).limit(1)
+        )
+        candidates = [snapshot for snapshot in (before.scalar_one_or_none(), after.scalar_one_or_none()) if snapshot]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda snapshot: abs(snapshot.cutoff - moment))
+
+    async def _columns(self, snapshot: StockSnapshot) -> SnapshotColumns:
+        """Decode a snapshot's data, reusing recently decoded snapshots"""
+        key = (snapshot.id, snapshot.snapshot_date)
+        columns = _snapshot_cache.get(key)
+        if columns is not None:
+            _snapshot_cache.move_to_end(key)
+            return columns
+
+        result = await self.session.execute(select(StockSnapshot.data).where(StockSnapshot.id == snapshot.id))
+        # Decompressing a large snapshot takes a while; keep it off the event loop
+        columns = await asyncio.to_thread(SnapshotColumns.from_bytes, result.scalar_one())
+
+        _snapshot_cache[key] = columns
+        while len(_snapshot_cache) > SNAPSHOT_CACHE_SIZE:
+            _snapshot_cache.popitem(last=False)
+        return columns
+
+    async def _movement_totals(
+        self,
+        start: Optional[datetime],
+        end: datetime,
+        material_id: Optional[int] = None,
+    ) -> List[Tuple[int, str, float]]:
+        """Net movement per material and warehouse created in [start, end)"""
+        query = select(
+            StockMovement.material_id,
+            StockMovement.warehouse_code,
+            func.sum(StockMovement.quantity),
+        ).where(StockMovement.created_at < end)
+        if start is not None:
+            query = query.where(StockMovement.created_at >= start)
+        if material_id is not None:
+            query = query.where(StockMovement.material_id == material_id)
+
+        result = await self.session.execute(
+            query.group_by(StockMovement.material_id, StockMovement.warehouse_code)
+        )
+        return [tuple(row) for row in result]
+
+    async def _daily_movement_totals(
+        self,
+        start: datetime,
+        end: datetime,
+    ) -> Dict[date, List[Tuple[int, str, float]]]:
+        """Net movement per day, material and warehouse created in [start, end)"""
+        day = func.date(StockMovement.created_at)
+        result = await self.session.execute(
+            select(day, StockMovement.material_id, StockMovement.warehouse_code, func.sum(StockMovement.quantity))
+            .where(StockMovement.created_at >= start, StockMovement.created_at < end)
+            .group_by(day, StockMovement.material_id, StockMovement.warehouse_code)
+        )
+        daily = defaultdict(list)
+        for day_value, material_id, warehouse_code, quantity in result:
+            # date() returns a date on PostgreSQL and an ISO string on SQLite
+            daily[date.fromisoformat(str(day_value)[:10])].append((material_id, warehouse_code, quantity))
+        return daily
+
+    async def _ledger_columns(self, end: datetime) -> SnapshotColumns:
+        """Balances at a moment summed from the whole ledger, one chunk of materials at a time"""
+        rows = []
+        async for first_id, last_id, _ in material_chunks(self.session, self.settings.INVENTORY_CHUNK_SIZE):
+            result = await self.session.execute(
+                select(
+                    StockMovement.material_id,
+                    StockMovement.warehouse_code,
+                    func.sum(StockMovement.quantity),
+                )
+                .where(StockMovement.material_id.between(first_id, last_id), StockMovement.created_at < end)
+                .group_by(StockMovement.material_id, StockMovement.warehouse_code)
+            )
+            rows.extend(tuple(row) for row in result)
+        return SnapshotColumns.from_rows(rows)
+
+    async def _save(self, day: date, columns: SnapshotColumns) -> StockSnapshot:
+        data = await asyncio.to_thread(columns.to_bytes)
+        snapshot = StockSnapshot(
+            snapshot_date=day,
+            cutoff=day_cutoff(day),
+            balance_count=len(columns.quantities),
+            material_count=len(np.unique(columns.material_ids)),
+            total_quantity=float(columns.quantities.sum()),
+            format="npz",
+            size_bytes=len(data),
+            data=data,
+        )
+        self.session.add(snapshot)
+        await self.session.flush()
+        return snapshot
+
+    async def _expire_snapshots(self, today: date) -> None:
+        """Delete daily snapshots past retention, keeping month-end ones"""
+        oldest = today - timedelta(days=self.settings.INVENTORY_SNAPSHOT_RETENTION_DAYS)
+        result = await self.session.execute(
+            select(StockSnapshot.id, StockSnapshot.snapshot_date).where(StockSnapshot.snapshot_date < oldest)
+        )
+        expired = [row.id for row in result if (row.snapshot_date + timedelta(days=1)).day != 1]
+        if expired:
+            await self.session.execute(delete(StockSnapshot).where(StockSnapshot.id.in_(expired)))
+            logger.info("Deleted %s expired stock snapshots", len(expired))
+
+
+async def run_snapshots(through: Optional[date] = None) -> List[date]:
+    """Take the pending daily snapshots once"""
+    from app.db import get_sessionmaker
+
+    async with get_sessionmaker()() as session:
+        snapshots = await StockSnapshotService(session).take_snapshots(through)
+        return [snapshot.snapshot_date for snapshot in snapshots]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Take daily stock snapshots")
+    parser.add_argument("--through", type=date.fromisoformat, default=None, help="last day to snapshot (YYYY-MM-DD)")
+    args = parser.parse_args()
+    print(asyncio.run(run_snapshots(args.through)))
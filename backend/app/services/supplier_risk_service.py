@@ -0,0 +1,378 @@
+"""
+Supplier risk scoring from purchase order history
+
+Features of every supplier_id are aggregated set-based from its purchase
+orders, live and archived, placed in the last SUPPLIER_RISK_HISTORY_DAYS:
+
+- delivery: received orders and those received by their due_date, the day
+  of receipt being the first stock receipt posted against the order
+- cancellations: cancelled orders out of all but drafts
+- price volatility: the coefficient of variation of the unit prices of each
+  material bought from the supplier, averaged over its lines
+- concentration: the supplier's share of all purchase spend
+
+One NumPy pass turns them into risks from 0 to 100 and a weighted risk
+score. Delivery and cancellation rates are shrunk towards the rate over all
+suppliers by PRIOR_ORDERS orders' worth, so a supplier with two orders is
+not scored on them alone. Scores are stored per supplier in
+supplier_risk_profiles, which profiles are read from, and per supplier and
+day in supplier_risk_scores for the history. Rescore with POST
+/ml/supplier-risk/refresh or once a night with:
+
+    python -m app.services.supplier_risk_service
+"""
+
+import argparse
+import asyncio
+import re
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import Date, and_, case, cast, delete, func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import NotFoundException, ValidationException, get_logger, get_settings
+from app.models.archive import POLineItemArchive, PurchaseOrderArchive
+from app.models.inventory import MovementType, StockMovement
+from app.models.purchase_order import POLineItem, POStatus, PurchaseOrder
+from app.models.supplier_risk import SupplierRiskProfile, SupplierRiskScore
+
+logger = get_logger(__name__)
+
+# Weight of each risk in the risk score
+RISK_WEIGHTS = {
+    "delivery_risk": 0.40,
+    "cancellation_risk": 0.25,
+    "price_risk": 0.20,
+    "concentration_risk": 0.15,
+}
+# Orders' worth of the all-supplier rate a supplier's own delivery and cancellation rates are blended with
+PRIOR_ORDERS = 5
+# Price volatility and spend share at which those risks reach 100
+FULL_PRICE_VOLATILITY = 0.25
+FULL_SPEND_SHARE = 0.25
+# Score change between runs below which the trend is flat
+TREND_TOLERANCE = 2.0
+
+# Units of a history timeframe such as "12m", in days
+TIMEFRAME_DAYS = {"d": 1, "w": 7, "m": 365 / 12, "y": 365}
+
+
+def score_suppliers(features: dict) -> dict:
+    """Risks and risk score of every supplier from its features, one array each"""
+    orders, cancelled = features["orders"], features["cancelled_orders"]
+    received, on_time = features["received_orders"], features["on_time_orders"]
+
+    # Rates over all suppliers, which a supplier's own are shrunk towards
+    late_rate = 1 - on_time.sum() / received.sum() if received.sum() else 0.0
+    cancel_rate = cancelled.sum() / orders.sum() if orders.sum() else 0.0
+    risks = {
+        "delivery_risk": 100 * (received - on_time + PRIOR_ORDERS * late_rate) / (received + PRIOR_ORDERS),
+        "cancellation_risk": 100 * (cancelled + PRIOR_ORDERS * cancel_rate) / (orders + PRIOR_ORDERS),
+        "price_risk": 100 * np.clip(features["price_volatility"] / FULL_PRICE_VOLATILITY, 0, 1),
+        "concentration_risk": 100 * np.clip(features["spend_share"] / FULL_SPEND_SHARE, 0, 1),
+    }
+    risks["risk_score"] = sum(weight * risks[name] for name, weight in RISK_WEIGHTS.items())
+    return risks
+
+
+class SupplierRiskService:
+    """Service class for supplier risk scores"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.settings = get_settings()
+
+    async def load_features(self, since: date) -> dict:
+        """Features of every supplier with orders since since, one array each, sorted by supplier_id"""
+        orders = union_all(*(
+            select(po.id, po.supplier_id, po.supplier_name, po.status, po.due_date, po.total_amount)
+            .where(po.po_date >= since, po.status != POStatus.DRAFT)
+            for po in (PurchaseOrder, PurchaseOrderArchive)
+        )).subquery()
+        receipts = (
+            select(StockMovement.reference_id, func.min(StockMovement.created_at).label("received_at"))
+            .where(
+                StockMovement.reference_type == "purchase_order",
+                StockMovement.movement_type == MovementType.RECEIPT,
+                StockMovement.created_at >= datetime.combine(since, datetime.min.time()),
+            )
+            .group_by(StockMovement.reference_id)
+            .subquery()
+        )
+        days_late = self._days_between(orders.c.due_date, receipts.c.received_at)
+        cancelled = orders.c.status == POStatus.CANCELLED
+        result = await self.session.execute(
+            select(
+                orders.c.supplier_id,
+                func.max(orders.c.supplier_name),
+                func.count(),
+                func.sum(case((cancelled, 1), else_=0)),
+                func.count(receipts.c.reference_id),
+                func.sum(case((days_late <= 0, 1), else_=0)),
+                func.sum(case((days_late > 0, days_late), else_=0)),
+                func.sum(case((cancelled, 0), else_=orders.c.total_amount)),
+            )
+            .outerjoin(receipts, receipts.c.reference_id == orders.c.id)
+            .group_by(orders.c.supplier_id)
+            .order_by(orders.c.supplier_id)
+        )
+        rows = result.all()
+
+        # Unit price count, sum and sum of squares per supplier and material
+        lines = union_all(*(
+            select(po.supplier_id, line.material_code, line.unit_price)
+            .join(po, po.id == line.purchase_order_id)
+            .where(po.po_date >= since, po.status.not_in((POStatus.DRAFT, POStatus.CANCELLED)))
+            for po, line in ((PurchaseOrder, POLineItem), (PurchaseOrderArchive, POLineItemArchive))
+        )).subquery()
+        result = await self.session.execute(
+            select(
+                lines.c.supplier_id,
+                func.count(),
+                func.sum(lines.c.unit_price),
+                func.sum(lines.c.unit_price * lines.c.unit_price),
+            ).group_by(lines.c.supplier_id, lines.c.material_code)
+        )
+        prices = result.all()
+
+        columns = list(zip(*rows)) if rows else [()] * 8
+        supplier_ids = np.array(columns[0], dtype=np.int64)
+        features = {
+            "supplier_id": supplier_ids,
+            "supplier_name": list(columns[1]),
+            **{
+                name: np.array(values, dtype=float)
+                for name, values in zip(
+                    ("orders", "cancelled_orders", "received_orders", "on_time_orders", "days_late", "spend"),
+                    columns[2:],
+                )
+            },
+        }
+        spend = features["spend"]
+        features["spend_share"] = spend / spend.sum() if spend.sum() > 0 else np.zeros(len(spend))
+        late = features["received_orders"] - features["on_time_orders"]
+        features["average_days_late"] = np.divide(features["days_late"], late, out=np.zeros(len(late)), where=late > 0)
+
+        # Coefficient of variation of each material's prices, averaged over the supplier's lines
+        features["materials"] = np.zeros(len(supplier_ids))
+        features["price_volatility"] = np.zeros(len(supplier_ids))
+        if prices:
+            supplier, count, total, squares = (np.array(values, dtype=float) for values in zip(*prices))
+            mean = total / count
+            deviation = np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+            variation = np.divide(deviation, mean, out=np.zeros(len(mean)), where=mean > 0)
+            at = np.searchsorted(supplier_ids, supplier.astype(np.int64))
+            size = len(supplier_ids)
+            features["materials"] = np.bincount(at, minlength=size).astype(float)
+            line_count = np.bincount(at, weights=count, minlength=size)
+            weighted = np.bincount(at, weights=count * variation, minlength=size)
+            features["price_volatility"] = np.divide(
+                weighted, line_count, out=np.zeros(size), where=line_count > 0
+            )
+        return features
+
+    async def refresh(self) -> dict:
+        """Score every supplier with orders in the history window"""
+        started = time.perf_counter()
+        scored_at = datetime.utcnow()
+        today = scored_at.date()
+
+        features = await self.load_features(today - timedelta(days=self.settings.SUPPLIER_RISK_HISTORY_DAYS))
+        previous = await self._previous_scores(today)
+        loaded = time.perf_counter()
+        risks = await asyncio.to_thread(score_suppliers, features)
+        scoring = time.perf_counter()
+
+        supplier_ids = features["supplier_id"].tolist()
+        profiles = [
+            {
+                "supplier_id": supplier_id,
+                "supplier_name": features["supplier_name"][index],
+                **{
+                    name: int(features[name][index])
+                    for name in ("orders", "cancelled_orders", "received_orders", "on_time_orders", "materials")
+                },
+                **{
+                    name: float(features[name][index])
+                    for name in ("average_days_late", "spend", "spend_share", "price_volatility")
+                },
+                **{name: float(values[index]) for name, values in risks.items()},
+                "previous_score": previous.get(supplier_id),
+                "scored_at": scored_at,
+            }
+            for index, supplier_id in enumerate(supplier_ids)
+        ]
+        history = [
+            {
+                "supplier_id": supplier_id,
+                "scored_on": today,
+                **{name: float(values[index]) for name, values in risks.items()},
+            }
+            for index, supplier_id in enumerate(supplier_ids)
+        ]
+        await self._upsert(SupplierRiskProfile, profiles, ["supplier_id"])
+        await self._upsert(SupplierRiskScore, history, ["supplier_id", "scored_on"])
+        # Suppliers without orders in the window any more
+        result = await self.session.execute(
+            delete(SupplierRiskProfile).where(SupplierRiskProfile.scored_at < scored_at)
+        )
+        await self.session.commit()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        high_risk = int((risks["risk_score"] >= self.settings.SUPPLIER_RISK_THRESHOLD).sum())
+        logger.info(
+            "Suppliers scored: %s (%s high risk) in %.0fms", len(supplier_ids), high_risk, elapsed_ms
+        )
+        return {
+            "suppliers": len(supplier_ids),
+            "high_risk": high_risk,
+            "removed": result.rowcount,
+            "load_ms": round((loaded - started) * 1000, 1),
+            "score_ms": round((scoring - loaded) * 1000, 1),
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
+
+    async def _previous_scores(self, today: date) -> dict:
+        """Each supplier's risk score on the last day it was scored before today"""
+        last_day = (
+            select(SupplierRiskScore.supplier_id, func.max(SupplierRiskScore.scored_on).label("scored_on"))
+            .where(SupplierRiskScore.scored_on < today)
+            .group_by(SupplierRiskScore.supplier_id)
+            .subquery()
+        )
+        result = await self.session.execute(
+            select(SupplierRiskScore.supplier_id, SupplierRiskScore.risk_score).join(
+                last_day,
+                and_(
+                    last_day.c.supplier_id == SupplierRiskScore.supplier_id,
+                    last_day.c.scored_on == SupplierRiskScore.scored_on,
+                ),
+            )
+        )
+        return dict(result.all())
+
+    async def _upsert(self, model, rows: List[dict], keys: List[str]) -> None:
+        """Insert or update rows by keys, as one executemany of a statement compiled once"""
+        if not rows:
+            return
+        stmt = self._dialect_insert()(model.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={**{name: stmt.excluded[name] for name in set(rows[0]) - set(keys)}, "updated_at": func.now()},
+        )
+        await self.session.execute(stmt, rows)
+
+    def describe(self, profile: SupplierRiskProfile) -> dict:
+        """A profile with its rates, its status against SUPPLIER_RISK_THRESHOLD and its trend"""
+        threshold = self.settings.SUPPLIER_RISK_THRESHOLD
+        if profile.risk_score >= threshold:
+            status = "high_risk"
+        elif profile.risk_score >= threshold - 20:
+            status = "watch"
+        else:
+            status = "low_risk"
+
+        # Risk going down is performance going up
+        change = None if profile.previous_score is None else profile.risk_score - profile.previous_score
+        if change is None or abs(change) < TREND_TOLERANCE:
+            trend = "flat"
+        else:
+            trend = "down" if change > 0 else "up"
+
+        return {
+            **{column.name: getattr(profile, column.name) for column in SupplierRiskProfile.__table__.columns},
+            "on_time_rate": profile.on_time_orders / profile.received_orders if profile.received_orders else None,
+            "cancellation_rate": profile.cancelled_orders / profile.orders if profile.orders else None,
+            "status": status,
+            "performance_trend": trend,
+        }
+
+    async def get_scores(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> tuple[List[SupplierRiskProfile], int]:
+        """Get the scored suppliers, highest risk first"""
+        query = select(SupplierRiskProfile)
+        if search:
+            query = query.where(SupplierRiskProfile.supplier_name.ilike(f"%{search}%"))
+        if status:
+            threshold = self.settings.SUPPLIER_RISK_THRESHOLD
+            bounds = {
+                "high_risk": (threshold, None),
+                "watch": (threshold - 20, threshold),
+                "low_risk": (None, threshold - 20),
+            }
+            if status not in bounds:
+                raise ValidationException(f"Invalid status: {status}")
+            low, high = bounds[status]
+            if low is not None:
+                query = query.where(SupplierRiskProfile.risk_score >= low)
+            if high is not None:
+                query = query.where(SupplierRiskProfile.risk_score < high)
+
+        count_result = await self.session.execute(select(func.count()).select_from(query.subquery()))
+        total = count_result.scalar_one()
+
+        result = await self.session.execute(
+            query.order_by(SupplierRiskProfile.risk_score.desc(), SupplierRiskProfile.supplier_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return result.scalars().all(), total
+
+    async def get_profile(self, supplier_id: int) -> SupplierRiskProfile:
+        """Get a supplier's profile, by its unique supplier_id"""
+        result = await self.session.execute(
+            select(SupplierRiskProfile).where(SupplierRiskProfile.supplier_id == supplier_id)
+        )
+        profile = result.scalar_one_or_none()
+        if not profile:
+            raise NotFoundException(f"No risk profile for supplier: {supplier_id}")
+        return profile
+
+    async def get_history(self, supplier_id: int, timeframe: str = "12m") -> List[SupplierRiskScore]:
+        """A supplier's daily scores over the timeframe, a number and d, w, m or y (e.g. "12m")"""
+        match = re.fullmatch(r"(\d+)([dwmy])", timeframe)
+        if not match:
+            raise ValidationException(f"Invalid timeframe: {timeframe}")
+        since = date.today() - timedelta(days=round(int(match.group(1)) * TIMEFRAME_DAYS[match.group(2)]))
+        result = await self.session.execute(
+            select(SupplierRiskScore)
+            .where(SupplierRiskScore.supplier_id == supplier_id, SupplierRiskScore.scored_on >= since)
+            .order_by(SupplierRiskScore.scored_on)
+        )
+        return result.scalars().all()
+
+    def _days_between(self, start, end):
+        """Days from the date start to the day of the timestamp end, in the bound database's dialect"""
+        if self.session.get_bind().dialect.name == "postgresql":
+            return cast(end, Date) - start
+        return func.julianday(func.date(end)) - func.julianday(start)
+
+    def _dialect_insert(self):
+        """INSERT construct with ON CONFLICT support for the bound database"""
+        if self.session.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert
+
+
+async def run_refresh() -> dict:
+    """Score every supplier once"""
+    from app.db import get_sessionmaker
+
+    async with get_sessionmaker()() as session:
+        return await SupplierRiskService(session).refresh()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the risk of every supplier from its purchase orders")
+    parser.parse_args()
+    print(asyncio.run(run_refresh()))
@@ -49,7 +49,6 @@ class UserService:
 
         self.session.add(user)
         await self.session.commit()
-        await self.session.refresh(user)
 
         return user
 
@@ -98,6 +97,5 @@ class UserService:
                 setattr(user, key, value)
 
         await self.session.commit()
-        await self.session.refresh(user)
 
         return user
@@ -6,10 +6,17 @@ from typing import List, Optional
 
 from sqlalchemy import select, desc
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from app.core import NotFoundException, ValidationException
-from app.models.work_order import WorkOrder, WOStatus
+from app.core import NotFoundException, ValidationException, get_settings
+from app.models.archive import WorkOrderArchive
+from app.models.work_order import WorkOrder, WOMaterial, WOStatus
 from app.schemas import CreateWorkOrderRequest, UpdateWorkOrderRequest
+from app.services.archive_service import get_archived_order, paginate_with_archive
+from app.services.bom_service import BOMService
+from app.services.dye_sequencing_service import DyeSequencingService
+from app.services.inventory_service import InventoryService
+from app.services.scheduling_service import SchedulingService
 from app.utils import ValidationUtil
 
 
@@ -39,21 +46,58 @@ class WorkOrderService:
             quantity=request.quantity,
             due_date=request.due_date,
             priority=request.priority,
+            work_center_category=request.work_center_category,
+            fabric_type=request.fabric_type,
             notes=request.notes,
             created_by=user_id,
             status=WOStatus.DRAFT,
             progress_percentage=0,
+            materials=[],
         )
 
+        if request.dye_recipe_code:
+            recipe = await DyeSequencingService(self.session).get_dye_recipe_by_code(request.dye_recipe_code)
+            wo.dye_recipe_id = recipe.id
+
+        inventory = InventoryService(self.session)
+        warehouse_code = get_settings().INVENTORY_DEFAULT_WAREHOUSE
+        if request.product_code:
+            product = (await inventory.get_materials_by_code([request.product_code]))[request.product_code]
+            wo.product_id = product.id
+            if not request.materials:
+                # One level only; made components get work orders of their own
+                wo.materials = [
+                    WOMaterial(material_id=component_id, warehouse_code=warehouse_code, quantity=quantity)
+                    for component_id, quantity in await BOMService(self.session).component_requirements(
+                        product.id, request.quantity
+                    )
+                ]
+
+        if request.materials:
+            materials = await inventory.get_materials_by_code(
+                line.material_code for line in request.materials
+            )
+            wo.materials = [
+                WOMaterial(
+                    material_id=materials[line.material_code].id,
+                    warehouse_code=line.warehouse_code or warehouse_code,
+                    quantity=line.quantity,
+                    cut_length=line.cut_length,
+                )
+                for line in request.materials
+            ]
+
         self.session.add(wo)
         await self.session.commit()
-        await self.session.refresh(wo)
 
         return wo
 
-    async def get_work_order(self, wo_id: int) -> WorkOrder:
+    async def get_work_order(self, wo_id: int, include_archived: bool = False) -> WorkOrder:
         """Get work order by ID"""
-        wo = await self.session.get(WorkOrder, wo_id)
+        wo = await self.session.get(WorkOrder, wo_id, options=[selectinload(WorkOrder.materials)])
+
+        if not wo and include_archived:
+            wo = await get_archived_order(self.session, WorkOrderArchive, wo_id)
 
         if not wo:
             raise NotFoundException("Work order not found")
@@ -65,9 +109,15 @@ class WorkOrderService:
         skip: int = 0,
         limit: int = 10,
         status: Optional[str] = None,
+        include_archived: bool = False,
     ) -> tuple[List[WorkOrder], int]:
         """Get all work orders with optional filtering"""
-        query = select(WorkOrder)
+        if include_archived:
+            return await paginate_with_archive(
+                self.session, WorkOrder, WorkOrderArchive, skip=skip, limit=limit, status=status
+            )
+
+        query = select(WorkOrder).options(selectinload(WorkOrder.materials))
 
         if status:
             query = query.where(WorkOrder.status == status)
@@ -94,7 +144,20 @@ class WorkOrderService:
         """Update work order"""
         wo = await self.get_work_order(wo_id)
 
+        # Changes that move the order on the schedule
+        schedule_fields = request.model_dump(
+            include={"quantity", "due_date", "priority", "work_center_category"},
+            exclude_none=True,
+        )
+        reschedule = any(getattr(wo, field) != value for field, value in schedule_fields.items())
+        for field, value in schedule_fields.items():
+            setattr(wo, field, value)
+
         if request.status:
+            if request.status == WOStatus.IN_PROGRESS and wo.status != WOStatus.IN_PROGRESS:
+                # Posted in the same transaction as the status change
+                await InventoryService(self.session).post_work_order_issue(wo)
+            reschedule = reschedule or request.status in (WOStatus.COMPLETED, WOStatus.CANCELLED)
             wo.status = request.status
         if request.progress_percentage is not None:
             if not ValidationUtil.validate_percentage(request.progress_percentage):
@@ -105,8 +168,10 @@ class WorkOrderService:
         if request.notes is not None:
             wo.notes = request.notes
 
+        if reschedule and wo.work_center_id is not None:
+            await SchedulingService(self.session).reschedule_order(wo)
+
         await self.session.commit()
-        await self.session.refresh(wo)
 
         return wo
 
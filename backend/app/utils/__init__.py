@@ -1,9 +1,11 @@
 """Utilities module initialization"""
 
 from app.utils.common import PaginationUtil, ResponseUtil, ValidationUtil
+from app.utils.interval_tree import IntervalTree
 
 __all__ = [
     "PaginationUtil",
     "ResponseUtil",
     "ValidationUtil",
+    "IntervalTree",
 ]
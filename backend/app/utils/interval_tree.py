@@ -0,0 +1,193 @@
+"""
+Interval tree for the bookings of one resource
+"""
+
+import random
+from typing import Any, Iterable, List, Optional, Tuple
+
+Interval = Tuple[float, float, Any]
+
+
+class _Node:
+    __slots__ = ("start", "end", "key", "priority", "left", "right", "min_start", "max_end", "max_gap")
+
+    def __init__(self, start: float, end: float, key: Any, priority: float):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.priority = priority
+        self.left = None
+        self.right = None
+        self.min_start = start
+        self.max_end = end
+        self.max_gap = 0.0
+
+    def update(self) -> None:
+        """Recompute the subtree aggregates from the children"""
+        left, right = self.left, self.right
+        self.min_start = left.min_start if left else self.start
+        self.max_end = self.end
+        self.max_gap = 0.0
+        if left:
+            self.max_end = max(self.max_end, left.max_end)
+            self.max_gap = max(left.max_gap, self.start - left.max_end)
+        if right:
+            self.max_gap = max(self.max_gap, right.max_gap, right.min_start - self.max_end)
+            self.max_end = max(self.max_end, right.max_end)
+
+
+class IntervalTree:
+    """Half-open [start, end) intervals, each with a key, in a treap ordered by (start, key)
+
+    Every subtree keeps its smallest start, largest end and largest gap
+    between consecutive intervals, so overlap queries and the search for the
+    first free slot skip whole subtrees. The slot search assumes the
+    intervals do not overlap one another, as with the bookings of a machine.
+    """
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        intervals = sorted(intervals, key=lambda interval: (interval[0], interval[2]))
+        self._root = self._build(intervals)
+        self._size = len(intervals)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, start: float, end: float, key: Any) -> None:
+        """Add an interval"""
+        self._root = self._insert(self._root, _Node(start, end, key, random.random()))
+        self._size += 1
+
+    def remove(self, start: float, key: Any) -> bool:
+        """Remove the interval with this start and key; False if there is none"""
+        self._root, removed = self._remove(self._root, start, key)
+        if removed:
+            self._size -= 1
+        return removed
+
+    def overlapping(self, start: float, end: float) -> List[Interval]:
+        """Intervals overlapping [start, end), ordered by start"""
+        found = []
+        stack = [(self._root, False)]
+        while stack:
+            node, visited = stack.pop()
+            if node is None:
+                continue
+            if visited:
+                if node.end > start:
+                    found.append((node.start, node.end, node.key))
+                continue
+            if node.max_end <= start or node.min_start >= end:
+                continue
+            if node.start < end:
+                stack.append((node.right, False))
+                stack.append((node, True))
+            stack.append((node.left, False))
+        return found
+
+    def first_fit(self, earliest: float, length: float) -> float:
+        """Earliest start at or after earliest of a free slot of this length"""
+        fit, last_end = self._fit(self._root, float("-inf"), earliest, length)
+        return fit if fit is not None else max(last_end, earliest)
+
+    def __iter__(self):
+        stack, node = [], self._root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.start, node.end, node.key
+            node = node.right
+
+    # ----- Internals -----
+
+    def _fit(self, node: Optional[_Node], previous_end: float, earliest: float, length: float) -> Tuple[Optional[float], float]:
+        """First fit within a subtree, given the largest end before it, and that largest end after it"""
+        if node is None:
+            return None, previous_end
+        after = max(previous_end, node.max_end)
+        if node.max_end <= earliest:
+            return None, after
+        if max(previous_end, earliest) + length > node.min_start and node.max_gap < length:
+            return None, after
+
+        fit, previous_end = self._fit(node.left, previous_end, earliest, length)
+        if fit is not None:
+            return fit, after
+        candidate = max(previous_end, earliest)
+        if candidate + length <= node.start:
+            return candidate, after
+        fit, _ = self._fit(node.right, max(previous_end, node.end), earliest, length)
+        return fit, after
+
+    def _insert(self, root: Optional[_Node], node: _Node) -> _Node:
+        if root is None:
+            return node
+        if (node.start, node.key) < (root.start, root.key):
+            root.left = self._insert(root.left, node)
+            if root.left.priority > root.priority:
+                root = self._rotate_right(root)
+        else:
+            root.right = self._insert(root.right, node)
+            if root.right.priority > root.priority:
+                root = self._rotate_left(root)
+        root.update()
+        return root
+
+    def _remove(self, root: Optional[_Node], start: float, key: Any) -> Tuple[Optional[_Node], bool]:
+        if root is None:
+            return None, False
+        if (start, key) == (root.start, root.key):
+            if root.left is None:
+                return root.right, True
+            if root.right is None:
+                return root.left, True
+            if root.left.priority > root.right.priority:
+                root = self._rotate_right(root)
+                root.right, removed = self._remove(root.right, start, key)
+            else:
+                root = self._rotate_left(root)
+                root.left, removed = self._remove(root.left, start, key)
+        elif (start, key) < (root.start, root.key):
+            root.left, removed = self._remove(root.left, start, key)
+        else:
+            root.right, removed = self._remove(root.right, start, key)
+        root.update()
+        return root, removed
+
+    @staticmethod
+    def _rotate_right(node: _Node) -> _Node:
+        pivot = node.left
+        node.left, pivot.right = pivot.right, node
+        node.update()
+        pivot.update()
+        return pivot
+
+    @staticmethod
+    def _rotate_left(node: _Node) -> _Node:
+        pivot = node.right
+        node.right, pivot.left = pivot.left, node
+        node.update()
+        pivot.update()
+        return pivot
+
+    @staticmethod
+    def _build(intervals: List[Interval]) -> Optional[_Node]:
+        """Treap of sorted intervals in linear time, as the Cartesian tree of random priorities"""
+        stack: List[_Node] = []
+        for start, end, key in intervals:
+            node = _Node(start, end, key, random.random())
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+                # Its subtree is complete once it is popped
+                last.update()
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+        # Nodes left on the stack form the right spine, updated bottom up
+        for node in reversed(stack):
+            node.update()
+        return stack[0] if stack else None
@@ -0,0 +1,149 @@
+"""
+Available to promise: answer latency from the in-memory index against querying the orders
+
+--orders open sales order lines and --work-orders open work orders over
+--products products, due at random over the next --days days, are loaded into
+an ATPIndex and into an in-memory SQLite database indexed by product. Random
+checks of a product, quantity and date are then answered both ways: by the
+index, and by summing the product's demand and supply per day in SQL and
+taking the least projected stock from the date on, which is what answering
+every check from the database would cost at best. Also timed are building
+the index from rows already fetched, and the incremental update applied for
+a committed change of one order.
+
+Usage:
+    python -m benchmarks.bench_atp [--orders 300000] [--work-orders 50000] [--products 5000] [--days 180] [--checks 5000]
+"""
+
+import argparse
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.services.atp_service import ATPIndex
+
+
+def synthetic(orders: int, work_orders: int, products: int, days: int, seed: int = 7) -> tuple:
+    rng = random.Random(seed)
+    today = date.today()
+    codes = [f"P{product:05d}" for product in range(products)]
+    on_hand = [(material_id, rng.randint(0, 2000)) for material_id in range(products)]
+    lines = [
+        (line_id, line_id // 3, rng.choice(codes), rng.randint(1, 200), today + timedelta(days=rng.randrange(days)))
+        for line_id in range(orders)
+    ]
+    supply = [
+        (wo_id, rng.randrange(products), rng.randint(50, 2000), today + timedelta(days=rng.randrange(days)))
+        for wo_id in range(work_orders)
+    ]
+    return today, codes, on_hand, lines, supply
+
+
+def build(today: date, codes: list, on_hand: list, lines: list, supply: list) -> ATPIndex:
+    index = ATPIndex(today, 365)
+    for material_id, code in enumerate(codes):
+        index.set_material(material_id, code, 14)
+    for material_id, quantity in on_hand:
+        index.set_on_hand(material_id, quantity, 0)
+    for line_id, so_id, code, quantity, due in lines:
+        if so_id not in index.sales_orders:
+            index.set_sales_order(so_id, True, due, is_new=True)
+        index.set_sales_line(line_id, so_id, code, quantity)
+    for wo_id, material_id, quantity, day in supply:
+        index.set_work_order(wo_id, material_id, True, day, quantity)
+    return index
+
+
+def database(today: date, codes: list, on_hand: list, lines: list, supply: list) -> sqlite3.Connection:
+    db = sqlite3.connect(":memory:")
+    db.executescript(
+        """
+        CREATE TABLE stock (product_code TEXT PRIMARY KEY, quantity REAL);
+        CREATE TABLE flows (product_code TEXT, day INTEGER, quantity REAL);
+        CREATE INDEX idx_flows_product ON flows (product_code, day);
+        """
+    )
+    db.executemany("INSERT INTO stock VALUES (?, ?)", [(codes[m], q) for m, q in on_hand])
+    # Lines are due with their sales order, on the date drawn for its first line
+    due = {}
+    for _, so_id, _, _, day in lines:
+        due.setdefault(so_id, day)
+    db.executemany(
+        "INSERT INTO flows VALUES (?, ?, ?)",
+        [(code, (due[so_id] - today).days, -quantity) for _, so_id, code, quantity, _ in lines]
+        + [(codes[material_id], (day - today).days, quantity) for _, material_id, quantity, day in supply],
+    )
+    return db
+
+
+def query_atp(db: sqlite3.Connection, code: str, day: int) -> float:
+    stock = db.execute("SELECT quantity FROM stock WHERE product_code = ?", (code,)).fetchone()[0]
+    rows = db.execute(
+        "SELECT day, SUM(quantity) FROM flows WHERE product_code = ? GROUP BY day ORDER BY day", (code,)
+    ).fetchall()
+    projected = stock + np.cumsum([quantity for _, quantity in rows])
+    later = [level for (flow_day, _), level in zip(rows, projected) if flow_day >= day]
+    before = [level for (flow_day, _), level in zip(rows, projected) if flow_day < day]
+    # Stock carried into the day counts unless the day's own flows change it
+    if not later or rows[len(before)][0] > day:
+        later.append(before[-1] if before else stock)
+    return min(later)
+
+
+def percentiles(samples: list) -> str:
+    p50, p99 = np.percentile(np.array(samples) * 1000, [50, 99])
+    return f"{p50:>10.3f}{p99:>10.3f}"
+
+
+def timed(function, *args) -> tuple:
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=300000)
+    parser.add_argument("--work-orders", type=int, default=50000)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--checks", type=int, default=5000)
+    args = parser.parse_args()
+
+    today, codes, on_hand, lines, supply = synthetic(args.orders, args.work_orders, args.products, args.days)
+    build_seconds, index = timed(build, today, codes, on_hand, lines, supply)
+    db = database(today, codes, on_hand, lines, supply)
+
+    rng = random.Random(3)
+    checks = [(rng.choice(codes), rng.randint(1, 500), rng.randrange(args.days)) for _ in range(args.checks)]
+    index_times, query_times, mismatches = [], [], 0
+    for code, quantity, day in checks:
+        seconds, answer = timed(index.promise, code, quantity, today + timedelta(days=day))
+        index_times.append(seconds)
+        seconds, atp = timed(query_atp, db, code, day)
+        query_times.append(seconds)
+        mismatches += abs(answer["available_to_promise"] - atp) > 1e-6
+
+    update_times = []
+    for line_id, so_id, code, quantity, due in rng.sample(lines, min(len(lines), args.checks)):
+        seconds, _ = timed(index.set_sales_line, line_id, so_id, code, quantity + 1)
+        update_times.append(seconds)
+
+    print(
+        f"{args.orders} sales order lines, {args.work_orders} work orders, {args.products} products, "
+        f"{args.checks} checks; index and SQL disagree on {mismatches}"
+    )
+    print()
+    print(f"{'':<36}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'check from the index':<36}{percentiles(index_times)}")
+    print(f"{'check from SQL (SQLite in memory)':<36}{percentiles(query_times)}")
+    print(f"{'update of one sales order line':<36}{percentiles(update_times)}")
+    print()
+    print(f"index built from fetched rows in {build_seconds * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Fabric roll cutting: waste of each method, and event loop stalls while a plan is solved
+
+--rolls synthetic rolls of 30 to 100 m are cut into the pieces of --orders
+work orders, each needing pieces of one of --lengths cut lengths. Waste is
+compared for cutting in order of arrival from rolls in stock order (how a
+plan is made by hand), first fit decreasing, and the service's solve, which
+adds column generation within --time-limit seconds.
+
+The solve is then run on an event loop with a coroutine ticking every
+millisecond: inline, in a thread, and in the process pool the service uses.
+The longest gap between ticks is how long a request would have waited.
+
+Usage:
+    python -m benchmarks.bench_cutting [--rolls 3000] [--orders 2000] [--lengths 120] [--time-limit 5]
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.services.cutting_service import first_fit_decreasing, get_cutting_pool, shutdown_cutting_pool, solve_cutting
+
+STEPS = 100
+
+
+def synthetic(rolls: int, orders: int, lengths: int, seed: int = 9) -> tuple:
+    rng = np.random.default_rng(seed)
+    roll_lengths = rng.integers(30 * STEPS, 100 * STEPS, rolls)
+    cut_lengths = rng.choice(np.arange(40, 400), size=lengths, replace=False)
+    order_pieces = rng.choice(len(cut_lengths), size=orders)
+    order_counts = rng.integers(1, 12, orders)
+    return roll_lengths, cut_lengths, order_pieces, order_counts
+
+
+def in_arrival_order(rolls: np.ndarray, cut_lengths: np.ndarray, order_pieces, order_counts) -> tuple:
+    free = rolls.copy()
+    used = np.zeros(len(rolls), dtype=bool)
+    current = 0
+    for piece, count in zip(order_pieces, order_counts):
+        for _ in range(count):
+            # Carry on with the open roll; start the next one in stock when a piece no longer fits
+            while current < len(rolls) and free[current] < cut_lengths[piece]:
+                current += 1
+            if current == len(rolls):
+                return free, used
+            free[current] -= cut_lengths[piece]
+            used[current] = True
+    return free, used
+
+
+def percentage(waste: int, cut: int) -> float:
+    return 100 * waste / cut if cut else 0.0
+
+
+async def longest_stall(solve) -> tuple:
+    stalls, done = [], False
+
+    async def tick():
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await solve()
+    elapsed = time.perf_counter() - started
+    done = True
+    await ticker
+    return elapsed, max(stalls)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rolls", type=int, default=3000)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--lengths", type=int, default=120)
+    parser.add_argument("--time-limit", type=float, default=5)
+    args = parser.parse_args()
+
+    rolls, cut_lengths, order_pieces, order_counts = synthetic(args.rolls, args.orders, args.lengths)
+    counts = np.bincount(order_pieces, weights=order_counts, minlength=len(cut_lengths)).astype(np.int64)
+    print(
+        f"{args.rolls} rolls, {args.orders} work orders, {int(counts.sum())} pieces "
+        f"of {len(cut_lengths)} lengths, {counts @ cut_lengths / STEPS:.0f} m of {rolls.sum() / STEPS:.0f} m"
+    )
+    print()
+
+    started = time.perf_counter()
+    free, used = in_arrival_order(rolls, cut_lengths, order_pieces, order_counts)
+    arrival = (time.perf_counter() - started, int(free[used].sum()), int(rolls[used].sum()))
+
+    started = time.perf_counter()
+    free, cuts = rolls.copy(), {}
+    first_fit_decreasing(free, cut_lengths, counts, cuts=cuts)
+    ffd = (time.perf_counter() - started, int(free[list(cuts)].sum()), int(rolls[list(cuts)].sum()))
+
+    started = time.perf_counter()
+    solution = solve_cutting(rolls, cut_lengths, counts, args.time_limit)
+    solved = (time.perf_counter() - started, solution.waste, int(rolls[list(solution.cuts)].sum()))
+
+    print(f"{'method':<44}{'waste m':>10}{'waste %':>10}{'ms':>10}")
+    for name, (seconds, waste, cut) in (
+        ("in order of arrival, rolls in stock order", arrival),
+        ("first fit decreasing", ffd),
+        (f"service solve ({solution.method})", solved),
+    ):
+        print(f"{name:<44}{waste / STEPS:>10.1f}{percentage(waste, cut):>10.2f}{seconds * 1000:>10.0f}")
+    if solution.lower_bound is not None:
+        print(f"{'lower bound':<44}{(solution.lower_bound - counts @ cut_lengths) / STEPS:>10.1f}")
+    print()
+
+    problem = (rolls, cut_lengths, counts, args.time_limit)
+
+    async def inline():
+        solve_cutting(*problem)
+
+    async def stalls():
+        loop = asyncio.get_running_loop()
+        # Start the workers outside the measurement
+        await loop.run_in_executor(get_cutting_pool(), time.sleep, 0)
+        return [
+            ("inline on the event loop", await longest_stall(inline)),
+            ("in a thread", await longest_stall(lambda: asyncio.to_thread(solve_cutting, *problem))),
+            ("in the process pool", await longest_stall(
+                lambda: loop.run_in_executor(get_cutting_pool(), solve_cutting, *problem)
+            )),
+        ]
+
+    print(f"{'solve run':<44}{'total ms':>10}{'stall ms':>10}")
+    for name, (elapsed, stall) in asyncio.run(stalls()):
+        print(f"{name:<44}{elapsed * 1000:>10.0f}{stall * 1000:>10.1f}")
+    shutdown_cutting_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Dye-lot sequencing: changeover hours against first in, first out, and the time it takes
+
+--orders synthetic dyeing orders over --recipes recipes of random shade depth
+and --fabrics fabric types are packed into machine loads of --capacity and
+sequenced as DyeSequencingService.plan_lots does: nearest neighbour from the
+lightest shade, then or-opt restarts until --budget-ms runs out. Changeover
+hours are compared with dyeing every order on its own in order of arrival,
+and with the nearest-neighbour path alone, and bounded from below. A recipe change costs a one-hour
+wash plus up to three hours of lightening; a fabric change costs
+--fabric-change-hours.
+
+Usage:
+    python -m benchmarks.bench_dye_sequencing [--orders 5000] [--recipes 120] [--fabrics 4] [--capacity 500] [--budget-ms 2000] [--fabric-change-hours 2]
+"""
+
+import argparse
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from app.services.dye_sequencing_service import (
+    _nearest_neighbour,
+    changeover_matrix,
+    pack_lots,
+    path_cost,
+    sequence_groups,
+)
+
+
+def synthetic(orders: int, recipes: int, fabrics: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    depths = {f"R{recipe:03d}": round(rng.uniform(0, 100), 1) for recipe in range(recipes)}
+    codes = list(depths)
+    return [
+        (order_id, rng.randint(20, 1500), f"F{rng.randrange(fabrics)}", code, depths[code])
+        for order_id, code in enumerate(rng.choices(codes, k=orders))
+    ]
+
+
+def lower_bound(cost: np.ndarray) -> float:
+    # Every group but the first is entered at least once, at its cheapest
+    entering = np.where(np.eye(len(cost), dtype=bool), np.inf, cost).min(axis=0)
+    return float(entering.sum() - entering.max())
+
+
+def timed(function, *args) -> tuple:
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--recipes", type=int, default=120)
+    parser.add_argument("--fabrics", type=int, default=4)
+    parser.add_argument("--capacity", type=float, default=500)
+    parser.add_argument("--budget-ms", type=int, default=2000)
+    parser.add_argument("--fabric-change-hours", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rows = synthetic(args.orders, args.recipes, args.fabrics)
+    groups, depths = defaultdict(list), {}
+    for order_id, quantity, fabric, recipe, depth in rows:
+        groups[(recipe, fabric)].append((order_id, quantity))
+        depths[recipe] = depth
+    keys = sorted(groups, key=lambda key: (depths[key[0]], key))
+    index = {key: position for position, key in enumerate(keys)}
+
+    cost = changeover_matrix(
+        np.array([depths[recipe] for recipe, _ in keys]),
+        np.array([recipe for recipe, _ in keys], dtype=object),
+        np.array([fabric for _, fabric in keys], dtype=object),
+        wash_hours=1.0,
+        lightening_hours=3.0,
+        fabric_change_hours=args.fabric_change_hours,
+    )
+    pack_seconds, lots = timed(lambda: [pack_lots(groups[key], args.capacity) for key in keys])
+    fifo_lots = sum(-(-quantity // args.capacity) for _, quantity, *_ in rows)
+    print(
+        f"{args.orders} orders, {len(keys)} recipe and fabric groups, "
+        f"{sum(map(len, lots))} lots (FIFO {int(fifo_lots)}) packed in {pack_seconds * 1000:.1f}ms"
+    )
+    print()
+
+    fifo = [index[(recipe, fabric)] for _, _, fabric, recipe, _ in rows]
+    nn_seconds, nn = timed(_nearest_neighbour, cost, 0)
+    search_seconds, searched = timed(sequence_groups, cost, args.budget_ms / 1000)
+
+    print(f"{'sequence':<36}{'changeover h':>14}{'ms':>10}")
+    print(f"{'first in, first out':<36}{path_cost(cost, fifo):>14.1f}{'':>10}")
+    print(f"{'nearest neighbour':<36}{path_cost(cost, nn):>14.1f}{nn_seconds * 1000:>10.1f}")
+    print(f"{'nearest neighbour + or-opt':<36}{path_cost(cost, searched):>14.1f}{search_seconds * 1000:>10.1f}")
+    print(f"{'lower bound':<36}{lower_bound(cost):>14.1f}{'':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Demand forecasting: fitting time for tens of thousands of products, and accuracy on held-out weeks
+
+--products synthetic weekly series of --weeks weeks, a mix of steady,
+trending, seasonal and intermittent demand, are fitted as
+ForecastingService.retrain does: fit_batch over chunks of --chunk-size
+products, in one process and then across --workers processes. The baseline
+fits one product at a time with the same recursion in plain Python, timed on
+a sample and scaled up. Accuracy is measured by fitting all but the last
+--holdout weeks and comparing the flat forecast with them, against repeating
+the last week and against the mean of the last eight.
+
+An incremental refresh a week later, as ForecastingService.retrain does it
+without --full, refits only the --changed share of products that had orders
+and rolls every other forecast forward a week with roll_forward.
+
+Usage:
+    python -m benchmarks.bench_forecasting [--products 50000] [--weeks 104] [--chunk-size 5000] [--workers 4]
+        [--holdout 12] [--changed 0.02]
+"""
+
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.services.forecasting_service import ALPHAS, INTERMITTENT_ADI, ForecastFit, fit_batch, roll_forward
+
+
+def synthetic(products: int, weeks: int, seed: int = 9) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    week = np.arange(weeks)
+    base = rng.gamma(2, 40, (products, 1))
+    trend = rng.normal(0, 0.004, (products, 1)) * week
+    phase = rng.integers(0, 52, (products, 1))
+    season = 1 + rng.uniform(0, 0.4, (products, 1)) * np.sin(2 * np.pi * (week + phase) / 52)
+    demand = rng.poisson(np.maximum(base * (1 + trend) * season, 0))
+    # A third of the products sell only some weeks
+    sparse = rng.random(products) < 0.33
+    demand[sparse] *= rng.random((sparse.sum(), weeks)) < rng.uniform(0.1, 0.6, (sparse.sum(), 1))
+    # and some start selling part way through
+    late = rng.random(products) < 0.2
+    demand[late] *= week[None, :] >= rng.integers(0, weeks // 2, (late.sum(), 1))
+    demand[demand.sum(axis=1) == 0, -1] = 1
+    return demand.astype(float)
+
+
+def fit_one(series: np.ndarray) -> float:
+    """Fit one series in plain Python, every alpha, as the per-product baseline"""
+    start = int(np.argmax(series > 0))
+    values = series.tolist()
+    ordered = sum(1 for value in values if value > 0)
+    adi = (len(values) - start) / ordered
+    croston = adi > INTERMITTENT_ADI
+    best = None
+    for alpha in ALPHAS:
+        size, interval, since, error = values[start], adi if croston else 1.0, 0, 0.0
+        for value in values[start + 1:]:
+            forecast = (1 - alpha / 2) * size / interval if croston else size
+            error += (value - forecast) ** 2
+            since += 1
+            if value > 0 or not croston:
+                size += alpha * (value - size)
+            if value > 0 and croston:
+                interval += alpha * (since - interval)
+                since = 0
+        if best is None or error < best[0]:
+            best = (error, alpha)
+    return best[1]
+
+
+def fit_chunks(demand: np.ndarray, start: np.ndarray, chunk_size: int, pool=None):
+    chunks = [
+        (demand[offset:offset + chunk_size], start[offset:offset + chunk_size])
+        for offset in range(0, len(demand), chunk_size)
+    ]
+    if pool is None:
+        return [fit_batch(*chunk) for chunk in chunks]
+    return list(pool.map(fit_batch, *zip(*chunks)))
+
+
+def timed(function, *args) -> tuple:
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--weeks", type=int, default=104)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--holdout", type=int, default=12)
+    parser.add_argument("--changed", type=float, default=0.02)
+    args = parser.parse_args()
+
+    demand = synthetic(args.products, args.weeks)
+    start = (demand > 0).argmax(axis=1)
+
+    sample = demand[:500]
+    loop_seconds, _ = timed(lambda: [fit_one(series) for series in sample])
+    loop_seconds *= args.products / len(sample)
+    single_seconds, fits = timed(fit_chunks, demand, start, args.chunk_size)
+    with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Start the workers before timing
+        list(pool.map(abs, range(args.workers)))
+        pool_seconds, _ = timed(fit_chunks, demand, start, args.chunk_size, pool)
+
+    # A week later: a few products had orders, the rest none
+    fit = ForecastFit.concatenate(fits)
+    changed = np.random.default_rng(3).random(args.products) < args.changed
+    week_later = np.hstack([demand[:, 1:], np.zeros((args.products, 1))])
+    week_later[changed, -1] = 10
+    refit_seconds, _ = timed(fit_chunks, week_later[changed], (week_later[changed] > 0).argmax(axis=1), args.chunk_size)
+    unchanged = ForecastFit(
+        fit.intermittent[~changed], fit.alpha[~changed], fit.level[~changed], fit.interval[~changed],
+        fit.since[~changed], None, {name: values[~changed] for name, values in fit.sums.items()},
+    )
+    roll_seconds, _ = timed(roll_forward, unchanged, np.ones((~changed).sum(), dtype=int))
+
+    intermittent = sum(int(fit.intermittent.sum()) for fit in fits)
+    print(f"{args.products} products over {args.weeks} weeks, {intermittent} intermittent")
+    print()
+    print(f"{'fitting':<44}{'seconds':>10}")
+    print(f"{'one product at a time, Python (scaled)':<44}{loop_seconds:>10.1f}")
+    print(f"{'fit_batch, one process':<44}{single_seconds:>10.1f}")
+    print(f"{f'fit_batch, {args.workers} processes':<44}{pool_seconds:>10.1f}")
+    print()
+    print(f"{'refresh a week later, {:.0%} changed'.format(args.changed):<44}{'seconds':>10}")
+    print(f"{'full refit, one process':<44}{single_seconds:>10.2f}")
+    print(f"{f'refit {changed.sum()} changed products':<44}{refit_seconds:>10.2f}")
+    print(f"{f'roll {(~changed).sum()} forward a week':<44}{roll_seconds:>10.2f}")
+
+    # Fit on all but the holdout weeks, score the flat forecast on them
+    train, test = demand[:, :-args.holdout], demand[:, -args.holdout:]
+    keep = (train > 0).any(axis=1)
+    train, test = train[keep], test[keep]
+    fit = fit_batch(train, (train > 0).argmax(axis=1))
+    methods = {
+        "last week": train[:, -1],
+        "mean of the last 8 weeks": train[:, -8:].mean(axis=1),
+        "exponential smoothing / Croston": fit.forecast,
+    }
+    print()
+    print(f"{'forecast of the last {} weeks'.format(args.holdout):<44}{'MAE':>10}{'accuracy %':>12}")
+    for name, forecast in methods.items():
+        error = np.abs(test - forecast[:, None])
+        accuracy = 100 * (1 - error.sum() / test.sum())
+        print(f"{name:<44}{error.mean():>10.2f}{accuracy:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Insert throughput before and after removing redundant indexes
+
+Recreates the purchase order tables twice, once with the indexes the
+models used to declare on top of their primary and unique keys, and once
+as the models declare them now, then times bulk inserts into each.
+
+Usage:
+    python -m benchmarks.bench_index_inserts [--rows 50000] [--url sqlite://]
+"""
+
+import argparse
+import time
+from datetime import date
+
+from sqlalchemy import Index, MetaData, create_engine, insert
+
+from app.db.base import Base
+from app.models import POLineItem, PurchaseOrder
+
+# Indexes dropped from the models by the schema audit
+REDUNDANT_INDEXES = {
+    "purchase_orders": [
+        ("ix_purchase_orders_id", ["id"]),
+        ("idx_po_number", ["po_number"]),
+        ("ix_purchase_orders_supplier_id", ["supplier_id"]),
+    ],
+    "po_line_items": [
+        ("ix_po_line_items_id", ["id"]),
+    ],
+}
+
+
+def build_metadata(with_redundant: bool) -> MetaData:
+    """Copy the purchase order tables, optionally re-adding redundant indexes"""
+    metadata = MetaData()
+    Base.metadata.tables["users"].to_metadata(metadata)
+    for model in (PurchaseOrder, POLineItem):
+        table = model.__table__.to_metadata(metadata)
+        if with_redundant:
+            for name, columns in REDUNDANT_INDEXES[table.name]:
+                Index(name, *[table.c[column] for column in columns])
+    return metadata
+
+
+def run(url: str, rows: int, batch_size: int, with_redundant: bool) -> float:
+    """Insert rows orders with two line items each and return rows per second"""
+    metadata = build_metadata(with_redundant)
+    engine = create_engine(url)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    orders = metadata.tables["purchase_orders"]
+    line_items = metadata.tables["po_line_items"]
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch_size):
+            ids = range(offset + 1, min(offset + batch_size, rows) + 1)
+            conn.execute(
+                insert(orders),
+                [
+                    {
+                        "id": i,
+                        "po_number": f"PO-{i:08d}",
+                        "supplier_id": i % 500,
+                        "supplier_name": "Supplier",
+                        "po_date": date(2024, 1, 1),
+                        "due_date": date(2024, 2, 1),
+                        "status": "DRAFT",
+                        "subtotal": 100.0,
+                        "tax_amount": 10.0,
+                        "tax_rate": 10.0,
+                        "total_amount": 110.0,
+                    }
+                    for i in ids
+                ],
+            )
+            conn.execute(
+                insert(line_items),
+                [
+                    {
+                        "purchase_order_id": i,
+                        "material_code": f"MAT-{(i + n) % 1000:04d}",
+                        "material_name": "Material",
+                        "quantity": 10,
+                        "unit_price": 5.0,
+                        "amount": 50.0,
+                    }
+                    for i in ids
+                    for n in range(2)
+                ],
+            )
+    elapsed = time.perf_counter() - started
+
+    metadata.drop_all(engine)
+    engine.dispose()
+    return rows / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--url", default="sqlite://", help="synchronous SQLAlchemy URL")
+    args = parser.parse_args()
+
+    before = run(args.url, args.rows, args.batch_size, with_redundant=True)
+    after = run(args.url, args.rows, args.batch_size, with_redundant=False)
+
+    print(f"orders inserted:          {args.rows}")
+    print(f"with redundant indexes:   {before:,.0f} orders/s")
+    print(f"after schema audit:       {after:,.0f} orders/s")
+    print(f"speedup:                  {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
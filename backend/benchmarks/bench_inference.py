@@ -0,0 +1,112 @@
+"""
+Inference: one model call per request against micro-batches, under concurrent requests
+
+--clients coroutines each send --requests / --clients requests in turn, as
+inspection stations do. Each request is served three ways: the model called
+inline on the event loop, which blocks every other request while it runs;
+one model call per request in the worker threads; and through an
+InferenceScheduler, which runs the requests waiting together as one batch.
+Throughput, latency and the longest stall of the event loop, which every
+other request on the worker waits out, are reported for the quality
+prediction model, where the per-call overhead dominates, and for defect
+detection on --size pixel images.
+
+Usage:
+    python -m benchmarks.bench_inference [--clients 64] [--requests 20000] [--size 256] [--workers 2]
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.core.inference import InferenceScheduler
+from app.services.inspection_service import QUALITY_FEATURES, detect_defects, predict_quality
+
+
+def timed_requests(serve, items: list, clients: int) -> tuple:
+    """Seconds for all items, each request's latency in ms and the longest event loop stall in ms"""
+    latencies, stalls = [], [0.0]
+
+    async def client(share):
+        for item in share:
+            started = time.perf_counter()
+            await serve(item)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    async def ticker(done):
+        # Any other request, e.g. an order lookup, waits as long as this tick is late
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append((time.perf_counter() - started) * 1000 - 1)
+
+    async def main():
+        done = asyncio.Event()
+        tick = asyncio.ensure_future(ticker(done))
+        started = time.perf_counter()
+        await asyncio.gather(*(client(items[index::clients]) for index in range(clients)))
+        seconds = time.perf_counter() - started
+        done.set()
+        await tick
+        return seconds
+
+    seconds = asyncio.run(main())
+    return seconds, np.array(latencies), max(stalls)
+
+
+def compare(name: str, predict, items: list, clients: int, workers: int) -> None:
+    executor = ThreadPoolExecutor(workers)
+
+    async def inline(item):
+        return predict([item])[0]
+
+    async def per_request(item):
+        return (await asyncio.get_running_loop().run_in_executor(executor, predict, [item]))[0]
+
+    scheduler = {}
+
+    async def batched(item):
+        if "scheduler" not in scheduler:
+            scheduler["scheduler"] = InferenceScheduler(name, predict, 32, 5, 4096, workers, executor)
+        return await scheduler["scheduler"].submit(item)
+
+    print(f"{f'{name}, {len(items)} requests':<40}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'stall ms':>10}")
+    for label, serve in (
+        ("inline on the event loop", inline),
+        ("one call per request, threads", per_request),
+        ("micro-batched", batched),
+    ):
+        seconds, latencies, stall = timed_requests(serve, items, clients)
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"{label:<40}{len(items) / seconds:>10.0f}{p50:>10.2f}{p95:>10.2f}{stall:>10.1f}")
+    stats = scheduler["scheduler"].stats.snapshot()
+    print(f"{'  mean batch size':<40}{stats['batch_size']['mean']:>10.1f}")
+    print()
+    executor.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(9)
+    records = [
+        {name: target + tolerance * rng.normal() for name, (target, tolerance) in QUALITY_FEATURES.items()}
+        for _ in range(args.requests)
+    ]
+    compare("quality_prediction", predict_quality, records, args.clients, args.workers)
+
+    images = [rng.integers(100, 160, (args.size, args.size), dtype=np.uint8) for _ in range(16)]
+    frames = [images[index % len(images)] for index in range(args.requests // 10)]
+    compare("defect_detection", detect_defects, frames, args.clients, args.workers)
+
+
+if __name__ == "__main__":
+    main()
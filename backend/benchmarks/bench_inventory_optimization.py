@@ -0,0 +1,176 @@
+"""
+Inventory optimization: policy computation for every material at once, and incremental refreshes
+
+--materials materials with a year of weekly consumption and a few purchase
+order receipts each get their ABC/XYZ class, order quantity, safety stock
+and reorder point from compute_policies in one vectorized pass; the baseline
+computes one material at a time in plain Python. --movements issues are also loaded into an in-memory SQLite
+database indexed by material, to time aggregating the weekly consumption
+sums of every material, as a full refresh does, against those of the
+--changed share of materials with new movements, as an incremental one does.
+
+Usage:
+    python -m benchmarks.bench_inventory_optimization [--materials 100000] [--movements 2000000] [--changed 0.01]
+"""
+
+import argparse
+import math
+import sqlite3
+import time
+
+import numpy as np
+from scipy.special import ndtri
+
+from app.services.inventory_optimization_service import (
+    ABC_LIMITS,
+    SERVICE_LEVELS,
+    STATISTICS,
+    XYZ_LIMITS,
+    compute_policies,
+)
+
+ORDER_COST = 50.0
+HOLDING_RATE = 0.25
+
+
+def synthetic(materials: int, seed: int = 4) -> tuple:
+    rng = np.random.default_rng(seed)
+    weekly = rng.gamma(0.6, 80, materials) * (rng.random(materials) < 0.9)
+    spread = weekly * rng.uniform(0.1, 1.5, materials)
+    receipts = rng.integers(0, 8, materials).astype(float)
+    lead_time = rng.uniform(3, 40, materials)
+    lead_spread = rng.uniform(0, 6, materials)
+    received = receipts * rng.uniform(50, 500, materials)
+    statistics = {name: np.zeros(materials) for name in STATISTICS}
+    statistics["demand_weeks"][:] = 52
+    statistics["sum_demand"] = weekly * 52
+    statistics["sum_squared_demand"] = (weekly ** 2 + spread ** 2) * 52
+    statistics["receipts"] = receipts
+    statistics["sum_lead_time"] = lead_time * receipts
+    statistics["sum_squared_lead_time"] = (lead_time ** 2 + lead_spread ** 2) * receipts
+    statistics["received_quantity"] = received
+    statistics["received_value"] = received * rng.lognormal(1.5, 1, materials)
+    statistics["on_hand"] = rng.gamma(1, 400, materials)
+    standard_cost = rng.lognormal(1.5, 1, materials)
+    default_lead_time = rng.integers(5, 30, materials).astype(float)
+    return statistics, standard_cost, default_lead_time
+
+
+def policy_loop(statistics: dict, standard_cost: np.ndarray, default_lead_time: np.ndarray) -> list:
+    """Policies one material at a time, in plain Python, as the baseline"""
+    rows = [dict(zip(statistics, values)) for values in zip(*(column.tolist() for column in statistics.values()))]
+    values, policies = [], []
+    for index, row in enumerate(rows):
+        weekly = row["sum_demand"] / row["demand_weeks"]
+        weekly_variance = max(row["sum_squared_demand"] / row["demand_weeks"] - weekly ** 2, 0)
+        if row["received_quantity"] > 0:
+            unit_cost = row["received_value"] / row["received_quantity"]
+        else:
+            unit_cost = standard_cost[index]
+        if row["receipts"] > 0:
+            lead_time = row["sum_lead_time"] / row["receipts"]
+        else:
+            lead_time = default_lead_time[index]
+        lead_variance = 0.0
+        if row["receipts"] > 1:
+            lead_variance = max(row["sum_squared_lead_time"] / row["receipts"] - lead_time ** 2, 0)
+        values.append(weekly * 52 * unit_cost)
+        policies.append((weekly, weekly_variance, unit_cost, lead_time, lead_variance))
+
+    # ABC needs every material's value first
+    total = sum(values)
+    order = sorted(range(len(values)), key=lambda index: -values[index])
+    classes, running = [None] * len(values), 0.0
+    for index in order:
+        share = running / total
+        if values[index] <= 0 or share >= ABC_LIMITS[1]:
+            classes[index] = "C"
+        else:
+            classes[index] = "A" if share < ABC_LIMITS[0] else "B"
+        running += values[index]
+
+    results = []
+    for index, (weekly, weekly_variance, unit_cost, lead_time, lead_variance) in enumerate(policies):
+        variation = math.sqrt(weekly_variance) / weekly if weekly > 0 else math.inf
+        xyz = "X" if variation < XYZ_LIMITS[0] else "Y" if variation < XYZ_LIMITS[1] else "Z"
+        daily, daily_variance = weekly / 7, weekly_variance / 7
+        holding = HOLDING_RATE * unit_cost
+        eoq = math.sqrt(2 * weekly * 52 * ORDER_COST / holding) if weekly > 0 and holding > 0 else 0.0
+        safety = float(ndtri(SERVICE_LEVELS[classes[index]])) * math.sqrt(
+            lead_time * daily_variance + daily ** 2 * lead_variance
+        )
+        results.append((classes[index], xyz, eoq, safety, daily * lead_time + safety))
+    return results
+
+
+def consumption_database(materials: int, movements: int, seed: int = 5) -> sqlite3.Connection:
+    rng = np.random.default_rng(seed)
+    database = sqlite3.connect(":memory:")
+    database.execute(
+        "CREATE TABLE movements (id INTEGER PRIMARY KEY, material_id INTEGER, week INTEGER, quantity REAL)"
+    )
+    database.executemany(
+        "INSERT INTO movements (material_id, week, quantity) VALUES (?, ?, ?)",
+        zip(
+            rng.integers(0, materials, movements).tolist(),
+            rng.integers(0, 52, movements).tolist(),
+            rng.gamma(2, 10, movements).tolist(),
+        ),
+    )
+    database.execute("CREATE INDEX idx_movements_material ON movements (material_id, week)")
+    return database
+
+
+def aggregate(database: sqlite3.Connection, material_ids=None) -> list:
+    where = "" if material_ids is None else f"WHERE material_id IN ({','.join(map(str, material_ids))})"
+    return database.execute(
+        f"""
+        SELECT material_id, SUM(quantity), SUM(quantity * quantity)
+        FROM (SELECT material_id, week, SUM(quantity) AS quantity FROM movements {where} GROUP BY material_id, week)
+        GROUP BY material_id
+        """
+    ).fetchall()
+
+
+def timed(function, *args) -> tuple:
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--materials", type=int, default=100000)
+    parser.add_argument("--movements", type=int, default=2000000)
+    parser.add_argument("--changed", type=float, default=0.01)
+    args = parser.parse_args()
+
+    statistics, standard_cost, default_lead_time = synthetic(args.materials)
+    vector_seconds, policies = timed(
+        compute_policies, statistics, standard_cost, default_lead_time, ORDER_COST, HOLDING_RATE
+    )
+    loop_seconds, loop_policies = timed(policy_loop, statistics, standard_cost, default_lead_time)
+    mismatches = sum(
+        abc != policies["abc_class"][index] or not math.isclose(point, policies["reorder_point"][index], rel_tol=1e-9)
+        for index, (abc, _, _, _, point) in enumerate(loop_policies)
+    )
+
+    classes = {name: int((policies["abc_class"] == name).sum()) for name in "ABC"}
+    print(f"{args.materials} materials: {classes['A']} A, {classes['B']} B, {classes['C']} C; {mismatches} mismatches")
+    print()
+    print(f"{'policies for every material':<44}{'seconds':>10}")
+    print(f"{'one material at a time, Python':<44}{loop_seconds:>10.3f}")
+    print(f"{'compute_policies, vectorized':<44}{vector_seconds:>10.3f}")
+
+    database = consumption_database(args.materials, args.movements)
+    changed = np.flatnonzero(np.random.default_rng(6).random(args.materials) < args.changed).tolist()
+    full_seconds, _ = timed(aggregate, database)
+    changed_seconds, _ = timed(aggregate, database, changed)
+    print()
+    print(f"{f'weekly consumption sums, {args.movements} issues':<44}{'seconds':>10}")
+    print(f"{'every material (full refresh)':<44}{full_seconds:>10.3f}")
+    print(f"{f'{len(changed)} changed materials (incremental)':<44}{changed_seconds:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Request-path logging overhead: synchronous handlers versus the queue pipeline
+
+Each simulated request logs what a router does: one INFO line about the
+order it touched and two DEBUG lines that the INFO level filters out. Only
+the time spent on the calling thread is measured, since that is what the
+event loop pays; the queue is drained after the clock stops.
+
+Usage:
+    python -m benchmarks.bench_logging [--requests 20000]
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import time
+
+from app.core.logging import AsyncQueueHandler, JSONFormatter, RequestContextFilter, SamplingFilter
+
+
+class Order:
+    """Stand-in for an ORM object whose repr is not free"""
+
+    def __init__(self, number: str):
+        self.po_number = number
+        self.line_items = list(range(20))
+
+    def __repr__(self):
+        return f"<Order {self.po_number} items={self.line_items}>"
+
+
+def file_handlers(directory: str, formatter: logging.Formatter) -> list:
+    """Console (to /dev/null) and rotating file handlers, as the app configures them"""
+    console = logging.StreamHandler(open(os.devnull, "w"))
+    rotating = logging.handlers.RotatingFileHandler(
+        os.path.join(directory, "bench.log"),
+        maxBytes=10 * 1024 * 1024,
+        backupCount=5,
+    )
+    for handler in (console, rotating):
+        handler.setFormatter(formatter)
+    return [console, rotating]
+
+
+def simulate_eager(logger: logging.Logger, requests: int) -> None:
+    """Router logging before: f-strings built whether or not they are emitted"""
+    for i in range(requests):
+        order = Order(f"PO-{i}")
+        logger.debug(f"Loaded purchase order: {order!r}")
+        logger.info(f"Purchase order updated: {order.po_number}")
+        logger.debug(f"Line items: {order.line_items}")
+
+
+def simulate_lazy(logger: logging.Logger, requests: int) -> None:
+    """Router logging after: arguments only formatted for emitted records"""
+    for i in range(requests):
+        order = Order(f"PO-{i}")
+        logger.debug("Loaded purchase order: %r", order)
+        logger.info("Purchase order updated: %s", order.po_number)
+        logger.debug("Line items: %s", order.line_items)
+
+
+def run(name: str, requests: int, sampling: dict = None) -> tuple:
+    """Time one configuration, returning (caller seconds, drain seconds)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = logging.getLogger(f"bench.{name}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        listener = None
+
+        if name == "sync":
+            formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+            handlers = file_handlers(tmp, formatter)
+            for handler in handlers:
+                logger.addHandler(handler)
+            simulate = simulate_eager
+        else:
+            handlers = file_handlers(tmp, JSONFormatter())
+            log_queue = queue.SimpleQueue()
+            queue_handler = AsyncQueueHandler(log_queue)
+            queue_handler.addFilter(SamplingFilter(sampling or {}))
+            queue_handler.addFilter(RequestContextFilter())
+            logger.addHandler(queue_handler)
+            listener = logging.handlers.QueueListener(log_queue, *handlers)
+            listener.start()
+            simulate = simulate_lazy
+
+        started = time.perf_counter()
+        simulate(logger, requests)
+        caller = time.perf_counter() - started
+
+        if listener is not None:
+            listener.stop()
+        drained = time.perf_counter() - started
+
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        for handler in handlers:
+            handler.close()
+
+    return caller, drained
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    configurations = [
+        ("sync, eager f-strings", "sync", None),
+        ("queue, lazy", "queue", None),
+        ("queue, lazy, 1 in 10", "queue_sampled", {"bench.queue_sampled": 10}),
+    ]
+
+    print(f"{'configuration':<24}{'us/request':>12}{'speedup':>10}{'drained (s)':>13}")
+    baseline = None
+    for label, name, sampling in configurations:
+        caller, drained = run(name, args.requests, sampling)
+        per_request = caller / args.requests * 1e6
+        baseline = baseline or per_request
+        print(f"{label:<24}{per_request:>12.2f}{baseline / per_request:>9.1f}x{drained:>13.2f}")
+    print("(us/request is time on the calling thread; drained includes the listener)")
+
+
+if __name__ == "__main__":
+    main()
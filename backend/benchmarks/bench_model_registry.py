@@ -0,0 +1,83 @@
+"""
+Model registry: eager loading into every worker against lazy, memory-mapped loading
+
+A model with --megabytes of weights is published to a temporary registry.
+--workers processes then each load it and run a pass over its weights, as
+uvicorn workers serving it would: once reading the arrays into memory, as
+loading every model at startup does, and once through the registry, which
+maps them. Reported per worker: the time to load, and the memory private to
+the process (from /proc/self/smaps_rollup), which the mapped weights leave
+out as they are shared with the other workers through the page cache.
+
+Usage:
+    python -m benchmarks.bench_model_registry [--megabytes 256] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.model_registry import ModelRegistry, register_model
+
+
+def private_megabytes() -> float:
+    """Memory of this process no other process shares, in MB"""
+    total = 0
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total / 1024
+
+
+def worker(root: str, mapped: bool, results) -> None:
+    register_model("weights", lambda arrays, params: arrays["weights"], lambda: None)
+    started = time.perf_counter()
+    if mapped:
+        weights = ModelRegistry(root, 1 << 40).get("weights")
+    else:
+        weights = np.load(os.path.join(root, "weights", "versions", "1", "weights.npy"))
+    loaded = time.perf_counter() - started
+    # One pass over the weights, as inference does
+    float(weights.sum())
+    results.put((loaded, private_megabytes()))
+
+
+def run(root: str, workers: int, mapped: bool) -> list:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(root, mapped, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    outcome = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return outcome
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        register_model("weights", lambda arrays, params: arrays["weights"], lambda: None)
+        weights = np.random.default_rng(10).random(args.megabytes * 1024 * 1024 // 8)
+        ModelRegistry(root, 1 << 40).publish("weights", {"weights": weights}, {})
+        del weights
+
+        print(f"{f'{args.megabytes} MB model, {args.workers} workers':<44}{'load ms':>10}{'private MB':>12}")
+        for label, mapped in (("read into every worker", False), ("registry, memory-mapped", True)):
+            outcome = run(root, args.workers, mapped)
+            load_ms = 1000 * sum(loaded for loaded, _ in outcome) / len(outcome)
+            private = sum(megabytes for _, megabytes in outcome) / len(outcome)
+            print(f"{label:<44}{load_ms:>10.1f}{private:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+MRP run over synthetic multi-level bills of materials
+
+Builds --levels levels of BOMs (each parent uses --fanout components from
+the next levels down, some skipping a level, so low-level codes matter) and
+--work-orders open work orders for the top-level products, then times the
+vectorized MRP run with on-hand stock, open purchase order lines and lead
+times. For comparison, the same orders are exploded one at a time by
+recursing through a dict of BOM lines, gross requirements only, and the
+totals are checked against a run without stock, receipts or lead times.
+
+Usage:
+    python -m benchmarks.bench_mrp [--work-orders 50000] [--levels 5] [--items-per-level 1000]
+"""
+
+import argparse
+import time
+from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+
+from app.services.mrp_service import plan_requirements
+
+
+def synthetic_bom(levels: int, products: int, items_per_level: int, fanout: int, rng) -> tuple:
+    """BOM edges (parent, component, quantity) and the first item of every level"""
+    starts = np.cumsum([0, products] + [items_per_level] * (levels - 1))
+    parents, components = [], []
+    for level in range(levels - 1):
+        level_parents = np.arange(starts[level], starts[level + 1])
+        # One component in ten comes from two levels down when there is one
+        skip = (rng.random((len(level_parents), fanout)) < 0.1) & (level + 2 < levels)
+        low = np.where(skip, starts[min(level + 2, levels - 1)], starts[level + 1])
+        high = np.where(skip, starts[min(level + 3, levels)], starts[level + 2])
+        picked = low + (rng.random((len(level_parents), fanout)) * (high - low)).astype(np.int64)
+        pairs = np.unique(np.column_stack([np.repeat(level_parents, fanout), picked.ravel()]), axis=0)
+        parents.append(pairs[:, 0])
+        components.append(pairs[:, 1])
+    parents = np.concatenate(parents)
+    components = np.concatenate(components)
+    quantities = rng.integers(1, 5, len(parents)).astype(float)
+    return parents, components, quantities, starts
+
+
+def explode_per_order(orders, bom_lines: dict) -> dict:
+    """Gross requirements by recursing through the BOM once per work order"""
+    totals = defaultdict(float)
+
+    def explode(item, quantity):
+        for component, per_unit in bom_lines.get(item, ()):
+            totals[component] += quantity * per_unit
+            explode(component, quantity * per_unit)
+
+    for item, quantity in orders:
+        explode(item, quantity)
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--work-orders", type=int, default=50000)
+    parser.add_argument("--levels", type=int, default=5)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--items-per-level", type=int, default=1000)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--periods", type=int, default=52)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    parents, components, quantities, starts = synthetic_bom(
+        args.levels, args.products, args.items_per_level, args.fanout, rng
+    )
+    item_count = int(starts[-1])
+    bom = sparse.csr_matrix((quantities, (parents, components)), shape=(item_count, item_count))
+
+    order_items = rng.integers(0, args.products, args.work_orders)
+    order_quantities = rng.integers(1, 100, args.work_orders).astype(float)
+    order_due = rng.integers(0, args.periods, args.work_orders)
+    order_started = rng.random(args.work_orders) < 0.1
+    bought = np.flatnonzero(np.diff(bom.indptr) == 0)
+    receipt_items = rng.choice(bought, 20000)
+
+    inputs = dict(
+        bom=bom,
+        order_items=order_items,
+        order_quantities=order_quantities,
+        order_due=order_due,
+        periods=args.periods,
+    )
+    print(f"{item_count} materials, {len(parents)} BOM lines, {args.levels} levels, "
+          f"{args.work_orders} work orders, {args.periods} periods")
+    print()
+
+    started = time.perf_counter()
+    plan = plan_requirements(
+        on_hand=rng.integers(0, 5000, item_count).astype(float),
+        lead_periods=rng.integers(0, 4, item_count),
+        order_started=order_started,
+        receipt_items=receipt_items,
+        receipt_quantities=rng.integers(10, 1000, len(receipt_items)).astype(float),
+        receipt_periods=rng.integers(0, args.periods, len(receipt_items)),
+        **inputs,
+    )
+    mrp_seconds = time.perf_counter() - started
+    planned = int((plan.net > 0).sum())
+
+    # Without stock, receipts or lead times every gross requirement becomes a planned order
+    started = time.perf_counter()
+    gross_plan = plan_requirements(
+        on_hand=np.zeros(item_count),
+        lead_periods=np.zeros(item_count, dtype=np.int64),
+        order_started=np.zeros(args.work_orders, dtype=bool),
+        receipt_items=np.zeros(0, dtype=np.int64),
+        receipt_quantities=np.zeros(0),
+        receipt_periods=np.zeros(0, dtype=np.int64),
+        **inputs,
+    )
+    gross_seconds = time.perf_counter() - started
+
+    bom_lines = defaultdict(list)
+    for parent, component, quantity in zip(parents.tolist(), components.tolist(), quantities.tolist()):
+        bom_lines[parent].append((component, quantity))
+    started = time.perf_counter()
+    totals = explode_per_order(zip(order_items.tolist(), order_quantities.tolist()), bom_lines)
+    loop_seconds = time.perf_counter() - started
+
+    expected = np.zeros(item_count)
+    expected[list(totals)] = list(totals.values())
+    assert np.allclose(gross_plan.gross.sum(axis=1), expected)
+
+    print(f"{'run':<44}{'seconds':>10}{'speedup':>10}")
+    print(f"{'gross explosion, per order (Python)':<44}{loop_seconds:>10.2f}{1:>9.1f}x")
+    print(f"{'gross explosion, vectorized':<44}{gross_seconds:>10.2f}{loop_seconds / gross_seconds:>9.1f}x")
+    print(f"{'full MRP: netting, receipts, lead times':<44}{mrp_seconds:>10.2f}")
+    print(f"{planned} planned orders")
+
+
+if __name__ == "__main__":
+    main()
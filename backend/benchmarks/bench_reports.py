@@ -0,0 +1,130 @@
+"""
+Reports: purchase spend over 10M order lines, computed, from the cache, and after a change
+
+--lines purchase order lines, --lines-per-order to an order, of --suppliers
+suppliers each buying ten of their own materials over two years, are loaded
+into a SQLite database. The purchase spend report by supplier, material and
+month is run cold, then again unchanged, which the cache answers after one
+read of the table versions, then after one line is added to an order, which
+raises the versions and has it recomputed. Encoding the result in each
+output format is timed last.
+
+Usage:
+    python -m benchmarks.bench_reports [--lines 10000000] [--lines-per-order 10] [--suppliers 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.models import POLineItem
+from app.services.report_service import FORMATS, ReportService
+
+BATCH_SIZE = 100000
+
+
+def populate(path: str, lines: int, lines_per_order: int, suppliers: int, seed: int = 11) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    rng = np.random.default_rng(seed)
+    orders = lines // lines_per_order
+    supplier = rng.integers(1, suppliers + 1, orders)
+    days_ago = rng.integers(0, 730, orders)
+    first_day = date.today()
+    connection = sqlite3.connect(path)
+    connection.executemany(
+        "INSERT INTO purchase_orders (id, po_number, supplier_id, supplier_name, po_date, due_date, status,"
+        " subtotal, tax_amount, tax_rate, total_amount) VALUES (?, ?, ?, ?, ?, ?, 'APPROVED', 0, 0, 0, 0)",
+        (
+            (
+                i + 1, f"PO-{i + 1:09d}", int(supplier[i]), f"Supplier {supplier[i]}",
+                (first_day - timedelta(days=int(days_ago[i]))).isoformat(), first_day.isoformat(),
+            )
+            for i in range(orders)
+        ),
+    )
+    for offset in range(0, orders * lines_per_order, BATCH_SIZE):
+        count = min(BATCH_SIZE, orders * lines_per_order - offset)
+        order = np.arange(offset, offset + count) // lines_per_order
+        material = (supplier[order] * 7 + rng.integers(0, 10, count)) % 5000
+        quantity = rng.integers(1, 500, count)
+        price = np.round(rng.lognormal(1.5, 0.5, count), 2)
+        connection.executemany(
+            "INSERT INTO po_line_items (purchase_order_id, material_code, material_name, quantity, unit_price,"
+            " amount) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (int(order[k]) + 1, f"MAT-{material[k]:05d}", f"Material {material[k]}", int(quantity[k]),
+                 float(price[k]), float(quantity[k] * price[k]))
+                for k in range(count)
+            ),
+        )
+    connection.commit()
+    connection.close()
+
+
+async def measure(path: str) -> list:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    timings = []
+
+    async def timed(label: str):
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            result, cached = await ReportService(session).run("purchase-spend")
+            timings.append((label, time.perf_counter() - started, cached, result.rows))
+            return result
+
+    result = await timed("cold")
+    await timed("unchanged")
+    async with sessionmaker() as session:
+        session.add(POLineItem(
+            purchase_order_id=1, material_code="MAT-00001", material_name="Material 1",
+            quantity=1, unit_price=1.0, amount=1.0,
+        ))
+        await session.commit()
+    await timed("after one line is added")
+    await timed("unchanged again")
+    await engine.dispose()
+    return timings, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=10_000_000)
+    parser.add_argument("--lines-per-order", type=int, default=10)
+    parser.add_argument("--suppliers", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "reports.db")
+        started = time.perf_counter()
+        populate(path, args.lines, args.lines_per_order, args.suppliers)
+        print(f"{args.lines} lines of {args.lines // args.lines_per_order} orders loaded "
+              f"in {time.perf_counter() - started:.1f}s")
+        timings, result = asyncio.run(measure(path))
+
+    print()
+    print(f"{'purchase spend by supplier, material, month':<44}{'seconds':>10}{'cache':>8}{'rows':>10}")
+    for label, seconds, cached, rows in timings:
+        print(f"{label:<44}{seconds:>10.3f}{'hit' if cached else 'miss':>8}{rows:>10}")
+    print()
+    print(f"{'encoding the result':<44}{'seconds':>10}{'MB':>8}")
+    for name, (_, _, encode) in FORMATS.items():
+        started = time.perf_counter()
+        size = sum(len(chunk) for chunk in encode(result, 10000))
+        print(f"{name:<44}{time.perf_counter() - started:>10.3f}{size / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
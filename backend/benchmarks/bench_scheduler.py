@@ -0,0 +1,120 @@
+"""
+Finite-capacity scheduling of open work orders: full run versus moving one order
+
+A full run books --orders synthetic work orders onto --centers work centers
+in --categories categories, by priority and due date, and converts every
+booking to datetimes as the service writes them. Moving one order is timed
+the way SchedulingService.reschedule_order does it: load the bookings of the
+centers of its category into interval trees and take the earliest free slot.
+The first-fit search on trees that are already built is timed separately,
+and checked against a linear scan of the bookings.
+
+Usage:
+    python -m benchmarks.bench_scheduler [--orders 100000] [--centers 60] [--categories 4]
+"""
+
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from app.services.scheduling_service import ShopCalendar, order_hours, schedule_orders
+from app.utils import IntervalTree
+
+
+def synthetic(orders: int, centers: int, categories: int, seed: int = 5) -> tuple:
+    rng = random.Random(seed)
+    names = [f"cat{c}" for c in range(categories)]
+    center_rows = [(center_id, names[center_id % categories], rng.uniform(5, 50), rng.choice([0, 0.5, 1])) for center_id in range(centers)]
+    today = date.today()
+    order_rows = [
+        (
+            order_id,
+            rng.choice(names),
+            rng.randint(10, 2000),
+            rng.choice(["low", "normal", "normal", "normal", "high", "urgent"]),
+            today + timedelta(days=rng.randint(0, 365)),
+        )
+        for order_id in range(orders)
+    ]
+    return order_rows, center_rows
+
+
+def timed(function, *args, repeat: int = 3) -> tuple:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def full_run(orders, centers, calendar: ShopCalendar) -> list:
+    bookings, _ = schedule_orders(orders, centers, now=0)
+    return [
+        (order_id, center_id, calendar.to_datetime(start), calendar.to_datetime(end, closing=True))
+        for order_id, center_id, start, end in bookings
+    ]
+
+
+def move_one(bookings_by_center: dict, centers, quantity: float) -> tuple:
+    best = None
+    for center_id, _, units_per_hour, setup_hours in centers:
+        length = order_hours(quantity, units_per_hour, setup_hours)
+        start = IntervalTree(bookings_by_center[center_id]).first_fit(0, length)
+        if best is None or start + length < best[2]:
+            best = (center_id, start, start + length)
+    return best
+
+
+def linear_fit(bookings: list, length: float) -> float:
+    candidate = 0
+    for start, end, _ in bookings:
+        if candidate + length <= start:
+            return candidate
+        candidate = max(candidate, end)
+    return candidate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--centers", type=int, default=60)
+    parser.add_argument("--categories", type=int, default=4)
+    args = parser.parse_args()
+
+    orders, centers = synthetic(args.orders, args.centers, args.categories)
+    calendar = ShopCalendar(date.today(), shift_start_hour=6, shift_hours=16)
+    print(f"{args.orders} open work orders, {args.centers} work centers in {args.categories} categories")
+    print()
+
+    full_seconds, _ = timed(full_run, orders, centers, calendar, repeat=1)
+    engine_seconds, (bookings, _) = timed(schedule_orders, orders, centers, 0)
+
+    # Drop one booking in 97, leaving the gaps cancellations and moves leave
+    bookings_by_center = defaultdict(list)
+    for order_id, center_id, start, end in bookings:
+        if order_id % 97:
+            bookings_by_center[center_id].append((start, end, order_id))
+
+    category_centers = [center for center in centers if center[1] == "cat0"]
+    move_seconds, best = timed(move_one, bookings_by_center, category_centers, 400)
+
+    trees = {center_id: IntervalTree(bookings_by_center[center_id]) for center_id, *_ in category_centers}
+    length = order_hours(400, *next(center[2:] for center in category_centers if center[0] == best[0]))
+    fit_seconds, fit = timed(lambda: trees[best[0]].first_fit(0, length), repeat=100)
+    scan_seconds, scan = timed(lambda: linear_fit(sorted(bookings_by_center[best[0]]), length))
+    assert fit == scan == best[1]
+
+    print(f"{'operation':<48}{'ms':>10}")
+    print(f"{'full run: sequence and book every order':<48}{engine_seconds * 1000:>10.1f}")
+    print(f"{'full run, with datetime conversion':<48}{full_seconds * 1000:>10.1f}")
+    print(f"{'move one order: build trees for its category':<48}{move_seconds * 1000:>10.1f}")
+    print(f"{'first fit on a built tree':<48}{fit_seconds * 1000:>10.3f}")
+    print(f"{'first fit by sorting and scanning the bookings':<48}{scan_seconds * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
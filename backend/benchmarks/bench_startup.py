@@ -0,0 +1,102 @@
+"""
+Application startup time: import, first request and first database query
+
+Each scenario runs in a fresh interpreter so module imports are cold.
+
+Usage:
+    python -m benchmarks.bench_startup [--url sqlite+aiosqlite:///startup.db] [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCENARIOS = {
+    "create_all, no warm-up": {"SCHEMA_STARTUP_MODE": "create_all", "DB_POOL_WARMUP_CONNECTIONS": "0"},
+    "check, no warm-up": {"SCHEMA_STARTUP_MODE": "check", "DB_POOL_WARMUP_CONNECTIONS": "0"},
+    "check, warm-up": {"SCHEMA_STARTUP_MODE": "check", "DB_POOL_WARMUP_CONNECTIONS": "5"},
+}
+
+
+def measure() -> dict:
+    """Time one cold start in the current interpreter"""
+    started = time.perf_counter()
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    imported = time.perf_counter()
+    with TestClient(app) as client:
+        ready = time.perf_counter()
+        client.get("/health")
+        first_request = time.perf_counter()
+        # Reads the work order table, then answers 404
+        client.get("/api/v1/work-orders/0")
+        first_query = time.perf_counter()
+
+    return {
+        "import": imported - started,
+        "startup": ready - imported,
+        "first_request": first_request - ready,
+        "first_query": first_query - first_request,
+    }
+
+
+def run_scenario(env: dict, runs: int) -> dict:
+    """Run a scenario in fresh subprocesses and keep the best of each phase"""
+    best = {}
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+            env={**os.environ, **env},
+            cwd=Path(__file__).resolve().parent.parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        for phase, seconds in timings.items():
+            best[phase] = min(best.get(phase, seconds), seconds)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="async SQLAlchemy URL (default: temporary SQLite file)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure()))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_env = {
+            "DATABASE_URL": args.url or f"sqlite+aiosqlite:///{tmp}/startup.db",
+            "LOG_FILE": f"{tmp}/app.log",
+            "LOG_LEVEL": "WARNING",
+        }
+        # Create the schema once so the check scenarios find it
+        run_scenario({**base_env, **SCENARIOS["create_all, no warm-up"]}, 1)
+
+        print(f"{'scenario':<26}{'import':>10}{'startup':>10}{'1st req':>10}{'1st query':>11}")
+        for name, env in SCENARIOS.items():
+            timings = run_scenario({**base_env, **env}, args.runs)
+            print(
+                f"{name:<26}"
+                + "".join(
+                    f"{timings[phase] * 1000:>{width}.1f}"
+                    for phase, width in (("import", 10), ("startup", 10), ("first_request", 10), ("first_query", 11))
+                )
+            )
+        print("(milliseconds, best of runs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Supplier risk: scoring every supplier in one batch, against one supplier at a time
+
+--orders purchase orders of --suppliers suppliers, with two line items each
+and a stock receipt for every received order, are loaded into a SQLite
+database. SupplierRiskService.refresh aggregates the features of all
+suppliers in two queries and scores them in one NumPy pass; the baseline
+loads each of --sample suppliers' orders, lines and receipts with their own
+queries and computes its features in Python, and is scaled up to every
+supplier. Reading one profile from the stored scores is timed last.
+
+Usage:
+    python -m benchmarks.bench_supplier_risk [--suppliers 10000] [--orders 200000] [--sample 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.base import Base
+from app.models import MovementType, POLineItem, POStatus, PurchaseOrder, StockMovement
+from app.services.supplier_risk_service import SupplierRiskService
+
+STATUSES = [POStatus.APPROVED, POStatus.RECEIVED, POStatus.CANCELLED]
+BATCH_SIZE = 10000
+
+
+def populate(path: str, suppliers: int, orders: int, seed: int = 7) -> None:
+    rng = np.random.default_rng(seed)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+
+    today = date.today()
+    supplier = rng.integers(1, suppliers + 1, orders)
+    days_ago = rng.integers(0, 360, orders)
+    lead_time = rng.integers(5, 40, orders)
+    status = rng.choice(len(STATUSES), orders, p=[0.3, 0.6, 0.1])
+    # Each supplier is late on its own share of orders
+    lateness = rng.beta(1, 4, suppliers + 1)[supplier]
+    days_late = np.where(rng.random(orders) < lateness, rng.integers(1, 15, orders), -rng.integers(0, 4, orders))
+    prices = rng.lognormal(1.5, 0.5, (orders, 2)) * rng.uniform(0.9, 1.1, (orders, 2))
+
+    with engine.begin() as conn:
+        for offset in range(0, orders, BATCH_SIZE):
+            ids = range(offset, min(offset + BATCH_SIZE, orders))
+            conn.execute(
+                insert(PurchaseOrder),
+                [
+                    {
+                        "id": i + 1,
+                        "po_number": f"PO-{i + 1:08d}",
+                        "supplier_id": int(supplier[i]),
+                        "supplier_name": f"Supplier {supplier[i]}",
+                        "po_date": today - timedelta(days=int(days_ago[i])),
+                        "due_date": today - timedelta(days=int(days_ago[i] - lead_time[i])),
+                        "status": STATUSES[status[i]],
+                        "total_amount": float(prices[i].sum() * 100),
+                    }
+                    for i in ids
+                ],
+            )
+            conn.execute(
+                insert(POLineItem),
+                [
+                    {
+                        "purchase_order_id": i + 1,
+                        "material_code": f"MAT-{(supplier[i] * 7 + line) % 5000:05d}",
+                        "material_name": "Material",
+                        "quantity": 100,
+                        "unit_price": float(prices[i, line]),
+                        "amount": float(prices[i, line] * 100),
+                    }
+                    for i in ids
+                    for line in range(2)
+                ],
+            )
+            received = [i for i in ids if STATUSES[status[i]] == POStatus.RECEIVED]
+            conn.execute(
+                insert(StockMovement),
+                [
+                    {
+                        "material_id": 1,
+                        "warehouse_code": "MAIN",
+                        "movement_type": MovementType.RECEIPT,
+                        "quantity": 100.0,
+                        "reference_type": "purchase_order",
+                        "reference_id": i + 1,
+                        "created_at": datetime.combine(
+                            today - timedelta(days=int(days_ago[i] - lead_time[i] - days_late[i])), datetime.min.time()
+                        ),
+                    }
+                    for i in received
+                ],
+            )
+    engine.dispose()
+
+
+async def per_supplier(session, supplier_ids: list) -> list:
+    """Features one supplier at a time, three queries each, as the baseline"""
+    since = date.today() - timedelta(days=365)
+    features = []
+    for supplier_id in supplier_ids:
+        result = await session.execute(
+            select(PurchaseOrder).where(
+                PurchaseOrder.supplier_id == supplier_id,
+                PurchaseOrder.po_date >= since,
+                PurchaseOrder.status != POStatus.DRAFT,
+            )
+        )
+        orders = result.scalars().all()
+        ids = [order.id for order in orders]
+        result = await session.execute(select(POLineItem).where(POLineItem.purchase_order_id.in_(ids)))
+        lines = result.scalars().all()
+        result = await session.execute(
+            select(StockMovement.reference_id, StockMovement.created_at).where(
+                StockMovement.reference_type == "purchase_order",
+                StockMovement.movement_type == MovementType.RECEIPT,
+                StockMovement.reference_id.in_(ids),
+            )
+        )
+        received = {}
+        for reference_id, created_at in result.all():
+            received[reference_id] = min(received.get(reference_id, created_at), created_at)
+
+        due = {order.id: order.due_date for order in orders if order.status != POStatus.CANCELLED}
+        on_time = sum(received[i].date() <= due[i] for i in received if i in due)
+        prices = {}
+        for line in lines:
+            if line.purchase_order_id in due:
+                prices.setdefault(line.material_code, []).append(line.unit_price)
+        variation = [
+            statistics.pstdev(values) / statistics.mean(values) * len(values) for values in prices.values()
+        ]
+        features.append((
+            len(orders),
+            len(orders) - len(due),
+            on_time,
+            sum(variation) / max(sum(len(values) for values in prices.values()), 1),
+        ))
+    return features
+
+
+async def measure(path: str, suppliers: int, sample: int) -> dict:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        started = time.perf_counter()
+        report = await SupplierRiskService(session).refresh()
+        batch_seconds = time.perf_counter() - started
+
+        sample_ids = np.random.default_rng(8).choice(np.arange(1, suppliers + 1), sample, replace=False).tolist()
+        started = time.perf_counter()
+        await per_supplier(session, sample_ids)
+        loop_seconds = (time.perf_counter() - started) * suppliers / sample
+
+        service = SupplierRiskService(session)
+        started = time.perf_counter()
+        for supplier_id in sample_ids:
+            service.describe(await service.get_profile(supplier_id))
+        profile_ms = (time.perf_counter() - started) * 1000 / sample
+    await engine.dispose()
+    return {"report": report, "batch": batch_seconds, "loop": loop_seconds, "profile_ms": profile_ms}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--suppliers", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--sample", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "supplier_risk.db")
+        started = time.perf_counter()
+        populate(path, args.suppliers, args.orders)
+        print(f"{args.orders} orders of {args.suppliers} suppliers loaded in {time.perf_counter() - started:.1f}s")
+        results = asyncio.run(measure(path, args.suppliers, args.sample))
+
+    report = results["report"]
+    print(f"{report['suppliers']} suppliers scored, {report['high_risk']} high risk")
+    print()
+    print(f"{'features and scores of every supplier':<44}{'seconds':>10}")
+    print(f"{f'one supplier at a time (from {args.sample})':<44}{results['loop']:>10.2f}")
+    print(f"{'refresh, one batch':<44}{results['batch']:>10.2f}")
+    print(f"{'  of which loading features':<44}{report['load_ms'] / 1000:>10.2f}")
+    print(f"{'  of which scoring':<44}{report['score_ms'] / 1000:>10.3f}")
+    print()
+    print(f"{'one profile, from the stored scores (ms)':<44}{results['profile_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Test suite"""
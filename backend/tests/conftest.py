@@ -0,0 +1,163 @@
+"""
+Shared fixtures: an application on a temporary SQLite database, users and orders
+"""
+
+import os
+import tempfile
+from datetime import date, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="textile-erp-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite+aiosqlite:///{_tmp}/test.db",
+    LOG_FILE=f"{_tmp}/app.log",
+    MODEL_REGISTRY_DIR=f"{_tmp}/models",
+    LOG_LEVEL="WARNING",
+    SCHEMA_STARTUP_MODE="create_all",
+    DB_POOL_WARMUP_CONNECTIONS="0",
+    TRACING_ENABLED="false",
+    JOB_WORKER_ENABLED="false",
+)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core import create_access_token  # noqa: E402
+from app.db import get_engine, get_sessionmaker  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import UserRole  # noqa: E402
+from app.schemas import (  # noqa: E402
+    CreatePurchaseOrderRequest,
+    CreateSalesOrderRequest,
+    CreateWorkOrderRequest,
+)
+from app.services import (  # noqa: E402
+    PurchaseOrderService,
+    SalesOrderService,
+    UserService,
+    WorkOrderService,
+)
+from tests.query_budget import QueryCounter  # noqa: E402
+
+PASSWORD = "Passw0rd!secret"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client with the application started"""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def run(client):
+    """Run a coroutine function on the application's event loop"""
+
+    def _run(function, *args):
+        return client.portal.call(function, *args)
+
+    return _run
+
+
+async def _create_user(username: str, role: UserRole):
+    async with get_sessionmaker()() as session:
+        return await UserService(session).create_user(
+            email=f"{username}@example.com",
+            username=username,
+            password=PASSWORD,
+            full_name=username.title(),
+            role=role,
+        )
+
+
+def _headers(user) -> dict:
+    token = create_access_token(subject=str(user.id), additional_claims={"role": user.role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="session")
+def staff_user(run):
+    return run(_create_user, "staff", UserRole.STAFF)
+
+
+@pytest.fixture(scope="session")
+def admin_headers(run):
+    return _headers(run(_create_user, "admin", UserRole.ADMIN))
+
+
+@pytest.fixture
+def query_counter(client):
+    """Count the SQL statements of every API call made during the test"""
+    with QueryCounter(get_engine()) as counter:
+        yield counter
+
+
+async def _create_purchase_order(user_id: int):
+    async with get_sessionmaker()() as session:
+        request = CreatePurchaseOrderRequest(
+            supplier_id=1,
+            supplier_name="Cotton Mills",
+            po_date=date.today(),
+            due_date=date.today() + timedelta(days=30),
+            tax_rate=5,
+            line_items=[
+                {"material_code": f"YRN-{i}", "material_name": "Cotton yarn", "quantity": 10 + i, "unit_price": 2.5}
+                for i in range(3)
+            ],
+        )
+        return await PurchaseOrderService(session).create_purchase_order(request, user_id=user_id)
+
+
+async def _create_sales_order(user_id: int):
+    async with get_sessionmaker()() as session:
+        request = CreateSalesOrderRequest(
+            customer_id=1,
+            customer_name="Fashion House",
+            order_date=date.today(),
+            due_date=date.today() + timedelta(days=30),
+            tax_rate=5,
+            line_items=[
+                {"product_code": f"SHT-{i}", "product_name": "Shirting", "quantity": 100 + i, "unit_price": 4.0}
+                for i in range(3)
+            ],
+        )
+        return await SalesOrderService(session).create_sales_order(request, user_id=user_id)
+
+
+async def _create_work_order(user_id: int):
+    async with get_sessionmaker()() as session:
+        request = CreateWorkOrderRequest(
+            product_name="Shirting",
+            quantity=500,
+            due_date=date.today() + timedelta(days=14),
+        )
+        return await WorkOrderService(session).create_work_order(request, user_id=user_id)
+
+
+@pytest.fixture
+def purchase_order(run, staff_user):
+    return run(_create_purchase_order, staff_user.id)
+
+
+@pytest.fixture
+def purchase_orders(run, staff_user):
+    return [run(_create_purchase_order, staff_user.id) for _ in range(3)]
+
+
+@pytest.fixture
+def sales_order(run, staff_user):
+    return run(_create_sales_order, staff_user.id)
+
+
+@pytest.fixture
+def sales_orders(run, staff_user):
+    return [run(_create_sales_order, staff_user.id) for _ in range(3)]
+
+
+@pytest.fixture
+def work_order(run, staff_user):
+    return run(_create_work_order, staff_user.id)
+
+
+@pytest.fixture
+def work_orders(run, staff_user):
+    return [run(_create_work_order, staff_user.id) for _ in range(3)]
@@ -0,0 +1,156 @@
+"""
+SQL statement counting per API call, with budgets and N+1 detection
+
+Statements are captured with a before_cursor_execute listener on the
+application's engine. The listener runs in the context of the request that
+issued the statement, so each statement is attributed to its API call by
+the request id and route that RequestContextMiddleware binds.
+
+Consecutive INSERTs with the same fingerprint count as one statement: the
+ORM sends them as a single batch on PostgreSQL (insertmanyvalues), and only
+falls back to one INSERT per row on SQLite, where the tests run.
+"""
+
+import functools
+import inspect
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy import event
+
+from app.core.logging import current_route, request_id_var, request_scope_var
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+|%\(\w+\)s|:\w+"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    # IN (?, ?, ?) and expanded bind lists of any length look the same
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so repeats with different parameters compare equal"""
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class ApiCall:
+    """Statements issued while serving one request"""
+
+    def __init__(self, request_id: str, method: str, route: str):
+        self.request_id = request_id
+        self.method = method
+        self.route = route
+        self.statements: List[str] = []
+
+    @property
+    def label(self) -> str:
+        return f"{self.method} {self.route}"
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self) -> Dict[str, int]:
+        """Fingerprints issued more than once, the usual sign of an N+1 pattern"""
+        counts = Counter(fingerprint(statement) for statement in self.statements)
+        return {text: count for text, count in counts.most_common() if count > 1}
+
+    def report(self) -> str:
+        lines = [f"{self.label} issued {self.count} statements:"]
+        lines.extend(f"  {statement.strip()}" for statement in self.statements)
+        repeated = self.repeated()
+        if repeated:
+            lines.append("  likely N+1, repeated statements:")
+            lines.extend(f"    {count}x {text}" for text, count in repeated.items())
+        return "\n".join(lines)
+
+
+class QueryCounter:
+    """Count the statements each API call sends to the database"""
+
+    def __init__(self, engine):
+        self.engine = getattr(engine, "sync_engine", engine)
+        self.calls: Dict[str, ApiCall] = {}
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        request_id = request_id_var.get()
+        if request_id is None:
+            # Fixture setup and other work outside a request
+            return
+
+        call = self.calls.get(request_id)
+        if call is None:
+            scope = request_scope_var.get() or {}
+            call = self.calls[request_id] = ApiCall(request_id, scope.get("method", "?"), current_route())
+        if (
+            call.statements
+            and statement.lstrip().upper().startswith("INSERT")
+            and fingerprint(statement) == fingerprint(call.statements[-1])
+        ):
+            return
+        call.statements.append(statement)
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+    @property
+    def last(self) -> Optional[ApiCall]:
+        return next(reversed(self.calls.values()), None)
+
+    def by_route(self) -> Dict[str, List[ApiCall]]:
+        grouped = defaultdict(list)
+        for call in self.calls.values():
+            grouped[call.label].append(call)
+        return grouped
+
+    def check(self, budgets: Union[int, Dict[str, int]], allow_repeats: bool = False) -> None:
+        """Fail if any API call exceeds its budget or repeats a statement
+
+        budgets is either one limit for every call or a limit per
+        "METHOD /route/template"; calls to routes without a budget fail.
+        """
+        failures = []
+        for call in self.calls.values():
+            budget = budgets if isinstance(budgets, int) else budgets.get(call.label)
+            if budget is None:
+                failures.append(f"{call.label} has no query budget")
+            elif call.count > budget:
+                failures.append(f"exceeded budget of {budget}\n{call.report()}")
+            elif call.repeated() and not allow_repeats:
+                failures.append(f"repeated statements within budget of {budget}\n{call.report()}")
+
+        if failures:
+            raise AssertionError("\n\n".join(failures))
+
+
+def query_budget(budgets: Union[int, Dict[str, int]], allow_repeats: bool = False):
+    """Fail the decorated test if an API call it makes exceeds its statement budget
+
+    The test must take the query_counter fixture.
+    """
+
+    def decorator(test):
+        if "query_counter" not in inspect.signature(test).parameters:
+            raise TypeError(f"{test.__name__} must take the query_counter fixture to use @query_budget")
+
+        @functools.wraps(test)
+        def wrapper(*args, **kwargs):
+            result = test(*args, **kwargs)
+            kwargs["query_counter"].check(budgets, allow_repeats)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,129 @@
+"""
+Available- and capable-to-promise checks
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app.core import NotFoundException
+from app.services.atp_service import ATPIndex
+
+TODAY = date.today()
+
+
+def _day(days: int) -> str:
+    return (TODAY + timedelta(days=days)).isoformat()
+
+
+def _index() -> ATPIndex:
+    index = ATPIndex(TODAY, 30)
+    index.set_material(1, "FAB", 10)
+    index.set_on_hand(1, 100, 5)
+    index.set_sales_order(1, True, TODAY + timedelta(days=5), is_new=True)
+    index.set_sales_line(11, 1, "FAB", 80)
+    index.set_work_order(21, 1, True, TODAY + timedelta(days=7), 50)
+    index.set_sales_order(2, True, TODAY + timedelta(days=12), is_new=True)
+    index.set_sales_line(12, 2, "FAB", 60)
+    return index
+
+
+def test_available_to_promise_protects_later_orders():
+    index = _index()
+    # Projected 100, 20 from day 5, 70 from day 7, 10 from day 12
+    assert index.promise("FAB", 10, TODAY)["available_to_promise"] == 10
+    assert index.promise("FAB", 10, TODAY + timedelta(days=12))["can_ship"]
+
+    answer = index.promise("FAB", 30, TODAY + timedelta(days=20))
+    assert not answer["can_ship"] and answer["earliest_atp_date"] is None
+    assert answer["make_quantity"] == 20
+    # Ordered today, the shortfall arrives in the 10 day lead time
+    assert answer["can_ship_ctp"] and answer["promise_date"] == TODAY + timedelta(days=10)
+    assert not index.promise("FAB", 30, TODAY + timedelta(days=9))["can_ship_ctp"]
+
+    with pytest.raises(NotFoundException):
+        index.promise("NONE", 1, TODAY)
+
+
+def test_changes_replace_what_they_contributed():
+    index = _index()
+    # Applying the same change twice, or a stale movement, leaves the index alone
+    index.set_work_order(21, 1, True, TODAY + timedelta(days=7), 50)
+    index.add_movement(5, 1, 40)
+    assert index.promise("FAB", 1, TODAY)["available_to_promise"] == 10
+
+    index.set_sales_line(12, 2, "FAB", 30)
+    index.add_movement(6, 1, 15)
+    index.add_movement(6, 1, 15)
+    assert index.promise("FAB", 1, TODAY)["available_to_promise"] == 35
+
+    index.set_sales_order(1, False, TODAY + timedelta(days=5))
+    index.set_work_order(21, 1, False, TODAY + timedelta(days=7), 50)
+    assert index.promise("FAB", 1, TODAY)["available_to_promise"] == 85
+
+    index.remove_sales_order(2)
+    assert index.promise("FAB", 1, TODAY)["available_to_promise"] == 115
+    # A shipped order reopened needs lines the index never loaded
+    assert not index.incomplete
+    index.set_sales_order(3, True, TODAY)
+    assert index.incomplete
+
+
+def test_atp_follows_orders_and_stock_as_they_change(client):
+    def check(quantity: float, days: int) -> dict:
+        response = client.get(
+            "/api/v1/planning/atp", params={"product_code": "ATP-DENIM", "quantity": quantity, "date": _day(days)}
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    response = client.post(
+        "/api/v1/inventory/materials",
+        json={"material_code": "ATP-DENIM", "name": "Denim", "unit": "m", "lead_time_days": 20},
+    )
+    material_id = response.json()["id"]
+    client.post(
+        "/api/v1/inventory/movements",
+        json={"material_id": material_id, "movement_type": "receipt", "quantity": 100},
+    )
+    assert check(100, 0)["can_ship"]
+
+    response = client.post(
+        "/api/v1/sales-orders",
+        json={
+            "customer_id": 1,
+            "customer_name": "Fashion House",
+            "order_date": _day(0),
+            "due_date": _day(10),
+            "line_items": [{"product_code": "ATP-DENIM", "product_name": "Denim", "quantity": 70, "unit_price": 4}],
+        },
+    )
+    so_id = response.json()["id"]
+    # Drafts are not demand yet
+    assert check(100, 0)["can_ship"]
+    client.put(f"/api/v1/sales-orders/{so_id}", json={"status": "confirmed"})
+    answer = check(100, 0)
+    assert answer["available_to_promise"] == 30 and answer["earliest_atp_date"] is None
+    assert answer["make_quantity"] == 70 and answer["promise_date"] == _day(20)
+
+    response = client.post(
+        "/api/v1/work-orders",
+        json={"product_name": "Denim", "product_code": "ATP-DENIM", "quantity": 50, "due_date": _day(15)},
+    )
+    wo_id = response.json()["id"]
+    answer = check(60, 0)
+    assert answer["available_to_promise"] == 30 and answer["earliest_atp_date"] == _day(15)
+    assert answer["promise_date"] == _day(15)
+
+    client.put(f"/api/v1/work-orders/{wo_id}", json={"status": "cancelled"})
+    client.post(
+        "/api/v1/inventory/movements",
+        json={"material_id": material_id, "movement_type": "issue", "quantity": 10},
+    )
+    assert check(1, 30)["available_to_promise"] == 20
+
+    client.delete(f"/api/v1/sales-orders/{so_id}")
+    assert check(1, 30)["available_to_promise"] == 90
+
+    response = client.get("/api/v1/planning/atp", params={"product_code": "ATP-NONE", "quantity": 1, "date": _day(0)})
+    assert response.status_code == 404
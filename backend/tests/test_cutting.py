@@ -0,0 +1,101 @@
+"""
+Fabric rolls and cutting plans
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.services.cutting_service import first_fit_decreasing, solve_cutting
+
+DUE = (date.today() + timedelta(days=30)).isoformat()
+
+
+def _check(rolls, pieces, counts, solution) -> None:
+    cut = np.zeros(len(pieces), dtype=int)
+    for roll, pattern in solution.cuts.items():
+        assert sum(pieces[piece] * count for piece, count in pattern.items()) <= rolls[roll]
+        for piece, count in pattern.items():
+            cut[piece] += count
+    assert (cut + solution.unplaced == counts).all()
+
+
+def test_first_fit_decreasing_uses_the_shortest_roll_that_fits():
+    rolls = np.array([14, 11, 12, 14, 13, 12])
+    free, cuts = rolls.copy(), {}
+    unplaced = first_fit_decreasing(free, np.array([5, 7]), np.array([2, 4]), cuts=cuts)
+
+    assert not unplaced.any()
+    assert cuts == {1: {1: 1}, 2: {1: 1, 0: 1}, 5: {1: 1, 0: 1}, 4: {1: 1}}
+    assert free[[1, 2, 4, 5]].sum() == 10
+
+
+def test_column_generation_wastes_less_than_first_fit():
+    rolls, pieces, counts = np.array([14, 11, 12, 14, 13, 12]), np.array([5, 7]), np.array([2, 4])
+    solution = solve_cutting(rolls, pieces, counts, time_limit=5)
+
+    _check(rolls, pieces, counts, solution)
+    assert solution.method == "column_generation"
+    assert (solution.waste, solution.ffd_waste) == (0, 10)
+    # Both 12s and one 14
+    assert sorted(rolls[list(solution.cuts)]) == [12, 12, 14]
+    assert solution.lower_bound == 38
+
+
+def test_random_plans_are_feasible_and_never_worse_than_first_fit():
+    rng = np.random.default_rng(4)
+    for _ in range(10):
+        rolls = rng.integers(3000, 6000, 80)
+        pieces = np.unique(rng.integers(150, 900, 12))
+        counts = rng.integers(1, 30, len(pieces))
+        solution = solve_cutting(rolls, pieces, counts, time_limit=2)
+
+        _check(rolls, pieces, counts, solution)
+        assert not solution.unplaced.any() and solution.waste <= solution.ffd_waste
+        if solution.lower_bound is not None:
+            assert solution.lower_bound <= rolls[list(solution.cuts)].sum() + 1e-6
+
+
+def test_cutting_plan_for_open_work_orders(client):
+    client.post("/api/v1/inventory/materials", json={"material_code": "TST-TWILL", "name": "Twill", "unit": "m"})
+    rolls = [{"roll_number": f"TST-TW-{n}", "length": length} for n, length in enumerate([14, 11, 12, 14, 13, 12])]
+    response = client.post("/api/v1/inventory/rolls", json={"material_code": "TST-TWILL", "rolls": rolls})
+    assert response.status_code == 201
+    assert response.json()[0]["remaining_length"] == 14
+
+    response = client.post("/api/v1/inventory/rolls", json={"material_code": "TST-TWILL", "rolls": rolls[:1]})
+    assert response.status_code == 409
+    response = client.post("/api/v1/inventory/rolls", json={"material_code": "TST-NONE", "rolls": rolls[:1]})
+    assert response.status_code == 404
+
+    def create(pieces: int, cut_length: float) -> int:
+        response = client.post(
+            "/api/v1/work-orders",
+            json={
+                "product_name": "Trousers",
+                "quantity": pieces,
+                "due_date": DUE,
+                "materials": [
+                    {"material_code": "TST-TWILL", "quantity": pieces * cut_length, "cut_length": cut_length}
+                ],
+            },
+        )
+        assert response.status_code == 201
+        assert response.json()["materials"][0]["cut_length"] == cut_length
+        return response.json()["id"]
+
+    orders = {create(2, 5.0): 2, create(3, 7.0): 3, create(1, 7.0): 1}
+
+    params = {"material_code": "TST-TWILL", "time_limit_ms": 5000}
+    response = client.get("/api/v1/planning/cutting-plan", params=params)
+    assert response.status_code == 200
+    plan = response.json()["materials"][0]
+
+    assert plan["pieces"] == 6 and plan["unplaced_pieces"] == 0
+    assert plan["waste_length"] == 0 and plan["ffd_waste_percentage"] > 0
+    cut = {}
+    for roll in plan["rolls"]:
+        assert roll["used_length"] + roll["waste_length"] == roll["length"]
+        for pieces in roll["cuts"]:
+            cut[pieces["work_order_id"]] = cut.get(pieces["work_order_id"], 0) + pieces["pieces"]
+    assert cut == orders
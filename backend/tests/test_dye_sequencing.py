@@ -0,0 +1,100 @@
+"""
+Dye-lot batching and changeover sequencing
+"""
+
+import random
+from datetime import date, timedelta
+from itertools import permutations
+
+import numpy as np
+
+from app.services.dye_sequencing_service import changeover_matrix, pack_lots, path_cost, sequence_groups
+
+BASE = "/api/v1/planning"
+DUE = (date.today() + timedelta(days=30)).isoformat()
+
+
+def _matrix(depths, recipes, fabrics):
+    return changeover_matrix(
+        np.array(depths, dtype=float),
+        np.array(recipes, dtype=object),
+        np.array(fabrics, dtype=object),
+        wash_hours=1.0,
+        lightening_hours=3.0,
+        fabric_change_hours=0.5,
+    )
+
+
+def test_lots_are_packed_first_fit_decreasing_and_split_big_orders():
+    lots = pack_lots([(1, 1100), (2, 300), (3, 250), (4, 200), (5, 150)], 500)
+
+    assert lots == [
+        [(1, 500)],
+        [(1, 500)],
+        [(2, 300), (4, 200)],
+        [(3, 250), (5, 150), (1, 100)],
+    ]
+    assert all(sum(quantity for _, quantity in lot) <= 500 for lot in lots)
+
+
+def test_going_lighter_costs_more_than_going_darker():
+    cost = _matrix([10, 90, 90], ["ecru", "navy", "navy"], ["knit", "knit", "woven"])
+
+    assert cost[0, 1] == 1.0
+    assert cost[1, 0] == 1.0 + 3.0 * 0.8
+    assert cost[1, 2] == 0.5
+    assert np.all(np.diag(cost) == 0)
+
+
+def test_sequence_matches_brute_force_on_small_instances():
+    rng = random.Random(7)
+    for _ in range(20):
+        count = 6
+        cost = _matrix(
+            [rng.uniform(0, 100) for _ in range(count)],
+            [f"r{rng.randint(0, 3)}" for _ in range(count)],
+            [rng.choice(["knit", "woven"]) for _ in range(count)],
+        )
+        path = sequence_groups(cost, time_budget=1)
+
+        assert sorted(path) == list(range(count))
+        best = min(path_cost(cost, order) for order in permutations(range(count)))
+        # Local search is not exact, but close on instances this small
+        assert path_cost(cost, path) <= best + 0.5
+
+
+def test_dye_sequence_beats_fifo(client):
+    for code, depth in (("TST-ECRU", 5), ("TST-RED", 50), ("TST-BLACK", 95)):
+        response = client.post(f"{BASE}/dye-recipes", json={"code": code, "name": code, "depth": depth})
+        assert response.status_code == 201
+    assert client.post(f"{BASE}/dye-recipes", json={"code": "TST-RED", "name": "Again"}).status_code == 409
+
+    orders = [("TST-BLACK", "knit"), ("TST-ECRU", "knit"), ("TST-RED", "woven")] * 4
+    for recipe, fabric in orders:
+        response = client.post(
+            "/api/v1/work-orders",
+            json={
+                "product_name": "Dyed fabric",
+                "quantity": 150,
+                "due_date": DUE,
+                "dye_recipe_code": recipe,
+                "fabric_type": fabric,
+            },
+        )
+        assert response.status_code == 201
+    response = client.post(
+        "/api/v1/work-orders",
+        json={"product_name": "Dyed fabric", "quantity": 1, "due_date": DUE, "dye_recipe_code": "TST-NONE"},
+    )
+    assert response.status_code == 400
+
+    response = client.get(f"{BASE}/dye-sequence", params={"batch_capacity": 300})
+    assert response.status_code == 200
+    plan = response.json()
+
+    ours = [lot for lot in plan["lots"] if lot["dye_recipe_code"].startswith("TST-")]
+    assert [lot["dye_recipe_code"] for lot in ours] == ["TST-ECRU"] * 2 + ["TST-RED"] * 2 + ["TST-BLACK"] * 2
+    assert all(lot["load"] == 300 and len(lot["orders"]) == 2 for lot in ours)
+    assert plan["hours_saved"] > 0
+    assert plan["changeover_hours"] == sum(lot["changeover_hours"] for lot in plan["lots"])
+    assert plan["lot_count"] < plan["fifo_lot_count"]
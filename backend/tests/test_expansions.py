@@ -0,0 +1,63 @@
+"""
+?expand=created_by and the request-scoped batch loader
+"""
+
+from sqlalchemy import event
+
+from app.db import LoaderRegistry, get_engine, get_sessionmaker
+from app.models import User, UserRole
+from tests.conftest import _create_purchase_order, _create_user
+
+
+def test_expand_created_by_uses_one_query_per_page(client, run, query_counter, staff_user):
+    buyer = run(_create_user, "buyer", UserRole.MANAGER)
+    for user in (staff_user, buyer, staff_user, buyer):
+        run(_create_purchase_order, user.id)
+
+    response = client.get("/api/v1/purchase-orders", params={"limit": 4, "expand": "created_by"})
+    assert response.status_code == 200
+
+    creators = {order["created_by"]: order["created_by_user"] for order in response.json()["data"]}
+    assert creators[staff_user.id]["username"] == "staff"
+    assert creators[buyer.id] == {"id": buyer.id, "username": "buyer", "full_name": "Buyer", "role": "manager"}
+
+    user_queries = [s for s in query_counter.last.statements if "FROM users" in s]
+    assert len(user_queries) == 1
+    assert " IN " in user_queries[0]
+
+
+def test_created_by_user_is_omitted_without_expand(client, purchase_order):
+    response = client.get(f"/api/v1/purchase-orders/{purchase_order.id}")
+    assert response.status_code == 200
+    assert response.json()["created_by_user"] is None
+
+
+def test_unknown_expansion_is_rejected(client):
+    response = client.get("/api/v1/work-orders", params={"expand": "created_by,supplier"})
+    assert response.status_code == 400
+    assert "supplier" in response.json()["message"]
+
+
+def test_loader_batches_and_caches(run, staff_user):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    async def load():
+        async with get_sessionmaker()() as session:
+            loader = LoaderRegistry(session).get(User)
+            first = await loader.load_many([staff_user.id, 0, staff_user.id])
+            again = await loader.load(staff_user.id)
+            return first, again, loader
+
+    event.listen(get_engine().sync_engine, "before_cursor_execute", record)
+    try:
+        (user, missing, same), again, loader = run(load)
+    finally:
+        event.remove(get_engine().sync_engine, "before_cursor_execute", record)
+
+    assert len(statements) == 1
+    assert user.username == "staff"
+    assert missing is None
+    assert same is user and again is user
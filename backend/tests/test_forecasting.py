@@ -0,0 +1,177 @@
+"""
+Demand forecasting
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.services.forecasting_service import (
+    ALPHAS,
+    _smooth,
+    accuracy_metrics,
+    decode_series,
+    encode_series,
+    error_sums,
+    fit_batch,
+    roll_forward,
+)
+
+
+def _reference(series, alpha: float, croston: bool, interval: float) -> list:
+    """One-week-ahead forecasts of a single series, written out loop by loop"""
+    start = next(week for week, value in enumerate(series) if value > 0)
+    forecasts, size, since = [None] * len(series), series[start], 0
+    for week in range(start + 1, len(series)):
+        forecasts[week] = (1 - alpha / 2) * size / interval if croston else size
+        since += 1
+        if series[week] > 0 or not croston:
+            size += alpha * (series[week] - size)
+        if series[week] > 0 and croston:
+            interval += alpha * (since - interval)
+            since = 0
+    return forecasts
+
+
+def test_vectorized_fit_matches_the_recursion_per_series():
+    rng = np.random.default_rng(5)
+    smooth = rng.poisson(40, (20, 52)).astype(float)
+    intermittent = rng.poisson(30, (20, 52)) * (rng.random((20, 52)) < 0.25)
+    intermittent[:, 3] = 12
+    demand = np.vstack([smooth, intermittent])
+    start = (demand > 0).argmax(axis=1)
+
+    fit = fit_batch(demand, start)
+    assert not fit.intermittent[:20].any() and fit.intermittent[20:].all()
+    assert set(fit.alpha) <= set(ALPHAS)
+    for row in range(len(demand)):
+        weeks = len(demand[row]) - start[row]
+        interval = weeks / (demand[row] > 0).sum() if fit.intermittent[row] else 1.0
+        expected = _reference(list(demand[row]), fit.alpha[row], fit.intermittent[row], interval)
+        actual = [None if np.isnan(value) else value for value in fit.fitted[row]]
+        assert np.allclose([value or 0 for value in actual], [value or 0 for value in expected])
+        assert [value is None for value in actual] == [value is None for value in expected]
+
+
+def test_metrics_of_a_steady_series():
+    demand = np.array([[0, 0, 50, 50, 50, 50, 50, 50.0]])
+    fit = fit_batch(demand, np.array([2]))
+    metrics = accuracy_metrics(fit.sums)
+
+    assert fit.forecast[0] == 50 and metrics["mae"][0] == 0 and metrics["accuracy"][0] == 100
+    # No spread in the actuals: r squared is undefined
+    assert np.isnan(metrics["r_squared"][0])
+
+    actual, fitted = decode_series(encode_series(demand[0], fit.fitted[0]))
+    assert (actual == demand[0]).all() and np.isnan(fitted[:3]).all()
+
+
+def test_rolling_forward_matches_refitting_with_weeks_without_demand():
+    rng = np.random.default_rng(8)
+    demand = np.vstack([rng.poisson(20, (5, 30)), rng.poisson(20, (5, 30)) * (rng.random((5, 30)) < 0.3)])
+    demand[:, 0] = 4
+    start = np.zeros(len(demand), dtype=int)
+    fit = fit_batch(demand, start)
+    weeks = np.array([3, 0, 1, 2, 3, 3, 2, 1, 0, 3])
+
+    appended = roll_forward(fit, weeks)
+
+    extended = np.hstack([demand, np.zeros((len(demand), 3))])
+    interval = np.where(fit.intermittent, 30 / (demand > 0).sum(axis=1), 1.0)
+    for row, count in enumerate(weeks):
+        # The state after count more weeks: the refit over just those weeks
+        _, expected, state = _smooth(
+            extended[row:row + 1, :30 + count], start[row:row + 1], fit.alpha[row:row + 1, None],
+            fit.intermittent[row:row + 1], interval[row:row + 1], keep=True,
+        )
+        assert np.allclose(appended[row, :count], expected[0, 0, 30:])
+        assert np.isclose(fit.level[row], state[0][0, 0]) and fit.since[row] == state[2][0, 0]
+        sums = error_sums(extended[row:row + 1, :30 + count], expected[:, 0])
+        assert all(np.isclose(fit.sums[name][row], sums[name][0]) for name in sums)
+
+
+def test_forecasts_from_sales_order_history(client, admin_headers):
+    monday = date.today() - timedelta(days=date.today().weekday())
+    for weeks_ago, quantity in [(6, 40), (5, 42), (4, 38), (3, 41), (2, 39), (1, 40), (0, 500)]:
+        order_date = monday - timedelta(weeks=weeks_ago)
+        response = client.post(
+            "/api/v1/sales-orders",
+            json={
+                "customer_id": 1,
+                "customer_name": "Fashion House",
+                "order_date": order_date.isoformat(),
+                "due_date": (order_date + timedelta(days=14)).isoformat(),
+                "line_items": [
+                    {"product_code": "FC-POPLIN", "product_name": "Poplin", "quantity": quantity, "unit_price": 3}
+                ],
+            },
+        )
+        client.put(f"/api/v1/sales-orders/{response.json()['id']}", json={"status": "confirmed"})
+
+    assert client.post("/api/v1/ml/demand-forecasting/retrain").status_code in (401, 403)
+    response = client.post("/api/v1/ml/demand-forecasting/retrain", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["refitted"] >= 1
+
+    response = client.get("/api/v1/ml/demand-forecasting/skus", params={"search": "FC-POPLIN"})
+    assert response.json()["total"] == 1
+    assert response.json()["data"][0]["model"] == "ses"
+
+    response = client.get("/api/v1/ml/demand-forecasting/metrics/FC-POPLIN")
+    metrics = response.json()
+    assert 35 < metrics["forecast"] < 45 and metrics["accuracy"] > 90
+
+    response = client.get(
+        "/api/v1/ml/demand-forecasting/forecast",
+        params={"sku_id": "FC-POPLIN", "history_weeks": 6, "horizon_weeks": 4},
+    )
+    chart = response.json()
+    # The current week is not complete, so its order is not history yet
+    assert chart["dates"][:2] == [(monday - timedelta(weeks=6)).isoformat(), (monday - timedelta(weeks=5)).isoformat()]
+    assert chart["actual"] == [40, 42, 38, 41, 39, 40, None, None, None, None]
+    assert chart["predicted"][0] is None and chart["predicted"][-1] == round(metrics["forecast"], 2)
+    assert all(low <= high for low, high in zip(chart["confidence_lower"][1:], chart["confidence_upper"][1:]))
+
+    assert client.get("/api/v1/ml/demand-forecasting/metrics").json()["products"] >= 1
+    assert client.get("/api/v1/ml/demand-forecasting/metrics/FC-NONE").status_code == 404
+
+
+def test_only_products_with_changed_orders_are_refitted(client, admin_headers):
+    monday = date.today() - timedelta(days=date.today().weekday())
+    order_date = monday - timedelta(weeks=2)
+    response = client.post(
+        "/api/v1/sales-orders",
+        json={
+            "customer_id": 1,
+            "customer_name": "Fashion House",
+            "order_date": order_date.isoformat(),
+            "due_date": (order_date + timedelta(days=14)).isoformat(),
+            "line_items": [{"product_code": "FC-TWILL", "product_name": "Twill", "quantity": 30, "unit_price": 4}],
+        },
+    )
+    so_id = response.json()["id"]
+    client.put(f"/api/v1/sales-orders/{so_id}", json={"status": "confirmed"})
+
+    first = client.post("/api/v1/ml/demand-forecasting/retrain", headers=admin_headers).json()
+    assert first["refitted"] >= 1 and not first["full"]
+    # Nothing changed since
+    second = client.post("/api/v1/ml/demand-forecasting/retrain", headers=admin_headers).json()
+    assert second["refitted"] == 0 and second["unchanged"] == second["products"] == first["products"]
+
+    client.post(
+        f"/api/v1/sales-orders/{so_id}/line-items",
+        json={"product_code": "FC-TWILL", "product_name": "Twill", "quantity": 20, "unit_price": 4},
+    )
+    third = client.post("/api/v1/ml/demand-forecasting/retrain", headers=admin_headers).json()
+    assert third["refitted"] == 1 and third["unchanged"] == third["products"] - 1
+    chart = client.get("/api/v1/ml/demand-forecasting/forecast", params={"sku_id": "FC-TWILL", "history_weeks": 2})
+    assert chart.json()["actual"][:2] == [50, 0]
+
+    # Cancelling the only order leaves no history to forecast from
+    client.put(f"/api/v1/sales-orders/{so_id}", json={"status": "cancelled"})
+    fourth = client.post("/api/v1/ml/demand-forecasting/retrain", headers=admin_headers).json()
+    assert fourth["refitted"] == 0 and fourth["removed"] == 1
+    assert client.get("/api/v1/ml/demand-forecasting/metrics/FC-TWILL").status_code == 404
+
+    full = client.post("/api/v1/ml/demand-forecasting/retrain", params={"full": True}, headers=admin_headers).json()
+    assert full["full"] and full["refitted"] == full["products"] and full["unchanged"] == 0
@@ -0,0 +1,112 @@
+"""
+Quality inspection: micro-batched inference, defect detection and quality prediction
+"""
+
+import asyncio
+import io
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.core import ServiceUnavailableException
+from app.core.inference import InferenceScheduler
+from app.services.inspection_service import read_image
+
+
+def test_scheduler_batches_requests_and_refuses_past_its_queue():
+    executor = ThreadPoolExecutor(2)
+    sizes = []
+    release = threading.Event()
+
+    def double(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    def blocked(items):
+        release.wait(5)
+        return items
+
+    async def scenario():
+        scheduler = InferenceScheduler("double", double, 4, 50, 100, 1, executor)
+        results = await asyncio.gather(*(scheduler.submit(item) for item in range(10)))
+        assert results == [item * 2 for item in range(10)] and sizes == [4, 4, 2]
+        assert scheduler.stats.snapshot()["batch_size"]["max"] == 4
+
+        # One batch running, one waiting for the run slot, one queued: the next is refused
+        scheduler = InferenceScheduler("blocked", blocked, 1, 0, 1, 1, executor)
+        pending = []
+        for item in range(3):
+            pending.append(asyncio.ensure_future(scheduler.submit(item)))
+            await asyncio.sleep(0.02)
+        with pytest.raises(ServiceUnavailableException):
+            await scheduler.submit(3)
+        release.set()
+        assert await asyncio.gather(*pending) == [0, 1, 2]
+        assert scheduler.stats.rejected == 1
+
+    asyncio.run(scenario())
+    executor.shutdown()
+
+
+def fabric(size: int, seed: int = 1) -> np.ndarray:
+    """A regular weave with a little noise"""
+    rng = np.random.default_rng(seed)
+    rows, columns = np.indices((size, size))
+    weave = 128 + 30 * ((rows // 2 + columns // 2) % 2) + rng.normal(0, 4, (size, size))
+    return np.clip(weave, 0, 255).astype(np.uint8)
+
+
+def pgm(image: np.ndarray) -> bytes:
+    return b"P5\n# inspection frame\n%d %d\n255\n" % (image.shape[1], image.shape[0]) + image.tobytes()
+
+
+def test_large_uploads_are_memory_mapped():
+    image = fabric(1200)
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as file:
+        file.write(pgm(image))
+        assert file._rolled
+        pixels = read_image(file)
+        assert isinstance(pixels, np.memmap) and np.array_equal(pixels, image)
+
+    buffer = io.BytesIO()
+    np.save(buffer, image[:64, :64])
+    assert np.array_equal(read_image(buffer), image[:64, :64])
+
+
+def test_defect_detection_and_quality_prediction(client):
+    clean = fabric(256)
+    stained = clean.copy()
+    stained[96:128, 160:192] = 20
+
+    response = client.post(
+        "/api/v1/ml/defect-detection/detect",
+        files={"image": ("frame.pgm", pgm(stained), "image/x-portable-graymap")},
+        data={"line_id": "L1"},
+    )
+    result = response.json()
+    assert result["defective"] and result["defect_type"] == "dark_spot" and result["line_id"] == "L1"
+    assert result["bounding_box"] == [160, 96, 192, 128] and result["confidence"] > 0.9
+
+    response = client.post("/api/v1/ml/defect-detection/detect", files={"image": ("frame.pgm", pgm(clean))})
+    assert not response.json()["defective"]
+    response = client.post("/api/v1/ml/defect-detection/detect", files={"image": ("frame.png", b"\x89PNG")})
+    assert response.status_code == 422
+
+    response = client.post(
+        "/api/v1/ml/quality-prediction/batch",
+        json={
+            "records": [
+                {"batch_id": "B1", "temperature_c": 130, "ph": 4.5},
+                {"batch_id": "B2", "temperature_c": 141, "ph": 4.6, "humidity_pct": 70},
+            ]
+        },
+    )
+    on_target, too_hot = response.json()["predictions"]
+    assert on_target["batch_id"] == "B1" and on_target["predicted_grade"] == "A"
+    assert too_hot["predicted_grade"] == "C" and too_hot["main_driver"] == "temperature_c"
+
+    metrics = client.get("/api/v1/ml/inference/metrics").json()
+    assert metrics["defect_detection"]["requests"] >= 2 and metrics["quality_prediction"]["batches"] >= 1
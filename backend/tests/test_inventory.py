@@ -0,0 +1,181 @@
+"""
+Stock ledger postings, on-hand balances and the balance jobs
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.db import get_sessionmaker
+from app.models import StockBalance, StockMovement, WOMaterial, WorkOrder, WOStatus
+from app.services.archive_service import ArchiveService
+
+BASE = "/api/v1/inventory"
+DUE = (date.today() + timedelta(days=14)).isoformat()
+
+
+def _material(client, code: str, **fields) -> dict:
+    response = client.post(f"{BASE}/materials", json={"material_code": code, "name": code.title(), **fields})
+    assert response.status_code == 201
+    return response.json()
+
+
+def _on_hand(client, material_id: int) -> float:
+    return client.get(f"{BASE}/materials/{material_id}").json()["quantity_on_hand"]
+
+
+def test_receiving_a_purchase_order_posts_each_line_once(client, purchase_order):
+    url = f"/api/v1/purchase-orders/{purchase_order.id}"
+    assert client.put(url, json={"status": "received"}).status_code == 200
+    # Moving back and receiving again must not post the lines twice
+    assert client.put(url, json={"status": "approved"}).status_code == 200
+    assert client.put(url, json={"status": "received"}).status_code == 200
+
+    response = client.get(
+        f"{BASE}/movements",
+        params={"reference_type": "purchase_order", "reference_id": purchase_order.id},
+    )
+    movements = response.json()["data"]
+    assert sorted(m["reference_line_id"] for m in movements) == sorted(i.id for i in purchase_order.line_items)
+    assert all(m["movement_type"] == "receipt" and m["warehouse_code"] == "MAIN" for m in movements)
+
+    # Materials unknown to the master are created from the line items
+    materials = client.get(f"{BASE}/materials", params={"search": "YRN-2"}).json()["data"]
+    assert materials[0]["name"] == "Cotton yarn"
+    assert materials[0]["quantity_on_hand"] >= 12
+
+
+def test_starting_a_work_order_issues_its_materials(client):
+    thread = _material(client, "TST-THREAD")
+    response = client.post(
+        f"{BASE}/movements",
+        json={"material_id": thread["id"], "movement_type": "receipt", "quantity": 30, "warehouse_code": "W2"},
+    )
+    assert response.status_code == 201
+
+    response = client.post(
+        "/api/v1/work-orders",
+        json={
+            "product_name": "Shirting",
+            "quantity": 10,
+            "due_date": DUE,
+            "materials": [{"material_code": "TST-THREAD", "quantity": 12, "warehouse_code": "W2"}],
+        },
+    )
+    assert response.status_code == 201
+    wo = response.json()
+    assert wo["materials"][0]["material_id"] == thread["id"]
+
+    assert client.put(f"/api/v1/work-orders/{wo['id']}", json={"status": "in_progress"}).status_code == 200
+    balances = client.get(f"{BASE}/balances", params={"material_id": thread["id"]}).json()["data"]
+    assert [(b["warehouse_code"], b["quantity_on_hand"]) for b in balances] == [("W2", 18)]
+
+
+def test_issues_cannot_take_stock_below_zero(client):
+    cloth = _material(client, "TST-CLOTH")
+    response = client.post(
+        "/api/v1/work-orders",
+        json={
+            "product_name": "Towel",
+            "quantity": 5,
+            "due_date": DUE,
+            "materials": [{"material_code": "TST-CLOTH", "quantity": 3}],
+        },
+    )
+    wo_id = response.json()["id"]
+
+    response = client.put(f"/api/v1/work-orders/{wo_id}", json={"status": "in_progress"})
+    assert response.status_code == 400
+    assert "Insufficient stock" in response.json()["detail"]
+    # Nothing was posted and the order did not start
+    assert client.get(f"{BASE}/movements", params={"material_id": cloth["id"]}).json()["total"] == 0
+    assert client.get(f"/api/v1/work-orders/{wo_id}").json()["status"] == "draft"
+
+    response = client.post(
+        f"{BASE}/movements",
+        json={"material_id": cloth["id"], "movement_type": "issue", "quantity": 1},
+    )
+    assert response.status_code == 400
+
+
+def test_archived_work_orders_keep_their_materials(client, run):
+    _material(client, "TST-LINING")
+    response = client.post(
+        "/api/v1/work-orders",
+        json={
+            "product_name": "Jacket",
+            "quantity": 4,
+            "due_date": DUE,
+            "materials": [{"material_code": "TST-LINING", "quantity": 6, "cut_length": 1.5}],
+        },
+    )
+    wo = response.json()
+    created = datetime(2001, 1, 1)
+
+    async def archive():
+        async with get_sessionmaker()() as session:
+            await session.execute(
+                update(WorkOrder)
+                .where(WorkOrder.id == wo["id"])
+                .values(status=WOStatus.CANCELLED, created_at=created)
+            )
+            await session.commit()
+            archived = await ArchiveService(session).archive_closed_orders(
+                older_than_days=(datetime.utcnow() - created).days - 1
+            )
+            left = await session.execute(
+                select(func.count()).select_from(WOMaterial).where(WOMaterial.work_order_id == wo["id"])
+            )
+            return archived["work_orders"], left.scalar_one()
+
+    assert run(archive) == (1, 0)
+    response = client.get(f"/api/v1/work-orders/{wo['id']}", params={"include_archived": True})
+    assert response.status_code == 200
+    assert response.json()["materials"] == wo["materials"]
+
+
+def test_check_finds_drift_and_rebuild_repairs_it(client, run, admin_headers):
+    button = _material(client, "TST-BUTTON")
+    for quantity in (100, -15.5):
+        client.post(
+            f"{BASE}/movements",
+            json={"material_id": button["id"], "movement_type": "adjustment", "quantity": quantity},
+        )
+
+    async def corrupt():
+        async with get_sessionmaker()() as session:
+            await session.execute(
+                update(StockBalance).where(StockBalance.material_id == button["id"]).values(quantity_on_hand=1)
+            )
+            await session.commit()
+
+    run(corrupt)
+
+    params = {"chunk_size": 2}
+    report = client.get(f"{BASE}/balances/check", params=params, headers=admin_headers).json()
+    assert report["mismatches"] == [
+        {"material_id": button["id"], "warehouse_code": "MAIN", "ledger_quantity": 84.5, "balance_quantity": 1}
+    ]
+
+    rebuilt = client.post(f"{BASE}/balances/rebuild", params=params, headers=admin_headers).json()
+    assert rebuilt["materials"] == report["materials_checked"]
+    assert client.get(f"{BASE}/balances/check", params=params, headers=admin_headers).json()["mismatches"] == []
+    assert _on_hand(client, button["id"]) == 84.5
+
+
+def test_ledger_is_append_only(client, run):
+    zip_ = _material(client, "TST-ZIP")
+    response = client.post(
+        f"{BASE}/movements",
+        json={"material_id": zip_["id"], "movement_type": "receipt", "quantity": 5},
+    )
+
+    async def edit_movement():
+        async with get_sessionmaker()() as session:
+            movement = await session.get(StockMovement, response.json()["id"])
+            movement.quantity = 0
+            await session.commit()
+
+    with pytest.raises(ValueError, match="append-only"):
+        run(edit_movement)
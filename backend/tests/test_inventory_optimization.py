@@ -0,0 +1,116 @@
+"""
+Inventory optimization: ABC/XYZ classes, order quantities, safety stock and reorder points
+"""
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from scipy.special import ndtri
+from sqlalchemy import update
+
+from app.db import get_sessionmaker
+from app.models import StockMovement
+from app.services.inventory_optimization_service import STATISTICS, compute_policies
+
+
+def test_policies_of_steady_and_idle_materials():
+    weekly = np.array([100, 10, 5, 0.0])
+    statistics = {name: np.zeros(4) for name in STATISTICS}
+    statistics["demand_weeks"][:] = 52
+    statistics["sum_demand"] = weekly * 52
+    statistics["sum_squared_demand"] = weekly ** 2 * 52
+    # The first material was received twice, after 10 and 14 days, at 10 a unit
+    statistics["receipts"][0] = 2
+    statistics["sum_lead_time"][0] = 24
+    statistics["sum_squared_lead_time"][0] = 10 ** 2 + 14 ** 2
+    statistics["received_quantity"][0] = 1000
+    statistics["received_value"][0] = 10000
+    statistics["on_hand"] = np.array([800, 50, 20, 30.0])
+
+    policies = compute_policies(statistics, np.full(4, 10.0), np.array([0, 7, 7, 7.0]), 50, 0.25)
+
+    assert list(policies["abc_class"]) == ["A", "B", "C", "C"]
+    assert list(policies["xyz_class"]) == ["X", "X", "X", "Z"]
+    assert np.isclose(policies["economic_order_quantity"][0], np.sqrt(2 * 5200 * 50 / 2.5))
+    # Steady demand: safety stock covers only the lead time varying, by 2 days either way
+    daily = 100 / 7
+    assert np.isclose(policies["safety_stock"][0], ndtri(0.98) * daily * 2)
+    assert np.isclose(policies["reorder_point"][0], daily * 12 + policies["safety_stock"][0])
+    # Never received: the master lead time, and no variation to cover
+    assert np.isclose(policies["reorder_point"][1], 10 / 7 * 7) and policies["safety_stock"][1] == 0
+    # Nothing consumed: no order, and all stock held is a saving
+    assert policies["economic_order_quantity"][3] == 0 and policies["reorder_point"][3] == 0
+    assert np.isclose(policies["potential_savings"][3], 30 * 2.5)
+
+
+def test_policies_from_consumption_and_receipts(client, admin_headers, run):
+    response = client.post(
+        "/api/v1/inventory/materials",
+        json={"material_code": "IO-DENIM", "name": "Denim", "standard_cost": 4, "lead_time_days": 7},
+    )
+    material_id = response.json()["id"]
+    po_date = date.today() - timedelta(days=10)
+    response = client.post(
+        "/api/v1/purchase-orders",
+        json={
+            "supplier_id": 1,
+            "supplier_name": "Denim Mills",
+            "po_date": po_date.isoformat(),
+            "due_date": (po_date + timedelta(days=14)).isoformat(),
+            "line_items": [{"material_code": "IO-DENIM", "material_name": "Denim", "quantity": 600, "unit_price": 5}],
+        },
+    )
+    response = client.put(f"/api/v1/purchase-orders/{response.json()['id']}", json={"status": "received"})
+    assert response.status_code == 200
+
+    # Issue 70 a week over the last four complete weeks
+    monday = date.today() - timedelta(days=date.today().weekday())
+    issued = []
+    for _ in range(4):
+        response = client.post(
+            "/api/v1/inventory/movements",
+            json={"material_id": material_id, "movement_type": "issue", "quantity": 70},
+        )
+        issued.append(response.json()["id"])
+
+    async def backdate():
+        async with get_sessionmaker()() as session:
+            for weeks_ago, movement_id in enumerate(issued, start=1):
+                await session.execute(
+                    update(StockMovement)
+                    .where(StockMovement.id == movement_id)
+                    .values(created_at=datetime.combine(monday - timedelta(weeks=weeks_ago), datetime.min.time()))
+                )
+            await session.commit()
+
+    run(backdate)
+
+    base = "/api/v1/ml/inventory-optimization"
+    assert client.post(f"{base}/recompute").status_code in (401, 403)
+    report = client.post(f"{base}/recompute", headers=admin_headers).json()
+    assert report["aggregated"] == report["materials"] >= 1
+
+    policy = client.get(f"{base}/recommendations", params={"search": "IO-DENIM"}).json()["data"][0]
+    assert policy["unit_cost"] == 5 and policy["lead_time_days"] == 10 and policy["on_hand"] == 320
+    # 280 over the 52 weeks of history
+    assert np.isclose(policy["annual_demand"], 280)
+    assert policy["reorder_point"] > 0 and policy["recommended_stock"] > policy["safety_stock"]
+
+    # Nothing changed: every material's sums are reused and nothing is written
+    again = client.post(f"{base}/recompute", headers=admin_headers).json()
+    assert again["aggregated"] == 0 and again["reused"] == again["materials"] and again["written"] == 0
+
+    client.post(
+        "/api/v1/inventory/movements",
+        json={"material_id": material_id, "movement_type": "issue", "quantity": 300},
+    )
+    third = client.post(f"{base}/recompute", headers=admin_headers).json()
+    assert third["aggregated"] == 1
+    response = client.get(f"{base}/reorder-points", params={"below_reorder_point": True, "search": "IO-DENIM"})
+    assert response.json()["data"][0]["on_hand"] == 20 and response.json()["data"][0]["below_reorder_point"]
+
+    analysis = client.get(f"{base}/abc-analysis").json()
+    assert [row["abc_class"] for row in analysis["classes"]] == ["A", "B", "C"]
+    assert sum(analysis["matrix"].values()) == analysis["materials"] == third["materials"]
+    savings = client.get(f"{base}/cost-savings").json()
+    assert savings["materials"] == third["materials"] and savings["below_reorder_point"] >= 1
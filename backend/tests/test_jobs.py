@@ -0,0 +1,121 @@
+"""
+Background jobs: deduplication, priorities, progress, retries and cancellation
+"""
+
+import asyncio
+
+import pytest
+
+from app.db import get_sessionmaker
+from app.services import JobService
+from app.services.job_service import JobWorker, _handlers, job_handler
+
+TEST_TYPES = ["test_echo", "test_flaky", "test_wait"]
+
+
+@pytest.fixture
+def handlers():
+    calls = {"order": [], "flaky": 0, "release": None}
+
+    @job_handler("test_echo")
+    async def echo(context):
+        calls["order"].append(context.params["name"])
+        await context.report(0.5, "halfway")
+        return {"echo": context.params["name"], "attempt": context.attempt}
+
+    @job_handler("test_flaky")
+    async def flaky(context):
+        calls["flaky"] += 1
+        if calls["flaky"] < context.params["succeed_on"]:
+            raise RuntimeError(f"attempt {calls['flaky']} failed")
+        return {"attempts": calls["flaky"]}
+
+    @job_handler("test_wait")
+    async def wait(context):
+        await calls["release"].wait()
+        await context.report(0.5)
+        return {}
+
+    yield calls
+    for name in TEST_TYPES:
+        _handlers.pop(name)
+
+
+def work(**options):
+    return JobWorker(worker_id="test-worker", job_types=TEST_TYPES, retry_delay_seconds=0, **options).run_until_idle()
+
+
+def test_jobs_are_deduplicated_run_by_priority_and_report_progress(client, run, admin_headers, handlers):
+    def enqueue(name, priority=0, dedup_key=None):
+        body = {"job_type": "test_echo", "params": {"name": name}, "priority": priority, "dedup_key": dedup_key}
+        return client.post("/api/v1/jobs", json=body, headers=admin_headers)
+
+    assert client.post("/api/v1/jobs", json={"job_type": "test_echo"}).status_code in (401, 403)
+    assert client.post("/api/v1/jobs", json={"job_type": "nope"}, headers=admin_headers).status_code == 422
+
+    first = enqueue("low", dedup_key="echo-low")
+    again = enqueue("low again", dedup_key="echo-low")
+    assert (first.status_code, again.status_code) == (202, 200)
+    assert again.json()["id"] == first.json()["id"] and again.json()["params"] == {"name": "low"}
+    urgent = enqueue("urgent", priority=10)
+
+    run(work)
+    assert handlers["order"] == ["urgent", "low"]
+    job = client.get(f"/api/v1/jobs/{first.json()['id']}").json()
+    assert job["status"] == "succeeded" and job["progress"] == 1 and job["progress_message"] == "halfway"
+    assert job["result"] == {"echo": "low", "attempt": 1} and job["worker_id"] == "test-worker"
+
+    # Finished, so the key is free again
+    assert enqueue("low", dedup_key="echo-low").status_code == 202
+    listed = client.get("/api/v1/jobs", params={"job_type": "test_echo", "status": "succeeded"}).json()
+    assert [job["id"] for job in listed["data"]] == [urgent.json()["id"], first.json()["id"]]
+    assert client.get("/api/v1/jobs/999999").status_code == 404
+    run(work)
+
+
+async def _enqueue(job_type, params, max_attempts=3):
+    async with get_sessionmaker()() as session:
+        job, _ = await JobService(session).enqueue(job_type, params, max_attempts=max_attempts)
+        return job.id
+
+
+def test_failed_jobs_are_retried_until_max_attempts(client, run, handlers):
+    recovered = run(_enqueue, "test_flaky", {"succeed_on": 2})
+    run(work)
+    job = client.get(f"/api/v1/jobs/{recovered}").json()
+    assert job["status"] == "succeeded" and job["attempts"] == 2
+    assert job["error"] == "RuntimeError: attempt 1 failed"
+
+    handlers["flaky"] = 0
+    failing = run(_enqueue, "test_flaky", {"succeed_on": 10}, 3)
+    run(work)
+    job = client.get(f"/api/v1/jobs/{failing}").json()
+    assert job["status"] == "failed" and job["attempts"] == 3 and handlers["flaky"] == 3
+    assert job["error"] == "RuntimeError: attempt 3 failed" and job["finished_at"]
+
+
+def test_cancelling_queued_and_running_jobs(client, run, admin_headers, handlers):
+    queued = run(_enqueue, "test_echo", {"name": "never"})
+    cancelled = client.post(f"/api/v1/jobs/{queued}/cancel", headers=admin_headers)
+    assert cancelled.status_code == 200 and cancelled.json()["status"] == "cancelled"
+    assert client.post(f"/api/v1/jobs/{queued}/cancel", headers=admin_headers).status_code == 409
+
+    async def cancel_while_running():
+        handlers["release"] = asyncio.Event()
+        job_id = await _enqueue("test_wait", {})
+        worker = asyncio.ensure_future(work())
+        async with get_sessionmaker()() as session:
+            service = JobService(session)
+            while (await service.get_job(job_id)).status != "running":
+                await asyncio.sleep(0.01)
+                session.expire_all()
+            job = await service.cancel(job_id)
+            assert job.cancel_requested and job.status == "running"
+        # The handler stops at its next progress report
+        handlers["release"].set()
+        await worker
+        return job_id
+
+    job = client.get(f"/api/v1/jobs/{run(cancel_while_running)}").json()
+    assert job["status"] == "cancelled" and job["finished_at"]
+    assert handlers["order"] == []
@@ -0,0 +1,38 @@
+"""
+Migrations: the Alembic revisions build the schema of the models
+"""
+
+import os
+import tempfile
+
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.runtime.environment import EnvironmentContext
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine
+
+from app.db import Base
+from app.db.schema_version import MIGRATIONS_DIR, get_head_revision
+
+
+def test_migrations_match_the_models():
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    script = ScriptDirectory.from_config(config)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'migrated.db')}")
+        with engine.begin() as connection:
+            # The revisions on their own, without env.py and the application's database
+            with EnvironmentContext(
+                config, script, fn=lambda revision, _: script._upgrade_revs("head", revision)
+            ) as environment:
+                environment.configure(connection=connection, target_metadata=Base.metadata)
+                with environment.begin_transaction():
+                    environment.run_migrations()
+
+            context = MigrationContext.configure(connection)
+            assert context.get_current_revision() == get_head_revision()
+            assert compare_metadata(context, Base.metadata) == []
+        engine.dispose()
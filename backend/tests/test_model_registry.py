@@ -0,0 +1,89 @@
+"""
+Model registry: lazy, memory-mapped loading, version switching and the memory budget
+"""
+
+import numpy as np
+import pytest
+
+from app.core import NotFoundException
+from app.core.model_registry import ModelRegistry, _specs, get_model_registry, register_model
+from app.services.inspection_service import QualityPredictor
+
+
+@pytest.fixture
+def toy_models():
+    warmed = []
+    for name in ("toy_a", "toy_b"):
+        register_model(name, lambda arrays, params: (arrays["weights"], params), lambda: None, warmed.append)
+    yield warmed
+    _specs.pop("toy_a")
+    _specs.pop("toy_b")
+
+
+def test_versions_load_lazily_and_switch_atomically(tmp_path, toy_models):
+    registry = ModelRegistry(str(tmp_path), memory_budget_bytes=1 << 20)
+    assert registry.get("toy_a") is None and registry.status()["loads"] == 1
+
+    first = registry.publish("toy_a", {"weights": np.arange(100.0)}, {"scale": 1})
+    second = registry.publish("toy_a", {"weights": np.arange(100.0) * 2}, {"scale": 2}, activate=False)
+    assert (first, second) == (1, 2) and registry.versions("toy_a") == [1, 2]
+
+    weights, params = registry.get("toy_a")
+    assert isinstance(weights, np.memmap) and params == {"scale": 1}
+    # Loaded once, then reused until another version is activated
+    assert registry.get("toy_a")[0] is weights and len(toy_models) == 2
+
+    registry.activate("toy_a", 2)
+    assert registry.get("toy_a")[1] == {"scale": 2} and weights[1] == 1
+    with pytest.raises(NotFoundException):
+        registry.activate("toy_a", 3)
+
+
+def test_cold_models_are_unloaded_past_the_memory_budget(tmp_path, toy_models):
+    registry = ModelRegistry(str(tmp_path), memory_budget_bytes=1200)
+    registry.publish("toy_a", {"weights": np.zeros(100)}, {})
+    registry.publish("toy_b", {"weights": np.zeros(100)}, {})
+
+    registry.get("toy_a")
+    registry.get("toy_b")
+    loaded = {model["name"]: model["loaded"] for model in registry.status()["models"]}
+    assert loaded["toy_b"] and not loaded["toy_a"] and registry.evictions == 1
+    registry.get("toy_a")
+    assert registry.status()["loads"] == 3 and registry.status()["loaded_bytes"] == 800
+
+
+def test_activating_a_quality_model_version(client, admin_headers):
+    def grade():
+        response = client.post(
+            "/api/v1/ml/quality-prediction/batch", json={"records": [{"batch_id": "MR-1", "temperature_c": 141}]}
+        )
+        return response.json()["predictions"][0]["predicted_grade"]
+
+    assert grade() == "C"
+    registry = get_model_registry()
+    default = QualityPredictor.default()
+    targets = default.targets.copy()
+    targets[default.features.index("temperature_c")] = 140
+    version = registry.publish(
+        "quality_prediction",
+        {"targets": targets, "tolerances": default.tolerances},
+        {"features": default.features},
+        activate=False,
+    )
+
+    base = "/api/v1/ml/models"
+    try:
+        activate = f"{base}/quality_prediction/activate"
+        assert client.post(activate, params={"version": version}).status_code in (401, 403)
+        assert client.post(activate, params={"version": version}, headers=admin_headers).status_code == 200
+        assert grade() == "A"
+        models = {model["name"]: model for model in client.get(base).json()["models"]}
+        assert models["quality_prediction"]["loaded_version"] == version
+        assert client.post(activate, params={"version": 99}, headers=admin_headers).status_code == 404
+    finally:
+        # The default parameters, as the active version for the tests after this one
+        registry.publish(
+            "quality_prediction",
+            {"targets": default.targets, "tolerances": default.tolerances},
+            {"features": default.features},
+        )
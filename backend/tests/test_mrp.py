@@ -0,0 +1,123 @@
+"""
+Bills of materials and the MRP run
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from app.services.mrp_service import plan_requirements
+
+BASE = "/api/v1/planning"
+TODAY = date.today()
+
+
+def _material(client, code: str, **fields) -> dict:
+    response = client.post("/api/v1/inventory/materials", json={"material_code": code, "name": code.title(), **fields})
+    assert response.status_code == 201
+    return response.json()
+
+
+def _set_bom(client, material_id: int, lines: list):
+    return client.put(f"{BASE}/boms/{material_id}", json={"lines": lines})
+
+
+def test_plan_nets_each_level_before_exploding_it():
+    # 0 makes 2 x 1, 1 makes 3 x 2; item 1 takes one period to make
+    bom = sparse.csr_matrix(([2.0, 3.0], ([0, 1], [1, 2])), shape=(3, 3))
+    plan = plan_requirements(
+        on_hand=np.array([0.0, 5.0, 0.0]),
+        lead_periods=np.array([1, 1, 0]),
+        bom=bom,
+        order_items=np.array([0, 0]),
+        order_quantities=np.array([4.0, 4.0]),
+        order_due=np.array([2, 3]),
+        order_started=np.array([False, True]),
+        receipt_items=np.array([2]),
+        receipt_quantities=np.array([6.0]),
+        receipt_periods=np.array([0]),
+        periods=4,
+    )
+
+    assert plan.levels.tolist() == [0, 1, 2]
+    # Only the unstarted order needs components: 8 of item 1, 5 from stock
+    assert plan.gross[1].tolist() == [0, 8, 0, 0]
+    assert plan.net[1].tolist() == [0, 3, 0, 0]
+    assert plan.releases[1].tolist() == [3, 0, 0, 0]
+    # 9 of item 2 released in period 0, 6 of them on order
+    assert plan.net[2].tolist() == [3, 0, 0, 0]
+    assert plan.projected[2].tolist() == [0, 0, 0, 0]
+
+
+def test_mrp_explodes_work_orders_through_multi_level_boms(client):
+    shirt = _material(client, "MRP-SHIRT", lead_time_days=7)
+    fabric = _material(client, "MRP-FABRIC", lead_time_days=14)
+    yarn = _material(client, "MRP-YARN", lead_time_days=7)
+    button = _material(client, "MRP-BUTTON")
+    assert _set_bom(client, shirt["id"], [
+        {"component_code": "MRP-FABRIC", "quantity": 2},
+        {"component_code": "MRP-BUTTON", "quantity": 6},
+    ]).status_code == 200
+    response = _set_bom(client, fabric["id"], [{"component_code": "MRP-YARN", "quantity": 1.5, "scrap_percentage": 10}])
+    assert [line["component_code"] for line in response.json()["lines"]] == ["MRP-YARN"]
+
+    client.post(
+        "/api/v1/inventory/movements",
+        json={"material_id": yarn["id"], "movement_type": "receipt", "quantity": 10},
+    )
+    po = client.post(
+        "/api/v1/purchase-orders",
+        json={
+            "supplier_id": 1,
+            "supplier_name": "Spinners",
+            "po_date": TODAY.isoformat(),
+            "due_date": (TODAY + timedelta(days=21)).isoformat(),
+            "line_items": [{"material_code": "MRP-YARN", "material_name": "Yarn", "quantity": 20, "unit_price": 1}],
+        },
+    ).json()
+    assert client.put(f"/api/v1/purchase-orders/{po['id']}", json={"status": "pending"}).status_code == 200
+
+    response = client.post(
+        "/api/v1/work-orders",
+        json={"product_name": "Shirt", "product_code": "MRP-SHIRT", "quantity": 10, "due_date": (TODAY + timedelta(days=28)).isoformat()},
+    )
+    assert response.status_code == 201
+    wo = response.json()
+    assert wo["product_id"] == shirt["id"]
+    assert sorted((m["material_id"], m["quantity"]) for m in wo["materials"]) == [(fabric["id"], 20), (button["id"], 60)]
+
+    response = client.get(f"{BASE}/mrp", params={"bucket_days": 7, "limit": 1000})
+    assert response.status_code == 200
+    run = response.json()
+    assert run["levels"] >= 3 and run["work_orders"] >= 1
+    lines = {line["material_code"]: line for line in run["data"] if line["material_code"].startswith("MRP-")}
+    assert set(lines) == {"MRP-FABRIC", "MRP-YARN", "MRP-BUTTON"}
+
+    def day(offset: int) -> str:
+        return (TODAY + timedelta(days=offset)).isoformat()
+
+    assert lines["MRP-FABRIC"]["action"] == "make"
+    assert lines["MRP-FABRIC"]["net_requirement"] == 20
+    assert (lines["MRP-FABRIC"]["period_start"], lines["MRP-FABRIC"]["release_date"]) == (day(21), day(7))
+    # 33 yarn needed when the fabric is released, 10 on hand; the PO arrives too late to help
+    assert lines["MRP-YARN"]["action"] == "buy"
+    assert lines["MRP-YARN"]["net_requirement"] == pytest.approx(23)
+    assert (lines["MRP-YARN"]["period_start"], lines["MRP-YARN"]["release_date"]) == (day(7), day(0))
+    assert lines["MRP-BUTTON"]["net_requirement"] == 60
+
+    response = client.get(f"{BASE}/mrp", params={"bucket_days": 7, "material_id": yarn["id"], "action": "buy"})
+    assert [line["material_code"] for line in response.json()["data"]] == ["MRP-YARN"]
+
+
+def test_bom_cycles_are_rejected(client):
+    cloth = _material(client, "MRP-CLOTH")
+    thread = _material(client, "MRP-THREAD")
+    assert _set_bom(client, cloth["id"], [{"component_code": "MRP-THREAD", "quantity": 1}]).status_code == 200
+
+    response = _set_bom(client, thread["id"], [{"component_code": "MRP-CLOTH", "quantity": 1}])
+    assert response.status_code == 400
+    assert "cycle" in response.json()["detail"]
+    assert _set_bom(client, cloth["id"], [{"component_code": "MRP-CLOTH", "quantity": 1}]).status_code == 400
+    assert client.get(f"{BASE}/boms/{thread['id']}").json()["lines"] == []
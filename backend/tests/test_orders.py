@@ -0,0 +1,58 @@
+"""
+Order totals kept in step with line-item edits and tax-rate changes
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+DUE = (date.today() + timedelta(days=30)).isoformat()
+
+ORDERS = {
+    "purchase-orders": (
+        {"supplier_id": 1, "supplier_name": "Cotton Mills", "po_date": date.today().isoformat()},
+        lambda code, quantity, price: {
+            "material_code": code, "material_name": code, "quantity": quantity, "unit_price": price,
+        },
+    ),
+    "sales-orders": (
+        {"customer_id": 1, "customer_name": "Fashion House", "order_date": date.today().isoformat()},
+        lambda code, quantity, price: {
+            "product_code": code, "product_name": code, "quantity": quantity, "unit_price": price,
+        },
+    ),
+}
+
+
+def amounts(order: dict) -> tuple:
+    assert order["total_amount"] == pytest.approx(order["subtotal"] + order["tax_amount"])
+    return order["subtotal"], order["tax_amount"], order["total_amount"]
+
+
+@pytest.mark.parametrize("kind", ORDERS)
+def test_totals_follow_line_items_and_tax_rate(client, kind):
+    fields, line = ORDERS[kind]
+    base = f"/api/v1/{kind}"
+    response = client.post(
+        base, json={**fields, "due_date": DUE, "tax_rate": 10, "line_items": [line("TOT-A", 10, 2.0)]}
+    )
+    assert response.status_code == 201
+    order = response.json()
+    assert amounts(order) == pytest.approx((20, 2, 22))
+    url = f"{base}/{order['id']}"
+
+    response = client.post(f"{url}/line-items", json=line("TOT-B", 5, 4.0))
+    assert response.status_code == 201
+    assert amounts(response.json()) == pytest.approx((40, 4, 44))
+
+    item_id = order["line_items"][0]["id"]
+    response = client.patch(f"{url}/line-items/{item_id}", json={"quantity": 20})
+    assert response.status_code == 200
+    assert amounts(response.json()) == pytest.approx((60, 6, 66))
+
+    response = client.put(url, json={"tax_rate": 25})
+    assert response.status_code == 200
+    assert amounts(response.json()) == pytest.approx((60, 15, 75))
+
+    assert client.delete(f"{url}/line-items/{item_id}").status_code == 204
+    assert amounts(client.get(url).json()) == pytest.approx((20, 5, 25))
@@ -0,0 +1,532 @@
+"""
+SQL statement budgets for every API route
+
+Each budget is the number of statements one call to the route may issue.
+Raise a budget only when a new statement is intended; a call that repeats a
+statement fails even within budget, since that is usually a lazy load or a
+query in a loop (N+1).
+"""
+
+from datetime import date, timedelta
+
+from fastapi.routing import APIRoute
+
+from app.core.model_registry import get_model_registry
+from app.main import app
+from app.services.atp_service import reset_atp_index
+from tests.conftest import PASSWORD
+from tests.query_budget import fingerprint, query_budget
+
+ROUTE_BUDGETS = {
+    # Auth
+    "POST /api/v1/auth/register": 2,
+    "POST /api/v1/auth/login": 1,
+    "POST /api/v1/auth/refresh": 0,
+    # Purchase orders; every order write also raises the report table versions
+    "POST /api/v1/purchase-orders": 4,
+    # Each expansion adds one statement
+    "GET /api/v1/purchase-orders": 5,
+    # Archived order: hot table miss, archive row, its line items, creator
+    "GET /api/v1/purchase-orders/{po_id}": 4,
+    # Receiving an order adds its stock receipt, creating materials new to the master, and marks
+    # their inventory policies
+    "PUT /api/v1/purchase-orders/{po_id}": 10,
+    "DELETE /api/v1/purchase-orders/{po_id}": 5,
+    "POST /api/v1/purchase-orders/{po_id}/line-items": 6,
+    "PATCH /api/v1/purchase-orders/{po_id}/line-items/{item_id}": 7,
+    "DELETE /api/v1/purchase-orders/{po_id}/line-items/{item_id}": 5,
+    # Sales orders
+    "POST /api/v1/sales-orders": 4,
+    "GET /api/v1/sales-orders": 5,
+    "GET /api/v1/sales-orders/{so_id}": 4,
+    "PUT /api/v1/sales-orders/{so_id}": 5,
+    "DELETE /api/v1/sales-orders/{so_id}": 5,
+    "POST /api/v1/sales-orders/{so_id}/line-items": 6,
+    "PATCH /api/v1/sales-orders/{so_id}/line-items/{item_id}": 7,
+    "DELETE /api/v1/sales-orders/{so_id}/line-items/{item_id}": 5,
+    # Work orders
+    # Plus the material lookup and the material lines, or the product and its BOM
+    "POST /api/v1/work-orders": 5,
+    "GET /api/v1/work-orders": 5,
+    "GET /api/v1/work-orders/{wo_id}": 3,
+    # Starting an order adds its stock issue, and marks its materials' inventory policies
+    "PUT /api/v1/work-orders/{wo_id}": 8,
+    "DELETE /api/v1/work-orders/{wo_id}": 3,
+    # Inventory
+    "POST /api/v1/inventory/materials": 2,
+    "GET /api/v1/inventory/materials": 2,
+    "GET /api/v1/inventory/materials/{material_id}": 1,
+    "PUT /api/v1/inventory/materials/{material_id}": 2,
+    "GET /api/v1/inventory/balances": 2,
+    "GET /api/v1/inventory/movements": 2,
+    # Plus marking the material for the next inventory policy refresh
+    "POST /api/v1/inventory/movements": 4,
+    # Admin user, then two statements per chunk of materials and the empty last chunk
+    "GET /api/v1/inventory/balances/check": 4,
+    "POST /api/v1/inventory/balances/rebuild": 5,
+    # Material, nearest snapshots before and after, snapshot data, movements since
+    "GET /api/v1/inventory/balances/as-of": 6,
+    # Plus the material master for costs and the names of the top materials
+    "GET /api/v1/inventory/valuation": 6,
+    "GET /api/v1/inventory/snapshots": 2,
+    # The first snapshot sums the ledger per chunk of materials
+    "POST /api/v1/inventory/snapshots": 7,
+    # Material, purchase order line, roll numbers already taken, insert
+    "POST /api/v1/inventory/rolls": 4,
+    "GET /api/v1/inventory/rolls": 2,
+    # Planning
+    "GET /api/v1/planning/boms/{material_id}": 2,
+    # Material, components, the other BOM edges for the cycle check, replace, reread
+    "PUT /api/v1/planning/boms/{material_id}": 6,
+    # Materials, on-hand, BOM lines, open work orders, open purchase order lines
+    "GET /api/v1/planning/mrp": 5,
+    "POST /api/v1/planning/work-centers": 2,
+    "GET /api/v1/planning/work-centers": 1,
+    "PUT /api/v1/planning/work-centers/{center_id}": 2,
+    "GET /api/v1/planning/schedule": 2,
+    # Admin user, work centers, open orders, then one write per SCHEDULER_BATCH_SIZE orders
+    "POST /api/v1/planning/schedule": 4,
+    # Order, its materials, eligible centers, their bookings, the move
+    "POST /api/v1/planning/schedule/work-orders/{wo_id}": 5,
+    "POST /api/v1/planning/dye-recipes": 2,
+    "GET /api/v1/planning/dye-recipes": 1,
+    # Work center for its batch capacity, then the open dyeing orders with their recipes
+    "GET /api/v1/planning/dye-sequence": 2,
+    # Work order cuts, rolls with their materials, materials without rolls
+    "GET /api/v1/planning/cutting-plan": 3,
+    # Builds the index when cold; answered from memory after
+    "GET /api/v1/planning/atp": 4,
+    # Machine learning
+    "GET /api/v1/ml/demand-forecasting/skus": 2,
+    "GET /api/v1/ml/demand-forecasting/forecast": 1,
+    "GET /api/v1/ml/demand-forecasting/metrics": 1,
+    "GET /api/v1/ml/demand-forecasting/metrics/{sku_id}": 1,
+    # Changed products' history, forecasts to roll forward, upsert, removed forecasts, changes, count
+    "POST /api/v1/ml/demand-forecasting/retrain": 7,
+    "GET /api/v1/ml/inventory-optimization/recommendations": 2,
+    "GET /api/v1/ml/inventory-optimization/reorder-points": 2,
+    "GET /api/v1/ml/inventory-optimization/abc-analysis": 1,
+    "GET /api/v1/ml/inventory-optimization/cost-savings": 1,
+    # Materials, stored policies, changes, consumption, receipts, stock, upsert, removed policies, changes
+    "POST /api/v1/ml/inventory-optimization/recompute": 10,
+    "GET /api/v1/ml/supplier-risk/scores": 2,
+    "GET /api/v1/ml/supplier-risk/profile/{supplier_id}": 1,
+    "GET /api/v1/ml/supplier-risk/history/{supplier_id}": 1,
+    # Order features, prices, previous scores, profile upsert, score upsert, removed profiles
+    "POST /api/v1/ml/supplier-risk/refresh": 7,
+    # Models run in memory
+    "POST /api/v1/ml/defect-detection/detect": 0,
+    "POST /api/v1/ml/quality-prediction/batch": 0,
+    "GET /api/v1/ml/inference/metrics": 0,
+    # Models are on disk, not in the database
+    "GET /api/v1/ml/models": 0,
+    "POST /api/v1/ml/models/{name}/activate": 1,
+    "POST /api/v1/jobs": 3,
+    "GET /api/v1/jobs": 2,
+    "GET /api/v1/jobs/{job_id}": 1,
+    "POST /api/v1/jobs/{job_id}/cancel": 3,
+    # The table versions, and on a cache miss the aggregate
+    "GET /api/v1/reports": 0,
+    "GET /api/v1/reports/{name}": 2,
+    # Admin
+    "POST /api/v1/admin/profile/cpu": 1,
+    "POST /api/v1/admin/profile/memory": 1,
+}
+
+DUE = (date.today() + timedelta(days=30)).isoformat()
+
+
+def test_every_route_has_a_budget():
+    routes = {
+        f"{method} {route.path}"
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.path.startswith("/api/")
+        for method in route.methods
+    }
+    assert routes - ROUTE_BUDGETS.keys() == set()
+    assert ROUTE_BUDGETS.keys() - routes == set()
+
+
+def test_fingerprint_ignores_parameters():
+    assert fingerprint("SELECT * FROM t WHERE id = 1") == fingerprint("SELECT * FROM t WHERE id = 42")
+    assert fingerprint("SELECT * FROM t WHERE id IN (?, ?)") == fingerprint("SELECT * FROM t WHERE id IN (?)")
+    assert fingerprint("SELECT * FROM t WHERE name = 'a'") != fingerprint("SELECT * FROM u WHERE name = 'a'")
+
+
+def test_repeated_statements_are_reported(client, query_counter, purchase_orders):
+    for po in purchase_orders:
+        client.get(f"/api/v1/purchase-orders/{po.id}")
+
+    # Three separate calls are not an N+1 within any one of them
+    assert all(not call.repeated() for call in query_counter.calls.values())
+
+    call = query_counter.last
+    call.statements.extend(call.statements)
+    assert call.repeated()
+    assert "likely N+1" in call.report()
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_auth_routes(client, query_counter, staff_user):
+    response = client.post(
+        "/api/v1/auth/register",
+        json={"username": "budget", "email": "budget@example.com", "password": PASSWORD, "full_name": "Budget"},
+    )
+    assert response.status_code == 201
+
+    response = client.post("/api/v1/auth/login", json={"username": "staff", "password": PASSWORD})
+    assert response.status_code == 200
+
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": response.json()["refresh_token"]})
+    assert response.status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_purchase_order_routes(client, query_counter, purchase_orders):
+    po = purchase_orders[0]
+    base = "/api/v1/purchase-orders"
+
+    response = client.post(
+        base,
+        json={
+            "supplier_id": 1,
+            "supplier_name": "Cotton Mills",
+            "po_date": date.today().isoformat(),
+            "due_date": DUE,
+            "line_items": [
+                {"material_code": f"YRN-{i}", "material_name": "Yarn", "quantity": 5, "unit_price": 3}
+                for i in range(5)
+            ],
+        },
+    )
+    assert response.status_code == 201
+
+    assert client.get(base).status_code == 200
+    assert client.get(base, params={"include_archived": True, "expand": "created_by"}).status_code == 200
+    assert client.get(f"{base}/{po.id}", params={"expand": "created_by"}).status_code == 200
+    assert client.get(f"{base}/0", params={"include_archived": True}).status_code == 404
+    assert client.put(f"{base}/{po.id}", json={"notes": "Rush"}).status_code == 200
+
+    response = client.post(
+        f"{base}/{po.id}/line-items",
+        json={"material_code": "DYE-1", "material_name": "Dye", "quantity": 2, "unit_price": 9},
+    )
+    assert response.status_code == 201
+    item_id = po.line_items[0].id
+    assert client.patch(f"{base}/{po.id}/line-items/{item_id}", json={"quantity": 7}).status_code == 200
+    assert client.delete(f"{base}/{po.id}/line-items/{item_id}").status_code == 204
+    assert client.delete(f"{base}/{purchase_orders[1].id}").status_code == 204
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_sales_order_routes(client, query_counter, sales_orders):
+    so = sales_orders[0]
+    base = "/api/v1/sales-orders"
+
+    response = client.post(
+        base,
+        json={
+            "customer_id": 1,
+            "customer_name": "Fashion House",
+            "order_date": date.today().isoformat(),
+            "due_date": DUE,
+            "line_items": [
+                {"product_code": f"SHT-{i}", "product_name": "Shirting", "quantity": 50, "unit_price": 4}
+                for i in range(5)
+            ],
+        },
+    )
+    assert response.status_code == 201
+
+    assert client.get(base).status_code == 200
+    assert client.get(base, params={"include_archived": True, "expand": "created_by"}).status_code == 200
+    assert client.get(f"{base}/{so.id}", params={"expand": "created_by"}).status_code == 200
+    assert client.get(f"{base}/0", params={"include_archived": True}).status_code == 404
+    assert client.put(f"{base}/{so.id}", json={"notes": "Gift wrap"}).status_code == 200
+
+    response = client.post(
+        f"{base}/{so.id}/line-items",
+        json={"product_code": "TWL-1", "product_name": "Towel", "quantity": 20, "unit_price": 2},
+    )
+    assert response.status_code == 201
+    item_id = so.line_items[0].id
+    assert client.patch(f"{base}/{so.id}/line-items/{item_id}", json={"quantity": 70}).status_code == 200
+    assert client.delete(f"{base}/{so.id}/line-items/{item_id}").status_code == 204
+    assert client.delete(f"{base}/{sales_orders[1].id}").status_code == 204
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_work_order_routes(client, query_counter, work_orders):
+    wo = work_orders[0]
+    base = "/api/v1/work-orders"
+
+    response = client.post(base, json={"product_name": "Shirting", "quantity": 300, "due_date": DUE})
+    assert response.status_code == 201
+
+    assert client.get(base).status_code == 200
+    assert client.get(base, params={"include_archived": True, "expand": "created_by"}).status_code == 200
+    assert client.get(f"{base}/{wo.id}", params={"expand": "created_by"}).status_code == 200
+    assert client.get(f"{base}/0", params={"include_archived": True}).status_code == 404
+    assert client.put(f"{base}/{wo.id}", json={"progress_percentage": 40}).status_code == 200
+    assert client.delete(f"{base}/{work_orders[1].id}").status_code == 204
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_admin_routes(client, query_counter, admin_headers):
+    params = {"seconds": 0.05}
+    assert client.post("/api/v1/admin/profile/cpu", params=params, headers=admin_headers).status_code == 200
+    assert client.post("/api/v1/admin/profile/memory", params=params, headers=admin_headers).status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_inventory_routes(client, query_counter, purchase_order):
+    base = "/api/v1/inventory"
+
+    assert client.put(f"/api/v1/purchase-orders/{purchase_order.id}", json={"status": "received"}).status_code == 200
+
+    response = client.post(f"{base}/materials", json={"material_code": "BGT-DYE", "name": "Dye", "reorder_level": 5})
+    assert response.status_code == 201
+    material_id = response.json()["id"]
+
+    assert client.get(f"{base}/materials", params={"search": "YRN"}).status_code == 200
+    assert client.get(f"{base}/materials", params={"below_reorder": True}).status_code == 200
+    assert client.get(f"{base}/materials/{material_id}").status_code == 200
+    assert client.put(f"{base}/materials/{material_id}", json={"reorder_level": 8}).status_code == 200
+
+    response = client.post(
+        f"{base}/movements",
+        json={"material_id": material_id, "movement_type": "receipt", "quantity": 40},
+    )
+    assert response.status_code == 201
+
+    response = client.post(
+        "/api/v1/work-orders",
+        json={
+            "product_name": "Shirting",
+            "quantity": 100,
+            "due_date": DUE,
+            "materials": [{"material_code": "BGT-DYE", "quantity": 4}, {"material_code": "YRN-0", "quantity": 5}],
+        },
+    )
+    assert response.status_code == 201
+    wo_id = response.json()["id"]
+    assert client.put(f"/api/v1/work-orders/{wo_id}", json={"status": "in_progress"}).status_code == 200
+
+    assert client.get(f"{base}/balances", params={"material_id": material_id}).status_code == 200
+    assert client.get(f"{base}/movements", params={"reference_type": "work_order"}).status_code == 200
+
+
+# The balance jobs repeat their statements once per chunk of materials by design
+@query_budget(ROUTE_BUDGETS, allow_repeats=True)
+def test_inventory_job_routes(client, query_counter, admin_headers):
+    base = "/api/v1/inventory/balances"
+    assert client.get(f"{base}/check", headers=admin_headers).status_code == 200
+    assert client.post(f"{base}/rebuild", headers=admin_headers).status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS, allow_repeats=True)
+def test_stock_snapshot_routes(client, query_counter, admin_headers, purchase_order):
+    base = "/api/v1/inventory"
+    # A snapshot far in the past leaves later days to the snapshot tests
+    params = {"through": "2000-01-01"}
+    assert client.post(f"{base}/snapshots", params=params, headers=admin_headers).status_code == 200
+
+    assert client.get(f"{base}/snapshots").status_code == 200
+    params = {"material_code": purchase_order.line_items[0].material_code, "as_of": date.today().isoformat()}
+    assert client.get(f"{base}/balances/as-of", params=params).status_code in (200, 404)
+    assert client.get(f"{base}/valuation", params={"as_of": date.today().isoformat()}).status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_planning_routes(client, query_counter):
+    for code in ("BGT-GARMENT", "BGT-TRIM"):
+        client.post("/api/v1/inventory/materials", json={"material_code": code, "name": code})
+    garment = client.get("/api/v1/inventory/materials", params={"search": "BGT-GARMENT"}).json()["data"][0]
+
+    url = f"/api/v1/planning/boms/{garment['id']}"
+    assert client.put(url, json={"lines": [{"component_code": "BGT-TRIM", "quantity": 2}]}).status_code == 200
+    assert client.get(url).status_code == 200
+
+    response = client.post(
+        "/api/v1/work-orders",
+        json={"product_name": "Garment", "product_code": "BGT-GARMENT", "quantity": 5, "due_date": DUE},
+    )
+    assert response.status_code == 201
+    assert client.get("/api/v1/planning/mrp").status_code == 200
+
+
+# A full schedule run writes its orders in batches of the same statement
+@query_budget(ROUTE_BUDGETS, allow_repeats=True)
+def test_scheduling_routes(client, query_counter, admin_headers, work_orders):
+    base = "/api/v1/planning"
+    response = client.post(
+        f"{base}/work-centers",
+        json={"code": "BGT-LOOM", "name": "Loom", "category": "bgt-loom", "units_per_hour": 20},
+    )
+    assert response.status_code == 201
+    center_id = response.json()["id"]
+    assert client.get(f"{base}/work-centers").status_code == 200
+    assert client.put(f"{base}/work-centers/{center_id}", json={"setup_hours": 0.5}).status_code == 200
+
+    assert client.post(f"{base}/schedule", headers=admin_headers).status_code == 200
+    assert client.get(f"{base}/schedule", params={"work_center_id": center_id}).status_code == 200
+    assert client.post(f"{base}/schedule/work-orders/{work_orders[0].id}").status_code == 200
+    response = client.put(f"/api/v1/work-orders/{work_orders[1].id}", json={"quantity": 250})
+    assert response.status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_dye_sequencing_routes(client, query_counter):
+    base = "/api/v1/planning"
+    assert client.post(f"{base}/dye-recipes", json={"code": "BGT-NAVY", "name": "Navy", "depth": 80}).status_code == 201
+    assert client.get(f"{base}/dye-recipes").status_code == 200
+
+    response = client.post(
+        f"{base}/work-centers",
+        json={"code": "BGT-JET", "name": "Jet", "category": "bgt-dye", "units_per_hour": 50, "batch_capacity": 300},
+    )
+    assert response.status_code == 201
+    center_id = response.json()["id"]
+    response = client.post(
+        "/api/v1/work-orders",
+        json={
+            "product_name": "Navy jersey",
+            "quantity": 400,
+            "due_date": DUE,
+            "dye_recipe_code": "BGT-NAVY",
+            "fabric_type": "knit",
+        },
+    )
+    assert response.status_code == 201
+    assert client.get(f"{base}/dye-sequence", params={"work_center_id": center_id}).status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_cutting_routes(client, query_counter):
+    client.post("/api/v1/inventory/materials", json={"material_code": "BGT-DENIM", "name": "Denim", "unit": "m"})
+    response = client.post(
+        "/api/v1/inventory/rolls",
+        json={
+            "material_code": "BGT-DENIM",
+            "rolls": [{"roll_number": "BGT-R1", "length": 50}, {"roll_number": "BGT-R2", "length": 42.5}],
+        },
+    )
+    assert response.status_code == 201
+    assert client.get("/api/v1/inventory/rolls").status_code == 200
+
+    response = client.post(
+        "/api/v1/work-orders",
+        json={
+            "product_name": "Jeans",
+            "quantity": 30,
+            "due_date": DUE,
+            "materials": [{"material_code": "BGT-DENIM", "quantity": 36, "cut_length": 1.2}],
+        },
+    )
+    assert response.status_code == 201
+    assert client.get("/api/v1/planning/cutting-plan", params={"material_code": "BGT-DENIM"}).status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_atp_route(client, query_counter):
+    reset_atp_index()
+    params = {"product_code": "BGT-POPLIN", "quantity": 10, "date": DUE}
+    client.post("/api/v1/inventory/materials", json={"material_code": "BGT-POPLIN", "name": "Poplin", "unit": "m"})
+    assert client.get("/api/v1/planning/atp", params=params).status_code == 200
+    assert client.get("/api/v1/planning/atp", params=params).status_code == 200
+    # Only the first call, which built the index, reached the database
+    assert [call.route for call in query_counter.calls.values()].count("/api/v1/planning/atp") == 1
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_forecasting_routes(client, admin_headers, query_counter):
+    last_week = (date.today() - timedelta(days=date.today().weekday() + 7)).isoformat()
+    response = client.post(
+        "/api/v1/sales-orders",
+        json={
+            "customer_id": 1,
+            "customer_name": "Budget",
+            "order_date": last_week,
+            "due_date": DUE,
+            "line_items": [{"product_code": "BGT-FC", "product_name": "Voile", "quantity": 5, "unit_price": 1}],
+        },
+    )
+    client.put(f"/api/v1/sales-orders/{response.json()['id']}", json={"status": "confirmed"})
+
+    base = "/api/v1/ml/demand-forecasting"
+    assert client.post(f"{base}/retrain", headers=admin_headers).status_code == 200
+    assert client.get(f"{base}/skus").status_code == 200
+    assert client.get(f"{base}/metrics").status_code == 200
+    assert client.get(f"{base}/metrics/BGT-FC").status_code == 200
+    assert client.get(f"{base}/forecast", params={"sku_id": "BGT-FC"}).status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_inventory_optimization_routes(client, admin_headers, query_counter):
+    response = client.post("/api/v1/inventory/materials", json={"material_code": "BGT-IO", "name": "Lining"})
+    client.post(
+        "/api/v1/inventory/movements",
+        json={"material_id": response.json()["id"], "movement_type": "receipt", "quantity": 40},
+    )
+
+    base = "/api/v1/ml/inventory-optimization"
+    assert client.post(f"{base}/recompute", headers=admin_headers).status_code == 200
+    assert client.get(f"{base}/recommendations", params={"abc_class": "C"}).status_code == 200
+    assert client.get(f"{base}/reorder-points", params={"below_reorder_point": True}).status_code == 200
+    assert client.get(f"{base}/abc-analysis").status_code == 200
+    assert client.get(f"{base}/cost-savings").status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_supplier_risk_routes(client, admin_headers, query_counter):
+    response = client.post(
+        "/api/v1/purchase-orders",
+        json={
+            "supplier_id": 9001,
+            "supplier_name": "Budget Yarns",
+            "po_date": date.today().isoformat(),
+            "due_date": DUE,
+            "line_items": [{"material_code": "BGT-SR", "material_name": "Yarn", "quantity": 5, "unit_price": 2}],
+        },
+    )
+    client.put(f"/api/v1/purchase-orders/{response.json()['id']}", json={"status": "approved"})
+
+    base = "/api/v1/ml/supplier-risk"
+    assert client.post(f"{base}/refresh", headers=admin_headers).status_code == 200
+    assert client.get(f"{base}/scores", params={"status": "low_risk"}).status_code == 200
+    assert client.get(f"{base}/profile/9001").status_code == 200
+    assert client.get(f"{base}/history/9001", params={"timeframe": "30d"}).status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_inspection_routes(client, admin_headers, query_counter):
+    image = b"P5 32 32 255\n" + bytes(range(256)) * 4
+    assert client.post("/api/v1/ml/defect-detection/detect", files={"image": ("frame.pgm", image)}).status_code == 200
+    response = client.post("/api/v1/ml/quality-prediction/batch", json={"records": [{"batch_id": "BGT-Q"}]})
+    assert response.status_code == 200
+    assert client.get("/api/v1/ml/inference/metrics").status_code == 200
+    assert client.get("/api/v1/ml/models").status_code == 200
+    version = get_model_registry().publish("defect_detection", {}, {}, activate=False)
+    response = client.post(
+        "/api/v1/ml/models/defect_detection/activate", params={"version": version}, headers=admin_headers
+    )
+    assert response.status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_job_routes(client, admin_headers, query_counter):
+    body = {"job_type": "supplier_risk_refresh", "dedup_key": "budget-supplier-risk"}
+    response = client.post("/api/v1/jobs", json=body, headers=admin_headers)
+    assert response.status_code == 202
+    assert client.post("/api/v1/jobs", json=body, headers=admin_headers).status_code == 200
+    job_id = response.json()["id"]
+    assert client.get("/api/v1/jobs", params={"status": "queued"}).status_code == 200
+    assert client.get(f"/api/v1/jobs/{job_id}").status_code == 200
+    assert client.post(f"/api/v1/jobs/{job_id}/cancel", headers=admin_headers).status_code == 200
+
+
+@query_budget(ROUTE_BUDGETS)
+def test_report_routes(client, query_counter):
+    assert client.get("/api/v1/reports").status_code == 200
+    response = client.get("/api/v1/reports/purchase-spend", params={"group_by": ["supplier", "month"]})
+    assert response.status_code == 200
@@ -0,0 +1,102 @@
+"""
+Reports: aggregates, output formats and the cache kept current by table versions
+"""
+
+import csv
+import io
+
+import pyarrow.parquet as pq
+from sqlalchemy import update
+
+from app.db import get_sessionmaker
+from app.models import POLineItem
+
+# Orders dated in 2020, apart from those the other tests create
+RANGE = {"start": "2020-01-01", "end": "2020-12-31"}
+
+
+def create_purchase_order(client, po_date, lines, status="approved"):
+    response = client.post(
+        "/api/v1/purchase-orders",
+        json={
+            "supplier_id": 7001,
+            "supplier_name": "Report Spinners",
+            "po_date": po_date,
+            "due_date": "2021-01-31",
+            "line_items": [
+                {"material_code": code, "material_name": f"Yarn {code}", "quantity": quantity, "unit_price": 2.5}
+                for code, quantity in lines
+            ],
+        },
+    )
+    assert client.put(f"/api/v1/purchase-orders/{response.json()['id']}", json={"status": status}).status_code == 200
+    return response.json()
+
+
+def test_purchase_spend_in_each_format(client):
+    create_purchase_order(client, "2020-01-10", [("RPT-A", 10), ("RPT-B", 4)])
+    create_purchase_order(client, "2020-01-20", [("RPT-A", 6)])
+    create_purchase_order(client, "2020-02-03", [("RPT-A", 8)])
+    create_purchase_order(client, "2020-02-04", [("RPT-A", 100)], status="draft")
+
+    base = "/api/v1/reports/purchase-spend"
+    params = {**RANGE, "group_by": ["material", "month"]}
+    response = client.get(base, params=params)
+    assert response.status_code == 200
+    assert [(row["material_code"], row["month"], row["quantity"], row["spend"], row["orders"])
+            for row in response.json()["data"]] == [
+        ("RPT-A", "2020-01-01", 16, 40.0, 2),
+        ("RPT-A", "2020-02-01", 8, 20.0, 1),
+        ("RPT-B", "2020-01-01", 4, 10.0, 1),
+    ]
+
+    rows = list(csv.DictReader(io.StringIO(client.get(base, params={**params, "format": "csv"}).text)))
+    assert rows[0] == {
+        "material_code": "RPT-A", "material_name": "Yarn RPT-A", "month": "2020-01-01",
+        "quantity": "16", "spend": "40.0", "lines": "2", "orders": "2",
+    }
+    parquet = client.get(base, params={**params, "format": "parquet"})
+    assert parquet.headers["content-disposition"] == 'attachment; filename="purchase-spend.parquet"'
+    table = pq.read_table(io.BytesIO(parquet.content))
+    assert table.num_rows == 3 and table.column("quantity").to_pylist() == [16, 8, 4]
+
+    drafts = client.get(base, params={**RANGE, "group_by": ["supplier"], "status": ["draft"]}).json()
+    assert drafts["data"] == [{
+        "supplier_id": 7001, "supplier_name": "Report Spinners",
+        "quantity": 100, "spend": 250.0, "lines": 1, "orders": 1,
+    }]
+    assert client.get(base, params={"group_by": ["customer"]}).status_code == 422
+    assert client.get(base, params={"group_by": ["week", "month"]}).status_code == 422
+    assert client.get("/api/v1/reports/nope").status_code == 404
+    assert {report["name"] for report in client.get("/api/v1/reports").json()} == {"purchase-spend", "sales"}
+
+
+def test_cached_reports_are_recomputed_once_their_tables_change(client, run):
+    order = create_purchase_order(client, "2020-06-15", [("RPT-C", 5)])
+    base = "/api/v1/reports/purchase-spend"
+    params = {**RANGE, "group_by": ["material"]}
+
+    def report():
+        response = client.get(base, params=params)
+        totals = {row["material_code"]: row["quantity"] for row in response.json()["data"]}
+        return response.headers["x-report-cache"], totals.get("RPT-C")
+
+    assert report() == ("miss", 5)
+    assert report() == ("hit", 5)
+    # Other reports' cache entries are separate
+    assert client.get(base, params=RANGE).headers["x-report-cache"] == "miss"
+
+    item = {"material_code": "RPT-C", "material_name": "Yarn RPT-C", "quantity": 2, "unit_price": 2.5}
+    assert client.post(f"/api/v1/purchase-orders/{order['id']}/line-items", json=item).status_code == 201
+    assert report() == ("miss", 7)
+    assert report() == ("hit", 7)
+
+    async def bulk_update():
+        async with get_sessionmaker()() as session:
+            await session.execute(
+                update(POLineItem).where(POLineItem.purchase_order_id == order["id"]).values(quantity=1)
+            )
+            await session.commit()
+
+    run(bulk_update)
+    assert report() == ("miss", 2)
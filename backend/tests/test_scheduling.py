@@ -0,0 +1,139 @@
+"""
+Work centers and finite-capacity scheduling
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+from app.services.scheduling_service import ShopCalendar, schedule_orders
+from app.utils import IntervalTree
+
+BASE = "/api/v1/planning"
+TODAY = date.today()
+
+
+def _overlaps(bookings: list) -> bool:
+    bookings = sorted(bookings)
+    return any(later[0] < earlier[1] for earlier, later in zip(bookings, bookings[1:]))
+
+
+def test_interval_tree_matches_a_linear_scan():
+    rng = random.Random(3)
+    bookings, start = [], 0
+    for key in range(200):
+        start += rng.choice([0, 0, 1, 3])
+        length = rng.randint(1, 5)
+        bookings.append((start, start + length, key))
+        start += length
+
+    tree = IntervalTree(bookings[::2])
+    for booking in bookings[1::2]:
+        tree.insert(*booking)
+    for booking in rng.sample(bookings, 50):
+        assert tree.remove(booking[0], booking[2])
+        bookings.remove(booking)
+    assert list(tree) == sorted(bookings) and len(tree) == len(bookings)
+
+    for _ in range(200):
+        low = rng.uniform(-5, start + 5)
+        high = low + rng.uniform(0, 10)
+        assert tree.overlapping(low, high) == [b for b in sorted(bookings) if b[0] < high and b[1] > low]
+
+        length = rng.choice([0.5, 2, 4, 8])
+        fit = tree.first_fit(low, length)
+        assert fit >= low and not tree.overlapping(fit, fit + length)
+        # Nothing earlier fits: every candidate start is low or the end of a booking
+        earlier = [low] + [b[1] for b in bookings if low <= b[1] < fit]
+        assert all(tree.overlapping(candidate, candidate + length) for candidate in earlier if candidate < fit)
+
+
+def test_orders_go_by_priority_then_due_date_to_the_first_free_center():
+    orders = [
+        (1, "loom", 20, "normal", TODAY + timedelta(days=9)),
+        (2, "loom", 10, "urgent", TODAY + timedelta(days=30)),
+        (3, "loom", 30, "normal", TODAY + timedelta(days=2)),
+        (4, "dyeing", 5, "low", TODAY),
+        (5, None, 10, "high", TODAY),
+    ]
+    centers = [(10, "loom", 10.0, 0.0), (11, "loom", 5.0, 1.0)]
+    bookings, unscheduled = schedule_orders(orders, centers, now=0, busy_until={11: 4})
+
+    assert unscheduled == [4]
+    assert bookings == [
+        (2, 10, 0, 1.0),
+        (5, 10, 1.0, 2.0),
+        (3, 10, 2.0, 5.0),
+        (1, 11, 4, 9.0),
+    ]
+
+
+def test_shop_calendar_counts_working_hours():
+    calendar = ShopCalendar(TODAY, shift_start_hour=6, shift_hours=16)
+    midnight = datetime.combine(TODAY, datetime.min.time())
+
+    assert calendar.to_hours(midnight + timedelta(hours=10)) == 4
+    # Outside the shift snaps to its edges
+    assert calendar.to_hours(midnight + timedelta(hours=23)) == 16
+    assert calendar.to_datetime(20) == midnight + timedelta(days=1, hours=10)
+    assert calendar.to_datetime(16, closing=True) == midnight + timedelta(hours=22)
+    assert calendar.to_datetime(16) == midnight + timedelta(days=1, hours=6)
+
+
+def test_full_run_and_incremental_moves(client, admin_headers):
+    for code, rate in (("TST-DYE-1", 10), ("TST-DYE-2", 5)):
+        response = client.post(
+            f"{BASE}/work-centers",
+            json={"code": code, "name": code, "category": "tst-dye", "units_per_hour": rate},
+        )
+        assert response.status_code == 201
+    assert client.post(
+        f"{BASE}/work-centers",
+        json={"code": "TST-DYE-1", "name": "Again", "category": "tst-dye", "units_per_hour": 1},
+    ).status_code == 409
+
+    def create(quantity: int, priority: str, due_in: int) -> int:
+        response = client.post(
+            "/api/v1/work-orders",
+            json={
+                "product_name": "Dyed yarn",
+                "quantity": quantity,
+                "priority": priority,
+                "due_date": (TODAY + timedelta(days=due_in)).isoformat(),
+                "work_center_category": "tst-dye",
+            },
+        )
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    late, rush, soon = create(80, "normal", 30), create(40, "urgent", 40), create(16, "normal", 5)
+
+    response = client.post(f"{BASE}/schedule", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["scheduled"] >= 3
+
+    def get(wo_id: int) -> dict:
+        return client.get(f"/api/v1/work-orders/{wo_id}").json()
+
+    orders = {wo_id: get(wo_id) for wo_id in (late, rush, soon)}
+    assert orders[rush]["scheduled_start"] <= orders[soon]["scheduled_start"] <= orders[late]["scheduled_start"]
+    for order in orders.values():
+        assert order["estimated_completion_date"] == order["scheduled_end"][:10]
+
+    # A bigger order moves to a free slot; the others stay put
+    response = client.put(f"/api/v1/work-orders/{soon}", json={"quantity": 60})
+    assert response.status_code == 200
+    assert response.json()["scheduled_end"] != orders[soon]["scheduled_end"]
+    for wo_id in (late, rush):
+        assert get(wo_id)["scheduled_start"] == orders[wo_id]["scheduled_start"]
+
+    # Cancelling frees the slot
+    client.put(f"/api/v1/work-orders/{rush}", json={"status": "cancelled"})
+    assert get(rush)["work_center_id"] is None
+
+    extra = create(30, "high", 3)
+    response = client.post(f"{BASE}/schedule/work-orders/{extra}")
+    assert response.status_code == 200 and response.json()["work_center_id"] is not None
+
+    for center in client.get(f"{BASE}/work-centers", params={"category": "tst-dye"}).json():
+        schedule = client.get(f"{BASE}/schedule", params={"work_center_id": center["id"], "limit": 1000}).json()
+        assert not _overlaps([(o["scheduled_start"], o["scheduled_end"]) for o in schedule["data"]])
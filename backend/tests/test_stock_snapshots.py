@@ -0,0 +1,96 @@
+"""
+Daily stock snapshots and as-of balance queries
+"""
+
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+from app.db import get_sessionmaker
+from app.models import MovementType, StockMovement
+from app.services import InventoryService
+from app.services.stock_snapshot_service import SnapshotColumns
+
+BASE = "/api/v1/inventory"
+TODAY = datetime.utcnow().date()
+
+
+def _day(offset: int) -> date:
+    return TODAY + timedelta(days=offset)
+
+
+async def _post_history(material_id: int, history):
+    """Post (day offset, warehouse, quantity) movements dated in the past"""
+    async with get_sessionmaker()() as session:
+        for offset, warehouse_code, quantity in history:
+            movement = StockMovement(
+                material_id=material_id,
+                warehouse_code=warehouse_code,
+                movement_type=MovementType.ADJUSTMENT,
+                quantity=quantity,
+                reference_type="manual",
+                created_at=datetime.combine(_day(offset), time(12)),
+            )
+            await InventoryService(session).post_movements([movement])
+        await session.commit()
+
+
+def test_snapshot_columns_combine_and_drop_zero_balances():
+    base = SnapshotColumns.from_rows([(2, "MAIN", 5.0), (1, "W2", 3.0), (1, "MAIN", 1.0), (1, "MAIN", 1.0)])
+    assert base.material_ids.tolist() == [1, 1, 2]
+    assert base.by_warehouse() == [("MAIN", 2.0), ("W2", 3.0), ("MAIN", 5.0)]
+
+    combined = base.combine(SnapshotColumns.from_rows([(2, "MAIN", 5.0), (3, "A1", 4.0)]), sign=-1)
+    assert combined.by_warehouse() == [("MAIN", 2.0), ("W2", 3.0), ("A1", -4.0)]
+
+    material_ids, totals = combined.totals_by_material()
+    assert material_ids.tolist() == [1, 3] and totals.tolist() == [5.0, -4.0]
+
+    restored = SnapshotColumns.from_bytes(combined.to_bytes())
+    assert restored.by_warehouse() == combined.by_warehouse()
+    assert np.array_equal(restored.material_ids, combined.material_ids)
+
+
+def test_as_of_balances_from_the_nearest_snapshot(client, run, admin_headers):
+    material = client.post(
+        f"{BASE}/materials",
+        json={"material_code": "SNAP-LINEN", "name": "Linen", "category": "fabric", "standard_cost": 2},
+    ).json()
+    run(_post_history, material["id"], [(-6, "MAIN", 100), (-4, "MAIN", -30), (-4, "W2", 8), (-2, "MAIN", 10)])
+
+    params = {"material_code": "SNAP-LINEN", "as_of": _day(-3).isoformat()}
+    assert client.get(f"{BASE}/balances/as-of", params=params).json()["quantity_on_hand"] == 78
+
+    response = client.post(f"{BASE}/snapshots", params={"through": _day(-5).isoformat()}, headers=admin_headers)
+    assert response.status_code == 200
+    response = client.post(f"{BASE}/snapshots", headers=admin_headers)
+    assert response.status_code == 200
+    # Days without movements get no snapshot
+    snapshot_dates = [s["snapshot_date"] for s in client.get(f"{BASE}/snapshots").json()["data"]]
+    assert _day(-4).isoformat() in snapshot_dates and _day(-3).isoformat() not in snapshot_dates
+
+    expected = {-7: 0, -6: 100, -5: 100, -4: 78, -3: 78, -2: 88, 0: 88}
+    for offset, quantity in expected.items():
+        params = {"material_id": material["id"], "as_of": _day(offset).isoformat()}
+        response = client.get(f"{BASE}/balances/as-of", params=params).json()
+        assert response["quantity_on_hand"] == quantity, offset
+        assert response["snapshot_date"] is not None
+
+    response = client.get(f"{BASE}/balances/as-of", params={"material_id": material["id"], "as_of": _day(-3)})
+    assert response.json()["warehouses"] == [
+        {"warehouse_code": "MAIN", "quantity_on_hand": 70},
+        {"warehouse_code": "W2", "quantity_on_hand": 8},
+    ]
+
+    report = client.get(f"{BASE}/valuation", params={"as_of": _day(-5).isoformat(), "top": 1000}).json()
+    linen = next(line for line in report["top"] if line["material_code"] == "SNAP-LINEN")
+    assert linen["value"] == 200
+    assert report["by_category"]["fabric"] >= 200
+
+    report = client.get(f"{BASE}/valuation", params={"as_of": _day(-3).isoformat(), "warehouse_code": "W2"}).json()
+    assert report["total_quantity"] == 8 and report["total_value"] == 16
+
+
+def test_as_of_unknown_material(client):
+    response = client.get(f"{BASE}/balances/as-of", params={"material_code": "NOPE", "as_of": TODAY.isoformat()})
+    assert response.status_code == 404
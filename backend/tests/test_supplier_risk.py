@@ -0,0 +1,102 @@
+"""
+Supplier risk: features from purchase order history, risk scores and their history
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import update
+
+from app.db import get_sessionmaker
+from app.models import SupplierRiskScore
+from app.services.supplier_risk_service import PRIOR_ORDERS, RISK_WEIGHTS, score_suppliers
+
+
+def test_rates_are_shrunk_towards_all_suppliers():
+    features = {
+        "orders": np.array([2, 98.0]),
+        "cancelled_orders": np.array([2, 0.0]),
+        "received_orders": np.array([0, 98.0]),
+        "on_time_orders": np.array([0, 49.0]),
+        "price_volatility": np.array([0, 0.5]),
+        "spend_share": np.array([0, 1.0]),
+    }
+    risks = score_suppliers(features)
+
+    # Two orders, both cancelled: nowhere near certain cancellation, with 2 cancelled in 100 overall
+    assert np.isclose(risks["cancellation_risk"][0], 100 * (2 + PRIOR_ORDERS * 0.02) / (2 + PRIOR_ORDERS))
+    # Never received: the delivery risk of all suppliers, half late
+    assert np.isclose(risks["delivery_risk"][0], 50)
+    assert risks["price_risk"][1] == risks["concentration_risk"][1] == 100
+    assert np.isclose(
+        risks["risk_score"][1], sum(weight * risks[name][1] for name, weight in RISK_WEIGHTS.items())
+    )
+
+
+def test_scores_from_purchase_orders(client, admin_headers, run):
+    today = date.today()
+
+    def order(supplier_id, days_ago, due_in, unit_price, status):
+        response = client.post(
+            "/api/v1/purchase-orders",
+            json={
+                "supplier_id": supplier_id,
+                "supplier_name": f"Supplier {supplier_id}",
+                "po_date": (today - timedelta(days=days_ago)).isoformat(),
+                "due_date": (today + timedelta(days=due_in)).isoformat(),
+                "line_items": [
+                    {"material_code": "SR-YARN", "material_name": "Yarn", "quantity": 10, "unit_price": unit_price}
+                ],
+            },
+        )
+        response = client.put(f"/api/v1/purchase-orders/{response.json()['id']}", json={"status": status})
+        assert response.status_code == 200
+
+    # 7101 delivered 4 days late and had an order cancelled; 7102 delivers on time at varying prices
+    order(7101, 20, -4, 5, "received")
+    order(7101, 10, 5, 5, "cancelled")
+    order(7102, 30, 3, 4, "received")
+    order(7102, 5, 10, 6, "approved")
+
+    base = "/api/v1/ml/supplier-risk"
+    assert client.post(f"{base}/refresh").status_code in (401, 403)
+    report = client.post(f"{base}/refresh", headers=admin_headers).json()
+    assert report["suppliers"] >= 2
+
+    late = client.get(f"{base}/profile/7101").json()
+    assert late["orders"] == 2 and late["cancelled_orders"] == 1 and late["cancellation_rate"] == 0.5
+    assert late["received_orders"] == 1 and late["on_time_orders"] == 0 and late["average_days_late"] == 4
+    assert late["spend"] == 50 and late["price_volatility"] == 0
+    steady = client.get(f"{base}/profile/7102").json()
+    assert steady["on_time_rate"] == 1 and steady["materials"] == 1
+    assert np.isclose(steady["price_volatility"], 0.2)
+    assert late["delivery_risk"] > steady["delivery_risk"]
+    assert late["previous_score"] is None and late["performance_trend"] == "flat"
+    assert client.get(f"{base}/profile/7199").status_code == 404
+
+    # Move the day's scores back a month, as if scored then at no risk
+    async def backdate():
+        async with get_sessionmaker()() as session:
+            await session.execute(
+                update(SupplierRiskScore)
+                .where(SupplierRiskScore.supplier_id == 7101)
+                .values(scored_on=today - timedelta(days=30), risk_score=0)
+            )
+            await session.commit()
+
+    run(backdate)
+    client.post(f"{base}/refresh", headers=admin_headers)
+    late = client.get(f"{base}/profile/7101").json()
+    assert late["previous_score"] == 0 and late["performance_trend"] == "down"
+
+    history = client.get(f"{base}/history/7101", params={"timeframe": "12m"}).json()
+    assert [point["scored_on"] for point in history["scores"]] == [
+        (today - timedelta(days=30)).isoformat(),
+        today.isoformat(),
+    ]
+    assert len(client.get(f"{base}/history/7101", params={"timeframe": "2w"}).json()["scores"]) == 1
+
+    scores = client.get(f"{base}/scores", params={"search": "Supplier 710", "limit": 100}).json()["data"]
+    assert [profile["risk_score"] for profile in scores] == sorted(
+        (profile["risk_score"] for profile in scores), reverse=True
+    )